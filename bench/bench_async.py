@@ -0,0 +1,75 @@
+"""
+ベンチマーク: 独立した呼び出しの直列実行 vs AsyncMemoryBank + asyncio.gather
+
+Step 2 のセマンティック検索クエリ A/B/C と、user_123 / user_999 の retrieve を
+レイテンシ付きスタブで実行し、壁時計時間を比較する。
+直列なら「レイテンシの合計」、gather なら「レイテンシの最大値」に近づく。
+
+実行方法:
+  uv run python bench/bench_async.py
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank.aio import AsyncMemoryBank  # noqa: E402
+from memorybank.stub import LatencyModel, StubClient  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+SCOPE = {"user_id": "user_123", "system_id": "order_management"}
+SCOPE_999 = {"user_id": "user_999", "system_id": "order_management"}
+QUERIES = ["いつもの発注業者は？", "納品先はどこですか？", "予算の上限は？"]
+LATENCY = LatencyModel(mean_seconds=0.08, jitter_seconds=0.04)
+
+client = StubClient(latency=LatencyModel())
+for fact in ["A4コピー用紙の発注先はA社です", "納品先は2階のオフィスです", "消耗品の予算上限は月30万円です"]:
+    client.agent_engines.memories.create(name=AGENT_ENGINE_NAME, fact=fact, scope=SCOPE)
+client.agent_engines.memories.create(name=AGENT_ENGINE_NAME, fact="B5用紙の発注先はD社です", scope=SCOPE_999)
+client.set_latency(LATENCY)
+
+
+def sequential() -> list[int]:
+    memories = client.agent_engines.memories
+    counts = [
+        len(list(memories.retrieve(
+            name=AGENT_ENGINE_NAME,
+            scope=SCOPE,
+            similarity_search_params={"search_query": q, "top_k": 3},
+        )))
+        for q in QUERIES
+    ]
+    counts.append(len(list(memories.retrieve(name=AGENT_ENGINE_NAME, scope=SCOPE))))
+    counts.append(len(list(memories.retrieve(name=AGENT_ENGINE_NAME, scope=SCOPE_999))))
+    return counts
+
+
+async def gathered() -> list[int]:
+    bank = AsyncMemoryBank(client, AGENT_ENGINE_NAME, max_concurrency=8)
+    results = await asyncio.gather(
+        *(bank.retrieve(SCOPE, similarity_search_params={"search_query": q, "top_k": 3}) for q in QUERIES),
+        bank.retrieve(SCOPE),
+        bank.retrieve(SCOPE_999),
+    )
+    return [len(r) for r in results]
+
+
+started = time.perf_counter()
+seq_counts = sequential()
+seq_seconds = time.perf_counter() - started
+
+started = time.perf_counter()
+async_counts = asyncio.run(gathered())
+async_seconds = time.perf_counter() - started
+
+assert seq_counts == async_counts
+calls = len(seq_counts)
+print(f"独立した retrieve() {calls} 回、レイテンシ {LATENCY.mean_seconds * 1000:.0f}ms ± {LATENCY.jitter_seconds * 1000:.0f}ms\n")
+print(f"{'方式':<16} | {'時間(s)':>8}")
+print("-" * 28)
+print(f"{'直列（同期）':<16} | {seq_seconds:>8.3f}")
+print(f"{'asyncio.gather':<16} | {async_seconds:>8.3f}")
+print(f"\n→ 合計 ≈ {calls} × {LATENCY.mean_seconds:.2f}s、gather ≈ 最大値（≤ {LATENCY.mean_seconds + LATENCY.jitter_seconds:.2f}s）")
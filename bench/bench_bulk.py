@@ -0,0 +1,89 @@
+"""
+ベンチマーク: スコープ内メモリの削除（直列 delete vs bulk_delete）
+
+Step 4 のクリーンアップと同じ「retrieve() して 1 件ずつ delete()」と、
+bulk_delete() の 2 つの方式（delete の並列実行 / purge）を比較する。
+bulk_delete() の計測では 5% の確率で 503 を返し、再試行も含めて測る。
+
+実行方法:
+  uv run python bench/bench_bulk.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank.bulk import STRATEGY_PURGE, bulk_delete  # noqa: E402
+from memorybank.stub import LatencyModel, StubClient  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+SCOPE = {"user_id": "bulk-user"}
+MEMORIES = 200
+FAILURE_RATE = 0.05
+
+# purge のオペレーションは SDK の AgentEnginePurgeMemoriesOperation として読む。実クライアントでは
+# import 済みのため、初回 import の時間（数秒）が purge の計測に入らないよう先に読み込んでおく
+import vertexai._genai.types  # noqa: E402,F401
+
+client = StubClient(latency=LatencyModel(mean_seconds=0.02, jitter_seconds=0.005))
+
+
+def seed() -> list[str]:
+    # 準備の create() は遅延・エラーなし
+    client.set_latency(LatencyModel(), method="memories.create")
+    client.set_failure_rate(0.0, method="memories.create")
+    return [
+        client.agent_engines.memories.create(
+            name=AGENT_ENGINE_NAME, fact=f"削除テスト #{i}", scope=SCOPE
+        ).response.name
+        for i in range(MEMORIES)
+    ]
+
+
+def remaining() -> int:
+    return len(list(client.agent_engines.memories.retrieve(name=AGENT_ENGINE_NAME, scope=SCOPE)))
+
+
+# 直列（Step 4 の方式）
+seed()
+client.calls.clear()
+started = time.perf_counter()
+for m in client.agent_engines.memories.retrieve(name=AGENT_ENGINE_NAME, scope=SCOPE):
+    client.agent_engines.memories.delete(name=m.memory.name)
+serial_seconds = time.perf_counter() - started
+serial_rpcs = sum(client.calls.values())
+assert remaining() == 0
+
+client.set_failure_rate(FAILURE_RATE)
+
+# bulk_delete（名前指定 → delete の並列実行）
+names = seed()
+client.calls.clear()
+by_names = bulk_delete(client, AGENT_ENGINE_NAME, names=names, max_workers=16)
+names_rpcs = sum(n for k, n in client.calls.items() if not k.endswith(":failed"))
+
+# bulk_delete（スコープ指定 → purge）
+seed()
+client.calls.clear()
+by_scope = bulk_delete(client, AGENT_ENGINE_NAME, scope=SCOPE, max_workers=16)
+scope_rpcs = sum(n for k, n in client.calls.items() if not k.endswith(":failed"))
+
+client.set_failure_rate(0.0)
+assert by_names.ok and by_scope.ok and remaining() == 0
+# dry-run の purge_count が件数と一致し、個別の delete() に切り替わっていないこと
+assert by_scope.strategy == STRATEGY_PURGE, by_scope
+
+print(f"{MEMORIES} 件のメモリを削除（RPC 20ms ± 5ms、bulk_delete は 503 を {FAILURE_RATE:.0%} 注入）\n")
+print(f"{'方式':<22} | {'時間(s)':>8} | {'件/s':>7} | {'RPC':>5} | 再試行")
+print("-" * 60)
+print(f"{'直列 delete':<22} | {serial_seconds:>8.2f} | {MEMORIES / serial_seconds:>7.1f} | {serial_rpcs:>5} | -")
+for label, result, rpcs in (
+    (f"bulk_delete({by_names.strategy})", by_names, names_rpcs),
+    (f"bulk_delete({by_scope.strategy})", by_scope, scope_rpcs),
+):
+    print(
+        f"{label:<22} | {result.elapsed_seconds:>8.2f} | {result.deleted_per_second:>7.1f}"
+        f" | {rpcs:>5} | {result.retries}"
+    )
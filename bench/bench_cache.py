@@ -0,0 +1,93 @@
+"""
+ベンチマーク: エージェントの毎ターン retrieve()（キャッシュなし vs CachedMemories）
+
+エージェントが毎ターン同じユーザースコープを retrieve() し、
+ときどき create() で記憶を追加するワークロードをスタブクライアントで再現する。
+書き込み時にはスコープのキャッシュが自動で破棄されるため、結果は常に最新になる。
+最後に、retrieve() の最中に書き込みがあった場合に古い結果をキャッシュしないこと、
+エントリを捨てたときにメモリ名 → スコープの記録も消えることを確認する。
+
+実行方法:
+  uv run python bench/bench_cache.py
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank.cache import CachedMemories, RetrieveCache, make_key  # noqa: E402
+from memorybank.stub import LatencyModel, StubClient  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+SCOPE = {"user_id": "user_123", "system_id": "order_management"}
+TURNS = 60
+WRITE_EVERY = 10
+
+
+def run(use_cache: bool) -> tuple[float, int, list[int]]:
+    client = StubClient(latency=LatencyModel(mean_seconds=0.02))
+    memories = CachedMemories(client.agent_engines.memories) if use_cache else client.agent_engines.memories
+    counts: list[int] = []
+    started = time.perf_counter()
+    for turn in range(TURNS):
+        if turn % WRITE_EVERY == 0:
+            memories.create(name=AGENT_ENGINE_NAME, fact=f"発注メモ #{turn}", scope=SCOPE)
+        counts.append(len(list(memories.retrieve(name=AGENT_ENGINE_NAME, scope=SCOPE))))
+    elapsed = time.perf_counter() - started
+    if use_cache:
+        print(f"   キャッシュ統計: {memories.cache.stats}（ヒット率 {memories.cache.stats.hit_rate:.0%}）")
+    return elapsed, client.calls["memories.retrieve"], counts
+
+
+print(f"{TURNS} ターン、{WRITE_EVERY} ターンごとに create()\n")
+plain_seconds, plain_rpcs, plain_counts = run(use_cache=False)
+cached_seconds, cached_rpcs, cached_counts = run(use_cache=True)
+assert plain_counts == cached_counts, "キャッシュ経由でも件数は一致するはず"
+
+print(f"\n{'方式':<16} | {'時間(s)':>8} | retrieve RPC")
+print("-" * 42)
+print(f"{'キャッシュなし':<16} | {plain_seconds:>8.3f} | {plain_rpcs}")
+print(f"{'CachedMemories':<16} | {cached_seconds:>8.3f} | {cached_rpcs}")
+
+
+# retrieve() の応答が返る前に別スレッドが create() した場合、その応答はキャッシュしない
+class SlowResponse:
+    """retrieve() の応答が届くまで時間がかかる（応答はサーバが読んだ時点の内容）"""
+
+    def __init__(self, memories: object) -> None:
+        self._memories = memories
+
+    def __getattr__(self, attr: str) -> object:
+        return getattr(self._memories, attr)
+
+    def retrieve(self, **kwargs: object) -> list[object]:
+        items = list(self._memories.retrieve(**kwargs))  # type: ignore[attr-defined]
+        time.sleep(0.2)
+        return items
+
+
+client = StubClient(latency=LatencyModel(mean_seconds=0.01))
+memories = CachedMemories(SlowResponse(client.agent_engines.memories))  # type: ignore[arg-type]
+writer = threading.Timer(
+    0.1, lambda: memories.create(name=AGENT_ENGINE_NAME, fact="取得中の書き込み", scope=SCOPE)
+)
+writer.start()
+before = len(memories.retrieve(name=AGENT_ENGINE_NAME, scope=SCOPE))
+writer.join()
+after = len(memories.retrieve(name=AGENT_ENGINE_NAME, scope=SCOPE))
+assert after == before + 1, f"取得中に無効化された古い結果がキャッシュされた（{before} → {after}）"
+print(f"\n✅ 取得中の書き込み: 古い結果（{before} 件）はキャッシュせず、次の retrieve() で {after} 件")
+
+# LRU で捨てたエントリのメモリ名は、メモリ名 → スコープの記録にも残らない
+cache = RetrieveCache(max_entries=4)
+for i in range(100):
+    scope = {"user_id": f"user_{i}"}
+    items = [SimpleNamespace(memory=SimpleNamespace(name=f"{AGENT_ENGINE_NAME}/memories/{i}-{j}")) for j in range(5)]
+    cache.put(make_key(AGENT_ENGINE_NAME, scope), items)  # type: ignore[arg-type]
+remembered = len(cache._scope_of_memory)
+assert remembered == 4 * 5, f"捨てたエントリのメモリ名が残っている（{remembered} 件）"
+print(f"✅ エントリ {len(cache)} 件に対し、メモリ名 → スコープの記録は {remembered} 件")
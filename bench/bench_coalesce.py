@@ -0,0 +1,200 @@
+"""
+ベンチマーク: 短い発話ごとの generate() vs GenerateCoalescer
+
+エージェントがユーザーごとに細かい発話を大量に出すワークロードを再現する。
+発話は「項目Nは値M」の形で、ときどき「項目Nは忘れて」が混ざり、途中で metadata
+（department）が変わるユーザーもいる。スタブは KeyedConsolidation で統合するため、
+発話の順序が崩れると最終的なメモリの内容が変わる。
+
+  - 発話ごと:           1 発話 = 1 generate()（ユーザーごとに直列、ユーザー間は並行）
+  - GenerateCoalescer:  ユーザーの発話が混ざって届く順に add_text() し、まとめて送る
+
+generate() の回数・時間と、両者の最終的なメモリが一致すること（順序の保証）を確認する。
+最後に、発話がまばらに届く場合に max_delay_seconds で送られることと、gate の判定が
+例外を送出しても close() が終わり、判定せずに generate() すること、add() と同時に
+close() しても受け付けた発話はすべて送られることも確認する。
+
+実行方法:
+  uv run python bench/bench_coalesce.py
+"""
+
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Mapping, Sequence
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank.coalesce import GenerateCoalescer  # noqa: E402
+from memorybank.gate import GateDecision, RelevanceGate  # noqa: E402
+from memorybank.stub import KeyedConsolidation, LatencyModel, StubClient  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+USERS = 50
+UTTERANCES_PER_USER = 40
+KEYS = 5
+# 3 人に 1 人はこの発話から department が変わる
+METADATA_SWITCH_AT = 25
+GENERATE_LATENCY = LatencyModel(0.02, 0.005)
+WORKERS = 8
+MAX_EVENTS = 20
+MAX_DELAY_SECONDS = 0.05
+
+rng = random.Random(0)
+
+# (スコープ, config, 発話) をユーザーごとに発話の順で作る
+Utterance = tuple[dict[str, str], dict[str, object], str]
+per_user: list[list[Utterance]] = []
+for u in range(USERS):
+    scope = {"user_id": f"user_{u}", "system_id": "order_management"}
+    items: list[Utterance] = []
+    for i in range(UTTERANCES_PER_USER):
+        department = "sales" if u % 3 or i < METADATA_SWITCH_AT else "general_affairs"
+        config: dict[str, object] = {"metadata": {"department": {"string_value": department}}}
+        key = rng.randrange(KEYS)
+        text = f"項目{key}は忘れて" if rng.random() < 0.1 else f"項目{key}は値{i}"
+        items.append((scope, config, text))
+    per_user.append(items)
+
+# 発話が届く順（ユーザー間は混ざるが、ユーザー内の順序は保つ）
+arrivals: list[Utterance] = []
+cursors = [0] * USERS
+remaining = list(range(USERS))
+while remaining:
+    u = rng.choice(remaining)
+    arrivals.append(per_user[u][cursors[u]])
+    cursors[u] += 1
+    if cursors[u] == UTTERANCES_PER_USER:
+        remaining.remove(u)
+
+
+def new_stub() -> StubClient:
+    return StubClient(
+        latencies={"memories.generate": GENERATE_LATENCY}, consolidation=KeyedConsolidation()
+    )
+
+
+def final_state(stub: StubClient) -> dict[str, list[str]]:
+    state: dict[str, list[str]] = {}
+    for memory in stub.agent_engines.memories.list(name=AGENT_ENGINE_NAME):
+        state.setdefault(memory.scope["user_id"], []).append(memory.fact)
+    return {user: sorted(facts) for user, facts in sorted(state.items())}
+
+
+def per_event(stub: StubClient) -> None:
+    def run_user(items: list[Utterance]) -> None:
+        for scope, config, text in items:
+            stub.agent_engines.memories.generate(
+                name=AGENT_ENGINE_NAME,
+                direct_contents_source={"events": [{"content": {"role": "user", "parts": [{"text": text}]}}]},
+                scope=scope,
+                config=config,
+            )
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        list(executor.map(run_user, per_user))
+
+
+total = USERS * UTTERANCES_PER_USER
+print(f"{USERS} ユーザー × {UTTERANCES_PER_USER} 発話 = {total:,} 件, generate() のレイテンシ "
+      f"{GENERATE_LATENCY.mean_seconds * 1000:.0f}ms, 並行 {WORKERS}\n")
+
+baseline_stub = new_stub()
+started = time.perf_counter()
+per_event(baseline_stub)
+baseline_seconds = time.perf_counter() - started
+baseline_calls = baseline_stub.calls["memories.generate"]
+
+coalesced_stub = new_stub()
+started = time.perf_counter()
+with GenerateCoalescer(
+    coalesced_stub, AGENT_ENGINE_NAME,
+    max_events=MAX_EVENTS, max_delay_seconds=MAX_DELAY_SECONDS, max_workers=WORKERS,
+) as coalescer:
+    for scope, config, text in arrivals:
+        coalescer.add_text(text, scope=scope, config=config)
+coalesced_seconds = time.perf_counter() - started
+coalesced_calls = coalesced_stub.calls["memories.generate"]
+
+print(f"{'方式':<20} | {'generate()':>10} | {'時間(s)':>7}")
+print("-" * 46)
+print(f"{'発話ごと':<20} | {baseline_calls:>10,} | {baseline_seconds:>7.2f}")
+print(f"{'GenerateCoalescer':<20} | {coalesced_calls:>10,} | {coalesced_seconds:>7.2f}")
+print(f"\n{coalescer.stats.summary()}")
+print(f"generate() の回数: {baseline_calls / coalesced_calls:.1f} 分の 1")
+
+same = final_state(baseline_stub) == final_state(coalesced_stub)
+print(f"最終的なメモリが一致: {'✅' if same else '❌'}")
+
+# 発話がまばらに届く場合（max_delay_seconds で送られる）
+trickle_stub = new_stub()
+scope = {"user_id": "trickle"}
+with GenerateCoalescer(trickle_stub, AGENT_ENGINE_NAME, max_delay_seconds=MAX_DELAY_SECONDS) as trickle:
+    for i in range(6):
+        trickle.add_text(f"項目{i % 2}は値{i}", scope=scope)
+        time.sleep(MAX_DELAY_SECONDS * 0.6)
+print(f"\nまばらな発話: {trickle.stats.summary()}")
+
+
+class FailingGate(RelevanceGate):
+    def decide(self, events: Sequence[Mapping[str, object]]) -> GateDecision:
+        raise RuntimeError("gate failure")
+
+
+# gate の判定が例外を送出する場合（close() が終わらないと join() がタイムアウトする）
+failing_stub = new_stub()
+failing = GenerateCoalescer(failing_stub, AGENT_ENGINE_NAME, max_events=5, gate=FailingGate())
+
+
+def feed_failing() -> None:
+    with failing:
+        for i in range(12):
+            failing.add_text(f"項目{i % 3}は値{i}", scope={"user_id": "gate_error"})
+
+
+feeder = threading.Thread(target=feed_failing, daemon=True)
+feeder.start()
+feeder.join(timeout=10)
+gate_ok = (
+    not feeder.is_alive()
+    and failing.stats.gate_errors == failing.stats.generates == failing_stub.calls["memories.generate"] == 3
+)
+print(f"gate の例外: {failing.stats.summary()} {'✅' if gate_ok else '❌'}")
+
+
+
+# add() と close() が同時に呼ばれる場合（受け付けた発話は取り残されずにすべて送られる）
+def close_while_adding() -> tuple[int, int, int]:
+    racing = GenerateCoalescer(new_stub(), AGENT_ENGINE_NAME, max_events=7, max_delay_seconds=60)
+    sent: list[int] = []
+    racing.on_flush = lambda result: sent.append(len(result.events))
+    accepted = [0] * 4
+
+    def feed(n: int) -> None:
+        for i in range(200):
+            try:
+                racing.add_text(f"項目{i % 3}は値{i}", scope={"user_id": f"race_{n}_{i % 5}"})
+            except RuntimeError:  # close() 済み
+                return
+            accepted[n] += 1
+
+    feeders = [threading.Thread(target=feed, args=(n,)) for n in range(len(accepted))]
+    for thread in feeders:
+        thread.start()
+    time.sleep(0.002)
+    racing.close()
+    for thread in feeders:
+        thread.join()
+    return sum(accepted), sum(sent), racing.pending_events()
+
+
+race_results = [close_while_adding() for _ in range(20)]
+race_ok = all(accepted == sent and pending == 0 for accepted, sent, pending in race_results)
+print(f"add() 中の close(): 受け付けた発話 {sum(r[0] for r in race_results):,} 件 / "
+      f"送った発話 {sum(r[1] for r in race_results):,} 件 {'✅' if race_ok else '❌'}")
+
+if not (same and gate_ok and race_ok):
+    sys.exit(1)
@@ -0,0 +1,127 @@
+"""
+ベンチマーク: 統合の差分（監査ログ）を取るコスト
+
+SCOPE_MEMORIES 件のメモリがあるスコープに、1 回あたり「更新 1 件・追加 1 件・忘却 1 件」の
+generate() を ROUNDS 回行い、毎回の CREATED / UPDATED / DELETED と前後の fact を記録する。
+
+  - step1b 方式:     前後にスコープ全体を retrieve() し、hydrate_generated() で get()
+  - diff_generated:  最初に 1 回だけ retrieve() し、以降は diff.apply() で更新したスナップショットを使う
+  - スナップショットなし: 変更前の fact をすべて previous_revision から revisions.get() する
+
+generate() 以外の RPC 数と全体の時間（generate() を含む）を比べ、3 つの方式の差分と
+最終的なスコープが一致することを確認する。
+
+実行方法:
+  uv run python bench/bench_diff.py
+"""
+
+import collections
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank import diff_generated, hydrate_generated, snapshot_facts  # noqa: E402
+from memorybank.stub import KeyedConsolidation, LatencyModel, StubClient  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+SCOPE = {"user_id": "bench_user"}
+SCOPE_MEMORIES = 500
+ROUNDS = 20
+LATENCY = LatencyModel(mean_seconds=0.02, jitter_seconds=0.005)
+# retrieve() の 1 ページの件数（スコープ全体の取得は SCOPE_MEMORIES / PAGE_SIZE 回の RPC になる）
+PAGE_SIZE = 100
+
+# (action, name, 変更前, 変更後) の並び
+Changes = list[tuple[str, str, object, object]]
+
+
+def new_stub() -> StubClient:
+    stub = StubClient(consolidation=KeyedConsolidation())
+    for i in range(SCOPE_MEMORIES):
+        stub.agent_engines.memories.create(name=AGENT_ENGINE_NAME, fact=f"項目{i}は値0", scope=SCOPE)
+    stub.set_latency(LATENCY)
+    stub.calls.clear()
+    return stub
+
+
+def generate(stub: StubClient, r: int) -> object:
+    texts = [f"項目{r}は値{r + 1}", f"新規{r}は値{r}", f"項目{SCOPE_MEMORIES - 1 - r}は忘れて"]
+    return stub.agent_engines.memories.generate(
+        name=AGENT_ENGINE_NAME,
+        direct_contents_source={"events": [{"content": {"role": "user", "parts": [{"text": t} for t in texts]}}]},
+        scope=SCOPE,
+    )
+
+
+def retrieve_facts(stub: StubClient) -> dict[str, str]:
+    return snapshot_facts(stub.agent_engines.memories.retrieve(
+        name=AGENT_ENGINE_NAME, scope=SCOPE, simple_retrieval_params={"page_size": PAGE_SIZE}
+    ))
+
+
+def step1b_style(stub: StubClient) -> tuple[list[Changes], dict[str, str]]:
+    log: list[Changes] = []
+    after: dict[str, str] = {}
+    for r in range(ROUNDS):
+        before = retrieve_facts(stub)
+        operation = generate(stub, r)
+        hydrated = hydrate_generated(stub, operation)  # type: ignore[arg-type]
+        after = retrieve_facts(stub)
+        log.append([
+            (e.action, e.name, before.get(e.name) if e.action != "CREATED" else None,
+             after.get(e.name) if e.action != "DELETED" else None)
+            for e in hydrated
+        ])
+    return log, after
+
+
+def with_snapshot(stub: StubClient) -> tuple[list[Changes], dict[str, str]]:
+    log: list[Changes] = []
+    snapshot = retrieve_facts(stub)
+    for r in range(ROUNDS):
+        operation = generate(stub, r)
+        diff = diff_generated(stub, operation, snapshot)  # type: ignore[arg-type]
+        log.append([(c.action, c.name, c.before, c.after) for c in diff])
+        snapshot = diff.apply(snapshot)
+    return log, snapshot
+
+
+def without_snapshot(stub: StubClient) -> tuple[list[Changes], dict[str, str]]:
+    log: list[Changes] = []
+    for r in range(ROUNDS):
+        operation = generate(stub, r)
+        diff = diff_generated(stub, operation)  # type: ignore[arg-type]
+        log.append([(c.action, c.name, c.before, c.after) for c in diff])
+    return log, retrieve_facts(stub)
+
+
+CASES: list[tuple[str, Callable[[StubClient], tuple[list[Changes], dict[str, str]]]]] = [
+    ("step1b 方式（前後に retrieve）", step1b_style),
+    ("diff_generated + スナップショット", with_snapshot),
+    ("diff_generated（スナップショットなし）", without_snapshot),
+]
+
+print(f"スコープ内 {SCOPE_MEMORIES} 件（retrieve() は {PAGE_SIZE} 件/ページ）, "
+      f"generate() {ROUNDS} 回（各回 更新・追加・忘却 1 件ずつ）\n")
+print(f"{'方式':<36} | {'RPC':>5} | {'時間(s)':>7} | 内訳（generate() を除く）")
+print("-" * 110)
+results: list[tuple[list[Changes], dict[str, str]]] = []
+for label, run in CASES:
+    stub = new_stub()
+    started = time.perf_counter()
+    results.append(run(stub))
+    elapsed = time.perf_counter() - started
+    calls = collections.Counter(stub.calls)
+    del calls["memories.generate"]
+    detail = ", ".join(f"{method}×{n}" for method, n in sorted(calls.items()))
+    print(f"{label:<36} | {sum(calls.values()):>5} | {elapsed:>7.2f} | {detail}")
+
+reference_log, reference_after = results[0]
+same = all(log == reference_log and after == reference_after for log, after in results[1:])
+print(f"\n差分と最終的なスコープが一致: {'✅' if same else '❌'}")
+print(f"例（1 回目）: {reference_log[0]}")
+if not same:
+    sys.exit(1)
@@ -0,0 +1,75 @@
+"""
+ベンチマーク: 負荷試験用のスタブ（StubClient）自体のスループット
+
+エージェントをオフラインで負荷試験するとき、スタブがボトルネックにならないことを確認する。
+レイテンシ 0 のスタブに SCOPES 個のスコープ × MEMORIES_PER_SCOPE 件のメモリを入れ、
+メソッドごとに 1 秒あたりの呼び出し数を測る。
+
+  - retrieve() はスコープの索引を引くため、全体の件数ではなくスコープ内の件数に比例する
+    （比較として list() + scope フィルタでの全件走査も測る）
+  - generate() は KeyedConsolidation（「キーは値」の fact をキーごとに統合）を使う
+
+実行方法:
+  uv run python bench/bench_emulator.py
+"""
+
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank.filters import scope_filter  # noqa: E402
+from memorybank.stub import KeyedConsolidation, StubClient  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+SCOPES = 10_000
+MEMORIES_PER_SCOPE = 5
+OPS = 20_000
+SCAN_OPS = 20
+
+client = StubClient(consolidation=KeyedConsolidation())
+memories = client.agent_engines.memories
+scopes = [{"user_id": f"user_{i}", "system_id": "load_test"} for i in range(SCOPES)]
+
+started = time.perf_counter()
+names: list[str] = []
+for scope in scopes:
+    for j in range(MEMORIES_PER_SCOPE):
+        names.append(memories.create(name=AGENT_ENGINE_NAME, fact=f"項目{j}は値{j}", scope=scope).response.name)
+seed_seconds = time.perf_counter() - started
+total = SCOPES * MEMORIES_PER_SCOPE
+print(f"{total:,} 件（{SCOPES:,} スコープ）を作成: {seed_seconds:.2f}s（{total / seed_seconds:,.0f} ops/s）\n")
+
+
+def events(i: int) -> dict[str, list[dict[str, object]]]:
+    # 半分は既存のキーの更新（UPDATED）、半分は新しいキー（CREATED）
+    text = f"項目{i % MEMORIES_PER_SCOPE}は新しい値{i}" if i % 2 else f"追加{i}は値{i}"
+    return {"events": [{"content": {"role": "user", "parts": [{"text": text}]}}]}
+
+
+CASES: list[tuple[str, int, Callable[[int], object]]] = [
+    ("get", OPS, lambda i: memories.get(name=names[i % len(names)])),
+    ("retrieve（スコープ索引）", OPS, lambda i: list(
+        memories.retrieve(name=AGENT_ENGINE_NAME, scope=scopes[i % SCOPES]))),
+    ("retrieve + search_query", OPS, lambda i: list(memories.retrieve(
+        name=AGENT_ENGINE_NAME, scope=scopes[i % SCOPES],
+        similarity_search_params={"search_query": "項目1", "top_k": 3}))),
+    ("generate（統合あり）", OPS, lambda i: memories.generate(
+        name=AGENT_ENGINE_NAME, direct_contents_source=events(i), scope=scopes[i % SCOPES])),
+    ("revisions.list", OPS, lambda i: list(memories.revisions.list(name=names[i % len(names)]))),
+    ("list + scope フィルタ（全件走査）", SCAN_OPS, lambda i: list(memories.list(
+        name=AGENT_ENGINE_NAME, config={"filter": scope_filter(scopes[i % SCOPES])}))),
+]
+
+print(f"{'メソッド':<32} | {'回数':>7} | {'ops/s':>10} | {'µs/回':>8}")
+print("-" * 68)
+for label, ops, call in CASES:
+    started = time.perf_counter()
+    for i in range(ops):
+        call(i)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} | {ops:>7,} | {ops / elapsed:>10,.0f} | {elapsed / ops * 1e6:>8.1f}")
+
+print(f"\n最終的なメモリ件数: {len(list(memories.list(name=AGENT_ENGINE_NAME))):,}")
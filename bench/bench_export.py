@@ -0,0 +1,128 @@
+"""
+ベンチマーク: 分析クエリ（毎回 list() vs 列指向スナップショット）
+
+Agent Engine 全体に対する分析クエリ（ユーザー別の件数・fact の部分一致検索・最近の更新）を、
+  - 毎回 list() で全ページを読み直す
+  - export_memories() で一度書き出し、SnapshotReader（mmap）で問い合わせる
+で比較する。あわせて、
+  - スナップショットのサイズ（JSON で保存した場合 / 非圧縮 / zlib）
+  - 1% のメモリが増えた後の再エクスポート（全件 vs 差分）の RPC 数と時間
+を計測する。
+
+実行方法:
+  uv run python bench/bench_export.py
+"""
+
+import collections
+import datetime
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank.export import CODEC_NONE, CODEC_ZLIB, SnapshotReader, export_memories  # noqa: E402
+from memorybank.records import compact  # noqa: E402
+from memorybank.streaming import stream_list  # noqa: E402
+from memorybank.stub import LatencyModel, StubClient  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+MEMORIES = 10_000
+PAGE_LATENCY = 0.02
+PRODUCTS = ["A4用紙", "トナー", "ノートPC", "モニター", "ボールペン"]
+
+client = StubClient()
+for i in range(MEMORIES):
+    client.agent_engines.memories.create(
+        name=AGENT_ENGINE_NAME,
+        fact=f"{PRODUCTS[i % len(PRODUCTS)]}は{'ABC'[i % 3]}社に発注する（#{i}）",
+        scope={"user_id": f"user_{i % 200}", "system_id": "order_management"},
+        config={"metadata": {"department": {"string_value": ["sales", "engineering", "hr"][i % 3]}}},
+    )
+client.set_latency(LatencyModel(mean_seconds=PAGE_LATENCY))
+since = datetime.datetime.now(tz=datetime.timezone.utc) - datetime.timedelta(hours=1)
+
+
+def queries_via_list() -> tuple[int, int, int]:
+    per_user = collections.Counter(
+        r.scope_dict()["user_id"] for r in compact(stream_list(client, AGENT_ENGINE_NAME))
+    )
+    toner = sum(1 for m in stream_list(client, AGENT_ENGINE_NAME) if "トナー" in m.fact)
+    recent = sum(
+        1 for m in stream_list(client, AGENT_ENGINE_NAME, filter=f'update_time>="{since.isoformat()}"')
+    )
+    return len(per_user), toner, recent
+
+
+def queries_via_snapshot(reader: SnapshotReader) -> tuple[int, int, int]:
+    per_user = collections.Counter(r.scope_dict()["user_id"] for r in reader.records())
+    toner = sum(1 for _ in reader.query(fact_contains="トナー"))
+    recent = sum(1 for _ in reader.query(updated_since=since))
+    return len(per_user), toner, recent
+
+
+def rpcs() -> int:
+    return client.calls["memories.list"]
+
+
+workdir = Path(tempfile.mkdtemp(prefix="bench_export_"))
+try:
+    # --- 分析クエリ ---
+    before = rpcs()
+    started = time.perf_counter()
+    expected = queries_via_list()
+    list_seconds = time.perf_counter() - started
+    list_rpcs = rpcs() - before
+
+    sizes: dict[str, int] = {}
+    for codec in (CODEC_NONE, CODEC_ZLIB):
+        result = export_memories(client, AGENT_ENGINE_NAME, workdir / codec, codec=codec)
+        sizes[codec] = result.bytes_written
+    export_seconds = result.elapsed_seconds
+
+    started = time.perf_counter()
+    with SnapshotReader(workdir / CODEC_ZLIB) as reader:
+        actual = queries_via_snapshot(reader)
+    snapshot_seconds = time.perf_counter() - started
+    assert actual == expected, (actual, expected)
+
+    print(f"{MEMORIES:,} 件, list() 1 ページ {PAGE_LATENCY * 1e3:.0f}ms, 分析クエリ 3 本\n")
+    print(f"{'方式':<28} | {'時間(s)':>8} | list() RPC")
+    print("-" * 56)
+    print(f"{'毎回 list()':<28} | {list_seconds:>8.2f} | {list_rpcs}")
+    print(f"{'export（1 回）':<28} | {export_seconds:>8.2f} | {result.pages}")
+    print(f"{'SnapshotReader で問い合わせ':<28} | {snapshot_seconds:>8.2f} | 0")
+
+    # --- サイズ ---
+    json_bytes = len(
+        json.dumps(
+            [
+                {"name": r.name, "fact": r.fact, "scope": r.scope_dict(), "metadata": r.metadata_dict(),
+                 "create_time_us": r.create_time_us, "update_time_us": r.update_time_us}
+                for r in compact(client.agent_engines.memories.list(name=AGENT_ENGINE_NAME))
+            ],
+            ensure_ascii=False,
+        ).encode("utf-8")
+    )
+    print(f"\nサイズ: JSON {json_bytes:,} bytes / 非圧縮 {sizes[CODEC_NONE]:,} bytes / zlib {sizes[CODEC_ZLIB]:,} bytes")
+
+    # --- 再エクスポート ---
+    client.set_latency(LatencyModel())
+    for i in range(MEMORIES // 100):
+        client.agent_engines.memories.create(
+            name=AGENT_ENGINE_NAME, fact=f"追加 #{i}", scope={"user_id": "user_new"}
+        )
+    client.set_latency(LatencyModel(mean_seconds=PAGE_LATENCY))
+    # スタブは全件を数秒以内に作るため、重なり幅 0 で差分だけを取得する
+    incremental = export_memories(client, AGENT_ENGINE_NAME, workdir / CODEC_ZLIB, overlap_seconds=0)
+    full = export_memories(client, AGENT_ENGINE_NAME, workdir / "full", incremental=False)
+    print(f"\n{MEMORIES // 100} 件追加した後の再エクスポート")
+    print(f"  全件: {full.summary()}")
+    print(f"  差分: {incremental.summary()}")
+    with SnapshotReader(workdir / CODEC_ZLIB) as reader:
+        assert len(reader) == MEMORIES + MEMORIES // 100
+finally:
+    shutil.rmtree(workdir, ignore_errors=True)
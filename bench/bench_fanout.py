@@ -0,0 +1,95 @@
+"""
+ベンチマーク: ユーザーごとの retrieve()（直列 vs 固定並列 vs retrieve_many）
+
+夜間バッチのように多数の user_id のメモリを取得するワークロードを、
+レイテンシとクォータ（1 秒あたりの呼び出し数、超えると 429）を設定したスタブで再現する。
+
+  - 直列:          1 スコープずつ retrieve()（一部のスコープで計測して換算）
+  - 固定並列:      スレッドプール（固定の同時実行数）+ call_with_retry()
+  - retrieve_many: 同時実行数を AIMD で調整（429 で半減、成功が続くと +1）
+
+実行方法:
+  uv run python bench/bench_fanout.py
+"""
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank.fanout import FanoutStats, retrieve_many  # noqa: E402
+from memorybank.retry import call_with_retry  # noqa: E402
+from memorybank.stub import LatencyModel, StubClient  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+USERS = 2_000
+MEMORIES_PER_USER = 2
+LATENCY = LatencyModel(mean_seconds=0.05, jitter_seconds=0.02)
+QUOTA_PER_SECOND = 400
+CONCURRENCY = 64
+SEQUENTIAL_SAMPLE = 100
+
+client = StubClient()
+memories = client.agent_engines.memories
+scopes = [{"user_id": f"user_{i}", "system_id": "nightly"} for i in range(USERS)]
+for scope in scopes:
+    for j in range(MEMORIES_PER_USER):
+        memories.create(name=AGENT_ENGINE_NAME, fact=f"メモ #{j}", scope=scope)
+client.set_latency(LATENCY, method="memories.retrieve")
+
+
+def retrieve(scope: dict[str, str]) -> int:
+    return len(list(memories.retrieve(name=AGENT_ENGINE_NAME, scope=scope)))
+
+
+def calls() -> tuple[int, int]:
+    return client.calls["memories.retrieve"], client.calls["memories.retrieve:throttled"]
+
+
+def report(label: str, seconds: float, total: int, before: tuple[int, int]) -> None:
+    rpcs, throttled = (a - b for a, b in zip(calls(), before))
+    print(f"{label:<22} | {seconds:>7.2f} | {USERS / seconds:>9.1f} | {rpcs:>6} | {throttled:>6} | {total}")
+
+
+print(f"{USERS:,} スコープ, retrieve {LATENCY.mean_seconds * 1e3:.0f}±{LATENCY.jitter_seconds * 1e3:.0f}ms, "
+      f"クォータ {QUOTA_PER_SECOND}/s, 同時実行 {CONCURRENCY}\n")
+print(f"{'方式':<22} | {'時間(s)':>7} | {'スコープ/s':>9} | {'RPC':>6} | {'429':>6} | メモリ件数")
+print("-" * 78)
+
+# --- 直列（一部のスコープで計測して換算） ---
+before = calls()
+started = time.perf_counter()
+sample_total = sum(retrieve(scope) for scope in scopes[:SEQUENTIAL_SAMPLE])
+elapsed = (time.perf_counter() - started) * USERS / SEQUENTIAL_SAMPLE
+report("直列（換算）", elapsed, sample_total * USERS // SEQUENTIAL_SAMPLE, before)
+
+client.set_rate_limit(QUOTA_PER_SECOND, method="memories.retrieve")
+
+# --- 固定並列 + 再試行 ---
+time.sleep(0.5)  # クォータのバケットを満たしてから計測する
+before = calls()
+started = time.perf_counter()
+with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+    total = sum(
+        pool.map(lambda s: call_with_retry(lambda: retrieve(s), max_attempts=10, base_seconds=0.2), scopes)
+    )
+report("固定並列 + 再試行", time.perf_counter() - started, total, before)
+
+# --- retrieve_many ---
+time.sleep(0.5)
+before = calls()
+stats = FanoutStats()
+started = time.perf_counter()
+total = 0
+failed = 0
+for result in retrieve_many(
+    client, AGENT_ENGINE_NAME, scopes, max_concurrency=CONCURRENCY, max_attempts=10, stats=stats
+):
+    total += len(result.memories)
+    failed += int(not result.ok)
+report("retrieve_many", time.perf_counter() - started, total, before)
+assert failed == 0 and total == USERS * MEMORIES_PER_USER
+
+print(f"\n{stats.summary()}")
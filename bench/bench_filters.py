@@ -0,0 +1,62 @@
+"""
+回帰テスト: filter / filter_groups のローカル評価（合成データ）
+
+bench/filter_regression.json は手で作った合成データで、Step 2 (3) の A-1〜C と同じ条件について
+  - snapshot: スコープ全体の retrieve() の応答と同じ形（REST の JSON）のメモリ
+  - cases:    条件（retrieve() の config）ごとに選ばれるべきメモリ名（期待値）
+を持つ。snapshot を SDK の型として読み込み、compile_filter() / compile_filter_groups() と
+ScopeSnapshot.filter() の結果が期待値と一致することを確認する（一致しない場合は終了コード 1）。
+
+⚠️ 期待値はこのリポジトリが想定するフィルタの意味（例: fact=~ は大文字・小文字を区別する）で
+   決めたもので、実サーバの応答を記録したものではない。サーバとの一致は Step 2 (3)-D で確認する。
+
+実行方法:
+  uv run python bench/bench_filters.py
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank.filters import ScopeSnapshot, compile_filter, compile_filter_groups  # noqa: E402
+from vertexai._genai import types  # noqa: E402
+
+FIXTURE_PATH = Path(__file__).resolve().parent / "filter_regression.json"
+
+with FIXTURE_PATH.open(encoding="utf-8") as f:
+    fixture: dict[str, object] = json.load(f)
+cases: list[dict[str, object]] = fixture["cases"]  # type: ignore[assignment]
+
+response = types.RetrieveMemoriesResponse._from_response(response=fixture["snapshot"], kwargs={})
+snapshot = ScopeSnapshot(response.retrieved_memories or [])
+print(f"合成スナップショット {len(snapshot)} 件（{fixture['scope']}）\n")
+print(f"{'条件':<4} | {'期待値':>6} | {'ローカル':>8} | 一致")
+print("-" * 36)
+
+failures: list[str] = []
+for case in cases:
+    config: dict[str, object] = case["config"]  # type: ignore[assignment]
+    expected = sorted(case["expected"])  # type: ignore[type-var]
+    matches_filter = compile_filter(str(config.get("filter") or ""))
+    matches_groups = compile_filter_groups(config.get("filter_groups"))  # type: ignore[arg-type]
+    local = sorted(
+        item.memory.name
+        for item in snapshot.items
+        if matches_filter(item.memory) and matches_groups(item.memory)
+    )
+    # ScopeSnapshot.filter()（compile_config() 経由）も同じ結果になること
+    via_snapshot = sorted(item.memory.name for item in snapshot.filter(config))
+    same = local == expected and via_snapshot == expected
+    print(f"{case['label']:<4} | {len(expected):>6} | {len(local):>8} | {'✅' if same else '❌'}")
+    if not same:
+        failures.append(
+            f"{case['label']}: 期待値 {expected} / ローカル {local} / ScopeSnapshot.filter {via_snapshot}"
+        )
+
+for line in failures:
+    print(f"\n❌ {line}")
+if failures:
+    sys.exit(1)
+print(f"\n✅ {len(cases)} 件の条件すべてで期待値と一致")
@@ -0,0 +1,129 @@
+"""
+ベンチマーク: generate() 前の関連性ゲート（RelevanceGate）の精度と省略できる generate()
+
+ラベル付きの会話（メモリになる / ならない）を判定し、次を表示する。
+
+  - 再現率:     メモリになる会話のうち generate() した割合（取りこぼし = 記憶の欠落）
+  - 適合率:     generate() した会話のうちメモリになる割合
+  - 省略の適合率: 省略した会話のうち本当にメモリにならない割合
+  - 省略率:     generate() を省略できた割合（= 減らせる generate() の回数）
+
+比較するのは、常に generate()（現状）/ ルールのみ / ルール + CharNgramModel。会話は 2 組ある。
+
+  - bench/gate_fixture.jsonl: ルール（挨拶・相づちのパターンなど）を調整するときに見た会話。
+    ルールの数字は参考値（楽観的）で、モデルは FOLDS 分割の交差検証で判定する
+  - bench/gate_holdout.jsonl: ルールの調整に使っていない会話（held-out）。ルールはそのまま、
+    モデルは gate_fixture.jsonl の全件で学習して判定する。こちらが実際の精度の目安
+
+held-out の会話でルールを調整しないこと（調整したら新しい held-out を作る）。取りこぼした会話も表示する。
+
+実行方法:
+  uv run python bench/bench_gate.py
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank.gate import CharNgramModel, GateDecision, RelevanceGate  # noqa: E402
+from memorybank.ingest import Message  # noqa: E402
+
+FIXTURE_PATH = Path(__file__).resolve().parent / "gate_fixture.jsonl"
+HOLDOUT_PATH = Path(__file__).resolve().parent / "gate_holdout.jsonl"
+FOLDS = 5
+REPEAT = 200
+
+
+def load(path: Path) -> list[dict[str, object]]:
+    with path.open(encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+cases = load(FIXTURE_PATH)
+holdout = load(HOLDOUT_PATH)
+
+
+def conversation(case: dict[str, object]) -> list[Message]:
+    return case["conversation"]  # type: ignore[return-value]
+
+
+def user_text(case: dict[str, object]) -> str:
+    return "\n".join(m["text"] for m in conversation(case) if m["role"] == "user")
+
+
+def evaluate(
+    label: str,
+    cases: list[dict[str, object]],
+    decide: Callable[[int, dict[str, object]], Optional[GateDecision]],
+) -> list[str]:
+    """全件を判定して 1 行を表示し、取りこぼした会話の id を返す"""
+    tp = fp = tn = fn = 0
+    missed: list[str] = []
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        decisions = [decide(i, case) for i, case in enumerate(cases)]
+    elapsed = time.perf_counter() - started
+    for case, decision in zip(cases, decisions):
+        generate = decision is None or decision.generate
+        if case["memorable"]:
+            tp += generate
+            fn += not generate
+            if not generate:
+                missed.append(f"{case['id']}: {user_text(case)[:40]}")
+        else:
+            fp += generate
+            tn += not generate
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    skip_precision = tn / (tn + fn) if tn + fn else 1.0
+    skipped = (tn + fn) / len(cases)
+    micros = elapsed / (REPEAT * len(cases)) * 1e6
+    print(
+        f"{label:<24} | {recall:>6.0%} | {precision:>6.0%} | {skip_precision:>10.0%} | "
+        f"{skipped:>6.0%} | {micros:>8.1f}"
+    )
+    return missed
+
+
+def header(title: str, cases: list[dict[str, object]]) -> None:
+    memorable = sum(1 for case in cases if case["memorable"])
+    print(f"{title}: {len(cases)} 件（メモリになる {memorable} 件 / ならない {len(cases) - memorable} 件）\n")
+    print(f"{'方式':<24} | {'再現率':>6} | {'適合率':>6} | {'省略の適合率':>10} | {'省略率':>6} | {'µs/判定':>8}")
+    print("-" * 82)
+
+
+rules = RelevanceGate()
+
+header("ルールの調整に使った会話（gate_fixture.jsonl、ルールは参考値）", cases)
+evaluate("常に generate()（現状）", cases, lambda i, case: None)
+evaluate("ルールのみ", cases, lambda i, case: rules.decide_messages(conversation(case)))
+# 交差検証: fold ごとに、その fold 以外で学習したモデルを使う
+gates: list[RelevanceGate] = []
+for fold in range(FOLDS):
+    model = CharNgramModel().fit(
+        (user_text(case), bool(case["memorable"])) for i, case in enumerate(cases) if i % FOLDS != fold
+    )
+    gates.append(RelevanceGate(model=model))
+evaluate("ルール + CharNgramModel", cases, lambda i, case: gates[i % FOLDS].decide_messages(conversation(case)))
+
+# held-out: ルールは調整に使っていない会話で、モデルは gate_fixture.jsonl の全件で学習する
+print()
+header("ルールの調整に使っていない会話（gate_holdout.jsonl）", holdout)
+evaluate("常に generate()（現状）", holdout, lambda i, case: None)
+rules = RelevanceGate()
+rule_missed = evaluate("ルールのみ", holdout, lambda i, case: rules.decide_messages(conversation(case)))
+full_model = CharNgramModel().fit((user_text(case), bool(case["memorable"])) for case in cases)
+model_gate = RelevanceGate(model=full_model)
+model_missed = evaluate(
+    "ルール + CharNgramModel", holdout, lambda i, case: model_gate.decide_messages(conversation(case))
+)
+
+print(f"\nルールのみ（held-out）: {rules.stats.summary()}")
+for label, missed in (("ルールのみ", rule_missed), ("ルール + CharNgramModel", model_missed)):
+    print(f"\n{label}で取りこぼした会話（held-out）: {len(missed)} 件")
+    for line in missed:
+        print(f"   {line}")
@@ -0,0 +1,57 @@
+"""
+ベンチマーク: generate() 後のメモリ取得（1 件ずつ get() vs hydrate_generated）
+
+generate() で 20 件のメモリが生成されたときに、
+従来の「generated_memories を回して 1 件ずつ get()」と
+memorybank.hydrate_generated() の所要時間をスタブクライアントで比較する。
+
+実行方法:
+  uv run python bench/bench_hydrate.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank import hydrate_generated  # noqa: E402
+from memorybank.stub import LatencyModel, StubClient  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+SCOPE = {"user_id": "bench_user"}
+GENERATED = 20
+
+client = StubClient(latency=LatencyModel(mean_seconds=0.03, jitter_seconds=0.01))
+operation = client.agent_engines.memories.generate(
+    name=AGENT_ENGINE_NAME,
+    direct_contents_source={
+        "events": [
+            {"content": {"role": "user", "parts": [{"text": f"発注ルール #{i}"} for i in range(GENERATED)]}}
+        ]
+    },
+    scope=SCOPE,
+)
+print(f"generate() で {len(operation.response.generated_memories)} 件生成\n")
+
+calls_before = client.calls["memories.get"]
+started = time.perf_counter()
+facts_loop = [
+    client.agent_engines.memories.get(name=gm.memory.name).fact
+    for gm in operation.response.generated_memories
+]
+loop_seconds = time.perf_counter() - started
+loop_calls = client.calls["memories.get"] - calls_before
+
+calls_before = client.calls["memories.get"]
+started = time.perf_counter()
+result = hydrate_generated(client, operation)
+hydrate_seconds = time.perf_counter() - started
+hydrate_calls = client.calls["memories.get"] - calls_before
+
+assert [e.fact for e in result] == facts_loop
+print(f"{'方式':<20} | {'時間(s)':>8} | get() 回数")
+print("-" * 44)
+print(f"{'1 件ずつ get()':<20} | {loop_seconds:>8.3f} | {loop_calls}")
+print(f"{'hydrate_generated':<20} | {hydrate_seconds:>8.3f} | {hydrate_calls}")
+print(f"\n→ {loop_seconds / hydrate_seconds:.1f} 倍高速（RPC 数は同じ、待ち時間が重なる）")
@@ -0,0 +1,81 @@
+"""
+ベンチマーク: セッションへのイベント追加（直列ループ vs append_events）
+
+Step 1a の「for i, msg in enumerate(conversation)」ループと、
+memorybank.append_events() の events/sec をスタブクライアントで比較する。
+GCP には接続しない。
+
+実行方法:
+  uv run python bench/bench_ingest.py
+"""
+
+import datetime
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank import append_events  # noqa: E402
+from memorybank.stub import LatencyModel, StubClient  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+LATENCY = LatencyModel(mean_seconds=0.02, jitter_seconds=0.005)
+
+
+def make_conversation(turns: int) -> list[dict[str, str]]:
+    conversation: list[dict[str, str]] = []
+    for t in range(turns):
+        conversation.append({"role": "user", "text": f"発注依頼 #{t}: A4コピー用紙を5箱"})
+        conversation.append({"role": "model", "text": f"承知しました。#{t} を発注します。"})
+    return conversation
+
+
+def sequential_loop(client: StubClient, session_name: str, conversation: list[dict[str, str]]) -> float:
+    """Step 1a と同じ直列ループ"""
+    started = time.perf_counter()
+    for i, msg in enumerate(conversation):
+        client.agent_engines.sessions.events.append(
+            name=session_name,
+            author="user",
+            invocation_id=str((i // 2) + 1),
+            timestamp=datetime.datetime.now(tz=datetime.timezone.utc),
+            config={
+                "content": {
+                    "role": msg["role"],
+                    "parts": [{"text": msg["text"]}],
+                }
+            },
+        )
+    return time.perf_counter() - started
+
+
+def new_session(client: StubClient) -> str:
+    session = client.agent_engines.sessions.create(name=AGENT_ENGINE_NAME, user_id="bench_user")
+    return session.response.name
+
+
+print(f"レイテンシ: {LATENCY.mean_seconds * 1000:.0f}ms ± {LATENCY.jitter_seconds * 1000:.0f}ms / RPC\n")
+print(f"{'件数':>6} | {'方式':<22} | {'時間(s)':>8} | {'events/s':>9} | 順序")
+print("-" * 64)
+
+for turns in (25, 100):
+    conversation = make_conversation(turns)
+    n = len(conversation)
+
+    client = StubClient(latency=LATENCY)
+    session_name = new_session(client)
+    elapsed = sequential_loop(client, session_name, conversation)
+    print(f"{n:>6} | {'直列ループ':<22} | {elapsed:>8.3f} | {n / elapsed:>9.1f} | -")
+
+    for window in (8, 32):
+        client = StubClient(latency=LATENCY)
+        session_name = new_session(client)
+        result = append_events(client, session_name, conversation, max_in_flight=window)
+        events = client.agent_engines.sessions.events.list(name=session_name)
+        ordered = [e.content["parts"][0]["text"] for e in events] == [m["text"] for m in conversation]
+        label = f"append_events(w={window})"
+        print(
+            f"{n:>6} | {label:<22} | {result.elapsed_seconds:>8.3f} | "
+            f"{result.events_per_second:>9.1f} | {'OK' if ordered else 'NG'}"
+        )
@@ -0,0 +1,79 @@
+"""
+ベンチマーク: 非同期 generate() の完了待ち（固定 sleep vs OperationTracker）
+
+wait_for_completion=False の generate() を複数発行し、
+Step 1d (9) と同じ「固定で sleep してから読む」方式と、
+OperationTracker による指数バックオフのポーリングを比較する。
+スタブのオペレーションは 0.2〜1.8 秒で完了する。
+最後に、呼び出し元が Future をキャンセルしても残りのオペレーションが完了することを確認する。
+
+実行方法:
+  uv run python bench/bench_operations.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank.operations import OperationTracker  # noqa: E402
+from memorybank.stub import LatencyModel, StubClient  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+SCOPE = {"user_id": "user_123"}
+OPERATIONS = 20
+FIXED_SLEEP = 5.0
+
+client = StubClient(
+    latency=LatencyModel(mean_seconds=0.01),
+    operation_latency=LatencyModel(mean_seconds=1.0, jitter_seconds=0.8),
+)
+
+
+def start_operations() -> list[object]:
+    return [
+        client.agent_engines.memories.generate(
+            name=AGENT_ENGINE_NAME,
+            direct_contents_source={"events": [{"content": {"role": "user", "parts": [{"text": f"予算メモ #{i}"}]}}]},
+            scope=SCOPE,
+            config={"wait_for_completion": False},
+        )
+        for i in range(OPERATIONS)
+    ]
+
+
+# 固定 sleep（Step 1d の方式）
+start_operations()
+started = time.perf_counter()
+time.sleep(FIXED_SLEEP)
+fixed_seconds = time.perf_counter() - started
+
+# OperationTracker
+operations = start_operations()
+started = time.perf_counter()
+with OperationTracker(client, base_interval=0.1, max_interval=1.0) as tracker:
+    futures = [tracker.track(op) for op in operations]
+    done = [f.result(timeout=30) for f in futures]
+    tracker_seconds = time.perf_counter() - started
+    polls = tracker.polls
+    histogram = tracker.time_to_done["generate"].snapshot()
+
+assert all(op.done for op in done)
+print(f"非同期 generate() {OPERATIONS} 件（完了まで 0.2〜1.8 秒）\n")
+print(f"{'方式':<18} | {'待ち時間(s)':>10} | ポーリング回数")
+print("-" * 48)
+print(f"{'固定 sleep(5)':<18} | {fixed_seconds:>10.2f} | 0（完了は保証されない）")
+print(f"{'OperationTracker':<18} | {tracker_seconds:>10.2f} | {polls}")
+print(f"\n完了までの時間: {histogram.summary()}")
+
+# 半分の Future をキャンセルしても、ポーリングスレッドは止まらず残りが完了する
+operations = start_operations()
+with OperationTracker(client, base_interval=0.1, max_interval=1.0) as tracker:
+    futures = [tracker.track(op) for op in operations]
+    for future in futures[::2]:
+        future.cancel()
+    rest = [f.result(timeout=30) for f in futures[1::2]]
+    tracker.wait_all(timeout=30)
+    assert all(op.done for op in rest) and tracker.pending == 0
+print(f"キャンセル {len(futures[::2])} 件と並行して残り {len(rest)} 件が完了 ✅")
@@ -0,0 +1,110 @@
+"""
+ベンチマーク: 添付の前処理（重複除去 + 画像の縮小）で減る送信量
+
+ユーザーがチャットで写真を送るワークロードを再現する。同じ写真（スタンプ・ロゴ・
+同じ納品書の再送）が何度も送られ、1 回の generate() には 1〜3 枚の画像が付く。
+
+  - 前処理なし:            すべての画像をそのまま inline_data で送る
+  - AttachmentPreprocessor: 同じスコープで送信済みの画像を取り除き、長辺 MAX_DIMENSION に縮小する
+
+写真は IMAGE_SIZE の JPEG を生成して使い、送信した画像がすべて長辺 MAX_DIMENSION 以下に
+縮小されたこと・報告された resized / bytes_saved が実際の送信内容と一致することを確認する
+（一致しない場合は AssertionError）。Pillow（extra `images`）が必要。
+
+実行方法:
+  uv sync --extra images
+  uv run python bench/bench_preprocess.py
+"""
+
+import io
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank.preprocess import AttachmentPreprocessor, PreprocessReport, pillow_available  # noqa: E402
+from memorybank.stub import StubClient  # noqa: E402
+
+if not pillow_available():
+    print("❌ Pillow がありません（uv sync --extra images）")
+    sys.exit(1)
+
+from PIL import Image  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+USERS = 20
+GENERATES_PER_USER = 10
+DISTINCT_IMAGES = 12
+IMAGE_SIZE = (4032, 3024)
+MAX_DIMENSION = 1600
+
+rng = random.Random(0)
+
+
+def make_image(seed: int) -> bytes:
+    image = Image.effect_mandelbrot(IMAGE_SIZE, (-2.0 + seed * 0.01, -1.2, 1.0, 1.2), 100).convert("RGB")
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=92)
+    return out.getvalue()
+
+
+images = [make_image(i) for i in range(DISTINCT_IMAGES)]
+# よく送られる画像ほど選ばれやすい（Zipf 風）
+weights = [1 / (i + 1) for i in range(DISTINCT_IMAGES)]
+workload = [
+    (f"user_{u}", [
+        {"content": {"role": "user", "parts": [{"text": f"写真 {g} 枚目です"}] + [
+            {"inline_data": {"mime_type": "image/jpeg", "data": image}}
+            for image in rng.choices(images, weights, k=rng.randint(1, 3))
+        ]}}
+    ])
+    for u in range(USERS)
+    for g in range(GENERATES_PER_USER)
+]
+
+client = StubClient()
+memories = client.agent_engines.memories
+preprocessor = AttachmentPreprocessor(max_dimension=MAX_DIMENSION)
+
+raw_bytes = 0
+sent_bytes = 0
+sent_images = 0
+largest_side = 0
+total = PreprocessReport()
+prepare_seconds = 0.0
+for user_id, events in workload:
+    scope = {"user_id": user_id}
+    raw_bytes += sum(len(p["inline_data"]["data"]) for p in events[0]["content"]["parts"] if "inline_data" in p)
+    started = time.perf_counter()
+    prepared = preprocessor.prepare(events, scope=scope)
+    prepare_seconds += time.perf_counter() - started
+    memories.generate(name=AGENT_ENGINE_NAME, direct_contents_source={"events": prepared.events}, scope=scope)
+    preprocessor.commit(prepared)
+    for part in prepared.events[0]["content"]["parts"]:
+        if "inline_data" in part:
+            data = part["inline_data"]["data"]
+            sent_bytes += len(data)
+            sent_images += 1
+            with Image.open(io.BytesIO(data)) as sent:
+                largest_side = max(largest_side, *sent.size)
+    for name in ("attachments", "deduplicated", "resized", "bytes_before", "bytes_after", "resize_skipped"):
+        setattr(total, name, getattr(total, name) + getattr(prepared.report, name))
+
+generates = len(workload)
+print(f"generate() {generates} 回, 異なる画像 {DISTINCT_IMAGES} 枚"
+      f"（{IMAGE_SIZE[0]}x{IMAGE_SIZE[1]}, 1 枚 平均 {sum(map(len, images)) / len(images) / 1e6:.2f} MB）"
+      f" → 長辺 {MAX_DIMENSION}px に縮小\n")
+print(f"前処理なし:      {raw_bytes / 1e6:>8.1f} MB（generate 1 回あたり {raw_bytes / generates / 1e6:.2f} MB）")
+print(f"前処理あり:      {total.bytes_after / 1e6:>8.1f} MB（generate 1 回あたり {total.bytes_after / generates / 1e6:.2f} MB）")
+print(f"  {total.summary()}")
+print(f"  前処理の時間: {prepare_seconds:.2f}s（generate 1 回あたり {prepare_seconds / generates * 1e3:.1f}ms）")
+assert total.bytes_before == raw_bytes
+assert total.bytes_after == sent_bytes
+# 重複でない画像はすべて縮小され、長辺が MAX_DIMENSION 以下になっている
+assert total.resize_skipped == 0
+assert total.resized == sent_images == total.attachments - total.deduplicated
+assert largest_side <= MAX_DIMENSION, largest_side
+assert total.bytes_saved == raw_bytes - sent_bytes > 0
+print(f"\n✅ 送信した画像 {sent_images} 枚すべて縮小済み（最大の長辺 {largest_side}px）")
@@ -0,0 +1,127 @@
+"""
+ベンチマーク: クォータのある generate() の連続呼び出し（素のループ vs 再試行 vs rate_limited）
+
+generate() を 1 秒あたり QUOTA 回までしか受け付けないスタブに対して BURST 回連続で呼び出し、
+  - 素のループ:        429 で失敗した呼び出しはそのまま失われる
+  - call_with_retry:   失敗した呼び出しを各自バックオフで再試行（429 を繰り返し受ける）
+  - rate_limited:      系統ごとのトークンバケット（AIMD）で送信ペースを合わせる
+を並列（スレッド）で比較する。あわせて、retrieve() が完全に失敗している間の
+再試行の総数を、予算なし（max_attempts 回まで）と RetryBudget ありで比較する。
+
+実行方法:
+  uv run python bench/bench_ratelimit.py
+"""
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank.ratelimit import (  # noqa: E402
+    FAMILY_GENERATE,
+    FAMILY_RETRIEVE,
+    FamilyLimit,
+    RetryBudget,
+    rate_limited,
+)
+from memorybank.retry import call_with_retry  # noqa: E402
+from memorybank.stub import LatencyModel, StubClient  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+BURST = 200
+WORKERS = 16
+QUOTA = 20  # generate() / 秒
+OUTAGE_CALLS = 200
+MAX_ATTEMPTS = 5
+
+client = StubClient(latency=LatencyModel(mean_seconds=0.03, jitter_seconds=0.01))
+client.set_rate_limit(QUOTA, method="memories.generate")
+SOURCE = {"events": [{"content": {"role": "user", "parts": [{"text": "A4用紙はA社に発注する"}]}}]}
+
+
+def generate(target: object) -> object:
+    return target.agent_engines.memories.generate(  # type: ignore[attr-defined]
+        name=AGENT_ENGINE_NAME, direct_contents_source=SOURCE, scope={"user_id": "user_123"}
+    )
+
+
+def run(label: str, call: Callable[[int], object]) -> None:
+    time.sleep(1.0)  # クォータのバケットを満たしてから計測する
+    before_calls = client.calls["memories.generate"]
+    before_429 = client.calls["memories.generate:throttled"]
+    failed = 0
+    started = time.perf_counter()
+
+    def _one(i: int) -> bool:
+        try:
+            call(i)
+            return True
+        except Exception:
+            return False
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        failed = sum(1 for ok in pool.map(_one, range(BURST)) if not ok)
+    elapsed = time.perf_counter() - started
+    rpcs = client.calls["memories.generate"] - before_calls
+    throttled = client.calls["memories.generate:throttled"] - before_429
+    print(f"{label:<18} | {elapsed:>7.2f} | {BURST - failed:>5} | {failed:>5} | {rpcs:>5} | {throttled:>5}")
+
+
+print(f"generate() {BURST} 回（{WORKERS} 並列）, クォータ {QUOTA}/s\n")
+print(f"{'方式':<18} | {'時間(s)':>7} | {'成功':>5} | {'失敗':>5} | {'RPC':>5} | {'429':>5}")
+print("-" * 64)
+run("素のループ", lambda i: generate(client))
+run("call_with_retry", lambda i: call_with_retry(lambda: generate(client), max_attempts=10))
+limited = rate_limited(
+    client,
+    {FAMILY_GENERATE: FamilyLimit(rate=10, burst=2, max_rate=50, additive=2.0, idempotent=False)},
+    max_attempts=10,
+)
+run("rate_limited", lambda i: generate(limited))
+generate_stats = limited.stats.families[FAMILY_GENERATE]
+print(
+    f"\nrate_limited: 429 {generate_stats.throttled} 回, 再試行 {generate_stats.retries} 回, "
+    f"最終レート {limited.limiter.buckets[FAMILY_GENERATE].rate:.1f}/s"
+)
+
+# --- 障害時の再試行の総数 ---
+client.set_failure_rate(1.0, method="memories.retrieve")
+
+
+def outage(label: str, call: Callable[[], object]) -> None:
+    before = client.calls["memories.retrieve"]
+    for _ in range(OUTAGE_CALLS):
+        try:
+            call()
+        except Exception:
+            pass
+    rpcs = client.calls["memories.retrieve"] - before
+    print(f"  {label:<26} RPC {rpcs:>5}（{rpcs / OUTAGE_CALLS:.2f} 倍）")
+
+
+def no_sleep(_: float) -> None:
+    pass
+
+
+print(f"\nretrieve() が全件 503 の間に {OUTAGE_CALLS} 回呼び出した場合（待ち時間は省略）")
+outage(
+    f"再試行 {MAX_ATTEMPTS} 回まで",
+    lambda: call_with_retry(
+        lambda: list(client.agent_engines.memories.retrieve(name=AGENT_ENGINE_NAME, scope={"user_id": "u"})),
+        max_attempts=MAX_ATTEMPTS, sleep=no_sleep,
+    ),
+)
+budgeted = rate_limited(
+    client,
+    {FAMILY_RETRIEVE: FamilyLimit(rate=1e6, burst=1e6)},
+    budget=RetryBudget(ratio=0.2, initial=10),
+    max_attempts=MAX_ATTEMPTS,
+    sleep=no_sleep,
+)
+outage(
+    "RetryBudget(ratio=0.2)",
+    lambda: list(budgeted.agent_engines.memories.retrieve(name=AGENT_ENGINE_NAME, scope={"user_id": "u"})),
+)
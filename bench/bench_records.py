@@ -0,0 +1,117 @@
+"""
+ベンチマーク: list() 結果の保持サイズとスキャン速度（SDK の types.Memory vs MemoryRecord）
+
+list() の応答と同じ形の JSON から types.Memory を作り、
+  - 保持に必要なメモリ（tracemalloc で計測した 1 件あたりのバイト数）
+  - スキャン（ユーザーごとの件数と最終更新日時の集計）の速度
+を、MemoryRecord に変換した場合と比較する。
+
+実行方法:
+  uv run python bench/bench_records.py
+"""
+
+import collections
+import datetime
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from vertexai._genai import types  # noqa: E402
+
+from memorybank.records import MemoryRecord, compact  # noqa: E402
+
+MEMORIES = 20_000
+ENGINE = "projects/123456789/locations/us-central1/reasoningEngines/987654321"
+TOPICS = [
+    {"managed_memory_topic": "USER_PREFERENCES"},
+    {"managed_memory_topic": "KEY_CONVERSATION_DETAILS"},
+    {"custom_memory_topic_label": "ordering_rules"},
+]
+
+rng = random.Random(0)
+base = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+raw = [
+    {
+        "name": f"{ENGINE}/memories/{1_000_000 + i}",
+        "fact": f"{rng.choice(['A4用紙', 'トナー', 'ノートPC'])}は{rng.choice(['A社', 'B社', 'C社'])}に発注する（#{i}）",
+        "scope": {"user_id": f"user_{i % 200}", "system_id": "order_management"},
+        "metadata": {
+            "department": {"string_value": rng.choice(["sales", "engineering", "hr"])},
+            "priority": {"double_value": float(rng.randint(1, 5))},
+        },
+        "topics": [rng.choice(TOPICS)],
+        "create_time": (base + datetime.timedelta(minutes=i)).isoformat(),
+        "update_time": (base + datetime.timedelta(minutes=i, seconds=30)).isoformat(),
+    }
+    for i in range(MEMORIES)
+]
+
+
+def retained(build: "collections.abc.Callable[[], list[object]]") -> tuple[list[object], int]:
+    gc.collect()
+    tracemalloc.start()
+    items = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return items, size
+
+
+def scan_sdk(items: list[types.Memory]) -> dict[str, tuple[int, datetime.datetime]]:
+    result: dict[str, tuple[int, datetime.datetime]] = {}
+    for m in items:
+        user = (m.scope or {})["user_id"]
+        count, latest = result.get(user, (0, base))
+        result[user] = (count + 1, max(latest, m.update_time or base))
+    return result
+
+
+def scan_records(items: list[MemoryRecord]) -> dict[str, tuple[int, int]]:
+    result: dict[str, tuple[int, int]] = {}
+    for r in items:
+        user = r.scope_dict()["user_id"]
+        count, latest = result.get(user, (0, 0))
+        result[user] = (count + 1, max(latest, r.update_time_us))
+    return result
+
+
+sdk_items, sdk_bytes = retained(lambda: [types.Memory.model_validate(d) for d in raw])
+
+
+def to_records() -> list[object]:
+    # SDK オブジェクトから変換し、SDK オブジェクトは手放す（保持するのはレコードだけ）
+    sdk = [types.Memory.model_validate(d) for d in raw]
+    records = list(compact(sdk))
+    del sdk
+    return records
+
+
+record_items, record_bytes = retained(to_records)
+
+
+def timed(scan: "collections.abc.Callable[[list], dict]", items: list) -> tuple[float, dict]:  # type: ignore[type-arg]
+    started = time.perf_counter()
+    for _ in range(5):
+        result = scan(items)
+    return (time.perf_counter() - started) / 5, result
+
+
+sdk_seconds, sdk_result = timed(scan_sdk, sdk_items)
+record_seconds, record_result = timed(scan_records, record_items)
+assert {u: c for u, (c, _) in sdk_result.items()} == {u: c for u, (c, _) in record_result.items()}
+
+started = time.perf_counter()
+list(compact(sdk_items))
+convert_seconds = time.perf_counter() - started
+
+print(f"{MEMORIES:,} 件（types.Memory, scope 2 キー, metadata 2 キー, topics 1 件）\n")
+print(f"{'表現':<16} | {'バイト/件':>10} | {'スキャン(ms)':>12} | 件/s")
+print("-" * 60)
+print(f"{'types.Memory':<16} | {sdk_bytes / MEMORIES:>10,.0f} | {sdk_seconds * 1e3:>12.1f} | {MEMORIES / sdk_seconds:,.0f}")
+print(f"{'MemoryRecord':<16} | {record_bytes / MEMORIES:>10,.0f} | {record_seconds * 1e3:>12.1f} | {MEMORIES / record_seconds:,.0f}")
+print(f"\n変換コスト: {convert_seconds * 1e3:.1f}ms（{MEMORIES / convert_seconds:,.0f} 件/s）")
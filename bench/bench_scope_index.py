@@ -0,0 +1,93 @@
+"""
+ベンチマーク: list() の結果に対するスコープ検索（全件走査 vs ScopeIndex）
+
+運用ツールでは list() で取得した全メモリから「このスコープのメモリ」や
+「user_id=X を含むスコープ」を探すことがある。メモリごとに scope を比較する全件走査と、
+ScopeIndex（正規化したスコープのハッシュ索引 + 要素ごとの転置索引）を比べる。
+
+  - 完全一致:   retrieve() と同じ条件（{"user_id": ..., "system_id": ...}）
+  - 部分一致:   user_id だけを指定（そのユーザーのすべてのスコープ）
+  - 2 要素指定: system_id と tenant_id の両方を含むスコープ（転置リストの積集合）
+
+実行方法:
+  uv run python bench/bench_scope_index.py
+"""
+
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank.records import MemoryRecord, compact  # noqa: E402
+from memorybank.scopes import ScopeIndex  # noqa: E402
+from memorybank.streaming import stream_list  # noqa: E402
+from memorybank.stub import StubClient  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+USERS = 5_000
+SYSTEMS = ["order_management", "inventory", "billing", "support"]
+TENANTS = 20
+MEMORIES_PER_SCOPE = 5
+QUERIES = 200
+
+client = StubClient()
+memories = client.agent_engines.memories
+for u in range(USERS):
+    for s, system in enumerate(SYSTEMS[: 1 + u % len(SYSTEMS)]):
+        scope = {"user_id": f"user_{u}", "system_id": system, "tenant_id": f"tenant_{(u + s) % TENANTS}"}
+        for j in range(MEMORIES_PER_SCOPE):
+            memories.create(name=AGENT_ENGINE_NAME, fact=f"メモ #{j}", scope=scope)
+
+records = list(compact(stream_list(client, AGENT_ENGINE_NAME, page_size=1000)))
+started = time.perf_counter()
+index: ScopeIndex[MemoryRecord] = ScopeIndex(records)
+build_seconds = time.perf_counter() - started
+print(f"list() の結果 {len(records):,} 件（{len(index.scopes()):,} スコープ）")
+print(f"ScopeIndex の構築: {build_seconds:.3f}s\n")
+
+
+def scan_exact(scope: dict[str, str]) -> list[MemoryRecord]:
+    target = tuple(sorted(scope.items()))
+    return [r for r in records if r.scope == target]
+
+
+def scan_partial(components: dict[str, str]) -> list[MemoryRecord]:
+    wanted = set(components.items())
+    return [r for r in records if wanted <= set(r.scope)]
+
+
+def exact_query(i: int) -> dict[str, str]:
+    u = i * 7 % USERS
+    return {"user_id": f"user_{u}", "system_id": SYSTEMS[0], "tenant_id": f"tenant_{u % TENANTS}"}
+
+
+def user_query(i: int) -> dict[str, str]:
+    return {"user_id": f"user_{i * 7 % USERS}"}
+
+
+def pair_query(i: int) -> dict[str, str]:
+    return {"system_id": SYSTEMS[i % len(SYSTEMS)], "tenant_id": f"tenant_{i % TENANTS}"}
+
+
+CASES: list[tuple[str, Callable[[int], dict[str, str]], Callable[[dict[str, str]], list[MemoryRecord]],
+                  Callable[[dict[str, str]], list[MemoryRecord]]]] = [
+    ("完全一致", exact_query, scan_exact, index.exact),
+    ("部分一致（user_id）", user_query, scan_partial, index.matching),
+    ("2 要素指定（system + tenant）", pair_query, scan_partial, index.matching),
+]
+
+print(f"{'検索':<28} | {'全件走査(ms)':>12} | {'ScopeIndex(ms)':>14} | {'倍率':>8} | 件数")
+print("-" * 82)
+for label, make_query, scan, lookup in CASES:
+    queries = [make_query(i) for i in range(QUERIES)]
+    started = time.perf_counter()
+    expected = [scan(q) for q in queries]
+    scan_ms = (time.perf_counter() - started) / QUERIES * 1e3
+    started = time.perf_counter()
+    found = [lookup(q) for q in queries]
+    index_ms = (time.perf_counter() - started) / QUERIES * 1e3
+    assert all({r.name for r in a} == {r.name for r in b} for a, b in zip(expected, found))
+    hits = sum(len(f) for f in found) / QUERIES
+    print(f"{label:<28} | {scan_ms:>12.3f} | {index_ms:>14.4f} | {scan_ms / index_ms:>7.0f}x | 平均 {hits:.0f}")
@@ -0,0 +1,88 @@
+"""
+ベンチマーク: 毎ターンのセマンティック検索（キャッシュなし vs 完全一致キー vs SemanticQueryCache）
+
+Step 2 (4) のようなセマンティック検索を、エージェントが毎ターン表記ゆれ付きで
+繰り返すワークロードをスタブクライアントで再現する。
+
+  - キャッシュなし: 毎ターンサーバに問い合わせる
+  - 完全一致キー:   クエリ文字列そのまま + top_k を広げない
+  - SemanticQueryCache: クエリを正規化し、top_k を 10 件まで広げて取得
+
+実行方法:
+  uv run python bench/bench_semantic_cache.py
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank.cache import CachedMemories, SemanticQueryCache  # noqa: E402
+from memorybank.stub import LatencyModel, StubClient  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+SCOPE = {"user_id": "user_123", "system_id": "order_management"}
+TURNS = 100
+WRITE_EVERY = 25
+QUESTIONS = ["いつもの発注業者は", "納品先はどこですか", "予算の上限は", "PCの発注ルールは"]
+
+
+def workload() -> list[tuple[str, int]]:
+    """表記ゆれ（末尾の記号・空白・全角英字）と top_k を混ぜたクエリ列"""
+    rng = random.Random(0)
+    turns: list[tuple[str, int]] = []
+    for _ in range(TURNS):
+        query = rng.choice(QUESTIONS) + rng.choice(["？", "?", ""])
+        if rng.random() < 0.3:
+            query = " " + query.replace("の", "の　", 1)
+        if rng.random() < 0.2:
+            query = query.replace("PC", "ＰＣ")
+        turns.append((query, rng.choice([1, 3, 5])))
+    return turns
+
+
+def run(mode: str) -> tuple[float, int, list[list[str]], str]:
+    client = StubClient(latency=LatencyModel(mean_seconds=0.02))
+    raw = client.agent_engines.memories
+    for i in range(8):
+        raw.create(name=AGENT_ENGINE_NAME, fact=f"発注メモ #{i}", scope=SCOPE)
+    memories: object = raw
+    if mode == "exact":
+        memories = CachedMemories(
+            raw, semantic_cache=SemanticQueryCache(normalizer=str), semantic_fetch_top_k=0
+        )
+    elif mode == "semantic":
+        memories = CachedMemories(raw)
+    client.calls.clear()
+
+    facts: list[list[str]] = []
+    started = time.perf_counter()
+    for turn, (query, top_k) in enumerate(workload()):
+        if turn and turn % WRITE_EVERY == 0:
+            memories.create(name=AGENT_ENGINE_NAME, fact=f"追加メモ #{turn}", scope=SCOPE)  # type: ignore[attr-defined]
+        results = memories.retrieve(  # type: ignore[attr-defined]
+            name=AGENT_ENGINE_NAME,
+            scope=SCOPE,
+            similarity_search_params={"search_query": query, "top_k": top_k},
+        )
+        facts.append([m.memory.fact for m in results])
+    elapsed = time.perf_counter() - started
+    stats = ""
+    if isinstance(memories, CachedMemories):
+        s = memories.semantic_cache.stats
+        stats = f"ヒット率 {s.hit_rate:.0%}（切り出し {s.partial_hits}）, 省けた時間 {s.saved_seconds:.2f}s"
+    return elapsed, client.calls["memories.retrieve"], facts, stats
+
+
+print(f"{TURNS} ターン、{WRITE_EVERY} ターンごとに create()（RPC 20ms）\n")
+results = {mode: run(mode) for mode in ("none", "exact", "semantic")}
+baseline = results["none"][2]
+assert all(r[2] == baseline for r in results.values()), "キャッシュ経由でも結果は一致するはず"
+
+print(f"{'方式':<20} | {'時間(s)':>8} | {'retrieve RPC':>12} | 統計")
+print("-" * 90)
+for label, mode in (("キャッシュなし", "none"), ("完全一致キー", "exact"), ("SemanticQueryCache", "semantic")):
+    elapsed, rpcs, _, stats = results[mode]
+    print(f"{label:<20} | {elapsed:>8.3f} | {rpcs:>12} | {stats}")
@@ -0,0 +1,65 @@
+"""
+ベンチマーク: 起動時間（python -X importtime）
+
+ステップスクリプトの起動時に払う import コストを比較する。
+
+  - 従来: import vertexai + dotenv をスクリプトの先頭で実行
+  - 現在: memorybank（connection を含む）だけを import し、vertexai は
+          get_client() を最初に呼ぶまで読み込まない
+
+それぞれ別プロセスで `python -X importtime -c "..."` を実行し、
+トップレベルの import の累積時間と、重い順の内訳を表示する。
+
+実行方法:
+  uv run python bench/bench_startup.py
+"""
+
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+REPEAT = 3
+
+CASES = [
+    ("memorybank（遅延 import）", "import memorybank, memorybank.connection"),
+    ("dotenv", "import dotenv"),
+    ("vertexai（従来の先頭 import）", "import vertexai, dotenv"),
+]
+
+
+def measure(statement: str) -> tuple[float, float, list[tuple[float, str]]]:
+    """(importtime の合計秒, プロセス全体の秒, 重いトップレベル import) を返す"""
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        cwd=SRC,
+        check=True,
+    )
+    wall = time.perf_counter() - started
+    top_level: list[tuple[float, str]] = []
+    for line in completed.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, package = line.split("|", 2)
+        if package.startswith(" ") and not package.startswith("  "):
+            top_level.append((int(cumulative) / 1e6, package.strip()))
+    return sum(s for s, _ in top_level), wall, sorted(top_level, reverse=True)[:3]
+
+
+print(f"起動時の import コスト（{REPEAT} 回の最小値）\n")
+print(f"{'対象':<30} | {'import(s)':>9} | {'プロセス(s)':>11} | 重い import（上位 3 件）")
+print("-" * 100)
+for label, statement in CASES:
+    try:
+        runs = [measure(statement) for _ in range(REPEAT)]
+    except subprocess.CalledProcessError:
+        print(f"{label:<30} | {'-':>9} | {'-':>11} | （import できません）")
+        continue
+    imported, wall, heaviest = min(runs, key=lambda r: r[1])
+    detail = ", ".join(f"{name} {seconds:.3f}s" for seconds, name in heaviest)
+    print(f"{label:<30} | {imported:>9.3f} | {wall:>11.3f} | {detail}")
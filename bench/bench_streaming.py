@@ -0,0 +1,104 @@
+"""
+ベンチマーク: list() の読み出し（list(pager) vs ストリーミング + 先読み）
+
+Agent Engine 全体を list() で読み、1 件ずつ処理（表示）するワークロードをスタブで再現する。
+
+  - list(pager):         全ページを取得し終えてから処理を始める
+  - stream（先読みなし）: 1 ページ処理するごとに次のページを取得する
+  - stream（先読みあり）: 処理中に次のページをバックグラウンドで取得する
+
+あわせて、先頭 20 件だけ読んで打ち切った場合に取得したページ数も比較する。
+最後に、途中のページが空でも次のページのトークンがある限り読み続けることを確認する。
+
+実行方法:
+  uv run python bench/bench_streaming.py
+"""
+
+import itertools
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Iterable
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank.streaming import StreamStats, stream_items, stream_list  # noqa: E402
+from memorybank.stub import LatencyModel, StubClient  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+MEMORIES = 5_000
+PAGE_SIZE = 100
+PAGE_LATENCY = 0.02
+WORK_PER_ITEM = 0.0002  # 表示などの処理時間（秒）
+
+client = StubClient()
+for i in range(MEMORIES):
+    client.agent_engines.memories.create(
+        name=AGENT_ENGINE_NAME, fact=f"メモ #{i}", scope={"user_id": f"user_{i % 50}"}
+    )
+client.set_latency(LatencyModel(mean_seconds=PAGE_LATENCY))
+
+
+def work(_: object) -> None:
+    time.sleep(WORK_PER_ITEM)
+
+
+def run(make_items: Callable[[], Iterable[object]]) -> tuple[float, float]:
+    """(最初の 1 件を処理し始めるまでの秒, 全件の処理が終わるまでの秒)"""
+    started = time.perf_counter()
+    first = None
+    for item in make_items():
+        if first is None:
+            first = time.perf_counter() - started
+        work(item)
+    return first or 0.0, time.perf_counter() - started
+
+
+def materialize() -> list[object]:
+    pager = client.agent_engines.memories.list(name=AGENT_ENGINE_NAME, config={"page_size": PAGE_SIZE})
+    return list(pager)
+
+
+rows = [("list(pager)", *run(materialize), MEMORIES)]
+for label, prefetch in (("stream（先読みなし）", False), ("stream（先読みあり）", True)):
+    first, total = run(lambda: stream_list(client, AGENT_ENGINE_NAME, page_size=PAGE_SIZE, prefetch=prefetch))
+    rows.append((label, first, total, PAGE_SIZE * (2 if prefetch else 1)))
+
+print(f"{MEMORIES:,} 件、page_size={PAGE_SIZE}、1 ページ {PAGE_LATENCY * 1e3:.0f}ms、1 件の処理 {WORK_PER_ITEM * 1e3:.1f}ms\n")
+print(f"{'方式':<20} | {'最初の 1 件(s)':>14} | {'合計(s)':>8} | 最大保持件数")
+print("-" * 66)
+for label, first, total, held in rows:
+    print(f"{label:<20} | {first:>14.3f} | {total:>8.3f} | {held:,}")
+
+client.calls.clear()
+stats = StreamStats()
+head = list(itertools.islice(stream_list(client, AGENT_ENGINE_NAME, page_size=PAGE_SIZE, stats=stats), 20))
+time.sleep(PAGE_LATENCY * 2)  # 先読み中だったページの取得完了を待ってから数える
+print(f"\n先頭 {len(head)} 件で打ち切り: list() RPC {client.calls['memories.list']} 回"
+      f"（全件なら {MEMORIES // PAGE_SIZE} 回）")
+
+
+class GappyPager:
+    """サーバのフィルタ処理などで、途中に空のページを返すページャ"""
+
+    def __init__(self, pages: list[list[int]]) -> None:
+        self._pages = pages
+        self._index = 0
+
+    @property
+    def page(self) -> list[int]:
+        return self._pages[self._index]
+
+    def next_page(self) -> list[int]:
+        if self._index + 1 >= len(self._pages):
+            raise IndexError("No more pages to fetch.")
+        self._index += 1
+        return self.page
+
+
+gappy_pages = [[], [1, 2], [], [], [3], [], [4, 5, 6]]
+for prefetch in (False, True):
+    gappy_stats = StreamStats()
+    items = list(stream_items(GappyPager(gappy_pages), prefetch=prefetch, stats=gappy_stats))
+    assert items == [1, 2, 3, 4, 5, 6], f"空のページで打ち切られた（prefetch={prefetch}）: {items}"
+print(f"\n✅ 空のページを挟んでも最後まで読む: {gappy_stats.items} 件 / 空でないページ {gappy_stats.pages}")
@@ -0,0 +1,126 @@
+"""
+ベンチマーク: スコープのローカルレプリカ（ScopeReplica）の整合性と同期コスト
+
+スタブ上でメモリの作成・更新・削除を続けながら ScopeReplica をバックグラウンドで同期し、
+  - 書き込みが止まった後、レプリカがサーバの状態（fact / update_time）と一致するか
+  - 状態ファイルから再起動した場合に差分取得から再開できるか
+  - 毎ターン retrieve() する場合と比べた RPC 数・読み出しのレイテンシ
+  - 更新からレプリカに反映されるまでの時間（replication lag）
+を確認する。一致しない場合は AssertionError で終了する。
+
+実行方法:
+  uv run python bench/bench_sync.py
+"""
+
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank.sync import ScopeReplica  # noqa: E402
+from memorybank.stub import LatencyModel, StubClient  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+SCOPES = [{"user_id": f"user_{i}", "system_id": "order_management"} for i in range(5)]
+OTHER_SCOPE = {"user_id": "user_other"}
+SEED_PER_SCOPE = 200
+MUTATIONS = 300
+READS = 500
+RETRIEVE_LATENCY = 0.02
+SYNC_INTERVAL = 0.2
+
+rng = random.Random(0)
+client = StubClient()
+memories = client.agent_engines.memories
+for scope in SCOPES + [OTHER_SCOPE]:
+    for i in range(SEED_PER_SCOPE):
+        memories.create(name=AGENT_ENGINE_NAME, fact=f"初期メモ #{i}", scope=scope)
+client.set_latency(LatencyModel(mean_seconds=RETRIEVE_LATENCY), method="memories.retrieve")
+
+
+def server_state() -> dict[str, tuple[str, object]]:
+    """複製対象のスコープにあるメモリ（name → (fact, update_time)）"""
+    state: dict[str, tuple[str, object]] = {}
+    for scope in SCOPES:
+        for item in memories.retrieve(name=AGENT_ENGINE_NAME, scope=scope):
+            state[item.memory.name] = (item.memory.fact, item.memory.update_time)
+    return state
+
+
+def replica_state(replica: ScopeReplica) -> dict[str, tuple[str, object]]:
+    return {
+        r.name: (r.fact, r.update_time)
+        for scope in SCOPES
+        for r in replica.memories(scope)
+    }
+
+
+def mutate(step: int) -> None:
+    scope = rng.choice(SCOPES + [OTHER_SCOPE])
+    existing = [item.memory.name for item in memories.retrieve(name=AGENT_ENGINE_NAME, scope=scope)]
+    action = rng.random()
+    if action < 0.4 or not existing:
+        memories.create(name=AGENT_ENGINE_NAME, fact=f"追加 #{step}", scope=scope)
+    elif action < 0.8:
+        memories._update(name=rng.choice(existing), fact=f"更新 #{step}")
+    else:
+        memories.delete(name=rng.choice(existing))
+
+
+workdir = Path(tempfile.mkdtemp(prefix="bench_sync_"))
+state_path = workdir / "replica.json"
+try:
+    # --- 書き込みと並行して同期する ---
+    # スタブの書き込みは数秒以内に終わるため、取り直しの幅は 50ms にする（既定は 5 秒）
+    replica = ScopeReplica(
+        client, AGENT_ENGINE_NAME, SCOPES,
+        state_path=state_path, reconcile_every=5, overlap_seconds=0.05,
+    )
+    replica.sync()
+    replica.start(interval=SYNC_INTERVAL)
+    for step in range(MUTATIONS):
+        mutate(step)
+        time.sleep(0.005)
+    replica.stop()
+    replica.sync(reconcile=True)  # 書き込み停止後の最終同期（削除も反映）
+    assert replica_state(replica) == server_state(), "レプリカがサーバの状態と一致しません"
+    print(f"並行書き込み {MUTATIONS} 回の後: レプリカ {len(replica)} 件がサーバと一致")
+    print(f"  {replica.stats.summary()}")
+
+    # --- 状態ファイルからの再開 ---
+    for step in range(MUTATIONS, MUTATIONS + 20):
+        mutate(step)
+    restarted = ScopeReplica(
+        client, AGENT_ENGINE_NAME, SCOPES, state_path=state_path, overlap_seconds=0.05
+    )
+    before = client.calls["memories.retrieve"]
+    restarted.sync()  # 差分取得（作成・更新だけが反映される）
+    incremental_rpcs = client.calls["memories.retrieve"] - before
+    print(f"\n状態ファイルから再開: 差分取得 {restarted.stats.fetched} 件（retrieve {incremental_rpcs} 回）")
+    restarted.reconcile()  # 削除の反映
+    assert replica_state(restarted) == server_state(), "再起動後のレプリカが一致しません"
+    print(f"  リコンサイル後 {len(restarted)} 件がサーバと一致")
+    print(f"  {restarted.stats.summary()}")
+
+    # --- 読み出しのコスト ---
+    before = client.calls["memories.retrieve"]
+    started = time.perf_counter()
+    for i in range(READS // 10):  # retrieve は遅いので 1/10 の回数で計測して換算する
+        list(memories.retrieve(name=AGENT_ENGINE_NAME, scope=SCOPES[i % len(SCOPES)]))
+    retrieve_seconds = (time.perf_counter() - started) * 10
+    retrieve_rpcs = (client.calls["memories.retrieve"] - before) * 10
+
+    started = time.perf_counter()
+    for i in range(READS):
+        restarted.memories(SCOPES[i % len(SCOPES)])
+    replica_seconds = time.perf_counter() - started
+
+    print(f"\n読み出し {READS} 回（retrieve {RETRIEVE_LATENCY * 1e3:.0f}ms）")
+    print(f"  毎回 retrieve():      {retrieve_seconds:.2f}s, RPC {retrieve_rpcs}")
+    print(f"  ScopeReplica:         {replica_seconds:.4f}s, RPC 0（同期 1 回あたり RPC {len(SCOPES)}）")
+finally:
+    shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,83 @@
+"""
+ベンチマーク: ローカルミラーでのセマンティック検索（全件比較 vs IVF）
+
+1 スコープに大量の fact がある状態を HashingEmbedder で再現し、
+ScopeVectorIndex の検索レイテンシと、IVF（近似）の再現率（全件比較の top_k との一致率）を測る。
+参考として、サーバ往復 1 回（スタブの retrieve()、20ms）も並べる。
+
+⚠️ NumPy が必要（uv sync --extra vector）
+
+実行方法:
+  uv run --extra vector python bench/bench_vector_index.py
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from memorybank.stub import LatencyModel, StubClient  # noqa: E402
+from memorybank.vector_index import HashingEmbedder, LocalVectorMirror  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+SCOPE = {"user_id": "hot-user"}
+MEMORIES = 20_000
+QUERIES = 200
+TOP_K = 3
+NPROBE = 8
+
+rng = random.Random(0)
+ITEMS = ["A4用紙", "トナー", "ノートPC", "モニター", "ボールペン", "封筒", "プリンタ", "椅子", "付箋", "ファイル"]
+VENDORS = ["A社", "B社", "C社", "D社", "E社"]
+PLACES = ["本社3階", "大阪支店", "倉庫", "名古屋営業所"]
+
+
+def fact(i: int) -> str:
+    return f"{rng.choice(ITEMS)}は{rng.choice(VENDORS)}から{rng.choice(PLACES)}へ毎月{rng.randint(1, 99)}個発注する（#{i}）"
+
+
+client = StubClient(latency=LatencyModel(mean_seconds=0.02))
+client.set_latency(LatencyModel(), method="memories.create")
+for i in range(MEMORIES):
+    client.agent_engines.memories.create(name=AGENT_ENGINE_NAME, fact=fact(i), scope=SCOPE)
+
+mirror = LocalVectorMirror(HashingEmbedder(dim=256))
+started = time.perf_counter()
+index = mirror.load(client, AGENT_ENGINE_NAME, SCOPE)
+load_seconds = time.perf_counter() - started
+
+queries = [f"{rng.choice(ITEMS)}の{rng.choice(VENDORS)}への発注は？" for _ in range(QUERIES)]
+vectors = [mirror.query_vector(q) for q in queries]
+
+
+def timed(nprobe: "int | None") -> tuple[float, list[list[str]]]:
+    results: list[list[str]] = []
+    started = time.perf_counter()
+    for vector in vectors:
+        results.append([h.memory.name for h in index.search(vector, TOP_K, nprobe=nprobe)])
+    return (time.perf_counter() - started) / len(vectors), results
+
+
+brute_seconds, exact = timed(None)
+started = time.perf_counter()
+index.build_ivf()
+ivf_build_seconds = time.perf_counter() - started
+ivf_seconds, approx = timed(NPROBE)
+recall = sum(len(set(a) & set(e)) for a, e in zip(approx, exact)) / (len(exact) * TOP_K)
+
+started = time.perf_counter()
+for q in queries[:10]:
+    list(client.agent_engines.memories.retrieve(
+        name=AGENT_ENGINE_NAME, scope=SCOPE, similarity_search_params={"search_query": q, "top_k": TOP_K}
+    ))
+server_seconds = (time.perf_counter() - started) / 10
+
+print(f"{MEMORIES:,} 件（dim=256, float32 {index.nbytes / 1e6:.1f} MB）、クエリ {QUERIES} 件、top_k={TOP_K}")
+print(f"ミラー構築: {load_seconds:.2f}s（retrieve 1 回 + 埋め込み）、IVF 構築: {ivf_build_seconds:.2f}s\n")
+print(f"{'方式':<26} | {'1 クエリ(ms)':>12} | 再現率")
+print("-" * 54)
+print(f"{'サーバ retrieve()（参考）':<26} | {server_seconds * 1e3:>12.3f} | -")
+print(f"{'全件比較':<26} | {brute_seconds * 1e3:>12.3f} | 100%")
+print(f"{f'IVF（nprobe={NPROBE}）':<26} | {ivf_seconds * 1e3:>12.3f} | {recall:.0%}")
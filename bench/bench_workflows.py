@@ -0,0 +1,198 @@
+"""
+ベンチマーク: ステップスクリプトのワークフロー（スタブに対して実行）
+
+src/step1a〜step2 と poi/ のスクリプトを、レイテンシを設定したスタブ（stub.StubClient）に
+対してそのまま実行し、ワークフローごとの実行時間と RPC の回数（メソッド別）を表示する。
+GCP に接続せずに「get() が 1 回増えた」といった退行を見つけるためのもの。
+
+  - Client は connection.set_client_factory() でスタブに差し替える（スクリプトは無変更）
+  - 外部サービスはオフラインの代替に置き換える
+      埋め込みモデル（vector_index.genai_embedder） → HashingEmbedder
+      サンプル画像のダウンロード（urllib.request.urlretrieve） → SAMPLE_IMAGE_BYTES のダミー
+  - 各スコープに SEED_MEMORIES 件のメモリを事前に作成し、retrieve() の結果の件数を調整する
+  - スタブが対応していない API を使うスクリプトは「未対応」として理由を表示する
+    （基準値にあるスクリプトが途中で終了した場合は退行として扱う）
+  - 時間には各スクリプトの import（vertexai の型定義など）も含まれる
+
+RPC の回数を bench/workflow_baseline.json と比較し、増えたメソッドがある場合、基準値にある
+ワークフローが失敗した・実行されなかった場合は終了コード 1 で終わる。
+基準値を更新する場合は --update-baseline を付けて実行する。
+
+実行方法:
+  uv run python bench/bench_workflows.py
+  uv run python bench/bench_workflows.py --update-baseline
+"""
+
+import collections
+import contextlib
+import io
+import json
+import os
+import runpy
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from memorybank import connection, vector_index  # noqa: E402
+from memorybank.stub import LatencyModel, StubClient  # noqa: E402
+
+AGENT_ENGINE_NAME = "projects/local/locations/local/reasoningEngines/bench"
+BASELINE_PATH = ROOT / "bench" / "workflow_baseline.json"
+
+# 実際の RPC のおおよそのレイテンシ（秒）。TIME_SCALE 倍して待機する
+LATENCY_PROFILE: dict[str, LatencyModel] = {
+    "sessions.create": LatencyModel(0.3, 0.1),
+    "sessions.events.append": LatencyModel(0.15, 0.05),
+    "memories.generate": LatencyModel(4.0, 1.5),
+    "memories.create": LatencyModel(0.4, 0.1),
+    "memories.get": LatencyModel(0.1, 0.03),
+    "memories.retrieve": LatencyModel(0.2, 0.05),
+    "memories.list": LatencyModel(0.2, 0.05),
+    "memories.delete": LatencyModel(0.2, 0.05),
+    "memories.purge": LatencyModel(0.5, 0.1),
+    "memories.operations.get": LatencyModel(0.1, 0.03),
+}
+DEFAULT_LATENCY = LatencyModel(0.1, 0.03)
+OPERATION_LATENCY = LatencyModel(3.0, 1.0)
+TIME_SCALE = 0.05
+
+# 事前に作成しておくメモリ（スクリプトが使うスコープごと）
+SEED_SCOPES = [
+    {"user_id": "user_123", "system_id": "order_management"},
+    {"user_id": "user_123"},
+]
+SEED_MEMORIES = 20
+SAMPLE_IMAGE_BYTES = 256 * 1024
+
+WORKFLOWS = [
+    "src/step1a_basics.py",
+    "src/step1b_consolidation.py",
+    "src/step1c_metadata.py",
+    "src/step1d_advanced.py",
+    "src/step2_retrieve.py",
+    "poi/step3_delete.py",
+    "poi/step3_multimodal.py",
+    "poi/step4_lifecycle.py",
+]
+
+
+def scaled(latency: LatencyModel) -> LatencyModel:
+    return LatencyModel(latency.mean_seconds * TIME_SCALE, latency.jitter_seconds * TIME_SCALE)
+
+
+def fake_urlretrieve(url: str, filename: str) -> tuple[str, None]:
+    """サンプル画像のダウンロードの代わりに、同じ大きさのダミーを書く"""
+    with open(filename, "wb") as f:
+        f.write(b"\xff\xd8\xff\xe0" + bytes(SAMPLE_IMAGE_BYTES - 4))
+    return filename, None
+
+
+def offline_embedder(*args: object, **kwargs: object) -> vector_index.Embedder:
+    return vector_index.HashingEmbedder()
+
+
+def run(path: str, stub: StubClient) -> tuple[float, collections.Counter[str], str]:
+    """スクリプトを実行し、(秒, RPC 回数, 失敗の理由) を返す（成功時の理由は空文字列）"""
+    before = collections.Counter(stub.calls)
+    error = ""
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            runpy.run_path(str(ROOT / path), run_name="__main__")
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - started
+    calls = collections.Counter(stub.calls)
+    calls.subtract(before)
+    return elapsed, +calls, error
+
+
+def main() -> int:
+    update = "--update-baseline" in sys.argv[1:]
+    os.environ.update(
+        GCP_PROJECT_ID="local",
+        GCP_LOCATION="local",
+        AGENT_ENGINE_NAME=AGENT_ENGINE_NAME,
+        MEMORYBANK_INSTRUMENT="0",
+        MEMORYBANK_RATE_LIMIT="0",
+    )
+    stub = StubClient(
+        latency=scaled(DEFAULT_LATENCY),
+        latencies={method: scaled(latency) for method, latency in LATENCY_PROFILE.items()},
+        operation_latency=scaled(OPERATION_LATENCY),
+    )
+    for scope in SEED_SCOPES:
+        for i in range(SEED_MEMORIES):
+            stub.agent_engines.memories.create(
+                name=AGENT_ENGINE_NAME, fact=f"既存のメモ #{i}", scope=scope
+            )
+    stub.calls.clear()
+
+    connection.set_client_factory(lambda project, location: stub)
+    original_embedder, original_urlretrieve = vector_index.genai_embedder, urllib.request.urlretrieve
+    vector_index.genai_embedder = offline_embedder  # type: ignore[assignment]
+    urllib.request.urlretrieve = fake_urlretrieve  # type: ignore[assignment]
+
+    baseline: dict[str, dict[str, int]] = {}
+    if BASELINE_PATH.exists() and not update:
+        baseline = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))
+
+    print(f"スタブ: レイテンシ × {TIME_SCALE}, 事前のメモリ {SEED_MEMORIES} 件/スコープ\n")
+    print(f"{'ワークフロー':<30} | {'時間(s)':>7} | {'RPC':>4} | 内訳")
+    print("-" * 100)
+    results: dict[str, dict[str, int]] = {}
+    regressions: list[str] = []
+    total_seconds = 0.0
+    total_rpcs = 0
+    try:
+        for path in WORKFLOWS:
+            elapsed, calls, error = run(path, stub)
+            rpcs = sum(calls.values())
+            total_seconds += elapsed
+            total_rpcs += rpcs
+            detail = ", ".join(f"{method}×{n}" for method, n in sorted(calls.items()))
+            print(f"{path:<30} | {elapsed:>7.2f} | {rpcs:>4} | {detail}")
+            if error:
+                if path in baseline:
+                    print(f"{'':<30} | ❌ 途中で終了: {error[:80]}")
+                    regressions.append(f"{path}: 途中で終了（{error[:80]}）")
+                else:
+                    print(f"{'':<30} | 未対応（途中で終了）: {error[:80]}")
+                continue
+            results[path] = dict(sorted(calls.items()))
+            for method, n in calls.items():
+                expected = baseline.get(path, {}).get(method)
+                if path in baseline and n > (expected or 0):
+                    regressions.append(f"{path}: {method} {expected or 0} → {n}")
+    finally:
+        connection.set_client_factory(None)
+        vector_index.genai_embedder = original_embedder  # type: ignore[assignment]
+        urllib.request.urlretrieve = original_urlretrieve  # type: ignore[assignment]
+    print("-" * 100)
+    print(f"{'合計':<30} | {total_seconds:>7.2f} | {total_rpcs:>4} |")
+    for path in baseline:
+        if path not in WORKFLOWS:
+            regressions.append(f"{path}: 基準値にあるが実行されていない")
+
+    if update:
+        BASELINE_PATH.write_text(json.dumps(results, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"\n基準値を更新しました: {BASELINE_PATH.relative_to(ROOT)}")
+        return 0
+    if not baseline:
+        print("\n基準値がありません（--update-baseline で作成してください）")
+        return 0
+    if regressions:
+        print("\n❌ 基準値より RPC が増えた・失敗したワークフロー:")
+        for line in regressions:
+            print(f"   {line}")
+        return 1
+    print("\n✅ RPC の回数は基準値以内")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,18 +18,19 @@ Step 3: メモリの削除
    fact を変更したい場合は generate() で統合するか、rollback() で戻す。
 """
 
-import os
+import sys
+from pathlib import Path
 
-import vertexai
-from dotenv import load_dotenv
+# poi/ から src/memorybank を読み込めるようにする
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
 
-load_dotenv()
+from memorybank.connection import get_client, settings  # noqa: E402
+from memorybank.records import MemoryRecord, compact  # noqa: E402
 
-PROJECT_ID = os.environ["GCP_PROJECT_ID"]
-LOCATION = os.environ["GCP_LOCATION"]
-AGENT_ENGINE_NAME = os.environ["AGENT_ENGINE_NAME"]
+AGENT_ENGINE_NAME = settings().require_agent_engine_name()
 
-client = vertexai.Client(project=PROJECT_ID, location=LOCATION)
+# vertexai の import と Client の生成はここで初めて行われる（プロセス内で共有）
+client = get_client()
 print(f"✅ Client 初期化完了")
 print(f"   Agent Engine: {AGENT_ENGINE_NAME}")
 
@@ -37,18 +38,18 @@ SCOPE = {"user_id": "user-1"}
 
 
 # --- ヘルパー関数 ---
-def show_all_memories(label: str) -> list[object]:
+def show_all_memories(label: str) -> list[MemoryRecord]:
     """現在のメモリを一覧表示するヘルパー"""
     results = client.agent_engines.memories.retrieve(
         name=AGENT_ENGINE_NAME,
         scope=SCOPE,
     )
-    memories = list(results)
+    memories = list(compact(results))
     print(f"\n   📋 {label}: {len(memories)} 件")
     for i, m in enumerate(memories, 1):
-        print(f"     [{i}] fact: {m.memory.fact}")
-        if m.memory.metadata:
-            print(f"         metadata: {m.memory.metadata}")
+        print(f"     [{i}] fact: {m.fact}")
+        if m.metadata:
+            print(f"         metadata: {m.metadata_dict()}")
     return memories
 
 
@@ -6,7 +6,7 @@ step1_generate.py では GCS 画像の簡易例のみ扱っているが、
 ここではより多くの入力方法を網羅的に確認する。
 
   1. GCS の画像 URL からメモリ生成（file_data）
-  2. ローカル画像からメモリ生成（inline_data）
+  2. ローカル画像からメモリ生成（inline_data。大きいファイルはステージングして file_data）
   3. テキスト + 画像の組み合わせ（Sessions 連携）
   4. 生成されたメモリの確認
   5. クリーンアップ
@@ -19,24 +19,31 @@ step1_generate.py では GCS 画像の簡易例のみ扱っているが、
 
 import datetime
 import os
+import sys
 import urllib.request
+from pathlib import Path
 
-import vertexai
-from dotenv import load_dotenv
+# poi/ から src/memorybank を読み込めるようにする
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
 
-load_dotenv()
+from memorybank import compact, hydrate_generated  # noqa: E402
+from memorybank.connection import get_client, settings  # noqa: E402
+from memorybank.multimodal import GcsObjectStore, MediaInfo, media_part  # noqa: E402
+from memorybank.preprocess import AttachmentPreprocessor  # noqa: E402
 
-PROJECT_ID = os.environ["GCP_PROJECT_ID"]
-LOCATION = os.environ["GCP_LOCATION"]
-AGENT_ENGINE_NAME = os.environ["AGENT_ENGINE_NAME"]
+AGENT_ENGINE_NAME = settings().require_agent_engine_name()
 
-client = vertexai.Client(project=PROJECT_ID, location=LOCATION)
+# vertexai の import と Client の生成はここで初めて行われる（プロセス内で共有）
+client = get_client()
 print(f"✅ Client 初期化完了")
 print(f"   Agent Engine: {AGENT_ENGINE_NAME}")
 
 USER_ID = "user-multimodal-test"
 SCOPE = {"user_id": USER_ID}
 
+# 添付の前処理: 同じスコープで送信済みの画像は送らず、大きい画像は縮小する（Pillow がある場合）
+preprocessor = AttachmentPreprocessor()
+
 # ============================================================
 # 1. GCS の画像からメモリ生成（file_data）
 # ============================================================
@@ -46,35 +53,38 @@ print("=" * 60)
 
 GCS_IMAGE_URI = "gs://cloud-samples-data/generative-ai/image/scones.jpg"
 
+prepared1 = preprocessor.prepare(
+    [
+        {
+            "content": {
+                "role": "user",
+                "parts": [
+                    {"text": "これは私が週末に作ったスコーンです。ベーキングが趣味なんです。"},
+                    {
+                        "file_data": {
+                            "file_uri": GCS_IMAGE_URI,
+                            "mime_type": "image/jpeg",
+                        }
+                    },
+                ],
+            }
+        }
+    ],
+    scope=SCOPE,
+)
 op1 = client.agent_engines.memories.generate(
     name=AGENT_ENGINE_NAME,
-    direct_contents_source={
-        "events": [
-            {
-                "content": {
-                    "role": "user",
-                    "parts": [
-                        {"text": "これは私が週末に作ったスコーンです。ベーキングが趣味なんです。"},
-                        {
-                            "file_data": {
-                                "file_uri": GCS_IMAGE_URI,
-                                "mime_type": "image/jpeg",
-                            }
-                        },
-                    ],
-                }
-            }
-        ]
-    },
+    direct_contents_source={"events": prepared1.events},
     scope=SCOPE,
 )
+preprocessor.commit(prepared1)
 
 print(f"   ✅ generate() 完了 (done={op1.done})")
+print(f"   前処理: {prepared1.report.summary()}")
 if op1.response is not None:
-    for i, gm in enumerate(op1.response.generated_memories, 1):
-        memory = client.agent_engines.memories.get(name=gm.memory.name)
+    for i, gm in enumerate(hydrate_generated(client, op1), 1):
         print(f"   [{i}] action={gm.action}")
-        print(f"        fact={memory.fact}")
+        print(f"        fact={gm.fact}")
 else:
     print("   response=None（メモリ未生成）")
 
@@ -92,40 +102,42 @@ print(f"   サンプル画像をダウンロード中...")
 urllib.request.urlretrieve(SAMPLE_IMAGE_URL, LOCAL_IMAGE_PATH)
 print(f"   ダウンロード完了: {LOCAL_IMAGE_PATH}")
 
-with open(LOCAL_IMAGE_PATH, "rb") as f:
-    image_bytes: bytes = f.read()
-
-print(f"   画像サイズ: {len(image_bytes)} bytes")
-
+# media_part() はファイルの大きさで送り方を決める。小さいファイルは inline_data に埋め込み、
+# inline_limit（既定 4MB）を超えるファイル（納品書のスキャンなど）は、bytes に読み込まずに
+# MEMORYBANK_STAGING_BUCKET のバケットへチャンク単位でアップロードして file_data で渡す。
+staging_bucket = os.environ.get("MEMORYBANK_STAGING_BUCKET")
+store = GcsObjectStore(staging_bucket, prefix="memorybank-staging/") if staging_bucket else None
+media_info: list[MediaInfo] = []
+image_part = media_part(LOCAL_IMAGE_PATH, mime_type="image/jpeg", store=store, info=media_info)
+print(f"   画像サイズ: {media_info[0].size} bytes（{media_info[0].kind} で送信）")
+
+prepared2 = preprocessor.prepare(
+    [
+        {
+            "content": {
+                "role": "user",
+                "parts": [
+                    {"text": "これは私の犬です。名前はポチです。"},
+                    image_part,
+                ],
+            }
+        }
+    ],
+    scope=SCOPE,
+)
 op2 = client.agent_engines.memories.generate(
     name=AGENT_ENGINE_NAME,
-    direct_contents_source={
-        "events": [
-            {
-                "content": {
-                    "role": "user",
-                    "parts": [
-                        {"text": "これは私の犬です。名前はポチです。"},
-                        {
-                            "inline_data": {
-                                "mime_type": "image/jpeg",
-                                "data": image_bytes,
-                            }
-                        },
-                    ],
-                }
-            }
-        ]
-    },
+    direct_contents_source={"events": prepared2.events},
     scope=SCOPE,
 )
+preprocessor.commit(prepared2)
 
 print(f"   ✅ generate() 完了 (done={op2.done})")
+print(f"   前処理: {prepared2.report.summary()}")
 if op2.response is not None:
-    for i, gm in enumerate(op2.response.generated_memories, 1):
-        memory = client.agent_engines.memories.get(name=gm.memory.name)
+    for i, gm in enumerate(hydrate_generated(client, op2), 1):
         print(f"   [{i}] action={gm.action}")
-        print(f"        fact={memory.fact}")
+        print(f"        fact={gm.fact}")
 else:
     print("   response=None（メモリ未生成）")
 
@@ -143,39 +155,46 @@ session = client.agent_engines.sessions.create(
 session_name: str = session.response.name
 print(f"   セッション作成: {session_name}")
 
+# 1. と同じ画像（同じ URI）は、同じスコープで送信済みのため前処理で取り除かれる（テキストは送る）
+prepared3 = preprocessor.prepare(
+    [
+        {
+            "content": {
+                "role": "user",
+                "parts": [
+                    {"text": "旅行先で食べたスコーンが美味しかったです。来年もまた行きたいです。"},
+                    {
+                        "file_data": {
+                            "file_uri": "gs://cloud-samples-data/generative-ai/image/scones.jpg",
+                            "mime_type": "image/jpeg",
+                        }
+                    },
+                ],
+            }
+        }
+    ],
+    scope=SCOPE,
+)
 client.agent_engines.sessions.events.append(
     name=session_name,
     author="user",
     invocation_id="1",
     timestamp=datetime.datetime.now(tz=datetime.timezone.utc),
-    config={
-        "content": {
-            "role": "user",
-            "parts": [
-                {"text": "旅行先で食べたスコーンが美味しかったです。来年もまた行きたいです。"},
-                {
-                    "file_data": {
-                        "file_uri": "gs://cloud-samples-data/generative-ai/image/scones.jpg",
-                        "mime_type": "image/jpeg",
-                    }
-                },
-            ],
-        }
-    },
+    config={"content": prepared3.events[0]["content"]},
 )
-print(f"   イベント追加完了（テキスト + 画像）")
+print(f"   イベント追加完了（前処理: {prepared3.report.summary()}）")
 
 op3 = client.agent_engines.memories.generate(
     name=AGENT_ENGINE_NAME,
     vertex_session_source={"session": session_name},
 )
+preprocessor.commit(prepared3)
 
 print(f"   ✅ generate() 完了 (done={op3.done})")
 if op3.response is not None:
-    for i, gm in enumerate(op3.response.generated_memories, 1):
-        memory = client.agent_engines.memories.get(name=gm.memory.name)
+    for i, gm in enumerate(hydrate_generated(client, op3), 1):
         print(f"   [{i}] action={gm.action}")
-        print(f"        fact={memory.fact}")
+        print(f"        fact={gm.fact}")
 else:
     print("   response=None（メモリ未生成）")
 
@@ -190,11 +209,11 @@ results = client.agent_engines.memories.retrieve(
     name=AGENT_ENGINE_NAME,
     scope=SCOPE,
 )
-all_memories = list(results)
+all_memories = list(compact(results))
 
 print(f"   合計: {len(all_memories)} 件")
 for i, m in enumerate(all_memories, 1):
-    print(f"\n  [{i}] fact: {m.memory.fact}")
+    print(f"\n  [{i}] fact: {m.fact}")
 
 print(f"""
 📊 マルチモーダル入力のまとめ:
@@ -202,7 +221,8 @@ print(f"""
 | 方法           | 渡し方                           | 用途                    |
 |---------------|----------------------------------|------------------------|
 | file_data     | GCS URI を指定                    | GCS に画像がある場合     |
-| inline_data   | バイナリを直接埋め込む              | ローカルファイルの場合    |
+| inline_data   | バイナリを直接埋め込む              | ローカルの小さいファイル  |
+| media_part()  | 大きさで inline_data / file_data を選ぶ | ローカルの大きいファイル  |
 
 💡 ポイント:
   - 画像自体は保存されない。LLM が画像を分析し、テキストのメモリとして保存する
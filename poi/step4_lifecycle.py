@@ -14,20 +14,22 @@ Step 4: メモリライフサイクル（リビジョン）
    https://docs.cloud.google.com/agent-builder/agent-engine/memory-bank/revisions
 """
 
-import os
+import sys
 import time
+from pathlib import Path
 
-import vertexai
-from dotenv import load_dotenv
 from vertexai._genai import types
 
-load_dotenv()
+# poi/ から src/memorybank を読み込めるようにする
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
 
-PROJECT_ID = os.environ["GCP_PROJECT_ID"]
-LOCATION = os.environ["GCP_LOCATION"]
-AGENT_ENGINE_NAME = os.environ["AGENT_ENGINE_NAME"]
+from memorybank.bulk import bulk_delete  # noqa: E402
+from memorybank.connection import get_client, settings  # noqa: E402
 
-client = vertexai.Client(project=PROJECT_ID, location=LOCATION)
+AGENT_ENGINE_NAME = settings().require_agent_engine_name()
+
+# vertexai の import と Client の生成はここで初めて行われる（プロセス内で共有）
+client = get_client()
 print(f"✅ Client 初期化完了")
 print(f"   Agent Engine: {AGENT_ENGINE_NAME}")
 
@@ -232,17 +234,12 @@ print("🧹 5. クリーンアップ")
 print("=" * 60)
 
 # テスト用メモリの削除
-# purge ではなく、scopeで全メモリを取得して個別に削除
-cleanup_results = client.agent_engines.memories.retrieve(
-    name=AGENT_ENGINE_NAME,
-    scope=SCOPE,
-)
-cleanup_memories = list(cleanup_results)
-print(f"   削除対象: {len(cleanup_memories)} 件")
-
-for m in cleanup_memories:
-    client.agent_engines.memories.delete(name=m.memory.name)
-    print(f"   ✅ 削除: {m.memory.fact[:40]}...")
+# scope に完全一致するメモリをまとめて削除する。
+# 件数が多ければ purge（ドライランで件数を確認してから）、少なければ delete() を並列実行
+cleanup = bulk_delete(client, AGENT_ENGINE_NAME, scope=SCOPE)
+for failure in cleanup.failures:
+    print(f"   ❌ 削除失敗: {failure.name} ({type(failure.error).__name__})")
+print(f"   ✅ {cleanup.summary()}")
 
 print(f"""
 {'=' * 60}
@@ -0,0 +1,116 @@
+"""
+Memory Bank ハンズオン用の共通ユーティリティ
+
+各ステップのスクリプトで繰り返し出てくる処理をまとめたパッケージ。
+`uv run python src/stepN_*.py` で実行すると src/ が sys.path に入るため、
+スクリプトからは `from memorybank import ...` で読み込める。
+
+⚠️ vertexai の重い import はここでは行わない（型ヒント用途のみ）。
+   Client が必要になった時点で connection.get_client() が import する。
+"""
+
+from memorybank.aio import AsyncMemoryBank
+from memorybank.bulk import BulkDeleteResult, DeleteFailure, bulk_delete
+from memorybank.cache import (
+    CachedMemories,
+    CacheStats,
+    RetrieveCache,
+    SemanticQueryCache,
+    normalize_query,
+)
+from memorybank.coalesce import CoalesceStats, FlushResult, GenerateCoalescer
+from memorybank.connection import Settings, get_client, settings
+from memorybank.diff import ConsolidationDiff, MemoryChange, diff_generated, snapshot_facts
+from memorybank.export import ExportResult, SnapshotReader, export_memories
+from memorybank.fanout import FanoutStats, ScopeResult, retrieve_many
+from memorybank.filters import (
+    FilterSyntaxError,
+    ScopeSnapshot,
+    compile_config,
+    compile_filter,
+    compile_filter_groups,
+)
+from memorybank.gate import CharNgramModel, GateDecision, RelevanceGate
+from memorybank.hydrate import GenerateResult, HydratedMemory, hydrate_generated
+from memorybank.ingest import AppendFailure, AppendResult, append_events
+from memorybank.instrument import InstrumentedClient, RpcMetrics, instrumented
+from memorybank.multimodal import GcsObjectStore, LocalObjectStore, media_part
+from memorybank.operations import OperationFailed, OperationTracker
+from memorybank.preprocess import AttachmentPreprocessor
+from memorybank.ratelimit import FamilyLimit, RateLimitedClient, RetryBudget, rate_limited
+from memorybank.records import MemoryRecord, TopicCodes, compact
+from memorybank.scopes import ScopeIndex, ScopeKey, scope_key
+from memorybank.streaming import StreamStats, stream_items, stream_list, stream_retrieve
+from memorybank.sync import ScopeReplica, SyncStats
+from memorybank.topics import MEMORY_TOPICS
+
+# vector_index は NumPy（任意の依存）を使うため、ここでは読み込まない
+# （from memorybank.vector_index import LocalVectorMirror）
+
+__all__ = [
+    "AppendFailure",
+    "AppendResult",
+    "AsyncMemoryBank",
+    "AttachmentPreprocessor",
+    "BulkDeleteResult",
+    "CacheStats",
+    "CachedMemories",
+    "CharNgramModel",
+    "CoalesceStats",
+    "ConsolidationDiff",
+    "DeleteFailure",
+    "ExportResult",
+    "FamilyLimit",
+    "FanoutStats",
+    "FilterSyntaxError",
+    "FlushResult",
+    "GateDecision",
+    "GcsObjectStore",
+    "GenerateCoalescer",
+    "GenerateResult",
+    "HydratedMemory",
+    "InstrumentedClient",
+    "LocalObjectStore",
+    "MEMORY_TOPICS",
+    "MemoryChange",
+    "MemoryRecord",
+    "OperationFailed",
+    "OperationTracker",
+    "RateLimitedClient",
+    "RelevanceGate",
+    "RetrieveCache",
+    "RetryBudget",
+    "RpcMetrics",
+    "ScopeIndex",
+    "ScopeKey",
+    "ScopeReplica",
+    "ScopeResult",
+    "ScopeSnapshot",
+    "SemanticQueryCache",
+    "SnapshotReader",
+    "Settings",
+    "StreamStats",
+    "SyncStats",
+    "TopicCodes",
+    "append_events",
+    "bulk_delete",
+    "compact",
+    "compile_config",
+    "compile_filter",
+    "compile_filter_groups",
+    "diff_generated",
+    "export_memories",
+    "get_client",
+    "hydrate_generated",
+    "instrumented",
+    "media_part",
+    "normalize_query",
+    "rate_limited",
+    "retrieve_many",
+    "scope_key",
+    "settings",
+    "snapshot_facts",
+    "stream_items",
+    "stream_list",
+    "stream_retrieve",
+]
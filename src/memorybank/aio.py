@@ -0,0 +1,206 @@
+"""
+Memory Bank の asyncio ファサード
+
+各スクリプトは同期クライアントで 1 つずつ呼び出しているため、
+互いに独立した呼び出し（Step 2 のクエリ A/B/C、user_123 と user_999 の retrieve 等）も
+待ち時間が直列に積み上がる。AsyncMemoryBank は `client.aio.agent_engines` を
+セマフォ付きでラップし、独立した呼び出しを asyncio.gather() でまとめられるようにする。
+
+  bank = AsyncMemoryBank(client, AGENT_ENGINE_NAME, max_concurrency=8)
+  a, b = await asyncio.gather(
+      bank.retrieve(SCOPE, similarity_search_params={"search_query": "...", "top_k": 3}),
+      bank.retrieve(SCOPE_999),
+  )
+
+  - 同時実行数は max_concurrency で制限する（クォータ保護）
+  - retrieve() / list() / list_revisions() はページャを最後まで読み、リストで返す
+"""
+
+from __future__ import annotations
+
+import asyncio
+import datetime
+from typing import TYPE_CHECKING, Awaitable, Callable, Mapping, Optional, TypeVar
+
+from memorybank.ingest import Message, build_event_config, invocation_id_for
+
+if TYPE_CHECKING:
+    import vertexai
+    from vertexai._genai import types
+
+T = TypeVar("T")
+
+
+async def _collect(pager: object) -> list[object]:
+    """AsyncPager（または通常のイテラブル）を最後まで読んでリストにする"""
+    if hasattr(pager, "__aiter__"):
+        return [item async for item in pager]  # type: ignore[attr-defined]
+    return list(pager)  # type: ignore[call-overload]
+
+
+class AsyncMemoryBank:
+    """client.aio.agent_engines の memories / sessions を並行実行向けにまとめたもの
+
+    Args:
+        client: vertexai.Client（client.aio を使う）
+        engine_name: Agent Engine のリソース名
+        max_concurrency: 同時に実行する RPC の上限
+    """
+
+    def __init__(
+        self,
+        client: "vertexai.Client",
+        engine_name: str,
+        *,
+        max_concurrency: int = 8,
+    ) -> None:
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency は 1 以上を指定してください")
+        self.engine_name = engine_name
+        self._engines = client.aio.agent_engines
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _limited(self, call: Callable[[], Awaitable[T]]) -> T:
+        async with self._semaphore:
+            return await call()
+
+    # --------------------------------------------------------
+    # memories
+    # --------------------------------------------------------
+    async def create(
+        self,
+        fact: str,
+        scope: dict[str, str],
+        *,
+        config: Optional[Mapping[str, object]] = None,
+    ) -> "types.AgentEngineMemoryOperation":
+        return await self._limited(
+            lambda: self._engines.memories.create(
+                name=self.engine_name, fact=fact, scope=scope, config=config
+            )
+        )
+
+    async def generate(
+        self,
+        *,
+        scope: Optional[dict[str, str]] = None,
+        vertex_session_source: Optional[Mapping[str, object]] = None,
+        direct_contents_source: Optional[Mapping[str, object]] = None,
+        config: Optional[Mapping[str, object]] = None,
+    ) -> "types.AgentEngineGenerateMemoriesOperation":
+        return await self._limited(
+            lambda: self._engines.memories.generate(
+                name=self.engine_name,
+                vertex_session_source=vertex_session_source,
+                direct_contents_source=direct_contents_source,
+                scope=scope,
+                config=config,
+            )
+        )
+
+    async def retrieve(
+        self,
+        scope: dict[str, str],
+        *,
+        similarity_search_params: Optional[Mapping[str, object]] = None,
+        simple_retrieval_params: Optional[Mapping[str, object]] = None,
+        config: Optional[Mapping[str, object]] = None,
+    ) -> list["types.RetrieveMemoriesResponseRetrievedMemory"]:
+        async def _call() -> list[object]:
+            pager = await self._engines.memories.retrieve(
+                name=self.engine_name,
+                scope=scope,
+                similarity_search_params=similarity_search_params,
+                simple_retrieval_params=simple_retrieval_params,
+                config=config,
+            )
+            return await _collect(pager)
+
+        return await self._limited(_call)  # type: ignore[return-value]
+
+    async def get(self, name: str) -> "types.Memory":
+        return await self._limited(lambda: self._engines.memories.get(name=name))
+
+    async def list(
+        self,
+        *,
+        config: Optional[Mapping[str, object]] = None,
+    ) -> list["types.Memory"]:
+        async def _call() -> list[object]:
+            pager = await self._engines.memories.list(name=self.engine_name, config=config)
+            return await _collect(pager)
+
+        return await self._limited(_call)  # type: ignore[return-value]
+
+    async def delete(self, name: str) -> None:
+        await self._limited(lambda: self._engines.memories.delete(name=name))
+
+    async def purge(
+        self,
+        *,
+        filter: Optional[str] = None,
+        filter_groups: Optional[list[Mapping[str, object]]] = None,
+        force: bool = False,
+        config: Optional[Mapping[str, object]] = None,
+    ) -> "types.AgentEnginePurgeMemoriesOperation":
+        return await self._limited(
+            lambda: self._engines.memories.purge(
+                name=self.engine_name,
+                filter=filter,
+                filter_groups=filter_groups,
+                force=force,
+                config=config,
+            )
+        )
+
+    async def list_revisions(
+        self,
+        memory_name: str,
+        *,
+        config: Optional[Mapping[str, object]] = None,
+    ) -> list["types.MemoryRevision"]:
+        async def _call() -> list[object]:
+            pager = await self._engines.memories.revisions.list(name=memory_name, config=config)
+            return await _collect(pager)
+
+        return await self._limited(_call)  # type: ignore[return-value]
+
+    async def rollback(
+        self,
+        memory_name: str,
+        target_revision_id: str,
+        *,
+        config: Optional[Mapping[str, object]] = None,
+    ) -> "types.AgentEngineRollbackMemoryOperation":
+        return await self._limited(
+            lambda: self._engines.memories.rollback(
+                name=memory_name, target_revision_id=target_revision_id, config=config
+            )
+        )
+
+    # --------------------------------------------------------
+    # sessions
+    # --------------------------------------------------------
+    async def create_session(self, user_id: str) -> str:
+        """セッションを作成し、そのリソース名を返す"""
+        operation = await self._limited(
+            lambda: self._engines.sessions.create(name=self.engine_name, user_id=user_id)
+        )
+        return str(operation.response.name)
+
+    async def append_events(self, session_name: str, conversation: list[Message]) -> None:
+        """会話リストをセッションに追加する（ingest.append_events と同じ採番規則）"""
+        base_time = datetime.datetime.now(tz=datetime.timezone.utc)
+
+        async def _append(index: int, message: Message) -> None:
+            await self._limited(
+                lambda: self._engines.sessions.events.append(
+                    name=session_name,
+                    author="user",  # Sessions API の要件
+                    invocation_id=invocation_id_for(index),
+                    timestamp=base_time + datetime.timedelta(microseconds=index),
+                    config=build_event_config(message),
+                )
+            )
+
+        await asyncio.gather(*(_append(i, m) for i, m in enumerate(conversation)))
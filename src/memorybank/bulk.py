@@ -0,0 +1,236 @@
+"""
+メモリの一括削除
+
+Step 2 のクリーンアップ（user_999）や Step 4 のクリーンアップは、
+retrieve() した結果を 1 件ずつ delete() していた。件数が数千になると
+直列の往復だけで数分かかる。bulk_delete() は件数に応じて次の 2 つを使い分ける。
+
+  - purge:  サーバ側で filter に合致するメモリをまとめて削除（RPC 数は件数によらず一定）
+  - delete: スレッドプールで delete() を並列実行（max_workers 本まで）
+
+どちらの場合も、一時的なエラー（429 / 503 など）は指数バックオフで再試行する。
+
+  result = bulk_delete(client, AGENT_ENGINE_NAME, scope={"user_id": "user_999"})
+  print(result.summary())  # 件数・方式・スループット
+
+⚠️ purge の filter（scope.user_id="..."）は retrieve() と違い完全一致ではなく、
+   キーを追加で持つスコープにも合致する。そこで先にドライラン（force=False）で
+   件数を確かめ、retrieve() の件数と一致した場合だけ purge する。
+   一致しない場合は delete() の並列実行に切り替える。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable, Mapping, Optional
+
+from memorybank.filters import scope_filter
+from memorybank.operations import KIND_PURGE, OperationTracker
+from memorybank.retry import call_with_retry
+
+if TYPE_CHECKING:
+    import vertexai
+    from vertexai._genai import types
+
+STRATEGY_PURGE = "purge"
+STRATEGY_DELETE = "delete"
+
+# これ以上の件数なら purge を検討する（ドライラン + 本番 + ポーリングの往復で元が取れる目安）
+DEFAULT_PURGE_THRESHOLD = 20
+
+
+@dataclass(frozen=True)
+class DeleteFailure:
+    """削除できなかったメモリ（再試行し尽くした、または再試行できないエラー）"""
+
+    name: str
+    error: BaseException
+
+
+@dataclass
+class BulkDeleteResult:
+    strategy: str
+    requested: int
+    deleted: int = 0
+    failures: list[DeleteFailure] = field(default_factory=list)
+    retries: int = 0
+    elapsed_seconds: float = 0.0
+    # purge を使わなかった理由（件数不足・ドライランの件数不一致など）
+    note: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+    @property
+    def deleted_per_second(self) -> float:
+        return self.deleted / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        text = (
+            f"{self.deleted}/{self.requested} 件削除（{self.strategy}, "
+            f"{self.elapsed_seconds:.2f}s, {self.deleted_per_second:.1f} 件/s, "
+            f"再試行 {self.retries} 回, 失敗 {len(self.failures)} 件）"
+        )
+        return f"{text} {self.note}" if self.note else text
+
+    def raise_for_failures(self) -> None:
+        if self.failures:
+            first = self.failures[0]
+            raise RuntimeError(
+                f"{len(self.failures)} 件のメモリを削除できませんでした"
+                f"（最初の失敗: {first.name}）"
+            ) from first.error
+
+
+def _is_not_found(error: BaseException) -> bool:
+    return getattr(error, "code", None) == 404 or getattr(error, "status", None) == "NOT_FOUND"
+
+
+class _RetryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, attempt: int, error: BaseException) -> None:
+        with self._lock:
+            self.count += 1
+
+
+def _delete_each(
+    client: "vertexai.Client",
+    names: list[str],
+    result: BulkDeleteResult,
+    retries: _RetryCounter,
+    *,
+    max_workers: int,
+    max_attempts: int,
+) -> None:
+    memories = client.agent_engines.memories
+
+    def _delete(name: str) -> Optional[DeleteFailure]:
+        try:
+            call_with_retry(
+                lambda: memories.delete(name=name),
+                max_attempts=max_attempts,
+                on_retry=retries,
+            )
+        except Exception as e:
+            # 再試行中に前回の呼び出しが成功していた場合も 404 になる
+            if not _is_not_found(e):
+                return DeleteFailure(name, e)
+        return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for failure in pool.map(_delete, names):
+            if failure is None:
+                result.deleted += 1
+            else:
+                result.failures.append(failure)
+
+
+def _purge_count(
+    client: "vertexai.Client",
+    tracker: OperationTracker,
+    engine_name: str,
+    filter_text: str,
+    *,
+    force: bool,
+    max_attempts: int,
+    retries: _RetryCounter,
+) -> int:
+    operation = call_with_retry(
+        lambda: client.agent_engines.memories.purge(
+            name=engine_name,
+            filter=filter_text,
+            force=force,
+            config={"wait_for_completion": False},
+        ),
+        max_attempts=max_attempts,
+        on_retry=retries,
+    )
+    future = tracker.track(operation, kind=KIND_PURGE)
+    done: types.AgentEnginePurgeMemoriesOperation = future.result(timeout=tracker.timeout)
+    if done.response is None:
+        return 0
+    return done.response.purge_count or 0
+
+
+def bulk_delete(
+    client: "vertexai.Client",
+    engine_name: str,
+    *,
+    names: Optional[Iterable[str]] = None,
+    scope: Optional[Mapping[str, str]] = None,
+    purge_threshold: int = DEFAULT_PURGE_THRESHOLD,
+    max_workers: int = 8,
+    max_attempts: int = 5,
+) -> BulkDeleteResult:
+    """メモリ名のリスト、またはスコープ（完全一致）に属するメモリをまとめて削除する
+
+    Args:
+        client: vertexai.Client
+        engine_name: Agent Engine のリソース名
+        names: 削除するメモリのリソース名（scope と同時には指定できない）
+        scope: このスコープに完全一致するメモリをすべて削除する
+        purge_threshold: scope 指定でこの件数以上なら purge を使う
+        max_workers: delete() を並列実行するスレッド数
+        max_attempts: 一時的なエラーの再試行を含めた最大試行回数
+
+    Returns:
+        BulkDeleteResult（方式・件数・失敗・再試行回数・経過時間）
+    """
+    if (names is None) == (scope is None):
+        raise ValueError("names と scope のどちらか一方を指定してください")
+    if max_workers < 1:
+        raise ValueError("max_workers は 1 以上を指定してください")
+
+    started = time.perf_counter()
+    retries = _RetryCounter()
+
+    if names is not None:
+        targets = list(dict.fromkeys(names))
+        result = BulkDeleteResult(STRATEGY_DELETE, len(targets))
+    else:
+        assert scope is not None
+        retrieved = call_with_retry(
+            lambda: list(
+                client.agent_engines.memories.retrieve(name=engine_name, scope=dict(scope))
+            ),
+            max_attempts=max_attempts,
+            on_retry=retries,
+        )
+        targets = [item.memory.name for item in retrieved]
+        result = BulkDeleteResult(STRATEGY_DELETE, len(targets))
+        if len(targets) < purge_threshold:
+            result.note = f"（{purge_threshold} 件未満のため delete）" if targets else ""
+        else:
+            filter_text = scope_filter(scope)
+            with OperationTracker(client) as tracker:
+                staged = _purge_count(
+                    client, tracker, engine_name, filter_text,
+                    force=False, max_attempts=max_attempts, retries=retries,
+                )
+                if staged == len(targets):
+                    result.strategy = STRATEGY_PURGE
+                    result.deleted = _purge_count(
+                        client, tracker, engine_name, filter_text,
+                        force=True, max_attempts=max_attempts, retries=retries,
+                    )
+                    targets = []
+                else:
+                    result.note = (
+                        f"（purge 対象 {staged} 件がスコープの {len(targets)} 件と一致しないため delete）"
+                    )
+
+    if targets:
+        _delete_each(
+            client, targets, result, retries,
+            max_workers=max_workers, max_attempts=max_attempts,
+        )
+    result.retries = retries.count
+    result.elapsed_seconds = time.perf_counter() - started
+    return result
@@ -0,0 +1,559 @@
+"""
+retrieve() のリードスルーキャッシュ
+
+エージェントは毎ターン同じユーザーのスコープを retrieve() し直すことが多い。
+ここでは retrieve() の結果をクライアント側で保持し、同じ条件の呼び出しを
+サーバに問い合わせずに返す。
+
+キャッシュキー:
+  (Agent Engine 名, 正規化したスコープ, filter, filter_groups（DNF）,
+   similarity_search_params, simple_retrieval_params)
+
+  - TTL（有効期限）と LRU（件数上限）で古いエントリを捨てる
+  - create() / generate() / delete() / purge() / rollback() を
+    CachedMemories 経由で呼ぶと、影響するスコープのエントリを自動で破棄する
+  - ヒット・ミスなどの件数と、ヒットで省けたサーバ往復の時間は RetrieveCache.stats で確認できる
+  - 取得中に同じスコープが無効化された結果は put() しない（generation() で取得前の世代を控える）
+
+セマンティック検索（similarity_search_params）は SemanticQueryCache で別に扱う:
+  (Agent Engine 名, スコープ, filter, filter_groups, 正規化したクエリ)
+  - クエリは NFKC 正規化・大文字小文字・空白・末尾の「？」「。」の違いを無視する
+  - サーバからは top_k を広げて（fetch_top_k 件）取得し、小さい top_k は先頭を切り出して返す
+    （結果は distance の昇順なので、先頭 k 件はサーバに top_k=k で聞いた結果と同じ）
+
+⚠️ wait_for_completion=False の generate() は、呼び出し時点では
+   まだメモリが変わっていない。完了後にもう一度 invalidate_scope() すること
+   （OperationTracker.track() の callback で呼ぶとよい）。
+"""
+
+from __future__ import annotations
+
+import collections
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Mapping, Optional, Union
+
+from memorybank.scopes import ScopeKey, scope_key
+
+if TYPE_CHECKING:
+    from vertexai._genai import memories as memories_module
+    from vertexai._genai import types
+
+# dict / list / pydantic モデルを比較・ハッシュ可能な形にしたもの
+Frozen = Union[str, int, float, bool, None, tuple["Frozen", ...]]
+
+# (engine, scope, filter, filter_groups, similarity_search_params, simple_retrieval_params)
+CacheKey = tuple[str, ScopeKey, str, Frozen, Frozen, Frozen]
+
+RetrievedMemories = list["types.RetrieveMemoriesResponseRetrievedMemory"]
+
+
+def freeze(value: object) -> Frozen:
+    """設定値（dict / list / pydantic モデル）を順序に依存しないタプルに変換する"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    model_dump = getattr(value, "model_dump", None)
+    if callable(model_dump):
+        value = model_dump(exclude_none=True)
+    if isinstance(value, Mapping):
+        return tuple(sorted((str(k), freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return str(value)
+
+
+def engine_of(memory_name: str) -> str:
+    """メモリのリソース名から Agent Engine のリソース名を取り出す"""
+    return memory_name.split("/memories/")[0]
+
+
+def make_key(
+    engine_name: str,
+    scope: Mapping[str, str],
+    *,
+    config: Optional[Mapping[str, object]] = None,
+    similarity_search_params: object = None,
+    simple_retrieval_params: object = None,
+) -> CacheKey:
+    """retrieve() の引数からキャッシュキーを作る"""
+    config = config or {}
+    return (
+        engine_name,
+        scope_key(scope),
+        str(config.get("filter") or ""),
+        freeze(config.get("filter_groups")),
+        freeze(similarity_search_params),
+        freeze(simple_retrieval_params),
+    )
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+    # より大きい top_k のエントリから切り出して返したヒット
+    partial_hits: int = 0
+    # ヒットで省けたサーバ往復の時間（エントリ取得時に計測した時間の合計、秒）
+    saved_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+@dataclass
+class _Entry:
+    expires_at: float
+    items: RetrievedMemories
+    fetch_seconds: float = 0.0
+    # セマンティック検索の場合、サーバに指定した top_k
+    top_k: Optional[int] = None
+
+
+class RetrieveCache:
+    """TTL + LRU の retrieve() 結果キャッシュ
+
+    Args:
+        ttl_seconds: エントリの有効期限（秒）
+        max_entries: 保持するエントリ数の上限（超えたら最も古く使われたものを捨てる）
+        clock: 現在時刻を返す関数（テスト用に差し替え可能）
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float = 60.0,
+        max_entries: int = 256,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._clock = clock
+        self._entries: collections.OrderedDict[CacheKey, _Entry] = collections.OrderedDict()
+        # (engine, scope) → そのスコープのキャッシュキー
+        self._by_scope: dict[tuple[str, ScopeKey], set[CacheKey]] = collections.defaultdict(set)
+        # メモリ名 → (engine, scope)。delete() / rollback() の無効化に使う
+        self._scope_of_memory: dict[str, tuple[str, ScopeKey]] = {}
+        # メモリ名 → そのメモリを含むエントリの数（0 になったら _scope_of_memory から外す）
+        self._memory_refs: collections.Counter[str] = collections.Counter()
+        # 無効化のたびに 1 増える世代と、(engine, scope) / engine ごとの最後に無効化した世代。
+        # 記録が max_entries を超えたら忘れて、それ以前の世代をすべて無効化済みとみなす
+        self._generation = 0
+        self._invalidated_at: dict[Union[str, tuple[str, ScopeKey]], int] = {}
+        self._invalidated_floor = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: CacheKey) -> Optional[RetrievedMemories]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            if entry.expires_at <= self._clock():
+                self._drop(key)
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            self.stats.saved_seconds += entry.fetch_seconds
+            return list(entry.items)
+
+    def generation(self) -> int:
+        """現在の世代（サーバに問い合わせる前に控え、put() の generation に渡す）"""
+        with self._lock:
+            return self._generation
+
+    def put(
+        self,
+        key: CacheKey,
+        items: RetrievedMemories,
+        *,
+        fetch_seconds: float = 0.0,
+        top_k: Optional[int] = None,
+        generation: Optional[int] = None,
+    ) -> bool:
+        """エントリを追加する
+
+        generation を指定した場合、それ以降にスコープが無効化されていれば
+        （取得中に書き込みがあり、items が古い可能性がある）追加せず False を返す。
+        """
+        engine, scope = key[0], key[1]
+        with self._lock:
+            if generation is not None and self._invalidated_since(engine, scope, generation):
+                return False
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(
+                self._clock() + self.ttl_seconds, list(items), fetch_seconds, top_k
+            )
+            self._by_scope[(engine, scope)].add(key)
+            for name in self._memory_names(items):
+                self._scope_of_memory[name] = (engine, scope)
+                self._memory_refs[name] += 1
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.stats.evictions += 1
+            return True
+
+    def invalidate_scope(self, engine_name: str, scope: Mapping[str, str]) -> int:
+        """スコープに属するエントリをすべて破棄し、破棄した件数を返す"""
+        owner = (engine_name, scope_key(scope))
+        with self._lock:
+            self._mark_invalidated(owner)
+            return self._invalidate(self._by_scope.get(owner, set()))
+
+    def invalidate_engine(self, engine_name: str) -> int:
+        """Agent Engine 全体のエントリを破棄する（対象スコープを特定できない場合）"""
+        with self._lock:
+            self._mark_invalidated(engine_name)
+            return self._invalidate({k for k in self._entries if k[0] == engine_name})
+
+    def invalidate_memory(self, memory_name: str) -> int:
+        """メモリが属するスコープのエントリを破棄する（不明なら Agent Engine 全体）"""
+        with self._lock:
+            owner = self._scope_of_memory.get(memory_name)
+            if owner is not None:
+                self._mark_invalidated(owner)
+                return self._invalidate(self._by_scope.get(owner, set()))
+            engine = engine_of(memory_name)
+            self._mark_invalidated(engine)
+            return self._invalidate({k for k in self._entries if k[0] == engine})
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._invalidated_at.clear()
+            self._invalidated_floor = self._generation
+            self._invalidate(set(self._entries))
+
+    @staticmethod
+    def _memory_names(items: RetrievedMemories) -> set[str]:
+        names: set[str] = set()
+        for item in items:
+            memory = getattr(item, "memory", None)
+            if memory is not None and memory.name:
+                names.add(memory.name)
+        return names
+
+    def _mark_invalidated(self, owner: Union[str, tuple[str, ScopeKey]]) -> None:
+        self._generation += 1
+        if len(self._invalidated_at) >= self.max_entries:
+            self._invalidated_at.clear()
+            self._invalidated_floor = self._generation
+        self._invalidated_at[owner] = self._generation
+
+    def _invalidated_since(self, engine: str, scope: ScopeKey, generation: int) -> bool:
+        floor = self._invalidated_floor
+        last = max(
+            self._invalidated_at.get((engine, scope), floor),
+            self._invalidated_at.get(engine, floor),
+        )
+        return last > generation
+
+    def _invalidate(self, keys: set[CacheKey]) -> int:
+        keys = set(keys)
+        for key in keys:
+            self._drop(key)
+        self.stats.invalidations += len(keys)
+        return len(keys)
+
+    def _drop(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            for name in self._memory_names(entry.items):
+                self._memory_refs[name] -= 1
+                if self._memory_refs[name] <= 0:
+                    del self._memory_refs[name]
+                    self._scope_of_memory.pop(name, None)
+        owner = (key[0], key[1])
+        keys = self._by_scope.get(owner)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_scope[owner]
+
+
+_SPACE_NEAR_WIDE_RE = re.compile(r"(?<=[^\x00-\x7f]) | (?=[^\x00-\x7f])")
+
+
+def normalize_query(query: str) -> str:
+    """表記ゆれだけが違うクエリを同じキーにする（全角/半角・大文字小文字・空白・末尾の記号）"""
+    text = " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+    # 日本語の語間の空白は意味を持たないため、非 ASCII 文字に隣接する空白は取り除く
+    text = _SPACE_NEAR_WIDE_RE.sub("", text)
+    return text.rstrip("?!.。、 ")
+
+
+class SemanticQueryCache(RetrieveCache):
+    """セマンティック検索の結果キャッシュ（キーに top_k を含めない）
+
+    エントリは取得時の top_k を覚えておき、それ以下の top_k の問い合わせには
+    先頭から切り出して返す。取得件数が top_k 未満（スコープ内のメモリを
+    すべて返した）のエントリは、どの top_k にも使える。
+
+    Args:
+        normalizer: クエリを正規化する関数（既定は normalize_query）
+        その他は RetrieveCache と同じ
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float = 60.0,
+        max_entries: int = 256,
+        clock: Callable[[], float] = time.monotonic,
+        normalizer: Callable[[str], str] = normalize_query,
+    ) -> None:
+        super().__init__(ttl_seconds=ttl_seconds, max_entries=max_entries, clock=clock)
+        self.normalizer = normalizer
+
+    def make_key(
+        self,
+        engine_name: str,
+        scope: Mapping[str, str],
+        query: str,
+        *,
+        config: Optional[Mapping[str, object]] = None,
+    ) -> CacheKey:
+        config = config or {}
+        return (
+            engine_name,
+            scope_key(scope),
+            str(config.get("filter") or ""),
+            freeze(config.get("filter_groups")),
+            self.normalizer(query),
+            "similarity",
+        )
+
+    def lookup(self, key: CacheKey, top_k: int) -> Optional[RetrievedMemories]:
+        """top_k 件の結果を返す（キャッシュから返せない場合は None）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= self._clock():
+                self._drop(key)
+                self.stats.expirations += 1
+                entry = None
+            cached_top_k = (entry.top_k or 0) if entry is not None else 0
+            # 件数が cached_top_k に達している = サーバにはまだ続きがあるかもしれない
+            if entry is None or (top_k > cached_top_k and len(entry.items) >= cached_top_k):
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            if top_k < cached_top_k:
+                self.stats.partial_hits += 1
+            self.stats.saved_seconds += entry.fetch_seconds
+            return list(entry.items[:top_k])
+
+
+def _top_k(similarity_search_params: Mapping[str, object]) -> int:
+    """similarity_search_params の top_k（省略時はサーバの既定値 3）"""
+    value = similarity_search_params.get("top_k")
+    return int(str(value)) if value is not None else 3
+
+
+class CachedMemories:
+    """client.agent_engines.memories をラップし、retrieve() をキャッシュする
+
+    書き込み系メソッドは元の API を呼んだ後に影響範囲のキャッシュを破棄する。
+    それ以外の属性（get / list / revisions など）はそのまま元の API に委譲する。
+
+      memories = CachedMemories(client.agent_engines.memories)
+      memories.retrieve(name=AGENT_ENGINE_NAME, scope=SCOPE)  # サーバへ
+      memories.retrieve(name=AGENT_ENGINE_NAME, scope=SCOPE)  # キャッシュから
+
+    similarity_search_params 付きの retrieve() は semantic_cache で扱い、
+    サーバには top_k を semantic_fetch_top_k 件まで広げて問い合わせる（0 なら広げない）。
+    """
+
+    def __init__(
+        self,
+        memories: "memories_module.Memories",
+        cache: Optional[RetrieveCache] = None,
+        semantic_cache: Optional[SemanticQueryCache] = None,
+        *,
+        semantic_fetch_top_k: int = 10,
+    ) -> None:
+        self._memories = memories
+        self.cache = cache or RetrieveCache()
+        self.semantic_cache = semantic_cache or SemanticQueryCache(
+            ttl_seconds=self.cache.ttl_seconds, max_entries=self.cache.max_entries
+        )
+        self.semantic_fetch_top_k = semantic_fetch_top_k
+
+    def __getattr__(self, attr: str) -> object:
+        return getattr(self._memories, attr)
+
+    def _invalidate_scope(self, engine_name: str, scope: Mapping[str, str]) -> None:
+        self.cache.invalidate_scope(engine_name, scope)
+        self.semantic_cache.invalidate_scope(engine_name, scope)
+
+    def _invalidate_engine(self, engine_name: str) -> None:
+        self.cache.invalidate_engine(engine_name)
+        self.semantic_cache.invalidate_engine(engine_name)
+
+    def _invalidate_memory(self, memory_name: str) -> None:
+        self.cache.invalidate_memory(memory_name)
+        self.semantic_cache.invalidate_memory(memory_name)
+
+    def retrieve(
+        self,
+        *,
+        name: str,
+        scope: dict[str, str],
+        similarity_search_params: Optional[Mapping[str, object]] = None,
+        simple_retrieval_params: Optional[Mapping[str, object]] = None,
+        config: Optional[Mapping[str, object]] = None,
+    ) -> RetrievedMemories:
+        """retrieve() の結果をリストで返す（キャッシュにあればサーバに問い合わせない）"""
+        if similarity_search_params and similarity_search_params.get("search_query"):
+            return self._retrieve_similar(
+                name=name,
+                scope=scope,
+                similarity_search_params=similarity_search_params,
+                config=config,
+            )
+        key = make_key(
+            name,
+            scope,
+            config=config,
+            similarity_search_params=similarity_search_params,
+            simple_retrieval_params=simple_retrieval_params,
+        )
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        generation = self.cache.generation()
+        started = time.perf_counter()
+        items = list(
+            self._memories.retrieve(
+                name=name,
+                scope=scope,
+                similarity_search_params=similarity_search_params,
+                simple_retrieval_params=simple_retrieval_params,
+                config=config,
+            )
+        )
+        self.cache.put(
+            key, items, fetch_seconds=time.perf_counter() - started, generation=generation
+        )
+        return list(items)
+
+    def _retrieve_similar(
+        self,
+        *,
+        name: str,
+        scope: dict[str, str],
+        similarity_search_params: Mapping[str, object],
+        config: Optional[Mapping[str, object]],
+    ) -> RetrievedMemories:
+        top_k = _top_k(similarity_search_params)
+        query = str(similarity_search_params["search_query"])
+        key = self.semantic_cache.make_key(name, scope, query, config=config)
+        cached = self.semantic_cache.lookup(key, top_k)
+        if cached is not None:
+            return cached
+        fetch_top_k = max(top_k, self.semantic_fetch_top_k)
+        generation = self.semantic_cache.generation()
+        started = time.perf_counter()
+        items = list(
+            self._memories.retrieve(
+                name=name,
+                scope=scope,
+                similarity_search_params={**similarity_search_params, "top_k": fetch_top_k},
+                config=config,
+            )
+        )
+        self.semantic_cache.put(
+            key,
+            items,
+            fetch_seconds=time.perf_counter() - started,
+            top_k=fetch_top_k,
+            generation=generation,
+        )
+        return items[:top_k]
+
+    def create(
+        self,
+        *,
+        name: str,
+        fact: str,
+        scope: dict[str, str],
+        config: Optional[Mapping[str, object]] = None,
+    ) -> "types.AgentEngineMemoryOperation":
+        operation = self._memories.create(name=name, fact=fact, scope=scope, config=config)
+        self._invalidate_scope(name, scope)
+        return operation
+
+    def generate(
+        self,
+        *,
+        name: str,
+        vertex_session_source: Optional[Mapping[str, object]] = None,
+        direct_contents_source: Optional[Mapping[str, object]] = None,
+        direct_memories_source: Optional[Mapping[str, object]] = None,
+        scope: Optional[dict[str, str]] = None,
+        config: Optional[Mapping[str, object]] = None,
+    ) -> "types.AgentEngineGenerateMemoriesOperation":
+        operation = self._memories.generate(
+            name=name,
+            vertex_session_source=vertex_session_source,
+            direct_contents_source=direct_contents_source,
+            direct_memories_source=direct_memories_source,
+            scope=scope,
+            config=config,
+        )
+        if scope:
+            self._invalidate_scope(name, scope)
+        else:
+            # Sessions 由来でスコープ省略時はセッションの user_id が使われるため全体を破棄
+            self._invalidate_engine(name)
+        return operation
+
+    def delete(self, *, name: str, config: Optional[Mapping[str, object]] = None) -> object:
+        result = self._memories.delete(name=name, config=config)
+        self._invalidate_memory(name)
+        return result
+
+    def rollback(
+        self,
+        *,
+        name: str,
+        target_revision_id: str,
+        config: Optional[Mapping[str, object]] = None,
+    ) -> "types.AgentEngineRollbackMemoryOperation":
+        operation = self._memories.rollback(
+            name=name, target_revision_id=target_revision_id, config=config
+        )
+        self._invalidate_memory(name)
+        return operation
+
+    def purge(
+        self,
+        *,
+        name: str,
+        filter: Optional[str] = None,
+        filter_groups: Optional[list[Mapping[str, object]]] = None,
+        force: bool = False,
+        config: Optional[Mapping[str, object]] = None,
+    ) -> "types.AgentEnginePurgeMemoriesOperation":
+        operation = self._memories.purge(
+            name=name, filter=filter, filter_groups=filter_groups, force=force, config=config
+        )
+        if force:
+            # フィルタに合致するスコープはサーバ側でしか分からないため全体を破棄
+            self._invalidate_engine(name)
+        return operation
@@ -0,0 +1,366 @@
+"""
+短い発話の generate() をまとめて送る（write-behind のコアレッサ）
+
+step1c_metadata.py や poi/step3_delete.py は 1 行の発話ごとに generate() を呼んでいる。
+エージェントが 1 ユーザーあたり細かい発話を大量に出すと、そのたびに LLM による
+抽出・統合が 1 回走る。ここでは発話をバッファし、まとめて 1 回の generate()
+（direct_contents_source の events に複数のイベント）として送る。
+
+  with GenerateCoalescer(client, AGENT_ENGINE_NAME, max_events=20, max_delay_seconds=2.0) as coalescer:
+      for text in utterances:
+          coalescer.add_text(text, scope=SCOPE, config={"metadata": ..., "metadata_merge_strategy": ...})
+  print(coalescer.stats.summary())   # with を抜けると残りを送って止まる
+
+  - バッファは (スコープ, config) ごと。config（metadata・metadata_merge_strategy など）が
+    異なる発話は同じ generate() に入れない
+  - 次のいずれかで送る: max_events 件 / 発話の文字数が max_chars / 最初の発話から
+    max_delay_seconds 秒 / flush()・close()
+  - 順序の保証: 同じスコープの generate() は発話の順に 1 つずつ送る（前の generate() の完了を
+    待ってから次を送る）。同じスコープで config が変わったら、それまでのバッファを先に送る。
+    異なるスコープは max_workers 個まで並行に送る
+  - gate（gate.RelevanceGate）を指定すると、雑談だけのバッファは generate() せずに捨てる。
+    gate の判定が例外を送出した場合は generate() する（FlushResult.gate_error に記録）
+  - 一時的なエラーは call_with_retry() で再試行し、それでも失敗したバッファは
+    FlushResult.error に記録して次のバッファに進む（FlushResult.events から再送できる）
+
+⚠️ config に wait_for_completion=False を指定すると、サーバ側で前の generate() の統合が
+   終わる前に次が始まりうるため、順序は保証されない。
+"""
+
+from __future__ import annotations
+
+import collections
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Mapping, Optional
+
+from memorybank.gate import RelevanceGate
+from memorybank.retry import call_with_retry
+from memorybank.scopes import ScopeKey, scope_key
+
+if TYPE_CHECKING:
+    import vertexai
+
+# 送った理由（FlushResult.reason）
+REASON_SIZE = "size"
+REASON_AGE = "age"
+REASON_CONFIG = "config"
+REASON_FLUSH = "flush"
+
+
+def _config_key(config: Optional[Mapping[str, object]]) -> str:
+    """config の比較用の文字列（キー順に依存しない）"""
+    if not config:
+        return ""
+    return json.dumps(config, sort_keys=True, ensure_ascii=False, default=repr)
+
+
+def _event_chars(event: Mapping[str, object]) -> int:
+    content = event.get("content")
+    if not isinstance(content, Mapping):
+        return 0
+    return sum(
+        len(part["text"])
+        for part in content.get("parts") or []  # type: ignore[attr-defined]
+        if isinstance(part, Mapping) and isinstance(part.get("text"), str)
+    )
+
+
+@dataclass
+class _Buffer:
+    scope: dict[str, str]
+    config: Optional[dict[str, object]]
+    config_key: str
+    started: float
+    events: list[dict[str, object]] = field(default_factory=list)
+    chars: int = 0
+    reason: str = ""
+
+
+@dataclass
+class FlushResult:
+    """1 回の generate()（まとめて送ったバッファ）の結果"""
+
+    scope: dict[str, str]
+    config: Optional[dict[str, object]]
+    events: list[dict[str, object]]
+    reason: str
+    operation: object = None
+    error: Optional[BaseException] = None
+    elapsed_seconds: float = 0.0
+    # gate がメモリにならないと判定し、generate() しなかった
+    skipped: bool = False
+    # gate の判定で発生した例外（この場合は判定せずに generate() する）
+    gate_error: Optional[BaseException] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class CoalesceStats:
+    """GenerateCoalescer の集計"""
+
+    events: int = 0
+    generates: int = 0
+    failed_generates: int = 0
+    failed_events: int = 0
+    # gate の判定で generate() しなかったバッファ
+    skipped_generates: int = 0
+    skipped_events: int = 0
+    reasons: collections.Counter[str] = field(default_factory=collections.Counter)
+    failures: list[FlushResult] = field(default_factory=list)
+    # on_flush が送出した例外（送信スレッドは止めない）
+    callback_errors: int = 0
+    last_callback_error: Optional[BaseException] = None
+    # gate の判定が送出した例外（判定せずに generate() した）
+    gate_errors: int = 0
+    last_gate_error: Optional[BaseException] = None
+
+    @property
+    def events_per_generate(self) -> float:
+        return (self.events - self.skipped_events) / self.generates if self.generates else 0.0
+
+    def summary(self) -> str:
+        reasons = ", ".join(f"{reason}×{n}" for reason, n in self.reasons.most_common())
+        text = (
+            f"発話 {self.events} 件 → generate() {self.generates} 回"
+            f"（平均 {self.events_per_generate:.1f} 件/回, 送った理由: {reasons or 'なし'}）"
+        )
+        if self.skipped_generates:
+            text += f", 関連なしで省略 {self.skipped_generates} 回（発話 {self.skipped_events} 件）"
+        if self.failed_generates:
+            text += f", 失敗 {self.failed_generates} 回（発話 {self.failed_events} 件）"
+        if self.gate_errors:
+            text += f", gate の判定エラー {self.gate_errors} 回（generate() した）"
+        return text
+
+
+class GenerateCoalescer:
+    """発話を (スコープ, config) ごとにバッファし、まとめて generate() する（スレッドセーフ）
+
+    Args:
+        client: vertexai.Client（get_client() の戻り値）
+        engine_name: Agent Engine のリソース名
+        max_events: 1 回の generate() に入れるイベントの上限
+        max_chars: 1 回の generate() に入れる text パートの文字数の目安（超えたら送る）
+        max_delay_seconds: 最初の発話から送るまでの最大の待ち時間
+        max_workers: 並行に送るスコープの数
+        max_attempts: 一時的なエラーの再試行を含めた generate() の試行回数
+        on_flush: generate() ごとに呼ばれる（スコープ内では発話の順。送信スレッドから呼ばれる）
+        gate: 送る前にバッファを判定し、メモリにならないものは generate() しない
+    """
+
+    def __init__(
+        self,
+        client: "vertexai.Client",
+        engine_name: str,
+        *,
+        max_events: int = 20,
+        max_chars: Optional[int] = 8_000,
+        max_delay_seconds: float = 2.0,
+        max_workers: int = 4,
+        max_attempts: int = 5,
+        on_flush: Optional[Callable[[FlushResult], None]] = None,
+        gate: Optional[RelevanceGate] = None,
+    ) -> None:
+        if max_events < 1:
+            raise ValueError("max_events は 1 以上を指定してください")
+        self._client = client
+        self.engine_name = engine_name
+        self.max_events = max_events
+        self.max_chars = max_chars
+        self.max_delay_seconds = max_delay_seconds
+        self.max_attempts = max_attempts
+        self.on_flush = on_flush
+        self.gate = gate
+        self.stats = CoalesceStats()
+        self._cond = threading.Condition()
+        # スコープごとに未送信のバッファは高々 1 つ（作成順 = 期限の早い順）
+        self._pending: dict[ScopeKey, _Buffer] = {}
+        # 送信待ちのバッファ（スコープごとに発話の順）と、送信中のスコープ
+        self._ready: dict[ScopeKey, collections.deque[_Buffer]] = {}
+        self._running: set[ScopeKey] = set()
+        self._inflight = 0
+        self._closed = False
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="coalesce")
+        self._timer = threading.Thread(target=self._run_timer, name="coalesce-timer", daemon=True)
+        self._timer.start()
+
+    def __enter__(self) -> "GenerateCoalescer":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    # --- 追加 ---
+    def add(
+        self,
+        event: Mapping[str, object],
+        *,
+        scope: Mapping[str, str],
+        config: Optional[Mapping[str, object]] = None,
+    ) -> None:
+        """イベント（direct_contents_source の events の 1 件と同じ形）をバッファに入れる"""
+        key = scope_key(scope)
+        config_key = _config_key(config)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("close() 済みのコアレッサには追加できません")
+            buffer = self._pending.get(key)
+            if buffer is not None and buffer.config_key != config_key:
+                self._seal(key, REASON_CONFIG)  # config が変わる前の発話を先に送る
+                buffer = None
+            if buffer is None:
+                buffer = _Buffer(
+                    dict(scope), dict(config) if config else None, config_key, time.monotonic()
+                )
+                self._pending[key] = buffer
+                self._cond.notify_all()  # タイマーに新しい期限を知らせる
+            buffer.events.append(dict(event))
+            buffer.chars += _event_chars(event)
+            self.stats.events += 1
+            if len(buffer.events) >= self.max_events or (
+                self.max_chars is not None and buffer.chars >= self.max_chars
+            ):
+                self._seal(key, REASON_SIZE)
+
+    def add_text(
+        self,
+        text: str,
+        *,
+        scope: Mapping[str, str],
+        role: str = "user",
+        config: Optional[Mapping[str, object]] = None,
+    ) -> None:
+        """1 行の発話をバッファに入れる"""
+        self.add({"content": {"role": role, "parts": [{"text": text}]}}, scope=scope, config=config)
+
+    def pending_events(self) -> int:
+        """まだ送っていない（送信中を含む）イベントの数"""
+        with self._cond:
+            return sum(len(b.events) for b in self._pending.values()) + sum(
+                len(b.events) for queue in self._ready.values() for b in queue
+            )
+
+    # --- 送信 ---
+    def flush(self) -> None:
+        """バッファをすべて送り、送信中のものも含めて完了を待つ"""
+        with self._cond:
+            for key in list(self._pending):
+                self._seal(key, REASON_FLUSH)
+            while self._inflight:
+                self._cond.wait()
+
+    def close(self) -> None:
+        """残りを送ってから、タイマーと送信スレッドを止める（何度呼んでもよい）"""
+        with self._cond:
+            if not self._closed:
+                # 閉じる印と残りの封を 1 つのロックの中で行い、間に add() が入らないようにする
+                self._closed = True
+                for key in list(self._pending):
+                    self._seal(key, REASON_FLUSH)
+                self._cond.notify_all()
+            while self._inflight:
+                self._cond.wait()
+        self._timer.join()
+        self._pool.shutdown()
+
+    def _seal(self, key: ScopeKey, reason: str) -> None:
+        """未送信のバッファを送信待ちに移す（self._cond を保持して呼ぶ）"""
+        buffer = self._pending.pop(key)
+        buffer.reason = reason
+        self._ready.setdefault(key, collections.deque()).append(buffer)
+        self._inflight += 1
+        if key not in self._running:
+            self._running.add(key)
+            self._pool.submit(self._drain, key)
+
+    def _drain(self, key: ScopeKey) -> None:
+        """スコープの送信待ちを 1 つずつ順に送る（スコープごとに同時に 1 つだけ動く）"""
+        while True:
+            with self._cond:
+                queue = self._ready[key]
+                if not queue:
+                    del self._ready[key]
+                    self._running.discard(key)
+                    return
+                buffer = queue.popleft()
+            try:
+                result = self._send(buffer)
+            except Exception as e:  # ここで抜けると _inflight が減らず flush() / close() が終わらない
+                result = FlushResult(buffer.scope, buffer.config, buffer.events, buffer.reason, error=e)
+            callback_error: Optional[BaseException] = None
+            if self.on_flush is not None:
+                try:
+                    self.on_flush(result)
+                except Exception as e:  # 呼び出し側の失敗で後続の送信を止めない
+                    callback_error = e
+            with self._cond:
+                if callback_error is not None:
+                    self.stats.callback_errors += 1
+                    self.stats.last_callback_error = callback_error
+                if result.gate_error is not None:
+                    self.stats.gate_errors += 1
+                    self.stats.last_gate_error = result.gate_error
+                if result.skipped:
+                    self.stats.skipped_generates += 1
+                    self.stats.skipped_events += len(buffer.events)
+                else:
+                    self.stats.generates += 1
+                    self.stats.reasons[buffer.reason] += 1
+                if not result.ok:
+                    self.stats.failed_generates += 1
+                    self.stats.failed_events += len(buffer.events)
+                    self.stats.failures.append(result)
+                self._inflight -= 1
+                self._cond.notify_all()
+
+    def _send(self, buffer: _Buffer) -> FlushResult:
+        result = FlushResult(buffer.scope, buffer.config, buffer.events, buffer.reason)
+        if self.gate is not None:
+            try:
+                generate = self.gate.decide(buffer.events).generate
+            except Exception as e:  # 判定できないときは記憶の欠落を避けて generate() する
+                result.gate_error = e
+                generate = True
+            if not generate:
+                result.skipped = True
+                return result
+        kwargs: dict[str, object] = {
+            "name": self.engine_name,
+            "direct_contents_source": {"events": buffer.events},
+            "scope": buffer.scope,
+        }
+        if buffer.config is not None:
+            kwargs["config"] = buffer.config
+        started = time.perf_counter()
+        try:
+            result.operation = call_with_retry(
+                lambda: self._client.agent_engines.memories.generate(**kwargs),
+                max_attempts=self.max_attempts,
+            )
+        except Exception as e:
+            result.error = e
+        result.elapsed_seconds = time.perf_counter() - started
+        return result
+
+    # --- タイマー ---
+    def _run_timer(self) -> None:
+        """max_delay_seconds を過ぎたバッファを送る"""
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                timeout: Optional[float] = None
+                # _pending は作成順なので、期限を過ぎていないものが出たらそこで止める
+                for key, buffer in list(self._pending.items()):
+                    remaining = buffer.started + self.max_delay_seconds - now
+                    if remaining > 0:
+                        timeout = remaining
+                        break
+                    self._seal(key, REASON_AGE)
+                self._cond.wait(timeout)
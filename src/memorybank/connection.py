@@ -0,0 +1,162 @@
+"""
+vertexai.Client の共有と遅延初期化
+
+各スクリプトは import 直後に load_dotenv() → os.environ の読み込み →
+vertexai.Client(...) を実行していた。vertexai の import だけで数秒かかるうえ、
+API を呼ばない経路（--help やエラー終了）でもその時間を払うことになる。
+
+  - 設定（.env / 環境変数）は最初に必要になった時点で 1 回だけ読む
+  - vertexai は get_client() を最初に呼んだ時点で import する
+  - Client は (project, location) ごとに 1 つだけ作って使い回す
+
+  from memorybank.connection import get_client, settings
+
+  AGENT_ENGINE_NAME = settings().require_agent_engine_name()
+  client = get_client()  # ここで初めて vertexai を import する
+
+環境変数で get_client() が返すクライアントにラッパーを挟める（既定ではどちらも挟まない）。
+  MEMORYBANK_RATE_LIMIT=1   レート制限・再試行（ratelimit.rate_limited()）
+  MEMORYBANK_INSTRUMENT=1   RPC ごとの計測（instrument.instrumented()）。終了時に集計を出力し、
+                            MEMORYBANK_METRICS_FILE があれば Prometheus 形式で保存する
+
+set_client_factory() で Client の生成を差し替えられる（bench/bench_workflows.py がスタブを渡す）。
+
+起動時間の内訳は `python -X importtime` で確認できる（bench/bench_startup.py）。
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Optional, cast
+
+if TYPE_CHECKING:
+    import vertexai
+
+ENV_PROJECT = "GCP_PROJECT_ID"
+ENV_LOCATION = "GCP_LOCATION"
+ENV_AGENT_ENGINE = "AGENT_ENGINE_NAME"
+ENV_RATE_LIMIT = "MEMORYBANK_RATE_LIMIT"
+ENV_INSTRUMENT = "MEMORYBANK_INSTRUMENT"
+ENV_METRICS_FILE = "MEMORYBANK_METRICS_FILE"
+
+_lock = threading.Lock()
+_env_loaded = False
+_dump_registered = False
+_clients: dict[tuple[str, str], "vertexai.Client"] = {}
+# (project, location) → Client を作る関数（None なら vertexai.Client）
+_client_factory: Optional[Callable[[str, str], object]] = None
+
+
+def load_env() -> None:
+    """.env を 1 回だけ読み込む（python-dotenv もここで初めて import する）"""
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _lock:
+        if not _env_loaded:
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            _env_loaded = True
+
+
+def require_env(name: str) -> str:
+    """環境変数を読む（.env を含む）。未設定なら KeyError"""
+    load_env()
+    value = os.environ.get(name)
+    if not value:
+        raise KeyError(f"環境変数 {name} が設定されていません（.env を確認してください）")
+    return value
+
+
+@dataclass(frozen=True)
+class Settings:
+    project: str
+    location: str
+    agent_engine_name: Optional[str] = None
+
+    def require_agent_engine_name(self) -> str:
+        if not self.agent_engine_name:
+            raise KeyError(
+                f"環境変数 {ENV_AGENT_ENGINE} が設定されていません（Step 0 の出力を .env に追記してください）"
+            )
+        return self.agent_engine_name
+
+
+def env_flag(name: str) -> bool:
+    """環境変数を真偽値として読む（1 / true / yes / on）"""
+    load_env()
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def settings() -> Settings:
+    """.env / 環境変数から接続設定を読む"""
+    load_env()
+    return Settings(
+        project=require_env(ENV_PROJECT),
+        location=require_env(ENV_LOCATION),
+        agent_engine_name=os.environ.get(ENV_AGENT_ENGINE) or None,
+    )
+
+
+def get_client(
+    project: Optional[str] = None,
+    location: Optional[str] = None,
+) -> "vertexai.Client":
+    """(project, location) ごとに共有する vertexai.Client を返す（省略時は環境変数）"""
+    global _dump_registered
+    if project is None or location is None:
+        current = settings()
+        project = project or current.project
+        location = location or current.location
+    key = (project, location)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    # load_env() が _lock を使うため、ロックの外で読む
+    rate_limit = env_flag(ENV_RATE_LIMIT)
+    instrument = env_flag(ENV_INSTRUMENT)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            if _client_factory is not None:
+                client = cast("vertexai.Client", _client_factory(project, location))
+            else:
+                import vertexai
+
+                client = vertexai.Client(project=project, location=location)
+            # 呼び出し箇所からは vertexai.Client と同じように使える
+            if instrument:  # 再試行も 1 回ずつ計測するよう、レート制限より内側に挟む
+                from memorybank.instrument import METRICS, dump_at_exit, instrumented
+
+                if not _dump_registered:
+                    atexit.register(dump_at_exit, METRICS, os.environ.get(ENV_METRICS_FILE))
+                    _dump_registered = True
+                client = cast("vertexai.Client", instrumented(client, METRICS))
+            if rate_limit:
+                from memorybank.ratelimit import rate_limited
+
+                client = cast("vertexai.Client", rate_limited(client))
+            _clients[key] = client
+    return client
+
+
+def set_client_factory(factory: Optional[Callable[[str, str], object]]) -> None:
+    """get_client() が Client を作る関数を差し替える（None で vertexai.Client に戻す）
+
+    ベンチマークでステップスクリプトをスタブ（stub.StubClient）に対して実行するためのもの。
+    共有している Client は破棄される。
+    """
+    global _client_factory
+    with _lock:
+        _client_factory = factory
+        _clients.clear()
+
+
+def reset_clients() -> None:
+    """共有している Client を破棄する（認証情報を切り替えた場合など）"""
+    with _lock:
+        _clients.clear()
@@ -0,0 +1,219 @@
+"""
+generate() による統合（Consolidation）の差分: 余分な retrieve() / get() なしで前後の fact を並べる
+
+step1b_consolidation.py は generate() の前後でスコープ全体を retrieve() して両方を表示し、
+さらに UPDATED のメモリを 1 件ずつ get() していた。監査ログのために「何がどう変わったか」を
+残すと、変更が 1 件でもスコープ全体の取得が 2 回かかる。
+
+  before = snapshot_facts(client.agent_engines.memories.retrieve(name=AGENT_ENGINE_NAME, scope=SCOPE))
+  operation = client.agent_engines.memories.generate(...)
+  diff = diff_generated(client, operation, before)
+  for change in diff:
+      print(change.describe())          # UPDATED ...: A4用紙の業者はA社 → A4用紙の業者はC社
+  after = diff.apply(before)            # 統合後のスコープ（name → fact、RPC なし）
+
+  - 変更前の fact は before（generate() の前のスナップショット）から取る。before にない
+    （または before を渡さない）UPDATED / DELETED は previous_revision を revisions.get() する
+  - 変更後の fact は generate() の応答に fact があればそれを使い、なければ get() する
+  - 足りないものだけを 1 回の並行バッチでまとめて取得する（RPC は変更の件数に比例する）
+  - 取得に失敗した変更は error に例外を入れて返す（全体は止めない）
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable, Iterator, Mapping, Optional
+
+from memorybank.hydrate import ACTION_CREATED, ACTION_DELETED, ACTION_UPDATED, action_name
+
+if TYPE_CHECKING:
+    import vertexai
+    from vertexai._genai import types
+
+
+def snapshot_facts(items: Iterable[object]) -> dict[str, str]:
+    """retrieve() / list() の結果（または Memory のリスト）を name → fact の辞書にする"""
+    facts: dict[str, str] = {}
+    for item in items:
+        memory = getattr(item, "memory", None) or item  # retrieve() は .memory に Memory が入る
+        name = getattr(memory, "name", None)
+        if name:
+            facts[name] = getattr(memory, "fact", None) or ""
+    return facts
+
+
+@dataclass(frozen=True)
+class MemoryChange:
+    """統合で作成・更新・削除された 1 件分の変更"""
+
+    action: str
+    name: str
+    # 変更前の fact（CREATED は None）
+    before: Optional[str] = None
+    # 変更後の fact（DELETED は None）
+    after: Optional[str] = None
+    previous_revision: Optional[str] = None
+    # 変更後のメモリ（get() した場合のみ。metadata などの確認用）
+    memory: Optional["types.Memory"] = None
+    error: Optional[BaseException] = None
+
+    def describe(self) -> str:
+        if self.action == ACTION_CREATED:
+            return f"{self.action} {self.name}: {self.after}"
+        if self.action == ACTION_DELETED:
+            return f"{self.action} {self.name}: {self.before}"
+        return f"{self.action} {self.name}: {self.before} → {self.after}"
+
+
+@dataclass
+class ConsolidationDiff:
+    """diff_generated() の結果"""
+
+    done: bool
+    changes: list[MemoryChange] = field(default_factory=list)
+    # 実際に発行した get() / revisions.get() の回数
+    fetched: int = 0
+    revisions_fetched: int = 0
+
+    def __iter__(self) -> Iterator[MemoryChange]:
+        return iter(self.changes)
+
+    def __len__(self) -> int:
+        return len(self.changes)
+
+    def by_action(self, action: str) -> list[MemoryChange]:
+        return [c for c in self.changes if c.action == action]
+
+    @property
+    def created(self) -> list[MemoryChange]:
+        return self.by_action(ACTION_CREATED)
+
+    @property
+    def updated(self) -> list[MemoryChange]:
+        return self.by_action(ACTION_UPDATED)
+
+    @property
+    def deleted(self) -> list[MemoryChange]:
+        return self.by_action(ACTION_DELETED)
+
+    @property
+    def errors(self) -> list[MemoryChange]:
+        return [c for c in self.changes if c.error is not None]
+
+    def apply(self, before: Mapping[str, str]) -> dict[str, str]:
+        """変更前のスコープ（name → fact）に差分を適用し、統合後のスコープを返す"""
+        after = dict(before)
+        for change in self.changes:
+            if change.action == ACTION_DELETED:
+                after.pop(change.name, None)
+            elif change.after is not None:
+                after[change.name] = change.after
+        return after
+
+
+def diff_generated(
+    client: "vertexai.Client",
+    operation: "types.AgentEngineGenerateMemoriesOperation",
+    before: Optional[Iterable[object] | Mapping[str, str]] = None,
+    *,
+    max_workers: int = 8,
+) -> ConsolidationDiff:
+    """generate() の operation と、その前のスナップショットから統合の差分を作る
+
+    Args:
+        client: vertexai.Client
+        operation: memories.generate() の戻り値
+        before: generate() の前の snapshot_facts()（name → fact）、または retrieve() / list() の結果
+            （省略時は UPDATED / DELETED の変更前をすべて previous_revision から取得する）。
+            結果のオブジェクトを渡す場合、fact はこの関数の呼び出し時点で読む
+        max_workers: 同時に実行する get() / revisions.get() の上限
+    """
+    result = ConsolidationDiff(done=bool(operation.done))
+    if operation.response is None:
+        return result
+    known = dict(before) if isinstance(before, Mapping) else snapshot_facts(before or ())
+
+    generated = [gm for gm in operation.response.generated_memories or [] if gm.memory is not None]
+    memory_names: list[str] = []
+    revision_names: list[str] = []
+    for gm in generated:
+        action = action_name(gm.action)
+        if action != ACTION_DELETED and getattr(gm.memory, "fact", None) is None:
+            memory_names.append(gm.memory.name)
+        if action != ACTION_CREATED and gm.memory.name not in known and gm.previous_revision:
+            revision_names.append(gm.previous_revision)
+    memories, revisions = _fetch_batch(client, memory_names, revision_names, max_workers=max_workers)
+    result.fetched = len(memories)
+    result.revisions_fetched = len(revisions)
+
+    for gm in generated:
+        action = action_name(gm.action)
+        name = gm.memory.name
+        error: Optional[BaseException] = None
+        before_fact: Optional[str] = None
+        if action != ACTION_CREATED:
+            before_fact = known.get(name)
+            revision = revisions.get(gm.previous_revision or "")
+            if before_fact is None and isinstance(revision, BaseException):
+                error = revision
+            elif before_fact is None and revision is not None:
+                before_fact = revision.fact
+        after_fact: Optional[str] = None
+        memory: Optional["types.Memory"] = None
+        if action != ACTION_DELETED:
+            after_fact = getattr(gm.memory, "fact", None)
+            value = memories.get(name)
+            if isinstance(value, BaseException):
+                error = value
+            elif value is not None:
+                memory = value
+                after_fact = value.fact
+        result.changes.append(
+            MemoryChange(
+                action=action,
+                name=name,
+                before=before_fact,
+                after=after_fact,
+                previous_revision=gm.previous_revision,
+                memory=memory,
+                error=error,
+            )
+        )
+    return result
+
+
+def _fetch_batch(
+    client: "vertexai.Client",
+    memory_names: list[str],
+    revision_names: list[str],
+    *,
+    max_workers: int,
+) -> tuple[dict[str, "types.Memory | BaseException"], dict[str, "types.MemoryRevision | BaseException"]]:
+    """get() と revisions.get() を 1 つのスレッドプールでまとめて並行に実行する（重複は 1 回）"""
+    memory_names = list(dict.fromkeys(memory_names))
+    revision_names = list(dict.fromkeys(revision_names))
+    if not memory_names and not revision_names:
+        return {}, {}
+    memories_api = client.agent_engines.memories
+
+    def _get(name: str) -> "types.Memory | BaseException":
+        try:
+            return memories_api.get(name=name)
+        except Exception as e:  # 1 件の失敗で全体を止めない
+            return e
+
+    def _get_revision(name: str) -> "types.MemoryRevision | BaseException":
+        try:
+            return memories_api.revisions.get(name=name)
+        except Exception as e:
+            return e
+
+    workers = min(max_workers, len(memory_names) + len(revision_names))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        memory_futures = [executor.submit(_get, name) for name in memory_names]
+        revision_futures = [executor.submit(_get_revision, name) for name in revision_names]
+        return (
+            {name: f.result() for name, f in zip(memory_names, memory_futures)},
+            {name: f.result() for name, f in zip(revision_names, revision_futures)},
+        )
@@ -0,0 +1,562 @@
+"""
+Agent Engine のメモリをローカルの列指向スナップショットに書き出す
+
+分析のたびに list() で Agent Engine 全体をページングすると、件数に比例した
+RPC と転送が毎回かかる。export_memories() は list() をストリーミングで読み、
+ディレクトリに「チャンク単位・列ごとに圧縮した」ファイルとして保存する。
+
+  result = export_memories(client, AGENT_ENGINE_NAME, "snapshots/engine")
+  print(result.summary())            # 2 回目以降は update_time>= で差分だけ取得
+
+  with SnapshotReader("snapshots/engine") as snapshot:
+      for record in snapshot.query(scope={"user_id": "user_123"}, fact_contains="発注"):
+          print(record.fact)
+
+ディレクトリの構成:
+  manifest.json             チャンクの一覧・世代・ウォーターマーク（最後に見た update_time）
+  chunk-GGGG-NNNNN.mbx      chunk_rows 件ごとの列ファイル
+
+チャンクファイル（数値は書き込んだ環境のバイト順。ヘッダに記録し、異なる環境では開かない）:
+  MAGIC | ヘッダ長 (uint32) | ヘッダ JSON | 列ブロック...
+  列ブロックは name / fact（文字列）、scope / metadata / topics（辞書符号化した JSON）、
+  create_time_us / update_time_us（int64）。既定では列ごとに zlib で圧縮する。
+
+SnapshotReader はチャンクを mmap で開き、クエリに必要な列だけを展開する
+（update_time・scope の条件で絞り込んでから fact などを読む）。
+
+⚠️ 差分エクスポート（incremental=True）では削除されたメモリを検出できない。
+   同じメモリが複数のチャンクにある場合は新しいチャンクの行が優先されるが、
+   削除を反映するには定期的に incremental=False で全件を書き直す。
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, Mapping, Optional, Sequence, Union
+
+from memorybank.records import (
+    TOPICS,
+    MemoryRecord,
+    MetadataScalar,
+    compact,
+    from_micros,
+    to_micros,
+)
+from memorybank.streaming import DEFAULT_PAGE_SIZE, StreamStats, stream_list
+
+if TYPE_CHECKING:
+    import vertexai
+
+MAGIC = b"MBX1"
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+
+CODEC_ZLIB = "zlib"
+CODEC_NONE = "none"
+
+DEFAULT_CHUNK_ROWS = 10_000
+# 差分エクスポートでウォーターマークより手前から取り直す幅（書き込み中だった更新の取りこぼし対策）
+DEFAULT_OVERLAP_SECONDS = 60
+
+MODE_FULL = "full"
+MODE_INCREMENTAL = "incremental"
+
+PathLike = Union[str, "os.PathLike[str]"]
+
+
+# ------------------------------------------------------------
+# マニフェスト
+# ------------------------------------------------------------
+@dataclass
+class ChunkInfo:
+    file: str
+    rows: int
+    bytes: int
+    min_update_us: int
+    max_update_us: int
+
+
+@dataclass
+class SnapshotManifest:
+    engine_name: str
+    # 全件エクスポートのたびに 1 つ進む（チャンクのファイル名に入る）
+    generation: int = 0
+    # これまでに取り込んだメモリの最大 update_time（UNIX エポックからのマイクロ秒）
+    watermark_us: int = 0
+    exported_at_us: int = 0
+    chunks: list[ChunkInfo] = field(default_factory=list)
+    format_version: int = FORMAT_VERSION
+
+    @property
+    def rows(self) -> int:
+        """全チャンクの行数（差分エクスポートで重複した行を含む）"""
+        return sum(chunk.rows for chunk in self.chunks)
+
+    @classmethod
+    def load(cls, directory: PathLike) -> Optional["SnapshotManifest"]:
+        path = Path(directory) / MANIFEST_FILE
+        if not path.exists():
+            return None
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"未対応のスナップショット形式です: {data.get('format_version')!r}")
+        chunks = [ChunkInfo(**chunk) for chunk in data.pop("chunks", [])]
+        return cls(chunks=chunks, **data)
+
+    def save(self, directory: PathLike) -> None:
+        """一時ファイルに書いてから置き換える（途中で失敗しても前のマニフェストが残る）"""
+        path = Path(directory) / MANIFEST_FILE
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(asdict(self), ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+# ------------------------------------------------------------
+# 列の符号化
+# ------------------------------------------------------------
+def _encode_strings(values: Sequence[str]) -> bytes:
+    """件数 (int64) | 終端オフセット (int64 × 件数+1) | UTF-8 の連結"""
+    blobs = [value.encode("utf-8") for value in values]
+    offsets = array("q", [0])
+    total = 0
+    for blob in blobs:
+        total += len(blob)
+        offsets.append(total)
+    return struct.pack("<q", len(blobs)) + offsets.tobytes() + b"".join(blobs)
+
+
+def _encode_dictionary(values: Sequence[str]) -> bytes:
+    """値の一覧（_encode_strings）| 各行のコード (uint32)"""
+    codes: dict[str, int] = {}
+    column = array("I", [codes.setdefault(value, len(codes)) for value in values])
+    return _encode_strings(list(codes)) + column.tobytes()
+
+
+def _encode_ints(values: Sequence[int]) -> bytes:
+    return array("q", values).tobytes()
+
+
+def _json_text(value: object) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+
+class _Strings:
+    """_encode_strings の読み出し（1 件ずつ decode する。全体はコピーしない）"""
+
+    def __init__(self, buf: memoryview) -> None:
+        (count,) = struct.unpack_from("<q", buf, 0)
+        end = 8 + 8 * (count + 1)
+        self._offsets = buf[8:end].cast("q")
+        self._blob = buf[end:]
+        self.nbytes = end + self._offsets[count]
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return str(self._blob[self._offsets[index] : self._offsets[index + 1]], "utf-8")
+
+
+class _Dictionary:
+    """_encode_dictionary の読み出し（値の一覧は先に decode し、行はコードで引く）"""
+
+    def __init__(self, buf: memoryview) -> None:
+        strings = _Strings(buf)
+        self.values = [strings[i] for i in range(len(strings))]
+        self.codes = buf[strings.nbytes :].cast("I")
+
+    def code_of(self, value: str) -> Optional[int]:
+        try:
+            return self.values.index(value)
+        except ValueError:
+            return None
+
+
+# ------------------------------------------------------------
+# チャンクファイル
+# ------------------------------------------------------------
+def _scope_text(record: MemoryRecord) -> str:
+    return _json_text(record.scope_dict())
+
+
+def _write_chunk(
+    path: Path,
+    records: Sequence[MemoryRecord],
+    *,
+    codec: str,
+    level: int,
+) -> int:
+    """records を 1 つのチャンクファイルに書き、ファイルサイズを返す"""
+    columns: dict[str, tuple[str, bytes]] = {
+        "name": ("str", _encode_strings([r.name for r in records])),
+        "fact": ("str", _encode_strings([r.fact for r in records])),
+        "scope": ("dict", _encode_dictionary([_scope_text(r) for r in records])),
+        "metadata": ("dict", _encode_dictionary([_json_text(r.metadata_dict()) for r in records])),
+        "topics": ("dict", _encode_dictionary([_json_text(r.topic_labels()) for r in records])),
+        "create_time_us": ("i64", _encode_ints([r.create_time_us for r in records])),
+        "update_time_us": ("i64", _encode_ints([r.update_time_us for r in records])),
+    }
+    header: dict[str, object] = {"rows": len(records), "byteorder": sys.byteorder}
+    specs: dict[str, dict[str, object]] = {}
+    blocks: list[bytes] = []
+    offset = 0
+    for name, (kind, raw) in columns.items():
+        data = zlib.compress(raw, level) if codec == CODEC_ZLIB else raw
+        specs[name] = {
+            "kind": kind,
+            "codec": codec,
+            "offset": offset,
+            "length": len(data),
+            "raw_length": len(raw),
+        }
+        padding = -len(data) % 8  # 非圧縮の int64 列を mmap 上でそのまま読めるように揃える
+        blocks.append(data + b"\0" * padding)
+        offset += len(data) + padding
+    header["columns"] = specs
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes += b" " * (-(len(MAGIC) + 4 + len(header_bytes)) % 8)
+
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for block in blocks:
+            f.write(block)
+    os.replace(tmp, path)
+    return path.stat().st_size
+
+
+class _Chunk:
+    """mmap で開いたチャンクファイル（列は初めて使う時に展開してキャッシュする）"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._columns: dict[str, object] = {}
+        self._view = view = memoryview(self._mmap)
+        if bytes(view[: len(MAGIC)]) != MAGIC:
+            self.close()
+            raise ValueError(f"チャンクファイルではありません: {path}")
+        (header_length,) = struct.unpack_from("<I", view, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(bytes(view[start : start + header_length]))
+        if header.get("byteorder") != sys.byteorder:
+            self.close()
+            raise ValueError(f"バイト順の異なる環境で書き出したチャンクです: {path}")
+        self.rows = int(header["rows"])
+        self._specs: dict[str, dict[str, object]] = header["columns"]
+        self._data = view[start + header_length :]
+
+    def _raw(self, column: str) -> memoryview:
+        spec = self._specs[column]
+        offset, length = int(str(spec["offset"])), int(str(spec["length"]))
+        block = self._data[offset : offset + length]
+        if spec["codec"] == CODEC_ZLIB:
+            return memoryview(zlib.decompress(block))
+        return block
+
+    def strings(self, column: str) -> _Strings:
+        cached = self._columns.get(column)
+        if cached is None:
+            cached = self._columns[column] = _Strings(self._raw(column))
+        assert isinstance(cached, _Strings)
+        return cached
+
+    def dictionary(self, column: str) -> _Dictionary:
+        cached = self._columns.get(column)
+        if cached is None:
+            cached = self._columns[column] = _Dictionary(self._raw(column))
+        assert isinstance(cached, _Dictionary)
+        return cached
+
+    def ints(self, column: str) -> memoryview:
+        cached = self._columns.get(column)
+        if cached is None:
+            cached = self._columns[column] = self._raw(column).cast("q")
+        assert isinstance(cached, memoryview)
+        return cached
+
+    def close(self) -> None:
+        # mmap を閉じる前に、mmap を参照している memoryview をすべて手放す
+        self._columns.clear()
+        for attr in ("_data", "_view"):
+            view = self.__dict__.pop(attr, None)
+            if isinstance(view, memoryview):
+                view.release()
+        self._mmap.close()
+        self._file.close()
+
+
+# ------------------------------------------------------------
+# エクスポート
+# ------------------------------------------------------------
+@dataclass
+class ExportResult:
+    mode: str
+    # list() で取得したメモリの件数
+    fetched: int = 0
+    pages: int = 0
+    chunks_written: int = 0
+    bytes_written: int = 0
+    elapsed_seconds: float = 0.0
+    watermark_us: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"{self.fetched} 件取得（{self.mode}, {self.pages} ページ, "
+            f"{self.chunks_written} チャンク / {self.bytes_written:,} bytes, "
+            f"{self.elapsed_seconds:.2f}s）"
+        )
+
+
+def _chunk_file(generation: int, index: int) -> str:
+    return f"chunk-{generation:04d}-{index:05d}.mbx"
+
+
+def _rfc3339(micros: int) -> str:
+    return from_micros(micros).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def export_memories(
+    client: "vertexai.Client",
+    engine_name: str,
+    directory: PathLike,
+    *,
+    incremental: bool = True,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    codec: str = CODEC_ZLIB,
+    level: int = 6,
+    overlap_seconds: float = DEFAULT_OVERLAP_SECONDS,
+) -> ExportResult:
+    """Agent Engine のメモリを directory のスナップショットに書き出す
+
+    Args:
+        client: vertexai.Client
+        engine_name: Agent Engine のリソース名
+        directory: スナップショットのディレクトリ（なければ作る）
+        incremental: 既存のスナップショットがあれば、ウォーターマーク以降に
+            更新されたメモリだけを取得してチャンクを追加する
+        chunk_rows: 1 チャンクあたりの行数
+        page_size: list() の 1 ページあたりの件数
+        codec: 列ブロックの圧縮（"zlib" / "none"）
+        level: zlib の圧縮レベル
+        overlap_seconds: 差分取得でウォーターマークより手前から取り直す秒数
+
+    Returns:
+        ExportResult（方式・取得件数・書き込んだチャンク・経過時間）
+    """
+    if codec not in (CODEC_ZLIB, CODEC_NONE):
+        raise ValueError(f"未対応の codec です: {codec!r}")
+    if chunk_rows < 1:
+        raise ValueError("chunk_rows は 1 以上を指定してください")
+
+    started = time.perf_counter()
+    root = Path(directory)
+    root.mkdir(parents=True, exist_ok=True)
+    previous = SnapshotManifest.load(root)
+    if previous is not None and previous.engine_name != engine_name:
+        raise ValueError(
+            f"{root} は別の Agent Engine（{previous.engine_name}）のスナップショットです"
+        )
+
+    filter_text: Optional[str] = None
+    if incremental and previous is not None and previous.chunks:
+        mode = MODE_INCREMENTAL
+        manifest = SnapshotManifest(
+            engine_name=engine_name,
+            generation=previous.generation,
+            watermark_us=previous.watermark_us,
+            chunks=list(previous.chunks),
+        )
+        since_us = max(0, previous.watermark_us - int(overlap_seconds * 1_000_000))
+        filter_text = f'update_time>="{_rfc3339(since_us)}"'
+    else:
+        mode = MODE_FULL
+        manifest = SnapshotManifest(
+            engine_name=engine_name,
+            generation=(previous.generation + 1) if previous is not None else 1,
+        )
+
+    result = ExportResult(mode=mode)
+    stats = StreamStats()
+    next_index = len(manifest.chunks)
+    buffer: list[MemoryRecord] = []
+
+    def _flush() -> None:
+        nonlocal next_index
+        if not buffer:
+            return
+        name = _chunk_file(manifest.generation, next_index)
+        size = _write_chunk(root / name, buffer, codec=codec, level=level)
+        updates = [r.update_time_us for r in buffer]
+        manifest.chunks.append(ChunkInfo(name, len(buffer), size, min(updates), max(updates)))
+        manifest.watermark_us = max(manifest.watermark_us, max(updates))
+        result.chunks_written += 1
+        result.bytes_written += size
+        next_index += 1
+        buffer.clear()
+
+    memories = stream_list(
+        client, engine_name, page_size=page_size, filter=filter_text, stats=stats
+    )
+    for record in compact(memories):
+        buffer.append(record)
+        result.fetched += 1
+        if len(buffer) >= chunk_rows:
+            _flush()
+    _flush()
+
+    manifest.exported_at_us = to_micros(datetime.datetime.now(tz=datetime.timezone.utc))
+    manifest.save(root)
+    if mode == MODE_FULL:
+        # 新しいマニフェストを書いた後で、前の世代のチャンクを消す
+        keep = {chunk.file for chunk in manifest.chunks}
+        for path in root.glob("chunk-*.mbx"):
+            if path.name not in keep:
+                path.unlink()
+
+    result.pages = stats.pages
+    result.watermark_us = manifest.watermark_us
+    result.elapsed_seconds = time.perf_counter() - started
+    return result
+
+
+# ------------------------------------------------------------
+# 読み出し
+# ------------------------------------------------------------
+class SnapshotReader:
+    """スナップショットを mmap で開いて問い合わせる（with で閉じる）"""
+
+    def __init__(self, directory: PathLike) -> None:
+        manifest = SnapshotManifest.load(directory)
+        if manifest is None:
+            raise FileNotFoundError(f"{Path(directory) / MANIFEST_FILE} がありません")
+        self.manifest = manifest
+        self._chunks: list[_Chunk] = []
+        try:
+            for chunk in manifest.chunks:
+                self._chunks.append(_Chunk(Path(directory) / chunk.file))
+        except BaseException:
+            self.close()
+            raise
+        self._live: Optional[list[tuple[_Chunk, list[int]]]] = None
+        # 辞書符号化した列の値 → MemoryRecord の属性（チャンクをまたいで共有）
+        self._scopes: dict[str, tuple[tuple[str, str], ...]] = {}
+        self._metadata: dict[str, tuple[tuple[str, MetadataScalar], ...]] = {}
+        self._topics: dict[str, tuple[int, ...]] = {}
+
+    def __enter__(self) -> "SnapshotReader":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for chunk in self._chunks:
+            chunk.close()
+        self._chunks.clear()
+        self._live = None
+
+    def _live_rows(self) -> list[tuple[_Chunk, list[int]]]:
+        """メモリ名ごとに最新の行だけを残す（新しいチャンク・後ろの行が優先）"""
+        if self._live is None:
+            seen: set[str] = set()
+            live: list[tuple[_Chunk, list[int]]] = []
+            for chunk in reversed(self._chunks):
+                names = chunk.strings("name")
+                rows: list[int] = []
+                for row in range(chunk.rows - 1, -1, -1):
+                    name = names[row]
+                    if name not in seen:
+                        seen.add(name)
+                        rows.append(row)
+                rows.reverse()
+                live.append((chunk, rows))
+            live.reverse()
+            self._live = live
+        return self._live
+
+    def __len__(self) -> int:
+        return sum(len(rows) for _, rows in self._live_rows())
+
+    def _record(self, chunk: _Chunk, row: int) -> MemoryRecord:
+        scope = chunk.dictionary("scope")
+        scope_text = scope.values[scope.codes[row]]
+        scope_value = self._scopes.get(scope_text)
+        if scope_value is None:
+            scope_value = self._scopes[scope_text] = tuple(
+                (sys.intern(k), sys.intern(v)) for k, v in json.loads(scope_text).items()
+            )
+        metadata = chunk.dictionary("metadata")
+        metadata_text = metadata.values[metadata.codes[row]]
+        metadata_value = self._metadata.get(metadata_text)
+        if metadata_value is None:
+            metadata_value = self._metadata[metadata_text] = tuple(
+                (sys.intern(k), sys.intern(v) if isinstance(v, str) else v)
+                for k, v in json.loads(metadata_text).items()
+            )
+        topics = chunk.dictionary("topics")
+        topics_text = topics.values[topics.codes[row]]
+        topics_value = self._topics.get(topics_text)
+        if topics_value is None:
+            topics_value = self._topics[topics_text] = tuple(
+                TOPICS.code_for_label(label) for label in json.loads(topics_text)
+            )
+        return MemoryRecord(
+            name=chunk.strings("name")[row],
+            fact=chunk.strings("fact")[row],
+            scope=scope_value,
+            metadata=metadata_value,
+            topics=topics_value,
+            create_time_us=chunk.ints("create_time_us")[row],
+            update_time_us=chunk.ints("update_time_us")[row],
+        )
+
+    def query(
+        self,
+        *,
+        scope: Optional[Mapping[str, str]] = None,
+        updated_since: Optional[datetime.datetime] = None,
+        fact_contains: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[MemoryRecord]:
+        """条件に合うメモリを返す（scope は完全一致。条件はすべて AND）
+
+        update_time → scope → fact の順に、必要な列だけを展開して絞り込む。
+        """
+        since_us = to_micros(updated_since) if updated_since is not None else None
+        scope_text = _json_text(dict(scope)) if scope is not None else None
+        returned = 0
+        for chunk, rows in self._live_rows():
+            if since_us is not None:
+                updates = chunk.ints("update_time_us")
+                rows = [row for row in rows if updates[row] >= since_us]
+            if scope_text is not None and rows:
+                scopes = chunk.dictionary("scope")
+                code = scopes.code_of(scope_text)
+                rows = [row for row in rows if scopes.codes[row] == code] if code is not None else []
+            if fact_contains is not None and rows:
+                facts = chunk.strings("fact")
+                rows = [row for row in rows if fact_contains in facts[row]]
+            for row in rows:
+                if limit is not None and returned >= limit:
+                    return
+                returned += 1
+                yield self._record(chunk, row)
+
+    def records(self) -> Iterator[MemoryRecord]:
+        """すべてのメモリ（メモリ名ごとに最新の行）を返す"""
+        return self.query()
@@ -0,0 +1,214 @@
+"""
+複数スコープの retrieve() の並行実行（ユーザーごとのファンアウト）
+
+Step 2 は SCOPE と SCOPE_999 を順番に retrieve() している。夜間バッチのように
+数万ユーザー分のメモリを取得する場合、直列ではレイテンシ × ユーザー数かかる。
+retrieve_many() はスレッドプールで並行に retrieve() し、完了した順に結果を返す。
+
+  for result in retrieve_many(client, AGENT_ENGINE_NAME, scopes, max_concurrency=32):
+      if result.ok:
+          print(result.scope, len(result.memories))
+
+  - 同時実行数は AIMD で調整する: 429 / RESOURCE_EXHAUSTED を受けると半分に減らし、
+    成功が「現在の同時実行数」回続くごとに 1 ずつ戻す（max_concurrency まで）
+  - 429 などの一時的なエラーは指数バックオフ + ジッターで再試行する
+  - scopes はジェネレータでもよい。先読みして投入するのは同時実行数の数倍までで、
+    途中で打ち切る（break する）と未実行の retrieve() は取り消される
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable, Iterator, Mapping, Optional
+
+from memorybank.retry import backoff_delay, is_throttled, is_transient_error
+
+if TYPE_CHECKING:
+    import vertexai
+    from vertexai._genai import types
+
+
+class AdaptiveConcurrency:
+    """AIMD で上限を調整するセマフォ
+
+    Args:
+        maximum: 同時実行数の上限
+        initial: 最初の同時実行数（省略時は maximum）
+        minimum: 減らすときの下限
+    """
+
+    def __init__(self, maximum: int, *, initial: Optional[int] = None, minimum: int = 1) -> None:
+        if not 1 <= minimum <= maximum:
+            raise ValueError("1 <= minimum <= maximum を満たすように指定してください")
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = min(maximum, max(minimum, initial if initial is not None else maximum))
+        self.in_flight = 0
+        self.peak = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+
+    def release(self, *, throttled: bool = False) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit // 2)
+                self._successes = 0
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.maximum:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+
+@dataclass
+class ScopeResult:
+    """1 スコープ分の retrieve() の結果"""
+
+    scope: dict[str, str]
+    memories: list["types.RetrieveMemoriesResponseRetrievedMemory"] = field(default_factory=list)
+    # 再試行し尽くした、または再試行できないエラー（成功時は None）
+    error: Optional[BaseException] = None
+    attempts: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class FanoutStats:
+    """retrieve_many() の計測値"""
+
+    completed: int = 0
+    failed: int = 0
+    throttled: int = 0
+    retries: int = 0
+    peak_concurrency: int = 0
+    final_concurrency: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def scopes_per_second(self) -> float:
+        return self.completed / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.completed} スコープ（失敗 {self.failed}）, {self.elapsed_seconds:.2f}s, "
+            f"{self.scopes_per_second:.1f} スコープ/s, 429 {self.throttled} 回, "
+            f"再試行 {self.retries} 回, 同時実行 最大 {self.peak_concurrency} / 最終 {self.final_concurrency}"
+        )
+
+
+def retrieve_many(
+    client: "vertexai.Client",
+    engine_name: str,
+    scopes: Iterable[Mapping[str, str]],
+    *,
+    max_concurrency: int = 16,
+    initial_concurrency: Optional[int] = None,
+    similarity_search_params: Optional[Mapping[str, object]] = None,
+    config: Optional[Mapping[str, object]] = None,
+    max_attempts: int = 5,
+    base_seconds: float = 0.2,
+    max_seconds: float = 5.0,
+    stats: Optional[FanoutStats] = None,
+) -> Iterator[ScopeResult]:
+    """scopes の各スコープを並行に retrieve() し、完了した順に ScopeResult を返す
+
+    Args:
+        client: vertexai.Client
+        engine_name: Agent Engine のリソース名
+        scopes: 取得するスコープ（完全一致）
+        max_concurrency: 同時に実行する retrieve() の上限（スレッド数）
+        initial_concurrency: 最初の同時実行数（省略時は max_concurrency）
+        similarity_search_params / config: retrieve() にそのまま渡す
+        max_attempts: 一時的なエラーの再試行を含めた最大試行回数
+        base_seconds / max_seconds: 再試行の待ち時間（指数バックオフ + ジッター）
+        stats: 計測値の格納先（省略可）
+
+    Returns:
+        ScopeResult のイテレータ（失敗したスコープも error 付きで返す）
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency は 1 以上を指定してください")
+    stats = stats if stats is not None else FanoutStats()
+    limiter = AdaptiveConcurrency(max_concurrency, initial=initial_concurrency)
+    stats_lock = threading.Lock()
+    memories = client.agent_engines.memories
+
+    def _retrieve(scope: dict[str, str]) -> ScopeResult:
+        result = ScopeResult(scope=scope)
+        started = time.perf_counter()
+        while True:
+            result.attempts += 1
+            limiter.acquire()
+            throttled = False
+            try:
+                pager = memories.retrieve(
+                    name=engine_name,
+                    scope=scope,
+                    similarity_search_params=similarity_search_params,
+                    config=config,
+                )
+                result.memories = list(pager)
+                break
+            except Exception as e:
+                throttled = is_throttled(e)
+                if result.attempts >= max_attempts or not is_transient_error(e):
+                    result.error = e
+                    break
+            finally:
+                limiter.release(throttled=throttled)
+                if throttled:
+                    with stats_lock:
+                        stats.throttled += 1
+            with stats_lock:
+                stats.retries += 1
+            time.sleep(
+                backoff_delay(result.attempts - 1, base_seconds=base_seconds, max_seconds=max_seconds)
+            )
+        result.elapsed_seconds = time.perf_counter() - started
+        return result
+
+    started = time.perf_counter()
+    source = iter(scopes)
+    # 投入済みで未完了の retrieve()（同時実行数の 2 倍まで先に投入しておく）
+    backlog = max_concurrency * 2
+    pending: set[Future[ScopeResult]] = set()
+    pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="retrieve-many")
+    try:
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < backlog:
+                scope = next(source, None)
+                if scope is None:
+                    exhausted = True
+                    break
+                pending.add(pool.submit(_retrieve, dict(scope)))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                stats.completed += 1
+                stats.failed += int(not result.ok)
+                stats.peak_concurrency = limiter.peak
+                stats.final_concurrency = limiter.limit
+                stats.elapsed_seconds = time.perf_counter() - started
+                yield result
+    finally:
+        # 打ち切られた場合は未実行の retrieve() を取り消し、実行中のものは待たない
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,386 @@
+"""
+filter / filter_groups のローカル評価
+
+Step 2 (3) の A-1〜C はすべて同じ SCOPE に対するフィルタだが、
+条件ごとに retrieve() を呼ぶとその回数だけサーバ往復が発生する。
+ここではフィルタを一度だけ述語関数（Memory → bool）にコンパイルし、
+1 回取得したスコープのスナップショットに対してローカルで評価する。
+
+対応する構文（リポジトリ内で使っているもの）:
+
+  filter（システムフィールド、EBNF）
+    fact=~".*PC.*"                              正規表現（部分一致で判定）
+    create_time>="2026-01-01T00:00:00Z"         日時比較（= != < <= > >=）
+    topics.managed_memory_topic: USER_PREFERENCES
+    topics.custom_memory_topic_label: ordering_rules
+    scope.user_id="user_123"
+    labels.data_source="step4_test"             リビジョンラベル（revisions.list() 用）
+    条件は AND / OR / NOT と括弧で組み合わせられる（空白区切りは AND）
+
+  filter_groups（メタデータ、DNF = OR of ANDs）
+    [{"filters": [{"key": "department", "value": {"string_value": "sales"}}]}]
+    op（EQUAL / GREATER_THAN / LESS_THAN）と negate にも対応
+
+⚠️ similarity_search_params（セマンティック検索）はローカルでは評価できない。
+"""
+
+from __future__ import annotations
+
+import datetime
+import functools
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Mapping, Optional, Sequence, Union
+
+if TYPE_CHECKING:
+    import vertexai
+    from vertexai._genai import types
+
+# types.Memory（またはスタブの StubMemory）を受け取る述語
+Predicate = Callable[[object], bool]
+
+Comparable = Union[str, float, bool, datetime.datetime]
+
+
+class FilterSyntaxError(ValueError):
+    """filter 文字列を解析できない"""
+
+
+# ------------------------------------------------------------
+# Memory オブジェクトへのアクセス（SDK の型・辞書・スタブのいずれでも動く）
+# ------------------------------------------------------------
+def _get(obj: object, attr: str) -> object:
+    if isinstance(obj, Mapping):
+        return obj.get(attr)
+    return getattr(obj, attr, None)
+
+
+def enum_text(value: object) -> str:
+    """enum（ManagedTopicEnum.USER_PREFERENCES）を "USER_PREFERENCES" にする"""
+    return str(getattr(value, "value", value))
+
+
+def parse_timestamp(text: str) -> datetime.datetime:
+    """RFC 3339 の文字列（末尾 Z 可）をタイムゾーン付き datetime にする"""
+    parsed = datetime.datetime.fromisoformat(text.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+
+def metadata_value(value: object) -> Optional[Comparable]:
+    """MemoryMetadataValue（string/double/bool/timestamp のいずれか1つ）の中身"""
+    for attr in ("string_value", "double_value", "bool_value", "timestamp_value"):
+        inner = _get(value, attr)
+        if inner is None:
+            continue
+        if attr == "timestamp_value" and isinstance(inner, str):
+            return parse_timestamp(inner)
+        if attr == "double_value":
+            return float(str(inner))
+        if isinstance(inner, (str, bool, datetime.datetime)):
+            return inner
+        return str(inner)
+    return None
+
+
+# ------------------------------------------------------------
+# filter（EBNF）の字句解析・構文解析
+# ------------------------------------------------------------
+_TOKEN_RE = re.compile(
+    r"""
+    \s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*")
+      | (?P<op>>=|<=|!=|=~|!~|=|<|>|:)
+      | (?P<paren>[()])
+      | (?P<word>[^\s()"=<>!:~]+)
+    )
+    """,
+    re.VERBOSE,
+)
+
+_COMPARISON_OPS = {"=", "!=", "<", "<=", ">", ">="}
+_TIME_FIELDS = {"create_time", "update_time"}
+_TOPIC_FIELDS = {"topics.managed_memory_topic", "topics.custom_memory_topic_label"}
+
+
+@dataclass(frozen=True)
+class _Token:
+    kind: str
+    text: str
+
+
+def _tokenize(expr: str) -> list[_Token]:
+    tokens: list[_Token] = []
+    pos = 0
+    expr = expr.rstrip()
+    while pos < len(expr):
+        match = _TOKEN_RE.match(expr, pos)
+        if match is None or match.end() == pos:
+            raise FilterSyntaxError(f"解析できない文字があります（位置 {pos}）: {expr!r}")
+        kind = match.lastgroup or ""
+        text = match.group(kind)
+        if kind == "string":
+            text = re.sub(r"\\(.)", r"\1", text[1:-1])
+        tokens.append(_Token(kind, text))
+        pos = match.end()
+    return tokens
+
+
+def _compare(left: Comparable, op: str, right: Comparable) -> bool:
+    if op == "=":
+        return left == right
+    if op == "!=":
+        return left != right
+    if type(left) is not type(right):
+        return False
+    if op == "<":
+        return left < right  # type: ignore[operator]
+    if op == "<=":
+        return left <= right  # type: ignore[operator]
+    if op == ">":
+        return left > right  # type: ignore[operator]
+    return left >= right  # type: ignore[operator]
+
+
+def _restriction(field: str, op: str, literal: str) -> Predicate:
+    """「フィールド 演算子 値」1 つ分の述語を作る"""
+    if field == "fact":
+        if op in ("=~", "!~"):
+            pattern = re.compile(literal)
+            expected = op == "=~"
+            return lambda m: (pattern.search(str(_get(m, "fact") or "")) is not None) == expected
+        if op in ("=", "!="):
+            return lambda m: _compare(str(_get(m, "fact") or ""), op, literal)
+        if op == ":":
+            return lambda m: literal in str(_get(m, "fact") or "")
+
+    if field in _TIME_FIELDS and op in _COMPARISON_OPS:
+        try:
+            threshold = parse_timestamp(literal)
+        except ValueError as e:
+            raise FilterSyntaxError(f"日時として解釈できません: {literal!r}") from e
+
+        def _time(m: object) -> bool:
+            value = _get(m, field)
+            if isinstance(value, str):
+                value = parse_timestamp(value)
+            return isinstance(value, datetime.datetime) and _compare(value, op, threshold)
+
+        return _time
+
+    if field in _TOPIC_FIELDS and op in (":", "="):
+        attr = field.split(".", 1)[1]
+
+        def _topic(m: object) -> bool:
+            topics = _get(m, "topics")
+            if not isinstance(topics, (list, tuple)):
+                return False
+            return any(
+                _get(t, attr) is not None and enum_text(_get(t, attr)) == literal
+                for t in topics
+            )
+
+        return _topic
+
+    if field.startswith("scope.") and op in ("=", "!="):
+        key = field.split(".", 1)[1]
+
+        def _scope(m: object) -> bool:
+            scope = _get(m, "scope")
+            value = scope.get(key) if isinstance(scope, Mapping) else None
+            return (value == literal) == (op == "=")
+
+        return _scope
+
+    if field.startswith("labels.") and op in ("=", "!="):  # revisions.list() のリビジョンラベル
+        key = field.split(".", 1)[1]
+
+        def _label(m: object) -> bool:
+            labels = _get(m, "labels")
+            value = labels.get(key) if isinstance(labels, Mapping) else None
+            return (value == literal) == (op == "=")
+
+        return _label
+
+    raise FilterSyntaxError(f"未対応の条件です: {field} {op} {literal!r}")
+
+
+class _Parser:
+    """expr := term (OR term)* / term := factor ([AND] factor)* / factor := NOT factor | (expr) | restriction"""
+
+    def __init__(self, tokens: list[_Token], source: str) -> None:
+        self._tokens = tokens
+        self._pos = 0
+        self._source = source
+
+    def parse(self) -> Predicate:
+        predicate = self._expr()
+        if self._peek() is not None:
+            raise FilterSyntaxError(f"余分なトークンがあります: {self._source!r}")
+        return predicate
+
+    def _peek(self) -> Optional[_Token]:
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else None
+
+    def _next(self) -> _Token:
+        token = self._peek()
+        if token is None:
+            raise FilterSyntaxError(f"式が途中で終わっています: {self._source!r}")
+        self._pos += 1
+        return token
+
+    def _is_word(self, word: str) -> bool:
+        token = self._peek()
+        return token is not None and token.kind == "word" and token.text == word
+
+    def _expr(self) -> Predicate:
+        terms = [self._term()]
+        while self._is_word("OR"):
+            self._next()
+            terms.append(self._term())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda m: any(t(m) for t in terms)
+
+    def _term(self) -> Predicate:
+        factors = [self._factor()]
+        while True:
+            token = self._peek()
+            if token is None or (token.kind == "paren" and token.text == ")") or self._is_word("OR"):
+                break
+            if self._is_word("AND"):
+                self._next()
+            factors.append(self._factor())
+        if len(factors) == 1:
+            return factors[0]
+        return lambda m: all(f(m) for f in factors)
+
+    def _factor(self) -> Predicate:
+        if self._is_word("NOT"):
+            self._next()
+            inner = self._factor()
+            return lambda m: not inner(m)
+        token = self._next()
+        if token.kind == "paren" and token.text == "(":
+            inner = self._expr()
+            closing = self._next()
+            if closing.kind != "paren" or closing.text != ")":
+                raise FilterSyntaxError(f"括弧が閉じていません: {self._source!r}")
+            return inner
+        if token.kind != "word":
+            raise FilterSyntaxError(f"フィールド名が必要です: {token.text!r}")
+        op = self._next()
+        if op.kind != "op":
+            raise FilterSyntaxError(f"演算子が必要です: {token.text} {op.text!r}")
+        literal = self._next()
+        if literal.kind not in ("string", "word"):
+            raise FilterSyntaxError(f"値が必要です: {token.text}{op.text}")
+        return _restriction(token.text, op.text, literal.text)
+
+
+@functools.lru_cache(maxsize=256)
+def compile_filter(expr: str) -> Predicate:
+    """filter 文字列を述語にコンパイルする（同じ文字列は再利用される）"""
+    if not expr.strip():
+        return lambda m: True
+    return _Parser(_tokenize(expr), expr).parse()
+
+
+# ------------------------------------------------------------
+# filter_groups（DNF）
+# ------------------------------------------------------------
+def _metadata_filter(spec: object) -> Predicate:
+    key = str(_get(spec, "key") or "")
+    expected = metadata_value(_get(spec, "value"))
+    if not key or expected is None:
+        raise FilterSyntaxError(f"filter_groups の条件には key と value が必要です: {spec!r}")
+    op = enum_text(_get(spec, "op") or "EQUAL")
+    negate = bool(_get(spec, "negate"))
+    symbol = {"EQUAL": "=", "OPERATOR_UNSPECIFIED": "=", "GREATER_THAN": ">", "LESS_THAN": "<"}.get(op)
+    if symbol is None:
+        raise FilterSyntaxError(f"未対応の op です: {op}")
+
+    def _match(m: object) -> bool:
+        metadata = _get(m, "metadata")
+        raw = metadata.get(key) if isinstance(metadata, Mapping) else None
+        actual = metadata_value(raw) if raw is not None else None
+        hit = actual is not None and _compare(actual, symbol, expected)
+        return hit != negate
+
+    return _match
+
+
+def compile_filter_groups(groups: Optional[Sequence[object]]) -> Predicate:
+    """filter_groups（OR of ANDs）を述語にコンパイルする"""
+    if not groups:
+        return lambda m: True
+    conjunctions: list[list[Predicate]] = []
+    for group in groups:
+        filters = _get(group, "filters") or []
+        if not isinstance(filters, (list, tuple)):
+            raise FilterSyntaxError(f"filters はリストで指定してください: {group!r}")
+        conjunctions.append([_metadata_filter(f) for f in filters])
+    return lambda m: any(all(p(m) for p in conj) for conj in conjunctions)
+
+
+def compile_config(config: Optional[Mapping[str, object]]) -> Predicate:
+    """retrieve() の config（filter + filter_groups）を 1 つの述語にまとめる（両方を AND）"""
+    config = config or {}
+    system = compile_filter(str(config.get("filter") or ""))
+    groups = config.get("filter_groups")
+    metadata = compile_filter_groups(groups if isinstance(groups, (list, tuple)) else None)
+    return lambda m: system(m) and metadata(m)
+
+
+def quote(value: str) -> str:
+    """filter 文字列のリテラルとして埋め込めるよう、ダブルクォートで囲んでエスケープする"""
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def scope_filter(scope: Mapping[str, str]) -> str:
+    """スコープの各キーを AND でつないだ filter 文字列（purge() / list() 用）
+
+    ⚠️ retrieve() と違い完全一致ではない。指定したキー以外を持つスコープにも合致する。
+    """
+    if not scope:
+        raise ValueError("scope を指定してください")
+    return " AND ".join(f"scope.{key}={quote(value)}" for key, value in sorted(scope.items()))
+
+
+# ------------------------------------------------------------
+# スナップショットに対する評価
+# ------------------------------------------------------------
+class ScopeSnapshot:
+    """1 回の retrieve() で取得したスコープ全体に対して、フィルタをローカル評価する
+
+      snapshot = ScopeSnapshot.fetch(client, AGENT_ENGINE_NAME, SCOPE)  # RPC 1 回
+      snapshot.filter({"filter": 'fact=~".*PC.*"'})                    # RPC なし
+    """
+
+    def __init__(
+        self,
+        items: Sequence["types.RetrieveMemoriesResponseRetrievedMemory"],
+    ) -> None:
+        self.items = list(items)
+
+    @classmethod
+    def fetch(
+        cls,
+        client: "vertexai.Client",
+        engine_name: str,
+        scope: dict[str, str],
+    ) -> "ScopeSnapshot":
+        return cls(list(client.agent_engines.memories.retrieve(name=engine_name, scope=scope)))
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def filter(
+        self,
+        config: Optional[Mapping[str, object]] = None,
+    ) -> list["types.RetrieveMemoriesResponseRetrievedMemory"]:
+        """retrieve() の config と同じ形式の条件で絞り込む"""
+        predicate = compile_config(config)
+        return [item for item in self.items if predicate(item.memory)]
@@ -0,0 +1,304 @@
+"""
+generate() の前の関連性ゲート: メモリにならない雑談のターンでは generate() を呼ばない
+
+Step 1a のコメントのとおり「お疲れ様です」のような挨拶はどのトピックにも該当せず記憶されないが、
+それを知るために generate()（LLM による抽出・統合の往復）を 1 回払っている。ここでは
+step0_setup.py で設定したメモリトピック（マネージド 4 つ + ordering_rules）をもとに、
+イベントからメモリが作られうるかをローカル（オフライン）で判定する。
+
+  gate = RelevanceGate()                       # 既定は topics.MEMORY_TOPICS（step0_setup.py で設定）
+  decision = gate.decide(events)               # direct_contents_source の events と同じ形
+  if decision.generate:
+      client.agent_engines.memories.generate(..., direct_contents_source={"events": events})
+  print(gate.stats.summary())
+
+判定の順序（最初に当てはまったもので決まる）:
+  1. user の画像などの添付がある                   → generate（attachment、テキストでは判定しない）
+     user のテキストがない                         → 省略（no_user_text）
+  2. user のテキストがトピックのキーワードに一致     → generate（topic）
+  3. model の質問（トピックに一致）への「はい」など → generate（confirmation）
+  4. 挨拶・相づちを除くとほとんど何も残らない       → 省略（chit_chat）
+  5. model を指定していれば、その確率が threshold 以上 → generate / 省略（model）
+  6. それ以外                                       → generate（uncertain、迷ったら送る）
+
+  - マネージドトピックは組み込みのキーワード、カスタムトピックは description の語句を使う
+    （RelevanceGate(memory_topics) に Agent Engine の memory_topics を渡すと、その設定で判定する）
+  - model は「テキストのリスト → メモリになる確率」の呼び出し可能オブジェクト。
+    軽量なモデルとして文字 bigram のナイーブベイズ（CharNgramModel）を用意している
+"""
+
+from __future__ import annotations
+
+import collections
+import math
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Iterable, Mapping, Optional, Protocol, Sequence
+
+from memorybank.filters import enum_text
+from memorybank.ingest import Message
+from memorybank.topics import MEMORY_TOPICS
+
+# マネージドトピックのキーワード（正規表現。NFKC 正規化・小文字化したテキストに使う）
+MANAGED_TOPIC_PATTERNS: dict[str, tuple[str, ...]] = {
+    "USER_PERSONAL_INFO": (
+        r"(私|僕|俺|わたし|自分)(は|の名前|の部署|の担当)", r"名前は", r"と申します",
+        r"部署|所属|担当(して|は|です)|異動|入社|誕生日|住所|出身|家族|子供|アレルギー",
+    ),
+    "USER_PREFERENCES": (
+        r"好き|嫌い|苦手|好み|気に入|いつも(通り|の)|の方がいい|がいい|が良い|希望|できれば|なるべく|避けて",
+    ),
+    "KEY_CONVERSATION_DETAILS": (
+        r"発注(して|する|した|を|お願い|済)|注文|頼んで|納品|納期|届け|配送|見積",
+        r"\d+\s*(枚|個|台|箱|本|冊|セット|ケース|kg|円|万円|部|脚|件)",
+        r"[a-zａ-ｚ]社|(来週|来月|明日|明後日|月末|今月)(から|まで|に|は)|変更",
+    ),
+    "EXPLICIT_INSTRUCTIONS": (
+        r"覚えて|忘れて|記憶して|メモして|(今後|次回|これから|以後)(から)?は|次から|必ず|しないで",
+    ),
+}
+
+# 挨拶・相づち（これらを取り除いて残りがほとんどなければ雑談とみなす）
+CHIT_CHAT_PATTERNS: tuple[str, ...] = (
+    r"お疲れ(様|さま)(です|でした)?", r"おはよう(ございます)?", r"こんにち[はわ]", r"こんばん[はわ]",
+    r"ありがと(うございます|うございました|う)?", r"(どうも)?すみません", r"よろしく(お願い(いたします|します)?)?",
+    r"了解(です|しました)?", r"承知(いたしました|しました)?", r"わかりました", r"なるほど", r"いいですね",
+    r"助かります", r"大丈夫です", r"失礼します", r"今日[はも]", r"ですね", r"ですよね",
+    r"はい", r"うん", r"ok", r"おけ", r"(それ)?では(また|失礼します)", r"また(明日|来週|あとで|後で)",
+)
+
+# model の質問に対する肯定（model 側がトピックに一致していれば generate する）
+CONFIRMATION_PATTERN = r"^(はい|ええ|うん|お願いします|それで(お願い|いい|大丈夫)|そうです|その通り|ok)"
+
+# 語句を取り出すときの区切り（custom_memory_topic の description 用）
+_DESCRIPTION_SEPARATORS = re.compile(r"[、。・,.\s]|など|に関する|の|や")
+# 「発注に関するルール」の「発注」のような分野名（雑談にも出るためキーワードにしない）
+_DESCRIPTION_DOMAIN = re.compile(r"([^、。・,.\s]+?)に関する")
+_IGNORABLE = re.compile(r"[\s\W_]+")
+
+
+def normalize_text(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def description_keywords(description: str, *, min_chars: int = 2, max_chars: int = 10) -> tuple[str, ...]:
+    """custom_memory_topic の description からキーワード（語句）を取り出す"""
+    description = normalize_text(description)
+    domains = {_DESCRIPTION_SEPARATORS.split(m)[-1] for m in _DESCRIPTION_DOMAIN.findall(description)}
+    words = (w.strip() for w in _DESCRIPTION_SEPARATORS.split(description))
+    return tuple(dict.fromkeys(w for w in words if min_chars <= len(w) <= max_chars and w not in domains))
+
+
+@dataclass(frozen=True)
+class TopicRule:
+    """1 つのメモリトピックのキーワード（正規表現）"""
+
+    topic: str
+    patterns: tuple[str, ...]
+
+
+def topic_rules(memory_topics: Iterable[object] = MEMORY_TOPICS) -> list[TopicRule]:
+    """memory_topics（step0_setup.py の customization_configs と同じ形、または SDK の型）からルールを作る"""
+    rules: list[TopicRule] = []
+    for topic in memory_topics:
+        managed = _field(topic, "managed_memory_topic")
+        if managed is not None:
+            label = enum_text(_field(managed, "managed_topic_enum"))
+            if label in MANAGED_TOPIC_PATTERNS:
+                rules.append(TopicRule(label, MANAGED_TOPIC_PATTERNS[label]))
+            continue
+        custom = _field(topic, "custom_memory_topic")
+        if custom is None:
+            continue
+        keywords = description_keywords(str(_field(custom, "description") or ""))
+        if keywords:
+            pattern = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+            rules.append(TopicRule(str(_field(custom, "label")), (pattern,)))
+    return rules
+
+
+def _field(value: object, name: str) -> object:
+    if isinstance(value, Mapping):
+        return value.get(name)
+    return getattr(value, name, None)
+
+
+class RelevanceModel(Protocol):
+    """テキスト（user の発話）のリストからメモリになる確率（0〜1）を返すモデル"""
+
+    def __call__(self, texts: Sequence[str]) -> float: ...
+
+
+class CharNgramModel:
+    """文字 n-gram の多項ナイーブベイズ（ラベル付きの例から fit() する軽量なモデル）"""
+
+    def __init__(self, n: int = 2, alpha: float = 1.0) -> None:
+        self.n = n
+        self.alpha = alpha
+        self._counts: dict[bool, collections.Counter[str]] = {True: collections.Counter(), False: collections.Counter()}
+        self._totals = {True: 0, False: 0}
+        self._docs = {True: 0, False: 0}
+        self._vocabulary: set[str] = set()
+
+    def _grams(self, text: str) -> list[str]:
+        text = normalize_text(text)
+        return [text[i : i + self.n] for i in range(max(len(text) - self.n + 1, 1))]
+
+    def fit(self, examples: Iterable[tuple[str, bool]]) -> "CharNgramModel":
+        """(テキスト, メモリになるか) の例を学習する（追加で呼ぶと学習を足す）"""
+        for text, label in examples:
+            grams = self._grams(text)
+            self._counts[label].update(grams)
+            self._totals[label] += len(grams)
+            self._docs[label] += 1
+            self._vocabulary.update(grams)
+        return self
+
+    def __call__(self, texts: Sequence[str]) -> float:
+        if not self._docs[True] or not self._docs[False]:
+            return 0.5
+        grams = [g for text in texts for g in self._grams(text)]
+        vocabulary = len(self._vocabulary) + 1
+        log_odds = math.log(self._docs[True] / self._docs[False])
+        for gram in grams:
+            log_odds += math.log(
+                (self._counts[True][gram] + self.alpha) / (self._totals[True] + self.alpha * vocabulary)
+            ) - math.log(
+                (self._counts[False][gram] + self.alpha) / (self._totals[False] + self.alpha * vocabulary)
+            )
+        return 1.0 / (1.0 + math.exp(-max(min(log_odds, 50.0), -50.0)))
+
+
+# GateDecision.reason
+REASON_ATTACHMENT = "attachment"
+REASON_NO_USER_TEXT = "no_user_text"
+REASON_TOPIC = "topic"
+REASON_CONFIRMATION = "confirmation"
+REASON_CHIT_CHAT = "chit_chat"
+REASON_MODEL = "model"
+REASON_UNCERTAIN = "uncertain"
+
+
+@dataclass(frozen=True)
+class GateDecision:
+    """decide() の結果"""
+
+    generate: bool
+    reason: str
+    # 一致したトピック（reason が topic / confirmation のとき）
+    topics: tuple[str, ...] = ()
+    # model の確率（reason が model のとき）
+    score: Optional[float] = None
+
+
+@dataclass
+class GateStats:
+    """RelevanceGate の集計"""
+
+    checked: int = 0
+    skipped: int = 0
+    reasons: collections.Counter[str] = field(default_factory=collections.Counter)
+
+    def summary(self) -> str:
+        rate = self.skipped / self.checked * 100 if self.checked else 0.0
+        reasons = ", ".join(f"{reason}×{n}" for reason, n in self.reasons.most_common())
+        return f"判定 {self.checked} 件, generate() を省略 {self.skipped} 件（{rate:.0f}%）, 理由: {reasons or 'なし'}"
+
+
+class RelevanceGate:
+    """イベントからメモリが作られうるかをローカルで判定する（スレッドセーフ）
+
+    Args:
+        memory_topics: 判定に使うトピック（省略時は step0_setup.py で設定する topics.MEMORY_TOPICS）
+        model: ルールで決まらないときに使うモデル（省略時は generate する）
+        threshold: model の確率がこの値以上なら generate する
+        max_residual_chars: 挨拶・相づちを除いた残りがこの文字数以下なら雑談とみなす
+    """
+
+    def __init__(
+        self,
+        memory_topics: Iterable[object] = MEMORY_TOPICS,
+        *,
+        model: Optional[RelevanceModel] = None,
+        threshold: float = 0.5,
+        max_residual_chars: int = 3,
+    ) -> None:
+        self.rules = topic_rules(memory_topics)
+        self.model = model
+        self.threshold = threshold
+        self.max_residual_chars = max_residual_chars
+        self.stats = GateStats()
+        self._topic_patterns = [(rule.topic, re.compile("|".join(rule.patterns))) for rule in self.rules]
+        self._chit_chat = re.compile("|".join(CHIT_CHAT_PATTERNS))
+        self._confirmation = re.compile(CONFIRMATION_PATTERN)
+        self._lock = threading.Lock()
+
+    def topics(self, text: str) -> tuple[str, ...]:
+        """text が一致するトピック"""
+        normalized = normalize_text(text)
+        return tuple(topic for topic, pattern in self._topic_patterns if pattern.search(normalized))
+
+    def is_chit_chat(self, text: str) -> bool:
+        residual = _IGNORABLE.sub("", self._chit_chat.sub("", normalize_text(text)))
+        return len(residual) <= self.max_residual_chars
+
+    def decide(self, events: Sequence[Mapping[str, object]]) -> GateDecision:
+        """events（direct_contents_source の events と同じ形）を判定する"""
+        return self._decide(_event_messages(events))
+
+    def decide_messages(self, conversation: Sequence[Message]) -> GateDecision:
+        """会話リスト（append_events() と同じ {"role", "text"} のリスト）を判定する"""
+        return self._decide([(m["role"], m["text"]) for m in conversation])
+
+    def _decide(self, messages: Sequence[tuple[str, Optional[str]]]) -> GateDecision:
+        decision = self._classify(messages)
+        with self._lock:
+            self.stats.checked += 1
+            self.stats.skipped += int(not decision.generate)
+            self.stats.reasons[decision.reason] += 1
+        return decision
+
+    def _classify(self, messages: Sequence[tuple[str, Optional[str]]]) -> GateDecision:
+        if any(role == "user" and text is None for role, text in messages):
+            return GateDecision(True, REASON_ATTACHMENT)
+        texts = [text for role, text in messages if role == "user" and text and text.strip()]
+        if not texts:
+            return GateDecision(False, REASON_NO_USER_TEXT)
+        matched = tuple(dict.fromkeys(topic for text in texts for topic in self.topics(text)))
+        if matched:
+            return GateDecision(True, REASON_TOPIC, matched)
+        # 直前の model の質問（トピックに一致）への肯定
+        last_model: Optional[str] = None
+        for role, text in messages:
+            if text is None:
+                continue
+            if role != "user":
+                last_model = text
+            elif last_model is not None and self._confirmation.match(normalize_text(text).strip()):
+                asked = self.topics(last_model)
+                if asked:
+                    return GateDecision(True, REASON_CONFIRMATION, asked)
+        if all(self.is_chit_chat(text) for text in texts):
+            return GateDecision(False, REASON_CHIT_CHAT)
+        if self.model is not None:
+            score = self.model(texts)
+            return GateDecision(score >= self.threshold, REASON_MODEL, score=score)
+        return GateDecision(True, REASON_UNCERTAIN)
+
+
+def _event_messages(events: Sequence[Mapping[str, object]]) -> list[tuple[str, Optional[str]]]:
+    """events を (role, テキスト) のリストにする（テキストのないパート = 添付は None）"""
+    messages: list[tuple[str, Optional[str]]] = []
+    for event in events:
+        content = event.get("content")
+        if not isinstance(content, Mapping):
+            continue
+        role = str(content.get("role") or "user")
+        for part in content.get("parts") or []:  # type: ignore[attr-defined]
+            if isinstance(part, Mapping) and isinstance(part.get("text"), str):
+                messages.append((role, part["text"]))
+            elif isinstance(part, Mapping):
+                messages.append((role, None))
+    return messages
@@ -0,0 +1,151 @@
+"""
+generate() 結果のハイドレーション（N+1 get() の解消）
+
+generate() の operation.response.generated_memories には memory.name しか
+入っていないため、各ステップでは 1 件ずつ memories.get() して fact を表示していた。
+ここでは生成されたメモリ名を重複排除し、まとめて並行に get() して
+型付きの GenerateResult として返す。
+
+  - DELETED のメモリは既に削除済みのため get() しない（Step 1b と同じ扱い）
+  - 同じ name が複数回現れても get() は 1 回だけ
+  - get() に失敗したメモリは error に例外を入れて返す（全体は止めない）
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterator, Optional
+
+if TYPE_CHECKING:
+    import vertexai
+    from vertexai._genai import types
+
+ACTION_CREATED = "CREATED"
+ACTION_UPDATED = "UPDATED"
+ACTION_DELETED = "DELETED"
+
+
+def action_name(action: object) -> str:
+    """SDK の enum（GenerateMemoriesResponseGeneratedMemoryAction.CREATED）を "CREATED" にする"""
+    return str(action).split(".")[-1]
+
+
+@dataclass(frozen=True)
+class HydratedMemory:
+    """generate() で生成・更新・削除された 1 件分のメモリ"""
+
+    action: str
+    name: str
+    # DELETED または get() 失敗時は None
+    memory: Optional["types.Memory"] = None
+    previous_revision: Optional[str] = None
+    error: Optional[BaseException] = None
+
+    @property
+    def fact(self) -> Optional[str]:
+        return self.memory.fact if self.memory is not None else None
+
+
+@dataclass
+class GenerateResult:
+    """hydrate_generated() の結果"""
+
+    done: bool
+    entries: list[HydratedMemory] = field(default_factory=list)
+    # 実際に発行した get() の回数
+    fetched: int = 0
+
+    def __iter__(self) -> Iterator[HydratedMemory]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def by_action(self, action: str) -> list[HydratedMemory]:
+        return [e for e in self.entries if e.action == action]
+
+    @property
+    def created(self) -> list[HydratedMemory]:
+        return self.by_action(ACTION_CREATED)
+
+    @property
+    def updated(self) -> list[HydratedMemory]:
+        return self.by_action(ACTION_UPDATED)
+
+    @property
+    def deleted(self) -> list[HydratedMemory]:
+        return self.by_action(ACTION_DELETED)
+
+    @property
+    def errors(self) -> list[HydratedMemory]:
+        return [e for e in self.entries if e.error is not None]
+
+
+def fetch_memories(
+    client: "vertexai.Client",
+    names: list[str],
+    *,
+    max_workers: int = 8,
+) -> dict[str, "types.Memory | BaseException"]:
+    """複数のメモリを並行に get() する（重複は 1 回にまとめる）
+
+    Returns:
+        name → Memory（失敗した場合は例外）の辞書
+    """
+    unique_names = list(dict.fromkeys(names))
+    if not unique_names:
+        return {}
+
+    def _get(name: str) -> "types.Memory | BaseException":
+        try:
+            return client.agent_engines.memories.get(name=name)
+        except Exception as e:  # 1 件の失敗で全体を止めない
+            return e
+
+    workers = min(max_workers, len(unique_names))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(unique_names, executor.map(_get, unique_names)))
+
+
+def hydrate_generated(
+    client: "vertexai.Client",
+    operation: "types.AgentEngineGenerateMemoriesOperation",
+    *,
+    max_workers: int = 8,
+) -> GenerateResult:
+    """generate() の operation から、生成されたメモリ本体をまとめて取得する
+
+    Args:
+        client: vertexai.Client
+        operation: memories.generate() の戻り値
+        max_workers: 同時に実行する get() の上限
+    """
+    result = GenerateResult(done=bool(operation.done))
+    if operation.response is None:
+        return result
+
+    generated = operation.response.generated_memories or []
+    targets = [
+        gm.memory.name
+        for gm in generated
+        if gm.memory is not None and action_name(gm.action) != ACTION_DELETED
+    ]
+    fetched = fetch_memories(client, targets, max_workers=max_workers)
+    result.fetched = len(fetched)
+
+    for gm in generated:
+        if gm.memory is None:
+            continue
+        action = action_name(gm.action)
+        value = fetched.get(gm.memory.name)
+        result.entries.append(
+            HydratedMemory(
+                action=action,
+                name=gm.memory.name,
+                memory=None if isinstance(value, BaseException) else value,
+                previous_revision=gm.previous_revision,
+                error=value if isinstance(value, BaseException) else None,
+            )
+        )
+    return result
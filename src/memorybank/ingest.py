@@ -0,0 +1,169 @@
+"""
+Sessions へのイベント一括追加（バッチ取り込み）
+
+会話履歴を 1 件ずつ sessions.events.append() すると、
+ターン数ぶんの RPC が直列に並びレイテンシが積み上がる（50〜200 ターンで顕著）。
+ここでは会話リスト全体を受け取り、上限付きの並行ウィンドウで append() を
+パイプライン化する。
+
+  - invocation_id は Step 1a と同じく「2メッセージで1ターン」で採番する
+  - timestamp は送信前に単調増加で確定させるため、サーバへの到着順が
+    前後してもセッション内の並びは会話リストの順になる
+  - 完了通知（on_commit）は会話リストの順に呼ばれる（ordered commit）
+  - 失敗したイベントは例外を握りつぶさず AppendFailure として返す
+"""
+
+from __future__ import annotations
+
+import collections
+import datetime
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Optional
+
+if TYPE_CHECKING:
+    import vertexai
+
+# 会話メッセージ: {"role": "user" | "model", "text": "..."}
+Message = dict[str, str]
+
+# 2メッセージ（user + model）で1ターン
+MESSAGES_PER_TURN = 2
+
+
+@dataclass(frozen=True)
+class AppendFailure:
+    """追加に失敗したイベント"""
+
+    index: int
+    message: Message
+    error: BaseException
+
+
+@dataclass
+class AppendResult:
+    """append_events() の結果"""
+
+    total: int
+    # 先頭から途切れずに成功した件数（セッション内で順序が保証される範囲）
+    committed: int = 0
+    failures: list[AppendFailure] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def succeeded(self) -> int:
+        return self.total - len(self.failures)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+    @property
+    def events_per_second(self) -> float:
+        if self.elapsed_seconds <= 0:
+            return 0.0
+        return self.succeeded / self.elapsed_seconds
+
+    def raise_for_failures(self) -> None:
+        """失敗したイベントがあれば最初の例外を送出する（従来のループと同じ挙動）"""
+        if self.failures:
+            first = self.failures[0]
+            raise RuntimeError(
+                f"{len(self.failures)} 件のイベント追加に失敗しました"
+                f"（最初の失敗: index={first.index}）"
+            ) from first.error
+
+
+def invocation_id_for(index: int) -> str:
+    """会話リスト内の位置から invocation_id を求める（2メッセージで1ターン）"""
+    return str((index // MESSAGES_PER_TURN) + 1)
+
+
+def build_event_config(message: Message) -> dict[str, dict[str, object]]:
+    """会話メッセージを events.append() の config に変換する"""
+    return {
+        "content": {
+            "role": message["role"],
+            "parts": [{"text": message["text"]}],
+        }
+    }
+
+
+def append_events(
+    client: "vertexai.Client",
+    session_name: str,
+    conversation: list[Message],
+    *,
+    max_in_flight: int = 8,
+    fail_fast: bool = False,
+    on_commit: Optional[Callable[[int, Message], None]] = None,
+) -> AppendResult:
+    """会話リスト全体をセッションに追加する
+
+    Args:
+        client: vertexai.Client（agent_engines.sessions.events.append を持つもの）
+        session_name: 追加先のセッションのリソース名
+        conversation: 会話メッセージのリスト
+        max_in_flight: 同時に実行する append() の上限（1 なら従来の直列ループと同じ）
+        fail_fast: True の場合、失敗を検知した時点で以降のイベントを送信しない
+        on_commit: 成功したイベントごとに会話リストの順で呼ばれるコールバック
+    """
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight は 1 以上を指定してください")
+
+    result = AppendResult(total=len(conversation))
+    base_time = datetime.datetime.now(tz=datetime.timezone.utc)
+    started = time.perf_counter()
+
+    def _append(index: int, message: Message) -> None:
+        client.agent_engines.sessions.events.append(
+            name=session_name,
+            author="user",  # Sessions API の要件
+            invocation_id=invocation_id_for(index),
+            # 1µs ずつずらして会話リストの順序を timestamp で固定する
+            timestamp=base_time + datetime.timedelta(microseconds=index),
+            config=build_event_config(message),
+        )
+
+    window: collections.deque[tuple[int, Message, Future[None]]] = collections.deque()
+    in_order = True
+    submitted = 0
+
+    def _commit_head() -> None:
+        nonlocal in_order
+        index, message, future = window.popleft()
+        error = future.exception()
+        if error is not None:
+            in_order = False
+            result.failures.append(AppendFailure(index, message, error))
+            return
+        if in_order:
+            result.committed += 1
+        if on_commit is not None:
+            on_commit(index, message)
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for index, message in enumerate(conversation):
+            if fail_fast and result.failures:
+                break
+            # ウィンドウが埋まっていたら先頭（最も古いイベント）の完了を待つ
+            while len(window) >= max_in_flight:
+                _commit_head()
+            window.append((index, message, executor.submit(_append, index, message)))
+            submitted += 1
+        while window:
+            _commit_head()
+
+    # fail_fast で送信しなかったイベントも失敗として報告する
+    for index in range(submitted, len(conversation)):
+        result.failures.append(
+            AppendFailure(
+                index,
+                conversation[index],
+                RuntimeError("先行するイベントの失敗により送信を中止しました"),
+            )
+        )
+
+    result.elapsed_seconds = time.perf_counter() - started
+    return result
@@ -0,0 +1,237 @@
+"""
+RPC ごとのレイテンシ計測（client.agent_engines の memories / revisions / sessions）
+
+遅いターンの原因が generate() なのか、その後の memories.get() なのか、retrieve() なのかを
+切り分けるため、メソッドごとに次の値を記録する。
+
+  - レイテンシのヒストグラム（p50 / p95 / p99）
+  - リクエストの大きさ（引数に含まれる文字列・バイト列の合計）
+  - 結果の件数（リスト・ページャの 1 ページ目・generate() の生成件数）
+  - エラーコード別の件数（429 / 503 / 例外クラス名）
+
+  client = instrumented(get_client())
+  ...
+  print(client.metrics.summary())           # プロセス内で参照
+  print(client.metrics.prometheus())        # Prometheus のテキスト形式
+
+環境変数 MEMORYBANK_INSTRUMENT=1 を設定すると connection.get_client() がこのラッパーを使い、
+プロセス終了時に集計を標準エラーへ出力する（MEMORYBANK_METRICS_FILE を指定すると
+Prometheus 形式でファイルにも書く）。無効の場合はラッパー自体を挟まないため、オーバーヘッドはない。
+
+retrieve() / list() のページャが 2 ページ目以降を取得する呼び出しは計測対象外。
+"""
+
+from __future__ import annotations
+
+import collections
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Mapping, Optional, TextIO
+
+from memorybank.metrics import Histogram
+
+if TYPE_CHECKING:
+    import vertexai
+
+# 属性アクセスをたどる名前空間（client.agent_engines.memories.revisions など）
+_NAMESPACES = frozenset({"memories", "sessions", "events", "revisions"})
+
+
+def _payload_bytes(value: object, depth: int = 0) -> int:
+    """引数に含まれる文字列（UTF-8）・バイト列の合計バイト数（JSON 化はしない概算）"""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if value is None or depth > 8:
+        return 0
+    # dict を先に判定する（Mapping の isinstance は抽象基底クラスの判定で遅い）
+    if isinstance(value, (dict, Mapping)):
+        return sum(_payload_bytes(k, depth + 1) + _payload_bytes(v, depth + 1) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_payload_bytes(v, depth + 1) for v in value)
+    return 0
+
+
+def _result_items(result: object) -> Optional[int]:
+    """結果の件数（数えられない結果は None）"""
+    if isinstance(result, list):
+        return len(result)
+    page = getattr(result, "page", None)  # ページャ（1 ページ目だけを数える）
+    if isinstance(page, list):
+        return len(page)
+    response = getattr(result, "response", None)
+    generated = getattr(response, "generated_memories", None)
+    if isinstance(generated, list):
+        return len(generated)
+    return None
+
+
+def _error_code(error: BaseException) -> str:
+    code = getattr(error, "code", None)
+    return str(code) if code is not None else type(error).__name__
+
+
+@dataclass
+class MethodMetrics:
+    latency: Histogram = field(default_factory=Histogram)
+    calls: int = 0
+    request_bytes: int = 0
+    result_items: int = 0
+    errors: collections.Counter[str] = field(default_factory=collections.Counter)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RpcMetrics:
+    """メソッドごとの計測値（スレッドセーフ）"""
+
+    def __init__(self) -> None:
+        self.methods: dict[str, MethodMetrics] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        method: str,
+        seconds: float,
+        *,
+        request_bytes: int = 0,
+        result_items: Optional[int] = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        metrics = self.methods.get(method)
+        if metrics is None:
+            with self._lock:
+                metrics = self.methods.setdefault(method, MethodMetrics())
+        metrics.latency.observe(seconds)
+        with self._lock:
+            metrics.calls += 1
+            metrics.request_bytes += request_bytes
+            if result_items is not None:
+                metrics.result_items += result_items
+            if error is not None:
+                metrics.errors[_error_code(error)] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self.methods.clear()
+
+    def summary(self) -> str:
+        """メソッドごとの 1 行サマリ（呼び出し回数の多い順）"""
+        if not self.methods:
+            return "（RPC なし）"
+        lines = []
+        for method, m in sorted(self.methods.items(), key=lambda item: -item[1].calls):
+            errors = ", ".join(f"{code}×{n}" for code, n in m.errors.most_common())
+            lines.append(
+                f"{method}: {m.latency.snapshot().summary()}, "
+                f"送信 {m.request_bytes:,} bytes, 結果 {m.result_items} 件"
+                + (f", エラー {errors}" if errors else "")
+            )
+        return "\n".join(lines)
+
+    def prometheus(self, prefix: str = "memorybank_rpc") -> str:
+        """Prometheus のテキスト形式（exposition format 0.0.4）"""
+        with self._lock:
+            methods = sorted(self.methods.items())
+        lines = [
+            f"# HELP {prefix}_latency_seconds Memory Bank RPC latency.",
+            f"# TYPE {prefix}_latency_seconds histogram",
+        ]
+        for method, m in methods:
+            label = f'method="{_label(method)}"'
+            for bound, count in m.latency.cumulative():
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{prefix}_latency_seconds_bucket{{{label},le="{le}"}} {count}')
+            lines.append(f"{prefix}_latency_seconds_sum{{{label}}} {m.latency.total}")
+            lines.append(f"{prefix}_latency_seconds_count{{{label}}} {m.latency.count}")
+        for name, help_text, attr in (
+            ("calls_total", "Memory Bank RPC calls.", "calls"),
+            ("request_bytes_total", "Approximate request payload bytes.", "request_bytes"),
+            ("result_items_total", "Items returned (first page for pagers).", "result_items"),
+        ):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for method, m in methods:
+                lines.append(f'{prefix}_{name}{{method="{_label(method)}"}} {getattr(m, attr)}')
+        lines.append(f"# HELP {prefix}_errors_total Memory Bank RPC errors by code.")
+        lines.append(f"# TYPE {prefix}_errors_total counter")
+        for method, m in methods:
+            for code, count in sorted(m.errors.items()):
+                lines.append(
+                    f'{prefix}_errors_total{{method="{_label(method)}",code="{_label(code)}"}} {count}'
+                )
+        return "\n".join(lines) + "\n"
+
+
+# get_client() が使う、プロセス全体で共有する計測値
+METRICS = RpcMetrics()
+
+
+class _InstrumentedNamespace:
+    """client.agent_engines（とその下の memories / sessions など）の代理オブジェクト"""
+
+    def __init__(self, target: object, metrics: RpcMetrics, path: str = "") -> None:
+        self._target = target
+        self._metrics = metrics
+        self._path = path
+
+    def __getattr__(self, attr: str) -> object:
+        value = getattr(self._target, attr)
+        path = f"{self._path}.{attr}" if self._path else attr
+        if attr in _NAMESPACES:
+            namespace = _InstrumentedNamespace(value, self._metrics, path)
+            self.__dict__[attr] = namespace  # 2 回目以降は __getattr__ を通らない
+            return namespace
+        if not self._path or attr.startswith("__") or not callable(value):
+            return value
+        method = value
+        metrics = self._metrics
+
+        def _call(*args: object, **kwargs: object) -> object:
+            size = _payload_bytes(kwargs) + (_payload_bytes(args) if args else 0)
+            started = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            except BaseException as e:
+                metrics.record(path, time.perf_counter() - started, request_bytes=size, error=e)
+                raise
+            metrics.record(
+                path, time.perf_counter() - started,
+                request_bytes=size, result_items=_result_items(result),
+            )
+            return result
+
+        self.__dict__[attr] = _call
+        return _call
+
+
+class InstrumentedClient:
+    """vertexai.Client の代理（agent_engines の RPC を計測し、それ以外はそのまま）"""
+
+    def __init__(self, client: "vertexai.Client", metrics: Optional[RpcMetrics] = None) -> None:
+        self._client = client
+        self.metrics = metrics if metrics is not None else RpcMetrics()
+        self.agent_engines = _InstrumentedNamespace(client.agent_engines, self.metrics)
+
+    def __getattr__(self, attr: str) -> object:
+        return getattr(self._client, attr)
+
+
+def instrumented(client: "vertexai.Client", metrics: Optional[RpcMetrics] = None) -> InstrumentedClient:
+    """client の agent_engines の RPC を計測する代理を返す（metrics 省略時は新しい RpcMetrics）"""
+    return InstrumentedClient(client, metrics)
+
+
+def dump_at_exit(metrics: RpcMetrics, path: Optional[str] = None, stream: TextIO = sys.stderr) -> None:
+    """集計をサマリとして stream に書き、path があれば Prometheus 形式で保存する（atexit 用）"""
+    print("\n[memorybank] RPC 計測結果", file=stream)
+    print(metrics.summary(), file=stream)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(metrics.prometheus())
+        print(f"[memorybank] Prometheus 形式で保存しました: {path}", file=stream)
@@ -0,0 +1,98 @@
+"""
+レイテンシ計測用のヒストグラム
+
+固定の指数バケット（1ms〜約 2 分）に観測値を数えるだけの軽量な実装。
+値そのものは保持しないため、観測数が増えてもメモリ使用量は一定。
+パーセンタイルはバケット境界から推定する（上側の境界を返す）。
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+from dataclasses import dataclass
+
+# 1ms から 2 倍ずつ（最後のバケットは上限なし）
+DEFAULT_BOUNDS: tuple[float, ...] = tuple(0.001 * (2**i) for i in range(18))
+
+
+@dataclass(frozen=True)
+class HistogramSnapshot:
+    count: int
+    total: float
+    minimum: float
+    maximum: float
+    p50: float
+    p95: float
+    p99: float
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> str:
+        if not self.count:
+            return "n=0"
+        return (
+            f"n={self.count} mean={self.mean:.3f}s p50≤{self.p50:.3f}s "
+            f"p95≤{self.p95:.3f}s p99≤{self.p99:.3f}s max={self.maximum:.3f}s"
+        )
+
+
+class Histogram:
+    """スレッドセーフなバケット型ヒストグラム（単位: 秒）"""
+
+    def __init__(self, bounds: tuple[float, ...] = DEFAULT_BOUNDS) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float("inf")
+        self.maximum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += value
+            self.minimum = min(self.minimum, value)
+            self.maximum = max(self.maximum, value)
+
+    def percentile(self, q: float) -> float:
+        """q（0〜1）パーセンタイルの推定値（そのバケットの上側の境界）"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = q * self.count
+            seen = 0
+            for index, bucket in enumerate(self.counts):
+                seen += bucket
+                if seen >= rank and bucket:
+                    if index < len(self.bounds):
+                        return min(self.bounds[index], self.maximum)
+                    return self.maximum
+            return self.maximum
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        """(バケットの上側の境界, その境界以下の観測数) の一覧（最後の境界は inf）"""
+        with self._lock:
+            counts = list(self.counts)
+        result: list[tuple[float, int]] = []
+        seen = 0
+        for bound, bucket in zip(self.bounds + (float("inf"),), counts):
+            seen += bucket
+            result.append((bound, seen))
+        return result
+
+    def snapshot(self) -> HistogramSnapshot:
+        return HistogramSnapshot(
+            count=self.count,
+            total=self.total,
+            minimum=self.minimum if self.count else 0.0,
+            maximum=self.maximum,
+            p50=self.percentile(0.50),
+            p95=self.percentile(0.95),
+            p99=self.percentile(0.99),
+        )
@@ -0,0 +1,212 @@
+"""
+マルチモーダル入力（画像・PDF など）のパートを、ファイル全体を読み込まずに作る
+
+poi/step3_multimodal.py は画像を f.read() で bytes にしてから inline_data に埋め込んでいた。
+納品書のスキャンのように 1 ファイルが数十 MB あると、読み込んだ bytes とリクエストの
+シリアライズ（base64）でピークのメモリが何倍にもなり、その間スレッドも止まる。
+
+  part = media_part("/path/to/scan.pdf", store=GcsObjectStore("my-bucket", prefix="memorybank/"))
+  client.agent_engines.memories.generate(..., direct_contents_source={"events": [
+      {"content": {"role": "user", "parts": [{"text": "先月の納品書です"}, part]}}
+  ]})
+
+  - ファイルは mmap で開き、内容のハッシュ（SHA-256）も mmap から計算する
+  - inline_limit 以下の小さいファイルは inline_data（従来どおり）
+  - それより大きいファイルはオブジェクトストアにチャンク単位でアップロードし、file_data の URI を渡す
+    （オブジェクト名は内容のハッシュなので、同じファイルの 2 回目以降はアップロードしない）
+  - LocalObjectStore はディレクトリを gs://bucket/ に見立てるローカルの代替（テスト・ベンチマーク用）
+
+GcsObjectStore は google-cloud-storage（google-cloud-aiplatform の依存）を使う。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+import mmap
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Optional, Protocol, Union
+
+if TYPE_CHECKING:
+    from google.cloud import storage
+
+# inline_data で送るファイルの上限（リクエスト全体の上限 20MB 程度より十分小さくする）
+DEFAULT_INLINE_LIMIT = 4 * 1024 * 1024
+# アップロード 1 回あたりの大きさ（GCS の再開可能アップロードは 256KiB の倍数）
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+PathLike = Union[str, os.PathLike[str]]
+
+
+class ObjectStore(Protocol):
+    """file_data の URI を発行できるオブジェクトストア"""
+
+    def exists(self, object_name: str) -> bool: ...
+
+    def upload(self, source: BinaryIO, object_name: str, *, size: int, mime_type: str) -> str:
+        """source（先頭から size バイト）をチャンク単位でアップロードし、gs:// の URI を返す"""
+        ...
+
+    def uri(self, object_name: str) -> str: ...
+
+
+class LocalObjectStore:
+    """ディレクトリを gs://bucket/ に見立てるオブジェクトストア（テスト・ベンチマーク用）
+
+    URI は gs://{bucket}/{object_name}、実体は {root}/{object_name}。
+    アップロードは一時ファイルに chunk_size ずつ書いてから置き換える。
+    """
+
+    def __init__(self, root: PathLike, bucket: str = "local-staging", *, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+        self.root = Path(root)
+        self.bucket = bucket
+        self.chunk_size = chunk_size
+        self.chunks_written = 0
+
+    def path(self, object_name: str) -> Path:
+        return self.root / object_name
+
+    def uri(self, object_name: str) -> str:
+        return f"gs://{self.bucket}/{object_name}"
+
+    def exists(self, object_name: str) -> bool:
+        return self.path(object_name).exists()
+
+    def upload(self, source: BinaryIO, object_name: str, *, size: int, mime_type: str) -> str:
+        target = self.path(object_name)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                remaining = size
+                while remaining > 0:
+                    chunk = source.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        raise OSError(f"{object_name}: {size} バイトのうち {size - remaining} バイトしか読めません")
+                    out.write(chunk)
+                    remaining -= len(chunk)
+                    self.chunks_written += 1
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return self.uri(object_name)
+
+
+class GcsObjectStore:
+    """Cloud Storage のバケットへの再開可能アップロード（chunk_size ずつ送る）"""
+
+    def __init__(
+        self,
+        bucket: str,
+        *,
+        prefix: str = "",
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        client: Optional["storage.Client"] = None,
+    ) -> None:
+        if chunk_size % (256 * 1024):
+            raise ValueError("chunk_size は 256KiB の倍数を指定してください")
+        from google.cloud import storage
+
+        self._bucket = (client or storage.Client()).bucket(bucket)
+        self.bucket = bucket
+        self.prefix = prefix
+        self.chunk_size = chunk_size
+
+    def uri(self, object_name: str) -> str:
+        return f"gs://{self.bucket}/{self.prefix}{object_name}"
+
+    def exists(self, object_name: str) -> bool:
+        return self._bucket.blob(f"{self.prefix}{object_name}").exists()
+
+    def upload(self, source: BinaryIO, object_name: str, *, size: int, mime_type: str) -> str:
+        blob = self._bucket.blob(f"{self.prefix}{object_name}", chunk_size=self.chunk_size)
+        blob.upload_from_file(source, size=size, content_type=mime_type, rewind=False)
+        return self.uri(object_name)
+
+
+@dataclass
+class MediaInfo:
+    """media_part() が作ったパートの内訳"""
+
+    path: str
+    size: int
+    sha256: str
+    mime_type: str
+    # "inline_data" または "file_data"
+    kind: str
+    uri: Optional[str] = None
+    # 同じ内容がストアに既にあり、アップロードしなかった
+    reused: bool = False
+
+
+def guess_mime_type(path: PathLike) -> str:
+    mime_type, _ = mimetypes.guess_type(str(path))
+    return mime_type or "application/octet-stream"
+
+
+def file_sha256(path: PathLike, *, chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    """ファイルの SHA-256（mmap から chunk_size ずつ読むため、ファイル全体を bytes にしない）"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return digest.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, len(view), chunk_size):
+                    digest.update(view[offset : offset + chunk_size])
+            finally:
+                view.release()
+    return digest.hexdigest()
+
+
+def staged_object_name(sha256: str, path: PathLike) -> str:
+    """内容のハッシュから決まるオブジェクト名（拡張子は元のファイルのもの）"""
+    return f"{sha256[:2]}/{sha256}{Path(path).suffix.lower()}"
+
+
+def media_part(
+    path: PathLike,
+    *,
+    mime_type: Optional[str] = None,
+    store: Optional[ObjectStore] = None,
+    inline_limit: int = DEFAULT_INLINE_LIMIT,
+    info: Optional[list[MediaInfo]] = None,
+) -> dict[str, dict[str, object]]:
+    """ローカルファイルを generate() / events.append() のパート（inline_data か file_data）にする
+
+    Args:
+        path: ローカルファイル
+        mime_type: 省略時は拡張子から推定する
+        store: inline_limit を超えるファイルのアップロード先（省略時は超えると ValueError）
+        inline_limit: inline_data で送るファイルの上限（バイト）
+        info: 渡すと MediaInfo を追記する（送信方法・アップロードの有無の確認用）
+    """
+    size = os.path.getsize(path)
+    mime_type = mime_type or guess_mime_type(path)
+    if size <= inline_limit:
+        with open(path, "rb") as f:
+            data = f.read()
+        if info is not None:
+            info.append(MediaInfo(str(path), size, hashlib.sha256(data).hexdigest(), mime_type, "inline_data"))
+        return {"inline_data": {"mime_type": mime_type, "data": data}}
+    if store is None:
+        raise ValueError(
+            f"{path} は {size:,} バイトで inline_data の上限（{inline_limit:,} バイト）を超えています。"
+            "store にアップロード先を指定してください"
+        )
+    sha256 = file_sha256(path)
+    object_name = staged_object_name(sha256, path)
+    reused = store.exists(object_name)
+    if reused:
+        uri = store.uri(object_name)
+    else:
+        with open(path, "rb") as f:
+            uri = store.upload(f, object_name, size=size, mime_type=mime_type)
+    if info is not None:
+        info.append(MediaInfo(str(path), size, sha256, mime_type, "file_data", uri, reused))
+    return {"file_data": {"file_uri": uri, "mime_type": mime_type}}
@@ -0,0 +1,273 @@
+"""
+非同期オペレーションのポーリング（time.sleep の置き換え）
+
+generate(config={"wait_for_completion": False}) や purge() / rollback() は
+未完了のオペレーション（done=False）を返す。Step 1d (9) では固定で
+time.sleep(5) してから retrieve() していたが、負荷が高いと 5 秒では足りず、
+軽いときは無駄に待つことになる。
+
+OperationTracker は 1 本のポーリングスレッドで複数のオペレーションを
+まとめて監視し、完了したものから Future を解決する。
+
+  - ポーリング間隔は指数バックオフ + ジッター（retry.backoff_delay）
+  - 完了時のコールバック登録・Future での待機のどちらにも対応
+  - 種類（generate / purge / rollback）ごとに完了までの時間をヒストグラムに記録
+
+⚠️ 実クライアントの取得関数は SDK の非公開メソッド
+   （memories._get_generate_memories_operation / _get_memory_operation）を使う。
+   SDK 側の wait_for_completion=True も内部で同じメソッドを使っている。
+   purge は _get_memory_operation だと応答が Memory として解釈されて purgeCount が
+   失われるため、同じ GET を memories._api_client で発行し
+   types.AgentEnginePurgeMemoriesOperation として読み直す。
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import itertools
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Optional
+
+from memorybank.metrics import Histogram
+from memorybank.retry import backoff_delay
+
+if TYPE_CHECKING:
+    import vertexai
+
+# オペレーションは SDK の *Operation 型（name / done / error / response を持つ）
+Operation = object
+# オペレーション名から最新のオペレーションを取得する関数
+FetchOperation = Callable[[str], Operation]
+
+KIND_GENERATE = "generate"
+KIND_PURGE = "purge"
+KIND_ROLLBACK = "rollback"
+
+
+class OperationFailed(RuntimeError):
+    """オペレーションがエラーで完了した"""
+
+
+def default_fetchers(client: "vertexai.Client") -> dict[str, FetchOperation]:
+    """vertexai.Client 用の取得関数（種類 → 関数）"""
+    memories = client.agent_engines.memories
+
+    def _generate(name: str) -> Operation:
+        return memories._get_generate_memories_operation(operation_name=name)
+
+    def _memory(name: str) -> Operation:
+        return memories._get_memory_operation(operation_name=name)
+
+    def _purge(name: str) -> Operation:
+        from vertexai._genai import types
+
+        response = memories._api_client.request("get", name, {})
+        body = json.loads(response.body) if response.body else {}
+        return types.AgentEnginePurgeMemoriesOperation._from_response(response=body, kwargs={})
+
+    return {KIND_GENERATE: _generate, KIND_PURGE: _purge, KIND_ROLLBACK: _memory}
+
+
+@dataclass(order=True)
+class _Pending:
+    due: float
+    seq: int
+    name: str = field(compare=False)
+    kind: str = field(compare=False)
+    started: float = field(compare=False)
+    future: "Future[Operation]" = field(compare=False)
+    attempt: int = field(default=0, compare=False)
+
+
+class OperationTracker:
+    """未完了オペレーションを 1 本のスレッドでまとめてポーリングする
+
+      tracker = OperationTracker(client)
+      future = tracker.track(op_async)           # すぐに戻る
+      future.add_done_callback(lambda f: ...)    # 完了時に呼ばれる
+      done_op = future.result(timeout=60)        # 完了まで待つ
+      tracker.close()
+
+    Args:
+        client: vertexai.Client（fetchers を指定する場合は不要）
+        fetchers: 種類ごとのオペレーション取得関数（省略時は default_fetchers(client)）
+        base_interval: 最初のポーリング間隔（秒）
+        max_interval: ポーリング間隔の上限（秒）
+        timeout: 1 つのオペレーションを待つ上限（秒）。超えると TimeoutError
+    """
+
+    def __init__(
+        self,
+        client: Optional["vertexai.Client"] = None,
+        *,
+        fetchers: Optional[dict[str, FetchOperation]] = None,
+        base_interval: float = 0.5,
+        max_interval: float = 10.0,
+        timeout: float = 300.0,
+    ) -> None:
+        if fetchers is None:
+            if client is None:
+                raise ValueError("client か fetchers のどちらかを指定してください")
+            fetchers = default_fetchers(client)
+        self._fetchers = fetchers
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+        # 種類ごとの「track() から完了までの時間」
+        self.time_to_done: dict[str, Histogram] = {}
+        self.polls = 0
+        self._heap: list[_Pending] = []
+        # 監視中（ヒープ内 + ポーリング実行中）のオペレーション数
+        self._outstanding = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="operation-tracker", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "OperationTracker":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    @property
+    def pending(self) -> int:
+        with self._cond:
+            return self._outstanding
+
+    def track(
+        self,
+        operation: Operation,
+        *,
+        kind: str = KIND_GENERATE,
+        callback: Optional[Callable[["Future[Operation]"], None]] = None,
+    ) -> "Future[Operation]":
+        """オペレーションを監視対象に加え、完了時に解決される Future を返す"""
+        if kind not in self._fetchers:
+            raise ValueError(f"未対応のオペレーション種類です: {kind}")
+        future: Future[Operation] = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        now = time.monotonic()
+        if getattr(operation, "done", False):
+            self._resolve(future, operation, kind, now)
+            return future
+        name = getattr(operation, "name", None)
+        if not name:
+            raise ValueError("未完了のオペレーションに name がありません")
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("OperationTracker は close() 済みです")
+            heapq.heappush(
+                self._heap,
+                _Pending(now + self._interval(0), next(self._seq), str(name), kind, now, future),
+            )
+            self._outstanding += 1
+            self._cond.notify()
+        return future
+
+    def wait_all(self, timeout: Optional[float] = None) -> None:
+        """監視中のオペレーションがすべて完了するまで待つ"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._outstanding:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"{self._outstanding} 件のオペレーションが未完了です")
+                self._cond.wait(remaining)
+
+    def close(self) -> None:
+        """ポーリングを停止する。未完了の Future はキャンセルされる"""
+        with self._cond:
+            self._closed = True
+            for pending in self._heap:
+                pending.future.cancel()
+            self._heap.clear()
+            self._outstanding = 0
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _interval(self, attempt: int) -> float:
+        return backoff_delay(
+            attempt, base_seconds=self.base_interval, max_seconds=self.max_interval
+        )
+
+    def _resolve(
+        self, future: "Future[Operation]", operation: Operation, kind: str, started: float
+    ) -> None:
+        with self._cond:  # track() の呼び出し元とポーリングスレッドの両方から書き込む
+            self.time_to_done.setdefault(kind, Histogram()).observe(time.monotonic() - started)
+        error = getattr(operation, "error", None)
+        if error:
+            self._settle(future, error=OperationFailed(f"{kind} オペレーションが失敗しました: {error}"))
+        else:
+            self._settle(future, result=operation)
+
+    @staticmethod
+    def _settle(
+        future: "Future[Operation]",
+        *,
+        result: Optional[Operation] = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        """Future を解決する（呼び出し元がキャンセル済みなら何もしない）"""
+        if future.done():
+            return
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        except InvalidStateError:  # done() の確認後にキャンセルされた。ポーリングスレッドは止めない
+            pass
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed and (not self._heap or self._heap[0].due > time.monotonic()):
+                    wait = self._heap[0].due - time.monotonic() if self._heap else None
+                    self._cond.wait(wait)
+                if self._closed:
+                    return
+                pending = heapq.heappop(self._heap)
+                if pending.future.done():  # 呼び出し元がキャンセルした。以後はポーリングしない
+                    self._outstanding -= 1
+                    self._cond.notify_all()
+                    continue
+
+            last_error: Optional[BaseException] = None
+            operation: Optional[Operation] = None
+            try:
+                operation = self._fetchers[pending.kind](pending.name)
+            except Exception as e:  # 取得の失敗は次回のポーリングで再試行する
+                last_error = e
+
+            now = time.monotonic()
+            finished = True
+            if operation is not None and getattr(operation, "done", False):
+                self._resolve(pending.future, operation, pending.kind, pending.started)
+            elif now - pending.started >= self.timeout:
+                error = TimeoutError(
+                    f"{pending.kind} オペレーションが {self.timeout:.0f} 秒以内に完了しませんでした"
+                )
+                error.__cause__ = last_error
+                self._settle(pending.future, error=error)
+            else:
+                finished = False
+                pending.attempt += 1
+                pending.due = now + self._interval(pending.attempt)
+
+            with self._cond:
+                self.polls += 1
+                if not finished and self._closed:
+                    pending.future.cancel()
+                elif not finished:
+                    heapq.heappush(self._heap, pending)
+                elif self._outstanding:
+                    self._outstanding -= 1
+                self._cond.notify_all()
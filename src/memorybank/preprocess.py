@@ -0,0 +1,263 @@
+"""
+generate() の前に添付（画像など）を前処理する: 重複の除去と画像の縮小
+
+poi/step3_multimodal.py では同じスコーンの画像を file_data・inline_data・Sessions のイベントで
+3 回送っている。添付は LLM の入力トークンと転送量の大半を占めるが、同じスコープで一度
+処理した画像から得られるメモリは既に保存されている。
+
+  pre = AttachmentPreprocessor(max_dimension=1600)
+  prepared = pre.prepare(events, scope=SCOPE)
+  operation = client.agent_engines.memories.generate(
+      name=AGENT_ENGINE_NAME, direct_contents_source={"events": prepared.events}, scope=SCOPE,
+  )
+  pre.commit(prepared)          # generate() が成功してから「送信済み」として記録する
+  print(prepared.report.summary())
+
+  - 添付を内容のハッシュ（inline_data は SHA-256、file_data は URI）で識別し、同じスコープで
+    送信済みのもの・同じリクエスト内で重複するものはパートごと取り除く（テキストは残す）
+  - inline_data の画像は長辺が max_dimension を超える場合に縮小して再エンコードする
+    （透過のある画像は PNG、それ以外は JPEG。小さくならなければ元のまま）
+  - file_data（GCS 上のファイル）は取得しないため、縮小はせず重複の除去だけを行う
+
+画像の縮小には Pillow（任意の依存、extra `images`）が必要（`uv sync --extra images` でインストールする）。
+max_dimension を指定したのに Pillow がない場合は、生成時に RuntimeWarning を出して
+重複の除去だけを行う。縮小しない場合は max_dimension=None を渡す。
+"""
+
+from __future__ import annotations
+
+import collections
+import copy
+import hashlib
+import io
+import threading
+import warnings
+from dataclasses import dataclass, field
+from typing import Mapping, Optional, Sequence
+
+from memorybank.scopes import ScopeKey, scope_key
+
+# 納品書の文字が読める程度を目安にした既定値（長辺のピクセル数）
+DEFAULT_MAX_DIMENSION = 1600
+DEFAULT_JPEG_QUALITY = 85
+
+
+def pillow_available() -> bool:
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def downscale_image(
+    data: bytes,
+    *,
+    max_dimension: int = DEFAULT_MAX_DIMENSION,
+    jpeg_quality: int = DEFAULT_JPEG_QUALITY,
+) -> Optional[tuple[bytes, str]]:
+    """長辺を max_dimension 以下に縮小して (データ, MIME タイプ) を返す
+
+    縮小が不要・画像として読めない・元より大きくなる場合は None。Pillow が必要。
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(io.BytesIO(data)) as opened:
+            if max(opened.size) <= max_dimension:
+                return None
+            image = ImageOps.exif_transpose(opened)
+            image.thumbnail((max_dimension, max_dimension))
+            out = io.BytesIO()
+            if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+                image.save(out, format="PNG", optimize=True)
+                mime_type = "image/png"
+            else:
+                image.convert("RGB").save(out, format="JPEG", quality=jpeg_quality, optimize=True)
+                mime_type = "image/jpeg"
+    except (OSError, ValueError):  # 画像として読めない（UnidentifiedImageError も OSError）
+        return None
+    encoded = out.getvalue()
+    return (encoded, mime_type) if len(encoded) < len(data) else None
+
+
+@dataclass
+class PreprocessReport:
+    """1 回の generate() 分の前処理の結果"""
+
+    attachments: int = 0
+    # 送信済み・重複のため取り除いた添付
+    deduplicated: int = 0
+    resized: int = 0
+    # inline_data の合計（前処理の前 / 後）。file_data は 0 として数える
+    bytes_before: int = 0
+    bytes_after: int = 0
+    # Pillow がないため縮小できなかった画像
+    resize_skipped: int = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    def summary(self) -> str:
+        text = (
+            f"添付 {self.attachments} 件（重複 {self.deduplicated} 件を除去, 縮小 {self.resized} 件）, "
+            f"{self.bytes_before:,} → {self.bytes_after:,} bytes（{self.bytes_saved:,} bytes 削減）"
+        )
+        if self.resize_skipped:
+            text += f", Pillow がないため縮小を確認しなかった画像 {self.resize_skipped} 件"
+        return text
+
+
+@dataclass
+class PreparedEvents:
+    """prepare() の結果（events を generate() に渡し、成功したら commit() する）"""
+
+    events: list[dict[str, object]]
+    report: PreprocessReport
+    scope: ScopeKey
+    # 今回送信する添付の識別子（commit() で送信済みとして記録する）
+    keys: list[str] = field(default_factory=list)
+
+
+def _attachment_key(part: Mapping[str, object]) -> Optional[str]:
+    inline = part.get("inline_data")
+    if isinstance(inline, Mapping) and isinstance(inline.get("data"), (bytes, bytearray)):
+        return "sha256:" + hashlib.sha256(inline["data"]).hexdigest()  # type: ignore[arg-type]
+    file_data = part.get("file_data")
+    if isinstance(file_data, Mapping) and file_data.get("file_uri"):
+        return f"uri:{file_data['file_uri']}"
+    return None
+
+
+class AttachmentPreprocessor:
+    """添付の重複除去と画像の縮小（スコープごとの送信済みの記録を持つ。スレッドセーフ）
+
+    Args:
+        max_dimension: 画像の長辺の上限（None なら縮小しない。指定時は Pillow が必要）
+        jpeg_quality: 再エンコードする JPEG の品質
+        dedupe: 送信済み・重複の添付を取り除くか
+        max_entries: 記録しておく (スコープ, 添付) と縮小結果それぞれの数（古いものから忘れる）
+    """
+
+    def __init__(
+        self,
+        *,
+        max_dimension: Optional[int] = DEFAULT_MAX_DIMENSION,
+        jpeg_quality: int = DEFAULT_JPEG_QUALITY,
+        dedupe: bool = True,
+        max_entries: int = 10_000,
+    ) -> None:
+        self.max_dimension = max_dimension
+        self.jpeg_quality = jpeg_quality
+        self.dedupe = dedupe
+        self.max_entries = max_entries
+        self.can_resize = max_dimension is not None and pillow_available()
+        if max_dimension is not None and not self.can_resize:
+            warnings.warn(
+                f"Pillow がないため画像を縮小できません（max_dimension={max_dimension} は無視され、"
+                "重複の除去だけを行います）。uv sync --extra images でインストールするか、"
+                "max_dimension=None を指定してください",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+        self._sent: collections.OrderedDict[tuple[ScopeKey, str], None] = collections.OrderedDict()
+        # (添付のハッシュ, 長辺の上限, JPEG 品質) → 縮小結果（縮小不要なら None）
+        self._resized: collections.OrderedDict[
+            tuple[str, int, int], Optional[tuple[bytes, str]]
+        ] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def seen(self, scope: Mapping[str, str], key: str) -> bool:
+        with self._lock:
+            return (scope_key(scope), key) in self._sent
+
+    def prepare(self, events: Sequence[Mapping[str, object]], *, scope: Mapping[str, str]) -> PreparedEvents:
+        """events（direct_contents_source の events と同じ形）を前処理した複製を返す（元は変更しない）"""
+        key_scope = scope_key(scope)
+        report = PreprocessReport()
+        prepared = PreparedEvents(events=[], report=report, scope=key_scope)
+        in_request: set[str] = set()
+        for event in events:
+            content = event.get("content")
+            if not isinstance(content, Mapping):
+                prepared.events.append(copy.deepcopy(dict(event)))
+                continue
+            parts: list[object] = []
+            for part in content.get("parts") or []:  # type: ignore[attr-defined]
+                key = _attachment_key(part) if isinstance(part, Mapping) else None
+                if key is None:
+                    parts.append(copy.deepcopy(part))
+                    continue
+                report.attachments += 1
+                size = self._inline_size(part)
+                report.bytes_before += size
+                with self._lock:
+                    sent = (key_scope, key) in self._sent
+                if self.dedupe and (sent or key in in_request):
+                    report.deduplicated += 1
+                    continue
+                in_request.add(key)
+                prepared.keys.append(key)
+                part = self._resize(part, key, report)  # type: ignore[arg-type]
+                report.bytes_after += self._inline_size(part)
+                parts.append(part)
+            if not parts:
+                continue  # 添付だけのイベントで、すべて送信済みだった
+            new_event = {k: copy.deepcopy(v) for k, v in event.items() if k != "content"}
+            new_content = {k: copy.deepcopy(v) for k, v in content.items() if k != "parts"}
+            new_content["parts"] = parts
+            new_event["content"] = new_content
+            prepared.events.append(new_event)
+        return prepared
+
+    def commit(self, prepared: PreparedEvents) -> None:
+        """prepare() した添付を送信済みとして記録する（generate() が成功した後に呼ぶ）"""
+        if not self.dedupe:
+            return
+        with self._lock:
+            for key in prepared.keys:
+                self._sent[(prepared.scope, key)] = None
+                self._sent.move_to_end((prepared.scope, key))
+            while len(self._sent) > self.max_entries:
+                self._sent.popitem(last=False)
+
+    @staticmethod
+    def _inline_size(part: Mapping[str, object]) -> int:
+        inline = part.get("inline_data")
+        data = inline.get("data") if isinstance(inline, Mapping) else None
+        return len(data) if isinstance(data, (bytes, bytearray)) else 0
+
+    def _resize(self, part: Mapping[str, object], key: str, report: PreprocessReport) -> dict[str, object]:
+        inline = part.get("inline_data")
+        if (
+            self.max_dimension is None
+            or not isinstance(inline, Mapping)
+            or not str(inline.get("mime_type", "")).startswith("image/")
+        ):
+            return dict(part)
+        if not self.can_resize:
+            report.resize_skipped += 1
+            return dict(part)
+        # 同じ画像を何度も送る場合（dedupe=False や別スコープ）はデコード・再エンコードを省く
+        cache_key = (key, self.max_dimension, self.jpeg_quality)
+        with self._lock:
+            cached = cache_key in self._resized
+            if cached:
+                resized = self._resized[cache_key]
+                self._resized.move_to_end(cache_key)
+        if not cached:
+            resized = downscale_image(
+                bytes(inline["data"]),  # type: ignore[arg-type]
+                max_dimension=self.max_dimension,
+                jpeg_quality=self.jpeg_quality,
+            )
+            with self._lock:
+                self._resized[cache_key] = resized
+                while len(self._resized) > self.max_entries:
+                    self._resized.popitem(last=False)
+        if resized is None:
+            return dict(part)
+        data, mime_type = resized
+        report.resized += 1
+        return {**part, "inline_data": {**inline, "data": data, "mime_type": mime_type}}
@@ -0,0 +1,313 @@
+"""
+クライアント側のレート制限と再試行（client.agent_engines への透過的なラッパー）
+
+各スクリプトはクォータ超過（429 / RESOURCE_EXHAUSTED）を扱っておらず、
+generate() をループで連続して呼ぶと途中で失敗する。rate_limited() で包んだクライアントは、
+呼び出し箇所を書き換えずに次の制御を加える。
+
+  client = rate_limited(get_client())
+  client.agent_engines.memories.generate(...)   # 呼び出し方はそのまま
+
+  - メソッドの系統（generate / create / retrieve / delete / append）ごとのトークンバケット
+  - AIMD: 429 を受けるとその系統のレートを半分に、成功が続くと 1 秒あたり additive ずつ戻す
+  - 一時的なエラーは指数バックオフ + ジッターで再試行する。ただし冪等でない系統
+    （generate / create / append）は、サーバが処理する前に拒否された 429 だけを再試行する
+  - 再試行の予算（RetryBudget）: 再試行は通常の呼び出しの ratio 割までに抑え、
+    障害時に再試行が負荷を何倍にも増やす（リトライストーム）のを防ぐ
+
+系統に含まれないメソッド（operations の取得・revisions など）はそのまま呼び出す。
+retrieve() / list() のページャが 2 ページ目以降を取得する呼び出しは対象外。
+connection.get_client() は環境変数 MEMORYBANK_RATE_LIMIT=1 のときこのラッパーを使う。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING, Callable, Mapping, Optional, TypeVar
+
+from memorybank.retry import backoff_delay, is_throttled, is_transient_error
+
+if TYPE_CHECKING:
+    import vertexai
+
+T = TypeVar("T")
+
+FAMILY_GENERATE = "generate"
+FAMILY_CREATE = "create"
+FAMILY_RETRIEVE = "retrieve"
+FAMILY_DELETE = "delete"
+FAMILY_APPEND = "append"
+
+# client.agent_engines からのメソッドのパス → 系統
+METHOD_FAMILIES: dict[str, str] = {
+    "memories.generate": FAMILY_GENERATE,
+    "memories.create": FAMILY_CREATE,
+    "memories.retrieve": FAMILY_RETRIEVE,
+    "memories.get": FAMILY_RETRIEVE,
+    "memories.list": FAMILY_RETRIEVE,
+    "memories.delete": FAMILY_DELETE,
+    "memories.purge": FAMILY_DELETE,
+    "sessions.events.append": FAMILY_APPEND,
+}
+
+# 属性アクセスをたどる名前空間（client.agent_engines.memories.revisions など）
+_NAMESPACES = frozenset({"memories", "sessions", "events", "revisions"})
+
+
+@dataclass(frozen=True)
+class FamilyLimit:
+    """系統ごとのレートの設定（単位: 呼び出し/秒）"""
+
+    rate: float
+    # まとめて受け付ける呼び出し数
+    burst: float = 1.0
+    min_rate: float = 0.1
+    max_rate: Optional[float] = None
+    # 成功が続いたときに 1 秒あたり戻すレート
+    additive: float = 1.0
+    # 5xx などでも再試行してよいか（False なら 429 だけを再試行する）
+    idempotent: bool = True
+    # 一度レートを下げたら、この秒数の間に届いた 429 では下げない（同じ混雑で何度も半減しない）
+    cooldown_seconds: float = 1.0
+
+
+# 既定値（Agent Engine のクォータはプロジェクトごとに異なるため目安。429 を受けると AIMD で下がる）
+DEFAULT_LIMITS: dict[str, FamilyLimit] = {
+    FAMILY_GENERATE: FamilyLimit(rate=2, burst=2, max_rate=10, additive=0.5, idempotent=False),
+    FAMILY_CREATE: FamilyLimit(rate=10, burst=5, max_rate=50, idempotent=False),
+    FAMILY_RETRIEVE: FamilyLimit(rate=20, burst=10, max_rate=100, additive=2.0),
+    FAMILY_DELETE: FamilyLimit(rate=10, burst=5, max_rate=50),
+    FAMILY_APPEND: FamilyLimit(rate=20, burst=10, max_rate=100, additive=2.0, idempotent=False),
+}
+
+
+class AdaptiveTokenBucket:
+    """AIMD でレートを調整するトークンバケット"""
+
+    def __init__(self, limit: FamilyLimit, *, clock: Callable[[], float] = time.monotonic) -> None:
+        self.limit = limit
+        self.rate = float(limit.rate)
+        self._tokens = float(limit.burst)
+        self._clock = clock
+        self._updated = clock()
+        self._decreased_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.limit.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """トークンを 1 つ予約し、使えるようになるまでの待ち時間（秒）を返す"""
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens -= 1.0
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def on_success(self) -> None:
+        with self._lock:
+            # 1 回あたり additive / rate 増やす（= 1 秒分の成功で additive 増える）
+            ceiling = self.limit.max_rate if self.limit.max_rate is not None else float("inf")
+            self.rate = min(ceiling, self.rate + self.limit.additive / self.rate)
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            if now - self._decreased_at < self.limit.cooldown_seconds:
+                return
+            self._decreased_at = now
+            self.rate = max(self.limit.min_rate, self.rate / 2)
+
+
+class RetryBudget:
+    """再試行の予算（通常の呼び出し 1 回ごとに ratio 回分たまり、再試行 1 回で 1 回分使う）
+
+    Args:
+        ratio: 通常の呼び出しに対する再試行の割合の上限
+        initial: 最初に使える再試行の回数（呼び出しが少ない間の下限）
+        maximum: たまる回数の上限
+    """
+
+    def __init__(self, ratio: float = 0.2, *, initial: float = 10.0, maximum: float = 100.0) -> None:
+        self.ratio = ratio
+        self.maximum = maximum
+        self._balance = min(initial, maximum)
+        self._lock = threading.Lock()
+
+    @property
+    def balance(self) -> float:
+        return self._balance
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._balance = min(self.maximum, self._balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self._balance < 1.0:
+                return False
+            self._balance -= 1.0
+            return True
+
+
+@dataclass
+class FamilyStats:
+    calls: int = 0
+    throttled: int = 0
+    retries: int = 0
+    # 予算がなくて再試行しなかった回数
+    budget_exhausted: int = 0
+    failures: int = 0
+    # トークンを待った合計時間（秒）
+    wait_seconds: float = 0.0
+
+
+@dataclass
+class RateLimitStats:
+    families: dict[str, FamilyStats] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        lines = []
+        for family, s in sorted(self.families.items()):
+            lines.append(
+                f"{family}: 呼び出し {s.calls}, 429 {s.throttled}, 再試行 {s.retries}, "
+                f"予算切れ {s.budget_exhausted}, 失敗 {s.failures}, 待ち {s.wait_seconds:.2f}s"
+            )
+        return "\n".join(lines) if lines else "（呼び出しなし）"
+
+
+class RateLimiter:
+    """系統ごとのトークンバケットと共通の再試行予算
+
+    Args:
+        limits: 系統ごとの設定（省略した系統は DEFAULT_LIMITS）
+        budget: 全系統で共有する再試行の予算
+        max_attempts: 再試行を含めた最大試行回数
+        base_seconds / max_seconds: 再試行の待ち時間（指数バックオフ + ジッター）
+        sleep: 待機関数（テスト・ベンチマーク用に差し替え可能）
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Mapping[str, FamilyLimit]] = None,
+        *,
+        budget: Optional[RetryBudget] = None,
+        max_attempts: int = 5,
+        base_seconds: float = 0.5,
+        max_seconds: float = 10.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        merged = dict(DEFAULT_LIMITS)
+        merged.update(limits or {})
+        self.buckets = {family: AdaptiveTokenBucket(limit) for family, limit in merged.items()}
+        self.budget = budget if budget is not None else RetryBudget()
+        self.max_attempts = max_attempts
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+        self.stats = RateLimitStats({family: FamilyStats() for family in merged})
+        self._sleep = sleep
+        self._stats_lock = threading.Lock()
+
+    def call(self, family: str, call: Callable[[], T]) -> T:
+        """family のレートに従って call() を実行する（必要なら再試行する）"""
+        bucket = self.buckets[family]
+        stats = self.stats.families[family]
+        attempt = 0
+        while True:
+            wait = bucket.reserve()
+            if wait > 0:
+                self._sleep(wait)
+            with self._stats_lock:
+                stats.calls += 1
+                stats.wait_seconds += wait
+            try:
+                result = call()
+            except Exception as e:
+                throttled = is_throttled(e)
+                if throttled:
+                    bucket.on_throttle()
+                attempt += 1
+                retryable = throttled or (bucket.limit.idempotent and is_transient_error(e))
+                give_up = attempt >= self.max_attempts or not retryable
+                exhausted = not give_up and not self.budget.withdraw()
+                with self._stats_lock:
+                    stats.throttled += int(throttled)
+                    stats.budget_exhausted += int(exhausted)
+                    stats.failures += int(give_up or exhausted)
+                    stats.retries += int(not (give_up or exhausted))
+                if give_up or exhausted:
+                    raise
+                self._sleep(
+                    backoff_delay(attempt - 1, base_seconds=self.base_seconds, max_seconds=self.max_seconds)
+                )
+                continue
+            bucket.on_success()
+            if attempt == 0:
+                self.budget.deposit()
+            return result
+
+
+class _RateLimitedNamespace:
+    """client.agent_engines（とその下の memories / sessions など）の代理オブジェクト"""
+
+    def __init__(self, target: object, limiter: RateLimiter, path: str = "") -> None:
+        self._target = target
+        self._limiter = limiter
+        self._path = path
+
+    def __getattr__(self, attr: str) -> object:
+        value = getattr(self._target, attr)
+        path = f"{self._path}.{attr}" if self._path else attr
+        family = METHOD_FAMILIES.get(path)
+        if family is not None and callable(value):
+            method = value
+            limiter = self._limiter
+
+            def _call(*args: object, **kwargs: object) -> object:
+                return limiter.call(family, lambda: method(*args, **kwargs))
+
+            return _call
+        if attr in _NAMESPACES:
+            return _RateLimitedNamespace(value, self._limiter, path)
+        return value
+
+
+class RateLimitedClient:
+    """vertexai.Client の代理（agent_engines だけをレート制限付きにし、それ以外はそのまま）"""
+
+    def __init__(self, client: "vertexai.Client", limiter: Optional[RateLimiter] = None) -> None:
+        self._client = client
+        self.limiter = limiter if limiter is not None else RateLimiter()
+        self.agent_engines = _RateLimitedNamespace(client.agent_engines, self.limiter)
+
+    @property
+    def stats(self) -> RateLimitStats:
+        return self.limiter.stats
+
+    def __getattr__(self, attr: str) -> object:
+        return getattr(self._client, attr)
+
+
+def rate_limited(
+    client: "vertexai.Client",
+    limits: Optional[Mapping[str, FamilyLimit]] = None,
+    **options: object,
+) -> RateLimitedClient:
+    """client をレート制限・再試行付きの代理で包む（options は RateLimiter の引数）"""
+    return RateLimitedClient(client, RateLimiter(limits, **options))  # type: ignore[arg-type]
+
+
+def scaled_limits(factor: float) -> dict[str, FamilyLimit]:
+    """DEFAULT_LIMITS のレートを factor 倍した設定（クォータを引き上げたプロジェクト向け）"""
+    return {
+        family: replace(
+            limit,
+            rate=limit.rate * factor,
+            burst=max(1.0, limit.burst * factor),
+            max_rate=limit.max_rate * factor if limit.max_rate is not None else None,
+        )
+        for family, limit in DEFAULT_LIMITS.items()
+    }
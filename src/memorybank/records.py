@@ -0,0 +1,225 @@
+"""
+大量スキャン用のコンパクトなメモリレコード
+
+list() の結果を集計・表示する場合、SDK の pydantic モデル（types.Memory や
+RetrieveMemoriesResponseRetrievedMemory）は 1 件あたり数 KB になる。
+MemoryRecord は表示・集計に必要な情報だけを `__slots__` のオブジェクトに詰め直す。
+
+  - スコープ・メタデータのキーと値（user_id / user_123 など繰り返し現れる文字列）は intern する
+  - 日時は UNIX エポックからのマイクロ秒（int）で持つ
+  - トピックは小さな整数コードで持つ（マネージドトピックは固定、カスタムは出現順に採番）
+
+  for record in compact(stream_list(client, AGENT_ENGINE_NAME)):
+      print(record.fact, record.scope_dict(), record.topic_labels())
+
+ベンチマーク: bench/bench_records.py（1 件あたりのバイト数とスキャン速度）
+"""
+
+from __future__ import annotations
+
+import datetime
+import sys
+import threading
+from typing import TYPE_CHECKING, Iterable, Iterator, Mapping, Optional, Union
+
+from memorybank.filters import enum_text, metadata_value
+
+if TYPE_CHECKING:
+    from vertexai._genai import types
+
+MetadataScalar = Union[str, float, bool, int]
+
+# マネージドトピック（ManagedTopicEnum）のコード。0 は「未指定」
+MANAGED_TOPICS: tuple[str, ...] = (
+    "MANAGED_TOPIC_ENUM_UNSPECIFIED",
+    "USER_PERSONAL_INFO",
+    "USER_PREFERENCES",
+    "KEY_CONVERSATION_DETAILS",
+    "EXPLICIT_INSTRUCTIONS",
+)
+# カスタムトピックのコードはこの値から採番する
+CUSTOM_TOPIC_BASE = 100
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class TopicCodes:
+    """トピック ⇔ 整数コードの対応表（カスタムトピックは出現順に採番）"""
+
+    def __init__(self) -> None:
+        self._custom: list[str] = []
+        self._custom_codes: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def code(self, topic: object) -> int:
+        """MemoryTopicId（managed_memory_topic / custom_memory_topic_label）をコードにする"""
+        managed = getattr(topic, "managed_memory_topic", None)
+        if managed is None and isinstance(topic, Mapping):
+            managed = topic.get("managed_memory_topic")
+        if managed is not None:
+            label = enum_text(managed)
+            return MANAGED_TOPICS.index(label) if label in MANAGED_TOPICS else 0
+        custom = getattr(topic, "custom_memory_topic_label", None)
+        if custom is None and isinstance(topic, Mapping):
+            custom = topic.get("custom_memory_topic_label")
+        if not custom:
+            return 0
+        label = str(custom)
+        code = self._custom_codes.get(label)
+        if code is None:
+            with self._lock:
+                code = self._custom_codes.get(label)
+                if code is None:
+                    code = CUSTOM_TOPIC_BASE + len(self._custom)
+                    self._custom.append(sys.intern(label))
+                    self._custom_codes[label] = code
+        return code
+
+    def code_for_label(self, label: str) -> int:
+        """topic_labels() の逆変換（保存したラベルからコードに戻す）"""
+        if label in MANAGED_TOPICS:
+            return self.code({"managed_memory_topic": label})
+        return self.code({"custom_memory_topic_label": label})
+
+    def label(self, code: int) -> str:
+        if code >= CUSTOM_TOPIC_BASE:
+            return self._custom[code - CUSTOM_TOPIC_BASE]
+        return MANAGED_TOPICS[code]
+
+
+# 既定の対応表（プロセス内で共有）
+TOPICS = TopicCodes()
+
+
+def to_micros(value: object) -> int:
+    """datetime（または RFC 3339 文字列）を UNIX エポックからのマイクロ秒にする"""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if not isinstance(value, datetime.datetime):
+        raise TypeError(f"日時ではありません: {value!r}")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    delta = value - _EPOCH
+    return (delta.days * 86_400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def from_micros(micros: int) -> datetime.datetime:
+    return _EPOCH + datetime.timedelta(microseconds=micros)
+
+
+def _intern(value: object) -> str:
+    return sys.intern(str(value))
+
+
+def _compact_metadata(value: object) -> MetadataScalar:
+    scalar = metadata_value(value)
+    if isinstance(scalar, datetime.datetime):
+        return to_micros(scalar)
+    if isinstance(scalar, str):
+        return _intern(scalar)
+    return scalar if scalar is not None else ""
+
+
+class MemoryRecord:
+    """types.Memory の表示・集計用のコンパクトな写し（読み取り専用として扱う）"""
+
+    __slots__ = (
+        "name",
+        "fact",
+        "scope",
+        "metadata",
+        "topics",
+        "create_time_us",
+        "update_time_us",
+        "distance",
+    )
+
+    name: str
+    fact: str
+    # (キー, 値) のタプル（キー順）。キーと値は intern 済み
+    scope: tuple[tuple[str, str], ...]
+    metadata: tuple[tuple[str, MetadataScalar], ...]
+    topics: tuple[int, ...]
+    create_time_us: int
+    update_time_us: int
+    # retrieve() の結果から作った場合の distance（それ以外は None）
+    distance: Optional[float]
+
+    def __init__(
+        self,
+        name: str,
+        fact: str,
+        scope: tuple[tuple[str, str], ...],
+        metadata: tuple[tuple[str, MetadataScalar], ...] = (),
+        topics: tuple[int, ...] = (),
+        create_time_us: int = 0,
+        update_time_us: int = 0,
+        distance: Optional[float] = None,
+    ) -> None:
+        self.name = name
+        self.fact = fact
+        self.scope = scope
+        self.metadata = metadata
+        self.topics = topics
+        self.create_time_us = create_time_us
+        self.update_time_us = update_time_us
+        self.distance = distance
+
+    def __repr__(self) -> str:
+        return f"MemoryRecord(name={self.name!r}, fact={self.fact!r}, scope={self.scope_dict()!r})"
+
+    @classmethod
+    def from_memory(
+        cls,
+        memory: Union["types.Memory", "types.RetrieveMemoriesResponseRetrievedMemory"],
+        *,
+        topics: TopicCodes = TOPICS,
+    ) -> "MemoryRecord":
+        """types.Memory（または retrieve() の結果）から作る"""
+        distance = None
+        if not hasattr(memory, "fact"):  # retrieve() の結果（memory / distance を持つ）
+            distance = getattr(memory, "distance", None)
+            memory = getattr(memory, "memory")
+        scope = getattr(memory, "scope", None) or {}
+        metadata = getattr(memory, "metadata", None) or {}
+        return cls(
+            name=str(getattr(memory, "name", "") or ""),
+            fact=str(getattr(memory, "fact", "") or ""),
+            scope=tuple(sorted((_intern(k), _intern(v)) for k, v in scope.items())),
+            metadata=tuple(
+                sorted((_intern(k), _compact_metadata(v)) for k, v in metadata.items())
+            ),
+            topics=tuple(topics.code(t) for t in getattr(memory, "topics", None) or ()),
+            create_time_us=to_micros(getattr(memory, "create_time", None)),
+            update_time_us=to_micros(getattr(memory, "update_time", None)),
+            distance=float(distance) if distance is not None else None,
+        )
+
+    @property
+    def create_time(self) -> datetime.datetime:
+        return from_micros(self.create_time_us)
+
+    @property
+    def update_time(self) -> datetime.datetime:
+        return from_micros(self.update_time_us)
+
+    def scope_dict(self) -> dict[str, str]:
+        return dict(self.scope)
+
+    def metadata_dict(self) -> dict[str, MetadataScalar]:
+        return dict(self.metadata)
+
+    def topic_labels(self, topics: TopicCodes = TOPICS) -> list[str]:
+        return [topics.label(code) for code in self.topics]
+
+
+def compact(
+    memories: Iterable[Union["types.Memory", "types.RetrieveMemoriesResponseRetrievedMemory"]],
+    *,
+    topics: TopicCodes = TOPICS,
+) -> Iterator[MemoryRecord]:
+    """メモリを 1 件ずつ MemoryRecord に変換する（ストリーミングと組み合わせられる）"""
+    for memory in memories:
+        yield MemoryRecord.from_memory(memory, topics=topics)
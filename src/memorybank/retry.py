@@ -0,0 +1,94 @@
+"""
+リトライ・ポーリング間隔の計算
+
+指数バックオフ + ジッター（Full Jitter）の待ち時間を求める。
+複数のクライアントが同じタイミングで再試行して負荷が集中するのを避けるため、
+上限まで伸ばした間隔の中からランダムに待ち時間を選ぶ。
+
+call_with_retry() は一時的なエラー（429 / 503 など）だけを再試行する。
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def backoff_delay(
+    attempt: int,
+    *,
+    base_seconds: float = 0.5,
+    max_seconds: float = 10.0,
+    multiplier: float = 2.0,
+    jitter: bool = True,
+    rand: Callable[[], float] = random.random,
+) -> float:
+    """attempt 回目（0 始まり）の待ち時間（秒）を返す
+
+    jitter=True の場合は [base, 上限] の範囲からランダムに選ぶ。
+    base を下限にすることで、ポーリング間隔が極端に短くなるのを防ぐ。
+    """
+    ceiling = min(max_seconds, base_seconds * (multiplier ** max(attempt, 0)))
+    if not jitter:
+        return ceiling
+    return base_seconds + (ceiling - base_seconds) * rand()
+
+
+# 再試行すれば成功する可能性があるエラー（HTTP ステータス / gRPC ステータス）
+TRANSIENT_CODES = frozenset({408, 429, 500, 502, 503, 504})
+TRANSIENT_STATUSES = frozenset(
+    {"RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL", "ABORTED"}
+)
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """一時的なエラー（クォータ超過・サーバ過負荷・タイムアウト等）かどうか
+
+    google.genai.errors.APIError（と StubApiError）は code / status を持つ。
+    """
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    code = getattr(error, "code", None)
+    status = getattr(error, "status", None)
+    return code in TRANSIENT_CODES or status in TRANSIENT_STATUSES
+
+
+def is_throttled(error: BaseException) -> bool:
+    """クォータ超過（429 / RESOURCE_EXHAUSTED）かどうか
+
+    サーバが処理する前に拒否されているため、冪等でない呼び出し（create など）でも再試行できる。
+    """
+    return getattr(error, "code", None) == 429 or getattr(error, "status", None) == "RESOURCE_EXHAUSTED"
+
+
+def call_with_retry(
+    call: Callable[[], T],
+    *,
+    max_attempts: int = 5,
+    base_seconds: float = 0.5,
+    max_seconds: float = 10.0,
+    retryable: Callable[[BaseException], bool] = is_transient_error,
+    sleep: Callable[[float], None] = time.sleep,
+    on_retry: Optional[Callable[[int, BaseException], None]] = None,
+) -> T:
+    """call() を実行し、一時的なエラーなら指数バックオフ + ジッターで再試行する
+
+    max_attempts 回失敗するか、再試行できないエラーが出たらその例外を送出する。
+    on_retry(attempt, error) は再試行の直前に呼ばれる（回数の集計用）。
+    """
+    attempt = 0
+    while True:
+        try:
+            return call()
+        except Exception as e:
+            attempt += 1
+            if attempt >= max_attempts or not retryable(e):
+                raise
+            if on_retry is not None:
+                on_retry(attempt, e)
+            sleep(
+                backoff_delay(attempt - 1, base_seconds=base_seconds, max_seconds=max_seconds)
+            )
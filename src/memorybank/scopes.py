@@ -0,0 +1,137 @@
+"""
+スコープの正規化
+
+スコープは最大5要素の辞書（複合キー）で、retrieve() は「完全一致」でしか
+取得できない（記事 3-2 (2)）。キーの並び順は意味を持たないため、
+キャッシュやインデックスのキーとしてはソート済みのタプルに正規化して使う。
+
+ScopeIndex は正規化したスコープのハッシュ索引と、要素（キー=値）ごとの転置索引を持ち、
+完全一致と「user_id=X を含むスコープ」の両方を全件走査せずに引く。
+"""
+
+from __future__ import annotations
+
+from typing import Generic, Iterable, Mapping, Optional, TypeVar
+
+T = TypeVar("T")
+
+# スコープに指定できる要素数の上限
+MAX_SCOPE_KEYS = 5
+
+# 正規化したスコープ: (("system_id", "order_management"), ("user_id", "user_123"))
+ScopeKey = tuple[tuple[str, str], ...]
+
+
+def scope_key(scope: Mapping[str, str]) -> ScopeKey:
+    """スコープ辞書をキーの順序に依存しないタプルに正規化する"""
+    if not scope:
+        raise ValueError("scope は1要素以上を指定してください")
+    if len(scope) > MAX_SCOPE_KEYS:
+        raise ValueError(f"scope の要素数は最大 {MAX_SCOPE_KEYS} です: {dict(scope)}")
+    return tuple(sorted((str(k), str(v)) for k, v in scope.items()))
+
+
+def scope_dict(key: ScopeKey) -> dict[str, str]:
+    """scope_key() の逆変換"""
+    return dict(key)
+
+
+def item_scope_key(item: object) -> ScopeKey:
+    """メモリ（types.Memory / StubMemory / MemoryRecord / 辞書）の scope を正規化する"""
+    scope = item.get("scope") if isinstance(item, Mapping) else getattr(item, "scope", None)
+    if isinstance(scope, tuple):  # MemoryRecord（ソート済みのタプル）
+        return scope
+    if isinstance(scope, Mapping):
+        return scope_key(scope)
+    raise ValueError(f"scope がありません: {item!r}")
+
+
+def _item_name(item: object) -> str:
+    name = item.get("name") if isinstance(item, Mapping) else getattr(item, "name", None)
+    if not name:
+        raise ValueError(f"name がありません: {item!r}")
+    return str(name)
+
+
+class ScopeIndex(Generic[T]):
+    """name と scope を持つメモリのスコープ索引（list() の結果などをローカルで引く）
+
+      index = ScopeIndex(compact(stream_list(client, AGENT_ENGINE_NAME)))
+      index.exact(SCOPE)                          # retrieve() と同じ完全一致（ハッシュ 1 回）
+      index.scopes_with({"user_id": "user_123"})  # user_id=user_123 を含むスコープ
+      index.matching({"user_id": "user_123"})     # それらのスコープのメモリ
+
+    スコープの要素（キー=値）ごとにスコープの集合（転置リスト）を持ち、scopes_with() は
+    短い転置リストから順に積集合をとるため、全メモリを走査しない。
+    サーバ側ではスコープをまたぐ検索はできない（記事 3-2 (2) のアンチパターン）ため、
+    これはデバッグ・運用ツール向け。スレッドセーフではない。
+    """
+
+    def __init__(self, items: Iterable[T] = ()) -> None:
+        self._by_scope: dict[ScopeKey, dict[str, T]] = {}
+        self._scope_of: dict[str, ScopeKey] = {}
+        # (キー, 値) → その要素を含むスコープ
+        self._postings: dict[tuple[str, str], set[ScopeKey]] = {}
+        for item in items:
+            self.add(item)
+
+    def __len__(self) -> int:
+        return len(self._scope_of)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._scope_of
+
+    def add(self, item: T) -> None:
+        """追加する（同じ name があれば置き換える。スコープが変わっていれば付け替える）"""
+        name = _item_name(item)
+        key = item_scope_key(item)
+        if self._scope_of.get(name, key) != key:
+            self.remove(name)
+        bucket = self._by_scope.get(key)
+        if bucket is None:
+            bucket = self._by_scope[key] = {}
+            for component in key:
+                self._postings.setdefault(component, set()).add(key)
+        bucket[name] = item
+        self._scope_of[name] = key
+
+    def remove(self, name: str) -> Optional[T]:
+        """削除して、削除したメモリを返す（なければ None）"""
+        key = self._scope_of.pop(name, None)
+        if key is None:
+            return None
+        bucket = self._by_scope[key]
+        item = bucket.pop(name)
+        if not bucket:
+            del self._by_scope[key]
+            for component in key:
+                scopes = self._postings[component]
+                scopes.discard(key)
+                if not scopes:
+                    del self._postings[component]
+        return item
+
+    def scopes(self) -> list[ScopeKey]:
+        return list(self._by_scope)
+
+    def exact(self, scope: Mapping[str, str]) -> list[T]:
+        """scope に完全一致するメモリ（retrieve() と同じ条件）"""
+        bucket = self._by_scope.get(scope_key(scope))
+        return list(bucket.values()) if bucket else []
+
+    def scopes_with(self, components: Mapping[str, str]) -> list[ScopeKey]:
+        """components の要素をすべて含むスコープ（部分一致。空なら全スコープ）"""
+        if not components:
+            return self.scopes()
+        postings: list[set[ScopeKey]] = []
+        for component in scope_key(components):
+            scopes = self._postings.get(component)
+            if not scopes:
+                return []
+            postings.append(scopes)
+        postings.sort(key=len)
+        return list(postings[0].intersection(*postings[1:]))
+
+    def matching(self, components: Mapping[str, str]) -> list[T]:
+        """components の要素をすべて含むスコープのメモリ"""
+        return [item for key in self.scopes_with(components) for item in self._by_scope[key].values()]
@@ -0,0 +1,141 @@
+"""
+retrieve() / list() のストリーミング読み出し
+
+各スクリプトは `list(pager)` でページャを最後まで読んでから表示していた。
+list() は Agent Engine 全体（全スコープ）を返すため、件数が多いと
+すべてのページがメモリに載り、最初の 1 件を表示するまでに全ページ分待つことになる。
+
+  for memory in stream_list(client, AGENT_ENGINE_NAME, page_size=100):
+      ...                                     # 1 ページずつ届く
+
+  first_20 = list(itertools.islice(stream_list(client, AGENT_ENGINE_NAME), 20))
+                                              # 20 件読んだら以降のページは取得しない
+
+  - 現在のページを処理している間に、次のページをバックグラウンドで先読みする
+  - 保持するのは「処理中のページ + 先読みした 1 ページ」だけ（件数によらず一定）
+  - ジェネレータを閉じる（islice で打ち切る / break する）と、それ以上ページを取得しない
+    （先読み中だった 1 ページ分だけは無駄になる）
+  - 途中に空のページがあっても終わりとはみなさない（next_page() が IndexError を
+    送出する = 次のページのトークンがない、まで読む）。空のページは返さない
+"""
+
+from __future__ import annotations
+
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterator, Mapping, Optional, Protocol, TypeVar
+
+if TYPE_CHECKING:
+    import vertexai
+    from vertexai._genai import types
+
+T = TypeVar("T")
+T_co = TypeVar("T_co", covariant=True)
+
+DEFAULT_PAGE_SIZE = 100
+
+
+class PagerLike(Protocol[T_co]):
+    """google.genai.pagers.Pager のうち、ここで使う部分"""
+
+    @property
+    def page(self) -> list[T_co]: ...
+
+    def next_page(self) -> list[T_co]: ...
+
+
+@dataclass
+class StreamStats:
+    """ストリーミングの計測値"""
+
+    pages: int = 0
+    items: int = 0
+    # 呼び出し側が次のページを待って止まっていた時間（先読みが間に合わなかった分）
+    wait_seconds: float = 0.0
+
+
+def _next_page(pager: "PagerLike[T]") -> Optional[list[T]]:
+    try:
+        return pager.next_page()
+    except IndexError:  # 最後のページ
+        return None
+
+
+def stream_pages(
+    pager: "PagerLike[T]",
+    *,
+    prefetch: bool = True,
+    stats: Optional[StreamStats] = None,
+) -> Iterator[list[T]]:
+    """ページャを 1 ページずつ返す（prefetch=True なら次のページを先読みする）"""
+    stats = stats if stats is not None else StreamStats()
+    page: Optional[list[T]] = pager.page
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="page-prefetch") if prefetch else None
+    try:
+        while page is not None:
+            upcoming: Optional[Future[Optional[list[T]]]] = None
+            if pool is not None:
+                upcoming = pool.submit(_next_page, pager)
+            if page:
+                stats.pages += 1
+                stats.items += len(page)
+                yield page
+            started = time.perf_counter()
+            page = upcoming.result() if upcoming is not None else _next_page(pager)
+            stats.wait_seconds += time.perf_counter() - started
+    finally:
+        if pool is not None:
+            # 打ち切られた場合は先読みの完了を待たない
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def stream_items(
+    pager: "PagerLike[T]",
+    *,
+    prefetch: bool = True,
+    stats: Optional[StreamStats] = None,
+) -> Iterator[T]:
+    """ページャの要素を 1 件ずつ返す（ページ単位で先読みする）"""
+    for page in stream_pages(pager, prefetch=prefetch, stats=stats):
+        yield from page
+
+
+def stream_list(
+    client: "vertexai.Client",
+    engine_name: str,
+    *,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    filter: Optional[str] = None,
+    order_by: Optional[str] = None,
+    prefetch: bool = True,
+    stats: Optional[StreamStats] = None,
+) -> Iterator["types.Memory"]:
+    """memories.list() を 1 件ずつ返す（Agent Engine 全体を対象にしても一定のメモリで動く）"""
+    config: dict[str, object] = {"page_size": page_size}
+    if filter:
+        config["filter"] = filter
+    if order_by:
+        config["order_by"] = order_by
+    pager = client.agent_engines.memories.list(name=engine_name, config=config)
+    return stream_items(pager, prefetch=prefetch, stats=stats)
+
+
+def stream_retrieve(
+    client: "vertexai.Client",
+    engine_name: str,
+    scope: dict[str, str],
+    *,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    config: Optional[Mapping[str, object]] = None,
+    prefetch: bool = True,
+    stats: Optional[StreamStats] = None,
+) -> Iterator["types.RetrieveMemoriesResponseRetrievedMemory"]:
+    """スコープ内のメモリを retrieve() で 1 件ずつ返す（simple_retrieval_params でページ分割）"""
+    pager = client.agent_engines.memories.retrieve(
+        name=engine_name,
+        scope=scope,
+        simple_retrieval_params={"page_size": page_size},
+        config=config,
+    )
+    return stream_items(pager, prefetch=prefetch, stats=stats)
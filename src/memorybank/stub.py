@@ -0,0 +1,980 @@
+"""
+ローカル検証用のスタブクライアント
+
+vertexai.Client の `agent_engines` のうち、このリポジトリで使う部分だけを
+プロセス内で模倣する。GCP に接続せずにベンチマークを取るためのもので、
+各メソッドは LatencyModel に従って待機してから結果を返す。
+
+  stub = StubClient(latency=LatencyModel(mean_seconds=0.02))
+  stub.agent_engines.sessions.create(name=..., user_id=...)
+  stub.calls["sessions.events.append"]  # メソッドごとの呼び出し回数
+  await stub.aio.agent_engines.memories.get(name=...)  # asyncio 版（client.aio と同じ形）
+
+generate() は LLM を使わず、統合ルール（ConsolidationRule）で user の text パートを
+CREATED / UPDATED / DELETED に振り分ける。既定の append_only は「text パート 1 つ = CREATED 1 件」、
+KeyedConsolidation は「キーは値」の形の fact をキーが同じ既存メモリに統合する決定的なルール。
+fact の内容よりも RPC の回数・順序・件数を検証するためのもの。
+
+メモリは (Agent Engine, 正規化したスコープ) ごとの索引に入るため、retrieve() の費用は
+全件数ではなくスコープ内の件数で決まる（負荷試験で数万 ops/s を出せる）。
+作成・更新・削除・ロールバックのたびにリビジョンを記録し、revisions.list() /
+revisions.get() / rollback() で参照できる。similarity_search_params の search_query は
+文字 bigram の Jaccard 距離で並べる（埋め込みモデルの距離とは異なる）。
+wait_for_completion=False の generate() は done=False のオペレーションを返し、
+operation_latency だけ経過すると _get_generate_memories_operation() で done=True になる。
+purge のオペレーションは SDK と同じく、_get_memory_operation() では purge_count が失われ、
+memories._api_client.request("get", ...) の JSON（purgeCount）でだけ読める。
+set_failure_rate() で一時的なエラー（503）を一定確率で発生させられる。
+set_rate_limit() でクォータ（1 秒あたりの呼び出し数）を設定すると、超えた呼び出しは 429 になる。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import contextvars
+import datetime
+import functools
+import itertools
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Generic, Iterator, Optional, Sequence, TypeVar
+
+from memorybank.filters import FilterSyntaxError, compile_config, compile_filter
+from memorybank.scopes import ScopeIndex, ScopeKey, scope_key
+
+T = TypeVar("T")
+
+# asyncio 版から呼ばれている間は time.sleep せず、待ち時間をここに積む
+_deferred_latency: contextvars.ContextVar[Optional[list[float]]] = contextvars.ContextVar(
+    "deferred_latency", default=None
+)
+
+
+class StubApiError(Exception):
+    """google.genai.errors.APIError と同じく code / status を持つ例外"""
+
+    def __init__(self, code: int, status: str, message: str) -> None:
+        super().__init__(f"{code} {status}. {message}")
+        self.code = code
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class LatencyModel:
+    """1 回の RPC にかかる待ち時間（平均 ± ジッター、秒）"""
+
+    mean_seconds: float = 0.0
+    jitter_seconds: float = 0.0
+
+    def sample(self) -> float:
+        if self.jitter_seconds <= 0:
+            return self.mean_seconds
+        return max(0.0, random.uniform(
+            self.mean_seconds - self.jitter_seconds,
+            self.mean_seconds + self.jitter_seconds,
+        ))
+
+
+@dataclass
+class _StubQuota:
+    """トークンバケット（per_second で補充、burst まで貯まる）"""
+
+    per_second: float
+    burst: float
+    tokens: float = 0.0
+    updated: float = field(default_factory=time.monotonic)
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.per_second)
+        self.updated = now
+        if self.tokens < 1.0:
+            return False
+        self.tokens -= 1.0
+        return True
+
+
+@dataclass
+class StubSession:
+    name: str
+    user_id: str
+
+
+@dataclass
+class StubEvent:
+    author: str
+    invocation_id: str
+    timestamp: datetime.datetime
+    content: dict[str, object]
+
+
+@dataclass
+class StubMetadataValue:
+    string_value: Optional[str] = None
+    double_value: Optional[float] = None
+    bool_value: Optional[bool] = None
+    timestamp_value: Optional[datetime.datetime] = None
+
+
+@dataclass
+class StubMemory:
+    """SDK の types.Memory と同じ属性を持つメモリ"""
+
+    name: str
+    fact: str
+    scope: dict[str, str]
+    create_time: datetime.datetime
+    update_time: datetime.datetime
+    metadata: Optional[dict[str, StubMetadataValue]] = None
+    topics: Optional[list[dict[str, str]]] = None
+
+
+@dataclass
+class StubRetrievedMemory:
+    """SDK の RetrieveMemoriesResponseRetrievedMemory と同じ属性を持つ"""
+
+    memory: StubMemory
+    distance: Optional[float] = None
+
+
+@dataclass
+class StubExtractedMemory:
+    fact: str
+
+
+@dataclass
+class StubMemoryRevision:
+    """SDK の types.MemoryRevision と同じ属性を持つ（削除時のリビジョンは fact が空）"""
+
+    name: str
+    fact: str
+    create_time: datetime.datetime
+    labels: Optional[dict[str, str]] = None
+    extracted_memories: Optional[list[StubExtractedMemory]] = None
+
+
+@dataclass
+class StubMemoryRef:
+    name: str
+    # SDK と同じく、generate() の応答には fact が入らない（hydrate_generated() で取得する）
+    fact: Optional[str] = None
+
+
+@dataclass
+class StubGeneratedMemory:
+    memory: StubMemoryRef
+    action: str
+    previous_revision: Optional[str] = None
+
+
+@dataclass
+class StubGenerateResponse:
+    generated_memories: list[StubGeneratedMemory]
+
+
+@dataclass
+class StubPurgeResponse:
+    purge_count: int
+
+
+@dataclass
+class StubOperation(Generic[T]):
+    """SDK の Operation と同じく done / response を持つ"""
+
+    response: Optional[T] = None
+    done: bool = True
+    name: Optional[str] = None
+    error: Optional[dict[str, object]] = None
+
+
+ACTION_CREATED = "CREATED"
+ACTION_UPDATED = "UPDATED"
+ACTION_DELETED = "DELETED"
+
+
+@dataclass(frozen=True)
+class ConsolidationAction:
+    """統合ルールが返す 1 件分の操作"""
+
+    action: str
+    fact: str = ""
+    # UPDATED / DELETED の対象（既存メモリの name）
+    target: Optional[str] = None
+
+
+# (スコープ内の既存メモリ, user の text パート) → 操作の列
+ConsolidationRule = Callable[[Sequence["StubMemory"], Sequence[str]], list[ConsolidationAction]]
+
+
+def append_only(existing: Sequence["StubMemory"], texts: Sequence[str]) -> list[ConsolidationAction]:
+    """既定の統合ルール: text パートごとにメモリを 1 件作る（既存のメモリは変更しない）"""
+    return [ConsolidationAction(ACTION_CREATED, text) for text in texts]
+
+
+class KeyedConsolidation:
+    """「キー<separator>値」の形の fact を、キーが同じ既存メモリに統合する決定的なルール
+
+      「A4用紙の業者はC社」（既存:「A4用紙の業者はA社」）→ UPDATED
+      既存と同じ fact                                       → 何もしない
+      forget_markers を含み、キーが同じメモリがある         → DELETED
+      それ以外                                               → CREATED
+
+    同じ generate() の中でキーが重なる text は、後のものに統合する
+    （text を 1 件ずつ generate() した場合と同じ結果になる）。
+    """
+
+    def __init__(self, separator: str = "は", forget_markers: Sequence[str] = ("忘れて",)) -> None:
+        self.separator = separator
+        self.forget_markers = tuple(forget_markers)
+
+    def key(self, fact: str) -> Optional[str]:
+        head, sep, _ = fact.partition(self.separator)
+        return (head.strip() or None) if sep else None
+
+    def __call__(self, existing: Sequence["StubMemory"], texts: Sequence[str]) -> list[ConsolidationAction]:
+        # 現在の fact（同じ呼び出しの中で更新・削除したものを反映する）
+        facts = collections.Counter(m.fact for m in existing)
+        # キー → 既存メモリの name、または同じ呼び出しで作る操作の位置
+        targets: dict[str, object] = {}
+        # キー → そのキーの現在の fact
+        current: dict[str, str] = {}
+        for memory in existing:
+            key = self.key(memory.fact)
+            if key is not None:
+                targets[key] = memory.name
+                current[key] = memory.fact
+        actions: list[Optional[ConsolidationAction]] = []
+        for text in texts:
+            forget = any(marker in text for marker in self.forget_markers)
+            if not forget and facts[text]:
+                continue
+            key = self.key(text)
+            target = targets.get(key) if key is not None else None
+            if key is not None and target is not None:
+                facts[current.pop(key)] -= 1
+            if isinstance(target, int):  # 同じ呼び出しで作る・更新するメモリ
+                previous = actions[target]
+                assert previous is not None
+                if forget:
+                    actions[target] = (
+                        None if previous.action == ACTION_CREATED
+                        else ConsolidationAction(ACTION_DELETED, target=previous.target)
+                    )
+                    targets.pop(key, None)  # type: ignore[arg-type]
+                else:
+                    actions[target] = ConsolidationAction(previous.action, text, previous.target)
+            elif isinstance(target, str):
+                actions.append(
+                    ConsolidationAction(ACTION_DELETED if forget else ACTION_UPDATED,
+                                        "" if forget else text, target)
+                )
+                if forget:
+                    targets.pop(key, None)  # type: ignore[arg-type]
+                else:
+                    targets[key] = len(actions) - 1  # type: ignore[index]
+            elif not forget:
+                actions.append(ConsolidationAction(ACTION_CREATED, text))
+                if key is not None:
+                    targets[key] = len(actions) - 1
+            if not forget:
+                facts[text] += 1
+                if key is not None:
+                    current[key] = text
+        return [a for a in actions if a is not None]
+
+
+@functools.lru_cache(maxsize=65536)
+def _bigrams(text: str) -> frozenset[str]:
+    text = text.casefold()
+    return frozenset(text[i : i + 2] for i in range(max(len(text) - 1, 1)))
+
+
+def _text_distance(query: str, fact: str) -> float:
+    """文字 bigram の Jaccard 距離（0 = 同じ、1 = 重なりなし）"""
+    a, b = _bigrams(query), _bigrams(fact)
+    union = len(a | b)
+    return 1.0 - len(a & b) / union if union else 1.0
+
+
+def _engine_of(memory_name: str) -> str:
+    return memory_name.rsplit("/memories/", 1)[0]
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(tz=datetime.timezone.utc)
+
+
+def _metadata_from_config(
+    config: Optional[dict[str, object]],
+) -> Optional[dict[str, StubMetadataValue]]:
+    raw = (config or {}).get("metadata")
+    if not isinstance(raw, dict):
+        return None
+    return {key: StubMetadataValue(**value) for key, value in raw.items()}
+
+
+def _user_texts(events: list[dict[str, object]]) -> list[str]:
+    """イベント（content 辞書）から user ロールの text パートを取り出す"""
+    texts: list[str] = []
+    for event in events:
+        content = event.get("content", {})
+        if not isinstance(content, dict) or content.get("role") != "user":
+            continue
+        for part in content.get("parts", []):
+            if isinstance(part, dict) and part.get("text"):
+                texts.append(str(part["text"]))
+    return texts
+
+
+@dataclass
+class _StubState:
+    """スタブ全体で共有する状態（呼び出し回数・保存データ）"""
+
+    default_latency: LatencyModel
+    latencies: dict[str, LatencyModel]
+    calls: collections.Counter[str] = field(default_factory=collections.Counter)
+    sessions: dict[str, StubSession] = field(default_factory=dict)
+    events: dict[str, list[StubEvent]] = field(default_factory=dict)
+    memories: dict[str, StubMemory] = field(default_factory=dict)
+    # Agent Engine → スコープの索引（retrieve() / generate() 用）
+    scopes: dict[str, ScopeIndex[StubMemory]] = field(default_factory=dict)
+    # メモリの name → リビジョン（古い順。削除後も残る）
+    revisions: dict[str, list[StubMemoryRevision]] = field(default_factory=dict)
+    consolidation: ConsolidationRule = append_only
+    # オペレーション名 → (完了時刻, 完了後に返すオペレーション)
+    operations: dict[str, tuple[float, StubOperation[object]]] = field(default_factory=dict)
+    operation_latency: LatencyModel = field(default_factory=LatencyModel)
+    # メソッド名（"" は全メソッド）→ 503 UNAVAILABLE を返す確率
+    failure_rates: dict[str, float] = field(default_factory=dict)
+    # メソッド名（"" は全メソッド共通）→ クォータ
+    quotas: dict[str, _StubQuota] = field(default_factory=dict)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    ids: itertools.count[int] = field(default_factory=lambda: itertools.count(1))
+
+    def rpc(self, method: str) -> None:
+        """呼び出し回数を数え、メソッドごとのレイテンシだけ待機する（一定確率で 503、クォータ超過で 429）"""
+        with self.lock:
+            self.calls[method] += 1
+            quota = self.quotas.get(method, self.quotas.get(""))
+            if quota is not None and not quota.take():
+                self.calls[f"{method}:throttled"] += 1
+                raise StubApiError(429, "RESOURCE_EXHAUSTED", f"Quota exceeded for {method}.")
+        seconds = self.latencies.get(method, self.default_latency).sample()
+        deferred = _deferred_latency.get()
+        if deferred is not None:
+            deferred.append(seconds)
+        elif seconds > 0:
+            time.sleep(seconds)
+        rate = self.failure_rates.get(method, self.failure_rates.get("", 0.0))
+        if rate > 0 and random.random() < rate:
+            with self.lock:
+                self.calls[f"{method}:failed"] += 1
+            raise StubApiError(503, "UNAVAILABLE", f"{method} is temporarily unavailable.")
+
+    def next_id(self) -> int:
+        with self.lock:
+            return next(self.ids)
+
+    # 以下のメソッド（add_revision 〜 remove_memory）は self.lock を取得した状態で呼ぶ
+    def add_revision(
+        self,
+        memory_name: str,
+        fact: str,
+        labels: Optional[dict[str, str]] = None,
+        extracted: Optional[list[str]] = None,
+    ) -> str:
+        revision = StubMemoryRevision(
+            name=f"{memory_name}/revisions/{next(self.ids)}",
+            fact=fact,
+            create_time=_now(),
+            labels=dict(labels) if labels else None,
+            extracted_memories=[StubExtractedMemory(f) for f in extracted] if extracted else None,
+        )
+        self.revisions.setdefault(memory_name, []).append(revision)
+        return revision.name
+
+    def scope_index(self, engine_name: str) -> ScopeIndex[StubMemory]:
+        index = self.scopes.get(engine_name)
+        if index is None:
+            index = self.scopes[engine_name] = ScopeIndex()
+        return index
+
+    def add_memory(
+        self, memory: StubMemory, labels: Optional[dict[str, str]] = None, extracted: bool = False
+    ) -> None:
+        self.memories[memory.name] = memory
+        self.scope_index(_engine_of(memory.name)).add(memory)
+        self.add_revision(memory.name, memory.fact, labels, [memory.fact] if extracted else None)
+
+    def update_memory(
+        self,
+        memory: StubMemory,
+        *,
+        fact: Optional[str] = None,
+        scope: Optional[dict[str, str]] = None,
+        metadata: Optional[dict[str, StubMetadataValue]] = None,
+        labels: Optional[dict[str, str]] = None,
+        extracted: bool = False,
+    ) -> Optional[str]:
+        """メモリを書き換えて新しいリビジョンを記録し、直前のリビジョン名を返す"""
+        previous = self.revisions.get(memory.name, [])
+        previous_name = previous[-1].name if previous else None
+        if scope is not None:
+            memory.scope = dict(scope)
+            self.scope_index(_engine_of(memory.name)).add(memory)  # 索引のスコープを付け替える
+        if fact is not None:
+            memory.fact = fact
+        if metadata is not None:
+            memory.metadata = metadata
+        memory.update_time = _now()
+        self.add_revision(memory.name, memory.fact, labels, [memory.fact] if extracted else None)
+        return previous_name
+
+    def remove_memory(self, name: str) -> Optional[str]:
+        """メモリを削除して fact が空のリビジョンを記録し、直前のリビジョン名を返す（なければ None）"""
+        memory = self.memories.pop(name, None)
+        if memory is None:
+            return None
+        self.scope_index(_engine_of(name)).remove(name)
+        previous = self.revisions.get(name, [])
+        previous_name = previous[-1].name if previous else name
+        self.add_revision(name, "")
+        return previous_name
+
+    def start_operation(self, engine_name: str, done: StubOperation[T]) -> StubOperation[T]:
+        """完了済みの結果を operation_latency 後に返す未完了オペレーションを作る"""
+        name = f"{engine_name}/operations/{self.next_id()}"
+        done.name = name
+        ready_at = time.monotonic() + self.operation_latency.sample()
+        with self.lock:
+            self.operations[name] = (ready_at, done)  # type: ignore[assignment]
+        return StubOperation(name=name, done=False)
+
+    def poll_operation(self, name: str) -> StubOperation[object]:
+        with self.lock:
+            entry = self.operations.get(name)
+        if entry is None:
+            raise StubApiError(404, "NOT_FOUND", f"Operation {name} not found.")
+        ready_at, done = entry
+        if time.monotonic() < ready_at:
+            return StubOperation(name=name, done=False)
+        return done
+
+
+class StubPager(Generic[T]):
+    """google.genai.pagers.Pager と同じく page / next_page() / 反復を持つ
+
+    2 ページ目以降を取得するたびに RPC 1 回として数える（レイテンシも同じ）。
+    """
+
+    def __init__(
+        self,
+        state: _StubState,
+        method: str,
+        items: list[T],
+        page_size: Optional[int] = None,
+    ) -> None:
+        self._state = state
+        self._method = method
+        self._items = items
+        self.page_size = page_size or max(len(items), 1)
+        self._offset = 0
+        self._page = items[: self.page_size]
+
+    @property
+    def page(self) -> list[T]:
+        return self._page
+
+    def __len__(self) -> int:
+        return len(self._page)
+
+    def next_page(self) -> list[T]:
+        if self._offset + self.page_size >= len(self._items):
+            raise IndexError("No more pages to fetch.")
+        self._state.rpc(self._method)
+        self._offset += self.page_size
+        self._page = self._items[self._offset : self._offset + self.page_size]
+        return self._page
+
+    def __iter__(self) -> Iterator[T]:
+        while True:
+            yield from self._page
+            try:
+                self.next_page()
+            except IndexError:
+                return
+
+
+def _page_size(params: Optional[dict[str, object]]) -> Optional[int]:
+    value = (params or {}).get("page_size")
+    return int(str(value)) if value else None
+
+
+class _StubSessionEvents:
+    def __init__(self, state: _StubState) -> None:
+        self._state = state
+
+    def append(
+        self,
+        *,
+        name: str,
+        author: str,
+        invocation_id: str,
+        timestamp: datetime.datetime,
+        config: Optional[dict[str, dict[str, object]]] = None,
+    ) -> None:
+        self._state.rpc("sessions.events.append")
+        if name not in self._state.sessions:
+            raise StubApiError(404, "NOT_FOUND", f"Session {name} not found.")
+        content = (config or {}).get("content", {})
+        with self._state.lock:
+            self._state.events[name].append(
+                StubEvent(author, invocation_id, timestamp, content)
+            )
+
+    def list(self, *, name: str) -> list[StubEvent]:
+        """timestamp 順に並べたイベント一覧（Sessions API と同じ並び）"""
+        self._state.rpc("sessions.events.list")
+        with self._state.lock:
+            return sorted(self._state.events.get(name, []), key=lambda e: e.timestamp)
+
+
+class _StubSessions:
+    def __init__(self, state: _StubState) -> None:
+        self._state = state
+        self.events = _StubSessionEvents(state)
+
+    def create(self, *, name: str, user_id: str) -> StubOperation[StubSession]:
+        self._state.rpc("sessions.create")
+        session = StubSession(
+            name=f"{name}/sessions/{self._state.next_id()}",
+            user_id=user_id,
+        )
+        with self._state.lock:
+            self._state.sessions[session.name] = session
+            self._state.events[session.name] = []
+        return StubOperation(response=session)
+
+
+def _revision_labels(config: Optional[dict[str, object]]) -> Optional[dict[str, str]]:
+    labels = (config or {}).get("revision_labels")
+    return {str(k): str(v) for k, v in labels.items()} if isinstance(labels, dict) else None
+
+
+def _scope_key_or_400(scope: dict[str, str]) -> ScopeKey:
+    try:
+        return scope_key(scope)
+    except ValueError as e:
+        raise StubApiError(400, "INVALID_ARGUMENT", str(e)) from e
+
+
+class _StubMemoryRevisions:
+    def __init__(self, state: _StubState) -> None:
+        self._state = state
+
+    def list(
+        self,
+        *,
+        name: str,
+        config: Optional[dict[str, object]] = None,
+    ) -> StubPager[StubMemoryRevision]:
+        """メモリのリビジョン（新しい順）。filter（labels.KEY="値" など）と page_size に対応"""
+        self._state.rpc("memories.revisions.list")
+        try:
+            predicate = compile_filter(str((config or {}).get("filter") or ""))
+        except FilterSyntaxError as e:
+            raise StubApiError(400, "INVALID_ARGUMENT", str(e)) from e
+        with self._state.lock:
+            revisions = self._state.revisions.get(name)
+            if revisions is None:
+                raise StubApiError(404, "NOT_FOUND", f"Memory {name} not found.")
+            matched = [r for r in reversed(revisions) if predicate(r)]
+        return StubPager(self._state, "memories.revisions.list", matched, _page_size(config))
+
+    def get(self, *, name: str) -> StubMemoryRevision:
+        self._state.rpc("memories.revisions.get")
+        memory_name = name.rsplit("/revisions/", 1)[0]
+        with self._state.lock:
+            for revision in self._state.revisions.get(memory_name, []):
+                if revision.name == name:
+                    return revision
+        raise StubApiError(404, "NOT_FOUND", f"Revision {name} not found.")
+
+
+@dataclass
+class StubHttpResponse:
+    """google.genai.types.HttpResponse と同じく body（JSON 文字列）を持つ"""
+
+    body: str
+
+
+class _StubApiClient:
+    """SDK の BaseApiClient.request() のうち、オペレーションの GET だけを模倣する"""
+
+    def __init__(self, state: _StubState) -> None:
+        self._state = state
+
+    def request(
+        self,
+        http_method: str,
+        path: str,
+        request_dict: dict[str, object],
+        http_options: Optional[dict[str, object]] = None,
+    ) -> StubHttpResponse:
+        if http_method != "get" or "/operations/" not in path:
+            raise StubApiError(501, "UNIMPLEMENTED", f"{http_method} {path} is not supported by the stub.")
+        self._state.rpc("memories.operations.get")
+        operation = self._state.poll_operation(path)
+        body: dict[str, object] = {"name": operation.name, "done": operation.done}
+        if operation.error is not None:
+            body["error"] = operation.error
+        if isinstance(operation.response, StubPurgeResponse):
+            body["response"] = {"purgeCount": operation.response.purge_count}
+        return StubHttpResponse(json.dumps(body))
+
+
+class _StubMemories:
+    def __init__(self, state: _StubState) -> None:
+        self._state = state
+        self.revisions = _StubMemoryRevisions(state)
+        self._api_client = _StubApiClient(state)
+
+    def _new_memory(
+        self,
+        engine_name: str,
+        fact: str,
+        scope: dict[str, str],
+        config: Optional[dict[str, object]],
+        *,
+        extracted: bool = False,
+    ) -> StubMemory:
+        now = _now()
+        memory = StubMemory(
+            name=f"{engine_name}/memories/{self._state.next_id()}",
+            fact=fact,
+            scope=dict(scope),
+            create_time=now,
+            update_time=now,
+            metadata=_metadata_from_config(config),
+        )
+        with self._state.lock:
+            self._state.add_memory(memory, _revision_labels(config), extracted)
+        return memory
+
+    def create(
+        self,
+        *,
+        name: str,
+        fact: str,
+        scope: dict[str, str],
+        config: Optional[dict[str, object]] = None,
+    ) -> StubOperation[StubMemory]:
+        self._state.rpc("memories.create")
+        _scope_key_or_400(scope)
+        return StubOperation(response=self._new_memory(name, fact, scope, config))
+
+    def get(self, *, name: str) -> StubMemory:
+        self._state.rpc("memories.get")
+        with self._state.lock:
+            memory = self._state.memories.get(name)
+        if memory is None:
+            raise StubApiError(404, "NOT_FOUND", f"Memory {name} not found.")
+        return memory
+
+    def _update(
+        self,
+        *,
+        name: str,
+        fact: Optional[str] = None,
+        scope: Optional[dict[str, str]] = None,
+        config: Optional[dict[str, object]] = None,
+    ) -> StubOperation[StubMemory]:
+        """fact / scope を書き換えて update_time を進める（SDK の memories._update と同じ引数）"""
+        self._state.rpc("memories.update")
+        if scope is not None:
+            _scope_key_or_400(scope)
+        with self._state.lock:
+            memory = self._state.memories.get(name)
+            if memory is None:
+                raise StubApiError(404, "NOT_FOUND", f"Memory {name} not found.")
+            self._state.update_memory(
+                memory, fact=fact, scope=scope, metadata=_metadata_from_config(config),
+                labels=_revision_labels(config),
+            )
+        return StubOperation(response=memory)
+
+    def delete(self, *, name: str, config: Optional[dict[str, object]] = None) -> None:
+        self._state.rpc("memories.delete")
+        with self._state.lock:
+            if self._state.remove_memory(name) is None:
+                raise StubApiError(404, "NOT_FOUND", f"Memory {name} not found.")
+
+    def rollback(
+        self,
+        *,
+        name: str,
+        target_revision_id: str,
+        config: Optional[dict[str, object]] = None,
+    ) -> StubOperation[None]:
+        """fact を target_revision_id のリビジョンの内容に戻す（ロールバックも新しいリビジョンになる）"""
+        self._state.rpc("memories.rollback")
+        target = f"{name}/revisions/{target_revision_id}"
+        with self._state.lock:
+            memory = self._state.memories.get(name)
+            if memory is None:
+                raise StubApiError(404, "NOT_FOUND", f"Memory {name} not found.")
+            revision = next((r for r in self._state.revisions.get(name, []) if r.name == target), None)
+            if revision is None:
+                raise StubApiError(404, "NOT_FOUND", f"Revision {target} not found.")
+            self._state.update_memory(memory, fact=revision.fact)
+        operation: StubOperation[None] = StubOperation()
+        if (config or {}).get("wait_for_completion") is False:
+            return self._state.start_operation(_engine_of(name), operation)
+        return operation
+
+    def retrieve(
+        self,
+        *,
+        name: str,
+        scope: dict[str, str],
+        similarity_search_params: Optional[dict[str, object]] = None,
+        simple_retrieval_params: Optional[dict[str, object]] = None,
+        config: Optional[dict[str, object]] = None,
+    ) -> StubPager[StubRetrievedMemory]:
+        """スコープが完全一致し、filter / filter_groups を満たすメモリを返す"""
+        self._state.rpc("memories.retrieve")
+        _scope_key_or_400(scope)
+        try:
+            predicate = compile_config(config)
+        except FilterSyntaxError as e:
+            raise StubApiError(400, "INVALID_ARGUMENT", str(e)) from e
+        with self._state.lock:
+            index = self._state.scopes.get(name)
+            candidates = index.exact(scope) if index is not None else []
+        matched = [StubRetrievedMemory(memory=m) for m in candidates if predicate(m)]
+        if similarity_search_params:
+            top_k = int(str(similarity_search_params.get("top_k", 3)))
+            query = similarity_search_params.get("search_query")
+            if query:
+                for item in matched:
+                    item.distance = _text_distance(str(query), item.memory.fact)
+                matched.sort(key=lambda item: item.distance or 0.0)
+            return StubPager(self._state, "memories.retrieve", matched[:top_k])
+        return StubPager(
+            self._state, "memories.retrieve", matched, _page_size(simple_retrieval_params)
+        )
+
+    def list(
+        self,
+        *,
+        name: str,
+        config: Optional[dict[str, object]] = None,
+    ) -> StubPager[StubMemory]:
+        """Agent Engine 内の全メモリ（スコープ横断）を返す。filter と page_size に対応"""
+        self._state.rpc("memories.list")
+        try:
+            predicate = compile_config({"filter": (config or {}).get("filter")})
+        except FilterSyntaxError as e:
+            raise StubApiError(400, "INVALID_ARGUMENT", str(e)) from e
+        prefix = f"{name}/memories/"
+        with self._state.lock:
+            matched = [
+                m for m in self._state.memories.values()
+                if m.name.startswith(prefix) and predicate(m)
+            ]
+        return StubPager(self._state, "memories.list", matched, _page_size(config))
+
+    def purge(
+        self,
+        *,
+        name: str,
+        filter: Optional[str] = None,
+        filter_groups: Optional[list[dict[str, object]]] = None,
+        force: bool = False,
+        config: Optional[dict[str, object]] = None,
+    ) -> StubOperation[StubPurgeResponse]:
+        """filter / filter_groups に合致するメモリを削除する（force=False は件数のみ）"""
+        self._state.rpc("memories.purge")
+        if not filter and not filter_groups:
+            raise StubApiError(400, "INVALID_ARGUMENT", "filter or filter_groups is required.")
+        try:
+            predicate = compile_config({"filter": filter, "filter_groups": filter_groups})
+        except FilterSyntaxError as e:
+            raise StubApiError(400, "INVALID_ARGUMENT", str(e)) from e
+        prefix = f"{name}/memories/"
+        with self._state.lock:
+            targets = [
+                m.name
+                for m in self._state.memories.values()
+                if m.name.startswith(prefix) and predicate(m)
+            ]
+            if force:
+                for target in targets:
+                    self._state.remove_memory(target)
+        operation = StubOperation(response=StubPurgeResponse(purge_count=len(targets)))
+        if (config or {}).get("wait_for_completion") is False:
+            return self._state.start_operation(name, operation)
+        return operation
+
+    def generate(
+        self,
+        *,
+        name: str,
+        vertex_session_source: Optional[dict[str, str]] = None,
+        direct_contents_source: Optional[dict[str, list[dict[str, object]]]] = None,
+        scope: Optional[dict[str, str]] = None,
+        config: Optional[dict[str, object]] = None,
+    ) -> StubOperation[StubGenerateResponse]:
+        self._state.rpc("memories.generate")
+        if vertex_session_source is not None:
+            session_name = vertex_session_source["session"]
+            with self._state.lock:
+                session = self._state.sessions[session_name]
+                events = [{"content": e.content} for e in self._state.events[session_name]]
+            scope = scope or {"user_id": session.user_id}
+        else:
+            events = list((direct_contents_source or {}).get("events", []))
+        if not scope:
+            raise StubApiError(400, "INVALID_ARGUMENT", "scope is required.")
+        _scope_key_or_400(scope)
+        with self._state.lock:
+            index = self._state.scopes.get(name)
+            existing = index.exact(scope) if index is not None else []
+        actions = self._state.consolidation(existing, _user_texts(events))
+        labels = _revision_labels(config)
+        generated: list[StubGeneratedMemory] = []
+        for action in actions:
+            if action.action == ACTION_CREATED:
+                memory = self._new_memory(name, action.fact, scope, config, extracted=True)
+                generated.append(StubGeneratedMemory(StubMemoryRef(memory.name), ACTION_CREATED))
+                continue
+            with self._state.lock:
+                target = self._state.memories.get(action.target or "")
+                if target is None:  # 統合ルールの判断後に削除された
+                    continue
+                if action.action == ACTION_UPDATED:
+                    previous = self._state.update_memory(target, fact=action.fact, labels=labels, extracted=True)
+                else:
+                    previous = self._state.remove_memory(target.name)
+            generated.append(StubGeneratedMemory(StubMemoryRef(target.name), action.action, previous))
+        operation = StubOperation(response=StubGenerateResponse(generated))
+        if (config or {}).get("wait_for_completion") is False:
+            return self._state.start_operation(name, operation)
+        return operation
+
+    def _get_generate_memories_operation(self, *, operation_name: str) -> StubOperation[object]:
+        self._state.rpc("memories.operations.get")
+        return self._state.poll_operation(operation_name)
+
+    def _get_memory_operation(self, *, operation_name: str) -> StubOperation[object]:
+        self._state.rpc("memories.operations.get")
+        operation = self._state.poll_operation(operation_name)
+        if isinstance(operation.response, StubPurgeResponse):
+            # SDK は応答を Memory として解釈するため purgeCount は残らない
+            return StubOperation(done=operation.done, name=operation.name, error=operation.error)
+        return operation
+
+
+class _StubAgentEngines:
+    def __init__(self, state: _StubState) -> None:
+        self.sessions = _StubSessions(state)
+        self.memories = _StubMemories(state)
+
+
+class _AsyncProxy:
+    """同期スタブのメソッドを、待ち時間を asyncio.sleep に置き換えたコルーチンとして公開する"""
+
+    def __init__(self, target: object) -> None:
+        self._target = target
+
+    def __getattr__(self, attr: str) -> object:
+        value = getattr(self._target, attr)
+        if not callable(value):
+            return _AsyncProxy(value)
+
+        async def _call(*args: object, **kwargs: object) -> object:
+            deferred: list[float] = []
+            token = _deferred_latency.set(deferred)
+            try:
+                result = value(*args, **kwargs)
+            finally:
+                _deferred_latency.reset(token)
+            await asyncio.sleep(sum(deferred))
+            return result
+
+        return _call
+
+
+class _StubAsyncClient:
+    def __init__(self, agent_engines: _StubAgentEngines) -> None:
+        self.agent_engines = _AsyncProxy(agent_engines)
+
+
+class StubClient:
+    """vertexai.Client の代わりに渡せるプロセス内スタブ
+
+    Args:
+        latency: 全メソッド共通のレイテンシ
+        latencies: メソッド別のレイテンシ（"sessions.events.append" など）
+        operation_latency: 非同期オペレーションが done になるまでの時間
+        consolidation: generate() の統合ルール（省略時は append_only）
+    """
+
+    def __init__(
+        self,
+        latency: Optional[LatencyModel] = None,
+        latencies: Optional[dict[str, LatencyModel]] = None,
+        operation_latency: Optional[LatencyModel] = None,
+        consolidation: Optional[ConsolidationRule] = None,
+    ) -> None:
+        self._state = _StubState(
+            default_latency=latency or LatencyModel(),
+            latencies=dict(latencies or {}),
+            operation_latency=operation_latency or LatencyModel(),
+            consolidation=consolidation or append_only,
+        )
+        self.agent_engines = _StubAgentEngines(self._state)
+        self.aio = _StubAsyncClient(self.agent_engines)
+
+    @property
+    def calls(self) -> collections.Counter[str]:
+        return self._state.calls
+
+    def set_latency(self, latency: LatencyModel, method: Optional[str] = None) -> None:
+        """レイテンシを変更する（method 省略時は全メソッド共通の値）"""
+        if method is None:
+            self._state.default_latency = latency
+        else:
+            self._state.latencies[method] = latency
+
+    def set_consolidation(self, rule: ConsolidationRule) -> None:
+        """generate() の統合ルールを差し替える"""
+        self._state.consolidation = rule
+
+    def set_failure_rate(self, rate: float, method: Optional[str] = None) -> None:
+        """一時的なエラー（503 UNAVAILABLE）を返す確率を設定する（method 省略時は全メソッド）"""
+        self._state.failure_rates[method or ""] = rate
+
+    def set_rate_limit(
+        self,
+        per_second: Optional[float],
+        method: Optional[str] = None,
+        *,
+        burst: Optional[float] = None,
+    ) -> None:
+        """1 秒あたりの呼び出し数の上限を設定する（超えると 429 RESOURCE_EXHAUSTED）
+
+        method 省略時は全メソッド共通のクォータ。per_second=None で解除する。
+        burst はまとめて受け付ける呼び出し数（省略時は per_second の 1/10、最低 1）。
+        """
+        with self._state.lock:
+            if per_second is None:
+                self._state.quotas.pop(method or "", None)
+                return
+            capacity = burst if burst is not None else max(1.0, per_second / 10)
+            self._state.quotas[method or ""] = _StubQuota(per_second, capacity, tokens=capacity)
@@ -0,0 +1,327 @@
+"""
+選択したスコープのローカルレプリカ（update_time のウォーターマークによる差分同期）
+
+毎ターン retrieve() する代わりに、よく読むスコープのメモリを手元に複製しておき、
+読み出しは RPC なしで行う。同期は定期的なポーリングで行う。
+
+  replica = ScopeReplica(client, AGENT_ENGINE_NAME, [SCOPE], state_path="replica.json")
+  replica.sync()                           # 初回はスコープ全体、以降は差分だけを取得
+  replica.start(interval=30)               # バックグラウンドで定期的に sync()
+  for record in replica.memories(SCOPE):   # RPC なし
+      print(record.fact)
+  print(replica.stats.summary())           # 同期の遅れ（staleness / 反映までの時間）
+  replica.stop()
+
+  - 差分取得: retrieve(config={"filter": 'update_time>="<ウォーターマーク>"'})
+    ウォーターマークはスコープごとの「受け取った最大の update_time」。
+    書き込み中だった更新を取りこぼさないよう overlap_seconds だけ手前から取り直す
+  - 削除の検出: 差分取得では削除が見えないため、reconcile_every 回に 1 回
+    スコープ全体を取得し、サーバ側に存在しないメモリをレプリカから消す（リコンサイル）
+  - 永続化: state_path を指定すると、ウォーターマークとレプリカを JSON で保存し、
+    再起動後は差分取得から再開する
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Mapping, Optional, Union
+
+from memorybank.metrics import Histogram
+from memorybank.records import TOPICS, MemoryRecord, compact, from_micros, to_micros
+from memorybank.retry import call_with_retry
+from memorybank.scopes import ScopeKey, scope_dict, scope_key
+from memorybank.streaming import DEFAULT_PAGE_SIZE, stream_retrieve
+
+if TYPE_CHECKING:
+    import vertexai
+
+STATE_VERSION = 1
+DEFAULT_OVERLAP_SECONDS = 5.0
+DEFAULT_RECONCILE_EVERY = 10
+
+
+@dataclass
+class SyncStats:
+    """同期の計測値"""
+
+    syncs: int = 0
+    reconciles: int = 0
+    # 差分取得で受け取った件数（重なり分の取り直しを含む）
+    fetched: int = 0
+    upserts: int = 0
+    deletions: int = 0
+    errors: int = 0
+    last_error: Optional[BaseException] = None
+    # 最後に成功した sync() の開始時刻（UNIX 時刻）。レプリカはこの時点以降のサーバの状態を反映している
+    last_synced_at: Optional[float] = None
+    # サーバで更新されてからレプリカに反映されるまでの時間（秒）
+    replication_lag: Histogram = field(default_factory=Histogram)
+
+    def staleness_seconds(self, now: Optional[float] = None) -> float:
+        """レプリカが最大でどれだけ古いか（一度も同期していなければ inf）"""
+        if self.last_synced_at is None:
+            return float("inf")
+        return max(0.0, (now if now is not None else time.time()) - self.last_synced_at)
+
+    def summary(self) -> str:
+        return (
+            f"sync {self.syncs} 回（リコンサイル {self.reconciles} 回, エラー {self.errors} 回）, "
+            f"取得 {self.fetched} 件 / 更新 {self.upserts} 件 / 削除 {self.deletions} 件, "
+            f"staleness {self.staleness_seconds():.1f}s, "
+            f"反映までの時間 {self.replication_lag.snapshot().summary()}"
+        )
+
+
+@dataclass
+class _ScopeState:
+    watermark_us: int = 0
+    records: dict[str, MemoryRecord] = field(default_factory=dict)
+    # 一度でもスコープ全体を取得したか（初回の sync はリコンサイルになる）
+    loaded: bool = False
+
+
+def _now_us() -> int:
+    return to_micros(datetime.datetime.now(tz=datetime.timezone.utc))
+
+
+def _record_to_json(record: MemoryRecord) -> dict[str, object]:
+    return {
+        "name": record.name,
+        "fact": record.fact,
+        "metadata": record.metadata_dict(),
+        "topics": record.topic_labels(),
+        "create_time_us": record.create_time_us,
+        "update_time_us": record.update_time_us,
+    }
+
+
+def _record_from_json(data: Mapping[str, object], scope: ScopeKey) -> MemoryRecord:
+    metadata = data.get("metadata")
+    topics = data.get("topics")
+    return MemoryRecord(
+        name=str(data["name"]),
+        fact=str(data["fact"]),
+        scope=scope,
+        metadata=tuple(sorted(metadata.items())) if isinstance(metadata, dict) else (),
+        topics=tuple(TOPICS.code_for_label(str(t)) for t in topics) if isinstance(topics, list) else (),
+        create_time_us=int(str(data.get("create_time_us", 0))),
+        update_time_us=int(str(data.get("update_time_us", 0))),
+    )
+
+
+class ScopeReplica:
+    """スコープ単位のローカルレプリカ
+
+    Args:
+        client: vertexai.Client
+        engine_name: Agent Engine のリソース名
+        scopes: 複製するスコープ（完全一致）
+        state_path: ウォーターマークとレプリカを保存する JSON ファイル（省略時は保存しない）
+        overlap_seconds: 差分取得でウォーターマークより手前から取り直す秒数
+        reconcile_every: この回数の sync() ごとにスコープ全体を取得して削除を検出する
+        page_size: retrieve() の 1 ページあたりの件数
+        max_attempts: 一時的なエラーの再試行を含めた最大試行回数
+    """
+
+    def __init__(
+        self,
+        client: "vertexai.Client",
+        engine_name: str,
+        scopes: Iterable[Mapping[str, str]],
+        *,
+        state_path: Optional[Union[str, "os.PathLike[str]"]] = None,
+        overlap_seconds: float = DEFAULT_OVERLAP_SECONDS,
+        reconcile_every: int = DEFAULT_RECONCILE_EVERY,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        max_attempts: int = 5,
+    ) -> None:
+        if reconcile_every < 1:
+            raise ValueError("reconcile_every は 1 以上を指定してください")
+        self._client = client
+        self.engine_name = engine_name
+        self.state_path = Path(state_path) if state_path is not None else None
+        self.overlap_seconds = overlap_seconds
+        self.reconcile_every = reconcile_every
+        self.page_size = page_size
+        self.max_attempts = max_attempts
+        self.stats = SyncStats()
+        self._scopes: dict[ScopeKey, _ScopeState] = {scope_key(s): _ScopeState() for s in scopes}
+        if not self._scopes:
+            raise ValueError("scopes を 1 つ以上指定してください")
+        self._lock = threading.Lock()
+        # sync() を同時に 1 つだけ実行する（バックグラウンドと手動の呼び出しが重ならないように）
+        self._sync_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if self.state_path is not None and self.state_path.exists():
+            self._load()
+
+    def __enter__(self) -> "ScopeReplica":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
+
+    # --- 読み出し（RPC なし） ---
+    def memories(self, scope: Mapping[str, str]) -> list[MemoryRecord]:
+        """スコープ（完全一致）のメモリを返す。複製対象でないスコープは KeyError"""
+        key = scope_key(scope)
+        with self._lock:
+            state = self._scopes.get(key)
+            if state is None:
+                raise KeyError(f"複製していないスコープです: {dict(scope)}")
+            return list(state.records.values())
+
+    def get(self, name: str) -> Optional[MemoryRecord]:
+        with self._lock:
+            for state in self._scopes.values():
+                record = state.records.get(name)
+                if record is not None:
+                    return record
+        return None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(state.records) for state in self._scopes.values())
+
+    def watermark(self, scope: Mapping[str, str]) -> Optional[datetime.datetime]:
+        state = self._scopes[scope_key(scope)]
+        return from_micros(state.watermark_us) if state.watermark_us else None
+
+    # --- 同期 ---
+    def sync(self, *, reconcile: Optional[bool] = None) -> None:
+        """全スコープを 1 回同期する（reconcile=None なら reconcile_every 回に 1 回リコンサイル）
+
+        一度も全件を取得していないスコープ（初回・状態ファイルなし）は常に全件を取得する。
+        """
+        with self._sync_lock:
+            started = time.time()
+            if reconcile is None:
+                reconcile = (self.stats.syncs + 1) % self.reconcile_every == 0
+            changed = False
+            for key, state in self._scopes.items():
+                changed |= self._sync_scope(key, state, reconcile=reconcile or not state.loaded)
+            self.stats.syncs += 1
+            self.stats.reconciles += int(reconcile)
+            self.stats.last_synced_at = started
+            if changed:
+                self._save()
+
+    def reconcile(self) -> None:
+        """全スコープを取得し直して削除を検出する"""
+        self.sync(reconcile=True)
+
+    def _sync_scope(self, key: ScopeKey, state: _ScopeState, *, reconcile: bool) -> bool:
+        config: Optional[dict[str, object]] = None
+        if not reconcile:
+            since_us = max(0, state.watermark_us - int(self.overlap_seconds * 1_000_000))
+            since = from_micros(since_us).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+            config = {"filter": f'update_time>="{since}"'}
+        fetched = call_with_retry(
+            lambda: list(
+                compact(
+                    stream_retrieve(
+                        self._client, self.engine_name, scope_dict(key),
+                        page_size=self.page_size, config=config,
+                    )
+                )
+            ),
+            max_attempts=self.max_attempts,
+        )
+        now_us = _now_us()
+        upserts = 0
+        deletions = 0
+        with self._lock:
+            for record in fetched:
+                current = state.records.get(record.name)
+                if current is not None and current.update_time_us == record.update_time_us:
+                    continue
+                state.records[record.name] = record
+                upserts += 1
+                if state.loaded:  # 初回の全件取得は「反映までの時間」に含めない
+                    self.stats.replication_lag.observe(
+                        max(0.0, (now_us - record.update_time_us) / 1_000_000)
+                    )
+                state.watermark_us = max(state.watermark_us, record.update_time_us)
+            if reconcile:
+                alive = {record.name for record in fetched}
+                for name in [name for name in state.records if name not in alive]:
+                    del state.records[name]
+                    deletions += 1
+            state.loaded = True
+        self.stats.fetched += len(fetched)
+        self.stats.upserts += upserts
+        self.stats.deletions += deletions
+        return bool(upserts or deletions)
+
+    # --- バックグラウンド ---
+    def start(self, interval: float = 30.0) -> None:
+        """interval 秒ごとに sync() するスレッドを起動する"""
+        if self._thread is not None:
+            raise RuntimeError("すでに起動しています")
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name="scope-replica", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.is_set():
+            try:
+                self.sync()
+            except Exception as e:  # 次の周期で再試行する（スレッドは止めない）
+                self.stats.errors += 1
+                self.stats.last_error = e
+            self._stop.wait(interval)
+
+    # --- 永続化 ---
+    def _save(self) -> None:
+        if self.state_path is None:
+            return
+        with self._lock:
+            data = {
+                "version": STATE_VERSION,
+                "engine_name": self.engine_name,
+                "scopes": [
+                    {
+                        "scope": scope_dict(key),
+                        "watermark_us": state.watermark_us,
+                        "records": [_record_to_json(r) for r in state.records.values()],
+                    }
+                    for key, state in self._scopes.items()
+                    if state.loaded
+                ],
+            }
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+
+    def _load(self) -> None:
+        assert self.state_path is not None
+        data = json.loads(self.state_path.read_text(encoding="utf-8"))
+        if data.get("version") != STATE_VERSION or data.get("engine_name") != self.engine_name:
+            return  # 形式や Agent Engine が違う状態ファイルは使わない（初回と同じく全件取得する）
+        for entry in data.get("scopes", []):
+            key = scope_key(entry["scope"])
+            state = self._scopes.get(key)
+            if state is None:  # 複製対象から外れたスコープ
+                continue
+            state.watermark_us = int(entry.get("watermark_us", 0))
+            state.records = {
+                record.name: record
+                for record in (_record_from_json(r, key) for r in entry.get("records", []))
+            }
+            state.loaded = True
@@ -0,0 +1,22 @@
+"""
+メモリトピックの設定（step0_setup.py と gate.RelevanceGate で共有する）
+
+step0_setup.py は MEMORY_TOPICS を customization_configs の memory_topics として
+Agent Engine に設定し、RelevanceGate は同じトピックをもとに generate() するかを判定する。
+トピックを変える場合はここを変更し、step0_setup.py を再実行する。
+"""
+
+# マネージドトピック（デフォルトの4つ）+ カスタムトピック（発注ルール・社内規定）
+# ⚠️ カスタムトピックを指定する場合、マネージドトピックも明示的に含める必要がある
+MEMORY_TOPICS: tuple[dict[str, object], ...] = (
+    {"managed_memory_topic": {"managed_topic_enum": "USER_PERSONAL_INFO"}},
+    {"managed_memory_topic": {"managed_topic_enum": "USER_PREFERENCES"}},
+    {"managed_memory_topic": {"managed_topic_enum": "KEY_CONVERSATION_DETAILS"}},
+    {"managed_memory_topic": {"managed_topic_enum": "EXPLICIT_INSTRUCTIONS"}},
+    {
+        "custom_memory_topic": {
+            "label": "ordering_rules",
+            "description": "発注に関するルール、承認フロー、締め日、予算上限、取引先の選定基準など、社内の発注業務に関する規定や慣習。",
+        }
+    },
+)
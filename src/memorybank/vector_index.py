@@ -0,0 +1,400 @@
+"""
+セマンティック検索のローカルミラー（NumPy）
+
+Step 2 (4) のセマンティック検索は毎回サーバ往復になる。よく使うユーザー（スコープ）については、
+fact の埋め込みベクトルを手元の行列に持っておき、ローカルで近傍検索できるようにする。
+
+  mirror = LocalVectorMirror(genai_embedder())            # 埋め込み関数は差し替え可能
+  mirror.load(client, AGENT_ENGINE_NAME, SCOPE)           # retrieve 1 回 + 埋め込み 1 回
+  hits = mirror.search(AGENT_ENGINE_NAME, SCOPE, "いつもの発注業者は？", top_k=3)
+  hits[0].memory.fact, hits[0].distance                   # retrieve() の結果と同じ属性
+
+  - 距離はサーバと同じユークリッド距離（小さいほど類似）。昇順で返す
+  - 全件比較（既定）と、IVF（k-means でクラスタに分け、近いクラスタだけを調べる）を選べる
+  - create() / generate()（hydrate_generated の結果）/ delete() の結果を反映して差分更新する
+  - HashingEmbedder は文字 n-gram のハッシュによる決定的な埋め込み（オフライン・ベンチ用）
+
+⚠️ NumPy は任意の依存パッケージ（extra の vector）。使う場合は `uv sync --extra vector` でインストールする。
+⚠️ サーバと同じ距離になるのは、Agent Engine と同じ埋め込みモデルを使った場合だけ。
+"""
+
+from __future__ import annotations
+
+import collections
+import hashlib
+import math
+import threading
+import unicodedata
+from dataclasses import dataclass
+from types import ModuleType
+from typing import TYPE_CHECKING, Callable, Iterable, Mapping, Optional, Sequence
+
+from memorybank.cache import engine_of
+from memorybank.hydrate import ACTION_DELETED, GenerateResult
+from memorybank.scopes import ScopeKey, scope_key
+
+if TYPE_CHECKING:
+    import numpy
+    import vertexai
+    from vertexai._genai import types
+
+# テキストのリスト → ベクトルのリスト（1 回の呼び出しでまとめて埋め込む）
+Embedder = Callable[[Sequence[str]], Sequence[Sequence[float]]]
+
+# Step 0 で Agent Engine に設定している埋め込みモデル
+DEFAULT_EMBEDDING_MODEL = "text-multilingual-embedding-002"
+
+
+def _numpy() -> ModuleType:
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError(
+            "memorybank.vector_index には NumPy が必要です（uv sync --extra vector）"
+        ) from e
+    return numpy
+
+
+# ------------------------------------------------------------
+# 埋め込み関数
+# ------------------------------------------------------------
+class HashingEmbedder:
+    """文字 n-gram をハッシュして数える決定的な埋め込み（外部サービス不要）
+
+    意味の近さではなく文字列の重なりを測るだけだが、同じ入力には常に同じベクトルを返すため、
+    オフラインでの動作確認やベンチマークに使える。
+    """
+
+    def __init__(self, dim: int = 256, ngram: int = 2) -> None:
+        self.dim = dim
+        self.ngram = ngram
+
+    def _vector(self, text: str) -> list[float]:
+        text = unicodedata.normalize("NFKC", text).casefold()
+        counts = [0.0] * self.dim
+        grams = [text[i : i + self.ngram] for i in range(max(len(text) - self.ngram + 1, 1))]
+        for gram in grams:
+            digest = hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest()
+            counts[int.from_bytes(digest[:4], "little") % self.dim] += (
+                1.0 if digest[4] & 1 else -1.0
+            )
+        norm = math.sqrt(sum(c * c for c in counts)) or 1.0
+        return [c / norm for c in counts]
+
+    def __call__(self, texts: Sequence[str]) -> list[list[float]]:
+        return [self._vector(t) for t in texts]
+
+
+def genai_embedder(
+    model: str = DEFAULT_EMBEDDING_MODEL,
+    *,
+    project: Optional[str] = None,
+    location: Optional[str] = None,
+    batch_size: int = 100,
+) -> Embedder:
+    """Vertex AI の埋め込みモデル（google-genai）を使う埋め込み関数"""
+    from google import genai
+
+    from memorybank.connection import settings
+
+    if project is None or location is None:
+        current = settings()
+        project = project or current.project
+        location = location or current.location
+    genai_client = genai.Client(vertexai=True, project=project, location=location)
+
+    def _embed(texts: Sequence[str]) -> list[list[float]]:
+        vectors: list[list[float]] = []
+        for start in range(0, len(texts), batch_size):
+            response = genai_client.models.embed_content(
+                model=model, contents=list(texts[start : start + batch_size])
+            )
+            vectors.extend(list(e.values or []) for e in response.embeddings or [])
+        return vectors
+
+    return _embed
+
+
+# ------------------------------------------------------------
+# スコープ 1 つ分のインデックス
+# ------------------------------------------------------------
+@dataclass(frozen=True)
+class VectorHit:
+    """RetrieveMemoriesResponseRetrievedMemory と同じく memory / distance を持つ"""
+
+    memory: "types.Memory"
+    distance: float
+
+
+class ScopeVectorIndex:
+    """1 つのスコープの fact ベクトルを行列で保持し、近傍検索する
+
+    行の削除は末尾の行と入れ替えて行うため、行列は常に詰まった状態に保たれる。
+    """
+
+    def __init__(self, dim: int) -> None:
+        np = _numpy()
+        self.dim = dim
+        self._matrix = np.zeros((16, dim), dtype=np.float32)
+        self._sq_norms = np.zeros(16, dtype=np.float32)
+        self._size = 0
+        self._memories: list["types.Memory"] = []
+        self._row_of: dict[str, int] = {}
+        # IVF（build_ivf() 後のみ）
+        self._centroids: Optional["numpy.ndarray"] = None
+        self._assign = np.zeros(16, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._row_of
+
+    @property
+    def nbytes(self) -> int:
+        """ベクトル部分のメモリ使用量（バイト）"""
+        return int(self._size * self.dim * self._matrix.itemsize)
+
+    def _grow(self, needed: int) -> None:
+        np = _numpy()
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[: self._size] = self._matrix[: self._size]
+        self._matrix = matrix
+        self._sq_norms = np.resize(self._sq_norms, capacity)
+        self._assign = np.resize(self._assign, capacity)
+
+    def upsert_many(
+        self, memories: Sequence["types.Memory"], vectors: Sequence[Sequence[float]]
+    ) -> None:
+        """メモリとそのベクトルを追加する（同名のメモリは置き換える）"""
+        np = _numpy()
+        if len(memories) != len(vectors):
+            raise ValueError("memories と vectors の件数が一致しません")
+        if not memories:
+            return
+        block = np.asarray(vectors, dtype=np.float32).reshape(len(memories), self.dim)
+        self._grow(self._size + len(memories))
+        for memory, vector in zip(memories, block):
+            name = str(memory.name)
+            row = self._row_of.get(name)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self._memories.append(memory)
+                self._row_of[name] = row
+            else:
+                self._memories[row] = memory
+            self._matrix[row] = vector
+            self._sq_norms[row] = float(vector @ vector)
+            if self._centroids is not None:
+                self._assign[row] = int(np.argmin(self._centroid_distances(vector)))
+
+    def remove(self, name: str) -> bool:
+        """メモリを取り除く（含まれていなければ False）"""
+        row = self._row_of.pop(name, None)
+        if row is None:
+            return False
+        last = self._size - 1
+        if row != last:
+            self._matrix[row] = self._matrix[last]
+            self._sq_norms[row] = self._sq_norms[last]
+            self._assign[row] = self._assign[last]
+            moved = self._memories[last]
+            self._memories[row] = moved
+            self._row_of[str(moved.name)] = row
+        self._memories.pop()
+        self._size = last
+        return True
+
+    def build_ivf(self, n_lists: Optional[int] = None, *, iterations: int = 10, seed: int = 0) -> None:
+        """k-means でクラスタ（転置リスト）を作る。以降の upsert は最も近いクラスタに入る"""
+        np = _numpy()
+        if not self._size:
+            return
+        n_lists = min(n_lists or max(1, int(math.sqrt(self._size))), self._size)
+        data = self._matrix[: self._size]
+        rng = np.random.default_rng(seed)
+        centroids = data[rng.choice(self._size, n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assign = self._nearest(data, centroids)
+            for k in range(n_lists):
+                members = data[assign == k]
+                if len(members):
+                    centroids[k] = members.mean(axis=0)
+        self._centroids = centroids
+        self._assign[: self._size] = self._nearest(data, centroids)
+
+    @staticmethod
+    def _nearest(data: "numpy.ndarray", centroids: "numpy.ndarray") -> "numpy.ndarray":
+        np = _numpy()
+        distances = (
+            (data * data).sum(axis=1)[:, None]
+            - 2.0 * data @ centroids.T
+            + (centroids * centroids).sum(axis=1)[None, :]
+        )
+        return np.argmin(distances, axis=1).astype(np.int32)
+
+    def _centroid_distances(self, vector: "numpy.ndarray") -> "numpy.ndarray":
+        assert self._centroids is not None
+        diff = self._centroids - vector
+        return (diff * diff).sum(axis=1)
+
+    def search(
+        self,
+        vector: Sequence[float],
+        top_k: int = 3,
+        *,
+        nprobe: Optional[int] = None,
+    ) -> list[VectorHit]:
+        """ユークリッド距離の昇順で top_k 件を返す
+
+        nprobe を指定し build_ivf() 済みなら、クエリに近い nprobe 個のクラスタだけを調べる（近似）。
+        """
+        np = _numpy()
+        if not self._size or top_k <= 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32).reshape(self.dim)
+        rows = None
+        if nprobe is not None and self._centroids is not None:
+            probed = np.zeros(len(self._centroids), dtype=bool)
+            probed[np.argsort(self._centroid_distances(query))[:nprobe]] = True
+            rows = np.flatnonzero(probed[self._assign[: self._size]])
+            matrix, sq_norms = self._matrix[rows], self._sq_norms[rows]
+        else:
+            matrix, sq_norms = self._matrix[: self._size], self._sq_norms[: self._size]
+        if not len(matrix):
+            return []
+        # ||m - q||² = ||m||² - 2 m·q + ||q||²
+        sq = np.maximum(sq_norms - 2.0 * (matrix @ query) + float(query @ query), 0.0)
+        k = min(top_k, len(sq))
+        best = np.argpartition(sq, k - 1)[:k]
+        best = best[np.argsort(sq[best])]
+        return [
+            VectorHit(
+                memory=self._memories[int(rows[i]) if rows is not None else int(i)],
+                distance=float(math.sqrt(sq[i])),
+            )
+            for i in best
+        ]
+
+
+# ------------------------------------------------------------
+# 複数スコープのミラー
+# ------------------------------------------------------------
+class LocalVectorMirror:
+    """スコープごとの ScopeVectorIndex をまとめ、サーバの変更を差分で反映する
+
+    Args:
+        embedder: 埋め込み関数（テキストのリスト → ベクトルのリスト）
+        query_cache_size: クエリのベクトルを覚えておく件数（同じ質問の埋め込みを省く）
+    """
+
+    def __init__(self, embedder: Embedder, *, query_cache_size: int = 256) -> None:
+        self.embedder = embedder
+        self.query_cache_size = query_cache_size
+        self._indexes: dict[tuple[str, ScopeKey], ScopeVectorIndex] = {}
+        # メモリ名 → 属するインデックスのキー（delete() の反映用）
+        self._owner: dict[str, tuple[str, ScopeKey]] = {}
+        self._queries: collections.OrderedDict[str, Sequence[float]] = collections.OrderedDict()
+        self._lock = threading.RLock()
+
+    def index(self, engine_name: str, scope: Mapping[str, str]) -> Optional[ScopeVectorIndex]:
+        return self._indexes.get((engine_name, scope_key(scope)))
+
+    def _upsert(self, engine_name: str, memories: Sequence["types.Memory"]) -> None:
+        memories = [m for m in memories if m.fact]
+        if not memories:
+            return
+        vectors = self.embedder([str(m.fact) for m in memories])
+        with self._lock:
+            for memory, vector in zip(memories, vectors):
+                key = (engine_name, scope_key(memory.scope or {}))
+                index = self._indexes.get(key)
+                if index is None:
+                    index = self._indexes[key] = ScopeVectorIndex(len(vector))
+                previous = self._owner.get(str(memory.name))
+                if previous is not None and previous != key:
+                    self._indexes[previous].remove(str(memory.name))
+                index.upsert_many([memory], [vector])
+                self._owner[str(memory.name)] = key
+
+    def load(
+        self,
+        client: "vertexai.Client",
+        engine_name: str,
+        scope: dict[str, str],
+    ) -> ScopeVectorIndex:
+        """スコープ全体を retrieve() して埋め込み、インデックスを作り直す"""
+        memories = [
+            item.memory
+            for item in client.agent_engines.memories.retrieve(name=engine_name, scope=scope)
+        ]
+        key = (engine_name, scope_key(scope))
+        with self._lock:
+            old = self._indexes.pop(key, None)
+            if old is not None:
+                for name in list(self._owner):
+                    if self._owner[name] == key:
+                        del self._owner[name]
+        self._upsert(engine_name, memories)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                dim = len(self.embedder(["_"])[0])
+                index = self._indexes[key] = ScopeVectorIndex(dim)
+            return index
+
+    def apply_memories(self, memories: Iterable["types.Memory"]) -> None:
+        """create() や get() で得たメモリを反映する"""
+        by_engine: dict[str, list["types.Memory"]] = collections.defaultdict(list)
+        for memory in memories:
+            by_engine[engine_of(str(memory.name))].append(memory)
+        for engine_name, group in by_engine.items():
+            self._upsert(engine_name, group)
+
+    def apply_generate(self, result: GenerateResult) -> None:
+        """hydrate_generated() の結果（CREATED / UPDATED / DELETED）を反映する"""
+        self.apply_deleted(e.name for e in result if e.action == ACTION_DELETED)
+        self.apply_memories(
+            e.memory for e in result if e.action != ACTION_DELETED and e.memory is not None
+        )
+
+    def apply_deleted(self, names: Iterable[str]) -> None:
+        with self._lock:
+            for name in names:
+                key = self._owner.pop(name, None)
+                if key is not None:
+                    self._indexes[key].remove(name)
+
+    def query_vector(self, query: str) -> Sequence[float]:
+        with self._lock:
+            cached = self._queries.get(query)
+            if cached is not None:
+                self._queries.move_to_end(query)
+                return cached
+        vector = self.embedder([query])[0]
+        with self._lock:
+            self._queries[query] = vector
+            while len(self._queries) > self.query_cache_size:
+                self._queries.popitem(last=False)
+        return vector
+
+    def search(
+        self,
+        engine_name: str,
+        scope: Mapping[str, str],
+        query: str,
+        top_k: int = 3,
+        *,
+        nprobe: Optional[int] = None,
+    ) -> list[VectorHit]:
+        """スコープ内をローカルで近傍検索する（load() していないスコープは KeyError）"""
+        index = self.index(engine_name, scope)
+        if index is None:
+            raise KeyError(f"スコープ {dict(scope)} はミラーされていません（load() してください）")
+        return index.search(self.query_vector(query), top_k, nprobe=nprobe)
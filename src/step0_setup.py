@@ -9,19 +9,17 @@ Agent Engine は Sessions・Memory Bank 等のサービスを束ねるインス
 実行後、.env に AGENT_ENGINE_NAME を追記してください。
 """
 
-import os
-import vertexai
-from dotenv import load_dotenv
+from memorybank.connection import get_client, settings
+from memorybank.topics import MEMORY_TOPICS
 
-load_dotenv()
-
-PROJECT_ID = os.environ["GCP_PROJECT_ID"]
-LOCATION = os.environ["GCP_LOCATION"]
+SETTINGS = settings()
+PROJECT_ID = SETTINGS.project
+LOCATION = SETTINGS.location
 
 # ============================================================
 # 1. クライアント初期化
 # ============================================================
-client = vertexai.Client(project=PROJECT_ID, location=LOCATION)
+client = get_client(PROJECT_ID, LOCATION)
 print(f"✅ Client 初期化完了: project={PROJECT_ID}, location={LOCATION}")
 
 # ============================================================
@@ -29,7 +27,7 @@ print(f"✅ Client 初期化完了: project={PROJECT_ID}, location={LOCATION}")
 # ============================================================
 # config なしで作ると Memory Bank のデフォルト設定で作成される。
 # embedding モデルのデフォルトは text-embedding-005（英語最適化）。
-existing_name = os.environ.get("AGENT_ENGINE_NAME")
+existing_name = SETTINGS.agent_engine_name
 
 if existing_name:
     agent_engine_name = existing_name
@@ -68,20 +66,9 @@ client.agent_engines.update(
                     "embedding_model": EMBEDDING_MODEL
                 },
                 "customization_configs": [{
-                    "memory_topics": [
-                        # マネージドトピック（デフォルトの4つ）
-                        {"managed_memory_topic": {"managed_topic_enum": "USER_PERSONAL_INFO"}},
-                        {"managed_memory_topic": {"managed_topic_enum": "USER_PREFERENCES"}},
-                        {"managed_memory_topic": {"managed_topic_enum": "KEY_CONVERSATION_DETAILS"}},
-                        {"managed_memory_topic": {"managed_topic_enum": "EXPLICIT_INSTRUCTIONS"}},
-                        # カスタムトピック: 発注ルール・社内規定
-                        {
-                            "custom_memory_topic": {
-                                "label": "ordering_rules",
-                                "description": "発注に関するルール、承認フロー、締め日、予算上限、取引先の選定基準など、社内の発注業務に関する規定や慣習。"
-                            }
-                        },
-                    ]
+                    # マネージドトピック（デフォルトの4つ）+ カスタムトピック（ordering_rules）。
+                    # generate() 前の RelevanceGate も同じ定義を使う（src/memorybank/topics.py）
+                    "memory_topics": list(MEMORY_TOPICS),
                 }]
             }
         }
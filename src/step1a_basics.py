@@ -14,19 +14,13 @@ Step 1a: メモリ生成の基本（記事 3-1 (1)(3)(4) に対応）
   uv run python src/step1a_basics.py
 """
 
-import datetime
-import os
+from memorybank import append_events, compact, hydrate_generated
+from memorybank.connection import get_client, settings
 
-import vertexai
-from dotenv import load_dotenv
+AGENT_ENGINE_NAME = settings().require_agent_engine_name()
 
-load_dotenv()
-
-PROJECT_ID = os.environ["GCP_PROJECT_ID"]
-LOCATION = os.environ["GCP_LOCATION"]
-AGENT_ENGINE_NAME = os.environ["AGENT_ENGINE_NAME"]
-
-client = vertexai.Client(project=PROJECT_ID, location=LOCATION)
+# vertexai の import と Client の生成はここで初めて行われる（プロセス内で共有）
+client = get_client()
 print(f"✅ Client 初期化完了")
 print(f"   Agent Engine: {AGENT_ENGINE_NAME}")
 
@@ -70,22 +64,19 @@ conversation: list[dict[str, str]] = [
 ]
 
 print(f"\n   💬 会話イベントを追加中...")
-for i, msg in enumerate(conversation):
-    client.agent_engines.sessions.events.append(
-        name=session_name,
-        author="user",  # Sessions API の要件
-        invocation_id=str((i // 2) + 1),  # 2メッセージで1ターン
-        timestamp=datetime.datetime.now(tz=datetime.timezone.utc),
-        config={
-            "content": {
-                "role": msg["role"],
-                "parts": [{"text": msg["text"]}],
-            }
-        },
-    )
-    print(f"   [{i + 1}] {msg['role']}: {msg['text'][:60]}...")
-
-print(f"\n   ✅ {len(conversation)} 件のイベントを追加完了")
+# append_events() は会話リスト全体を並行ウィンドウで送信する。
+# invocation_id（2メッセージで1ターン）と timestamp は従来のループと同じ規則で
+# 事前に確定させるため、セッション内の並び順は会話リストの順になる。
+append_result = append_events(
+    client,
+    session_name,
+    conversation,
+    on_commit=lambda i, msg: print(f"   [{i + 1}] {msg['role']}: {msg['text'][:60]}..."),
+)
+for failure in append_result.failures:
+    print(f"   ❌ [{failure.index + 1}] 追加失敗: {type(failure.error).__name__}: {failure.error}")
+
+print(f"\n   ✅ {append_result.succeeded} 件のイベントを追加完了")
 
 # ============================================================
 # (4) Generate と Create の違い（記事 3-1 (4) 参照）
@@ -107,12 +98,12 @@ operation = client.agent_engines.memories.generate(
 
 print(f"   ✅ generate() 完了 (done={operation.done})")
 if operation.response is not None:
-    generated = operation.response.generated_memories
+    # 生成されたメモリの本体は hydrate_generated() でまとめて並行取得する
+    generated = hydrate_generated(client, operation)
     print(f"   自動抽出: {len(generated)} 件")
     for i, gm in enumerate(generated, 1):
-        memory = client.agent_engines.memories.get(name=gm.memory.name)
         print(f"   [{i}] action={gm.action}")
-        print(f"        fact={memory.fact}")
+        print(f"        fact={gm.fact}")
 else:
     print("   response=None（メモリ未生成）")
 
@@ -146,18 +137,19 @@ results = client.agent_engines.memories.retrieve(
     name=AGENT_ENGINE_NAME,
     scope=SCOPE,
 )
-memories = list(results)
+# 表示用にコンパクトな MemoryRecord に変換する（トピックは整数コード、日時は整数で保持）
+memories = list(compact(results))
 
 print(f"   合計: {len(memories)} 件")
 for i, m in enumerate(memories, 1):
-    print(f"\n  [{i}] fact: {m.memory.fact}")
-    print(f"      scope: {m.memory.scope}")
-    if m.memory.metadata:
-        print(f"      metadata: {m.memory.metadata}")
-    if hasattr(m.memory, "topics") and m.memory.topics:
-        print(f"      topics: {m.memory.topics}")
-    print(f"      create_time: {m.memory.create_time}")
-    print(f"      update_time: {m.memory.update_time}")
+    print(f"\n  [{i}] fact: {m.fact}")
+    print(f"      scope: {m.scope_dict()}")
+    if m.metadata:
+        print(f"      metadata: {m.metadata_dict()}")
+    if m.topics:
+        print(f"      topics: {m.topic_labels()}")
+    print(f"      create_time: {m.create_time}")
+    print(f"      update_time: {m.update_time}")
 
 # ============================================================
 # まとめ
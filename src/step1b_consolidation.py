@@ -13,19 +13,13 @@ GenerateMemories は単純な追記ではなく、LLM による「統合」を
   uv run python src/step1b_consolidation.py
 """
 
-import datetime
-import os
+from memorybank import append_events, compact, diff_generated, snapshot_facts
+from memorybank.connection import get_client, settings
 
-import vertexai
-from dotenv import load_dotenv
+AGENT_ENGINE_NAME = settings().require_agent_engine_name()
 
-load_dotenv()
-
-PROJECT_ID = os.environ["GCP_PROJECT_ID"]
-LOCATION = os.environ["GCP_LOCATION"]
-AGENT_ENGINE_NAME = os.environ["AGENT_ENGINE_NAME"]
-
-client = vertexai.Client(project=PROJECT_ID, location=LOCATION)
+# vertexai の import と Client の生成はここで初めて行われる（プロセス内で共有）
+client = get_client()
 print(f"✅ Client 初期化完了")
 print(f"   Agent Engine: {AGENT_ENGINE_NAME}")
 
@@ -44,9 +38,11 @@ before_results = client.agent_engines.memories.retrieve(
     scope=SCOPE,
 )
 before_memories = list(before_results)
+# 統合の前後の差分は、このスナップショットと generate() の応答から作る（統合後の retrieve() は不要）
+before_facts = snapshot_facts(before_memories)
 print(f"   現在のメモリ数: {len(before_memories)} 件")
-for i, m in enumerate(before_memories, 1):
-    print(f"   [{i}] {m.memory.fact}")
+for i, m in enumerate(compact(before_memories), 1):
+    print(f"   [{i}] {m.fact}")
 
 # ============================================================
 # (5) 統合（Consolidation）のデモ（記事 3-1 (5) 参照）
@@ -74,19 +70,7 @@ consolidation_conversation: list[dict[str, str]] = [
     {"role": "user", "text": "来月からA4用紙の業者はC社に変更して。A社はもう使いません。"},
 ]
 
-for i, msg in enumerate(consolidation_conversation):
-    client.agent_engines.sessions.events.append(
-        name=session_consol_name,
-        author="user",
-        invocation_id="1",
-        timestamp=datetime.datetime.now(tz=datetime.timezone.utc),
-        config={
-            "content": {
-                "role": msg["role"],
-                "parts": [{"text": msg["text"]}],
-            }
-        },
-    )
+append_events(client, session_consol_name, consolidation_conversation).raise_for_failures()
 
 op_consol = client.agent_engines.memories.generate(
     name=AGENT_ENGINE_NAME,
@@ -96,37 +80,37 @@ op_consol = client.agent_engines.memories.generate(
 
 print(f"   ✅ generate() 完了 (done={op_consol.done})")
 if op_consol.response is not None:
-    for i, gm in enumerate(op_consol.response.generated_memories, 1):
-        action_name: str = str(gm.action).split(".")[-1]  # CREATED / UPDATED / DELETED
-        print(f"   [{i}] action={action_name}")
-        # DELETED の場合、メモリは既に削除されているため get() できない
-        if "DELETED" in action_name:
-            print(f"        → 古い記憶が削除された（name={gm.memory.name}）")
+    # 変更前の fact はスナップショットから、変更後の fact は変更のあったメモリだけ get() する
+    diff = diff_generated(client, op_consol, before_facts)
+    for i, change in enumerate(diff, 1):
+        print(f"   [{i}] action={change.action}")  # CREATED / UPDATED / DELETED
+        if change.action == "DELETED":
+            print(f"        → 古い記憶が削除された: {change.before}")
+        elif change.action == "UPDATED":
+            print(f"        {change.before} → {change.after}")
         else:
-            memory = client.agent_engines.memories.get(name=gm.memory.name)
-            print(f"        fact={memory.fact}")
+            print(f"        fact={change.after}")
+    print(f"   （追加の取得: get() {diff.fetched} 回, revisions.get() {diff.revisions_fetched} 回）")
     print(f"\n   💡 統合の結果:")
     print(f"      UPDATED → 既存の「A社」が「C社」に更新された")
     print(f"      CREATED → 全く新しい事実が追加された")
     print(f"      DELETED → 矛盾する古い記憶が削除された")
+    after_facts = list(diff.apply(before_facts).values())
 else:
     print("   response=None（メモリ未生成）")
+    after_facts = list(before_facts.values())
 
 # ============================================================
 # 統合後の状態を確認
 # ============================================================
+# 統合前のスナップショットに差分を適用する（スコープ全体を retrieve() し直さない）
 print("\n" + "=" * 60)
 print("📥 統合後の状態確認")
 print("=" * 60)
 
-after_results = client.agent_engines.memories.retrieve(
-    name=AGENT_ENGINE_NAME,
-    scope=SCOPE,
-)
-after_memories = list(after_results)
-print(f"   現在のメモリ数: {len(after_memories)} 件")
-for i, m in enumerate(after_memories, 1):
-    print(f"   [{i}] {m.memory.fact}")
+print(f"   現在のメモリ数: {len(after_facts)} 件")
+for i, fact in enumerate(after_facts, 1):
+    print(f"   [{i}] {fact}")
 
 print(f"""
 🎉 Step 1b 完了！
@@ -13,18 +13,13 @@ Step 1c: メタデータの付与と更新戦略（記事 3-1 (6)(7) に対応
   uv run python src/step1c_metadata.py
 """
 
-import os
+from memorybank import compact, hydrate_generated
+from memorybank.connection import get_client, settings
 
-import vertexai
-from dotenv import load_dotenv
+AGENT_ENGINE_NAME = settings().require_agent_engine_name()
 
-load_dotenv()
-
-PROJECT_ID = os.environ["GCP_PROJECT_ID"]
-LOCATION = os.environ["GCP_LOCATION"]
-AGENT_ENGINE_NAME = os.environ["AGENT_ENGINE_NAME"]
-
-client = vertexai.Client(project=PROJECT_ID, location=LOCATION)
+# vertexai の import と Client の生成はここで初めて行われる（プロセス内で共有）
+client = get_client()
 print(f"✅ Client 初期化完了")
 print(f"   Agent Engine: {AGENT_ENGINE_NAME}")
 
@@ -69,11 +64,11 @@ operation_meta = client.agent_engines.memories.generate(
 
 print(f"   ✅ メタデータ付き generate() 完了")
 if operation_meta.response is not None:
-    for i, gm in enumerate(operation_meta.response.generated_memories, 1):
-        memory = client.agent_engines.memories.get(name=gm.memory.name)
+    for i, gm in enumerate(hydrate_generated(client, operation_meta), 1):
         print(f"   [{i}] action={gm.action}")
-        print(f"        fact={memory.fact}")
-        print(f"        metadata={memory.metadata}")
+        print(f"        fact={gm.fact}")
+        if gm.memory is not None:
+            print(f"        metadata={gm.memory.metadata}")
 
 # ============================================================
 # (7) メタデータの更新戦略（記事 3-1 (7) 参照）
@@ -118,11 +113,11 @@ operation_exact = client.agent_engines.memories.generate(
 
 print(f"   ✅ REQUIRE_EXACT_MATCH 付き generate() 完了")
 if operation_exact.response is not None:
-    for i, gm in enumerate(operation_exact.response.generated_memories, 1):
-        memory = client.agent_engines.memories.get(name=gm.memory.name)
+    for i, gm in enumerate(hydrate_generated(client, operation_exact), 1):
         print(f"   [{i}] action={gm.action}")
-        print(f"        fact={memory.fact}")
-        print(f"        metadata={memory.metadata}")
+        print(f"        fact={gm.fact}")
+        if gm.memory is not None:
+            print(f"        metadata={gm.memory.metadata}")
 print(f"\n   💡 REQUIRE_EXACT_MATCH を使うと:")
 print(f"      メタデータが完全一致する記憶のみ統合対象になり、")
 print(f"      異なるメタデータを持つ記憶は独立して蓄積される。")
@@ -139,15 +134,15 @@ all_results = client.agent_engines.memories.retrieve(
     name=AGENT_ENGINE_NAME,
     scope=SCOPE,
 )
-all_memories = list(all_results)
+all_memories = list(compact(all_results))
 
 # メタデータを持つメモリだけ表示
 meta_count = 0
 for i, m in enumerate(all_memories, 1):
-    if m.memory.metadata:
+    if m.metadata:
         meta_count += 1
-        print(f"\n  [{meta_count}] fact: {m.memory.fact}")
-        print(f"      metadata: {m.memory.metadata}")
+        print(f"\n  [{meta_count}] fact: {m.fact}")
+        print(f"      metadata: {m.metadata_dict()}")
 
 print(f"\n   合計: {len(all_memories)} 件中 {meta_count} 件がメタデータ付き")
 
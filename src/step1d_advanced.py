@@ -12,20 +12,15 @@ Step 1d: 応用 — トピック・マルチモーダル・非同期（記事 3-
   uv run python src/step1d_advanced.py
 """
 
-import datetime
-import os
-import time
+from memorybank import append_events, compact, hydrate_generated
+from memorybank.connection import get_client, settings
+from memorybank.operations import OperationTracker
+from memorybank.streaming import stream_retrieve
 
-import vertexai
-from dotenv import load_dotenv
+AGENT_ENGINE_NAME = settings().require_agent_engine_name()
 
-load_dotenv()
-
-PROJECT_ID = os.environ["GCP_PROJECT_ID"]
-LOCATION = os.environ["GCP_LOCATION"]
-AGENT_ENGINE_NAME = os.environ["AGENT_ENGINE_NAME"]
-
-client = vertexai.Client(project=PROJECT_ID, location=LOCATION)
+# vertexai の import と Client の生成はここで初めて行われる（プロセス内で共有）
+client = get_client()
 print(f"✅ Client 初期化完了")
 print(f"   Agent Engine: {AGENT_ENGINE_NAME}")
 
@@ -57,19 +52,7 @@ topic_conversation: list[dict[str, str]] = [
     {"role": "user", "text": "発注の際のルールを共有します。10万円以上の発注は必ず部長承認が必要です。備品の発注は月末締めで翌月5日に一括処理してください。"},
 ]
 
-for i, msg in enumerate(topic_conversation):
-    client.agent_engines.sessions.events.append(
-        name=session2_name,
-        author="user",
-        invocation_id="1",
-        timestamp=datetime.datetime.now(tz=datetime.timezone.utc),
-        config={
-            "content": {
-                "role": msg["role"],
-                "parts": [{"text": msg["text"]}],
-            }
-        },
-    )
+append_events(client, session2_name, topic_conversation).raise_for_failures()
 
 operation_custom = client.agent_engines.memories.generate(
     name=AGENT_ENGINE_NAME,
@@ -79,12 +62,11 @@ operation_custom = client.agent_engines.memories.generate(
 
 print(f"   ✅ トピック確認用 generate() 完了")
 if operation_custom.response is not None:
-    for i, gm in enumerate(operation_custom.response.generated_memories, 1):
-        memory = client.agent_engines.memories.get(name=gm.memory.name)
+    for i, gm in enumerate(hydrate_generated(client, operation_custom), 1):
         print(f"   [{i}] action={gm.action}")
-        print(f"        fact={memory.fact}")
-        if hasattr(memory, "topics") and memory.topics:
-            print(f"        topics={memory.topics}")
+        print(f"        fact={gm.fact}")
+        if gm.memory is not None and gm.memory.topics:
+            print(f"        topics={gm.memory.topics}")
     print(f"\n   💡 Step 0 で設定した ordering_rules トピックが")
     print(f"      LLM により自動分類されているか確認してください。")
 
@@ -129,10 +111,9 @@ op_multi = client.agent_engines.memories.generate(
 
 print(f"   ✅ マルチモーダル generate() 完了 (done={op_multi.done})")
 if op_multi.response is not None:
-    for i, gm in enumerate(op_multi.response.generated_memories, 1):
-        memory = client.agent_engines.memories.get(name=gm.memory.name)
+    for i, gm in enumerate(hydrate_generated(client, op_multi), 1):
         print(f"   [{i}] action={gm.action}")
-        print(f"        fact={memory.fact}")
+        print(f"        fact={gm.fact}")
     print(f"\n   💡 画像自体は保存されず、LLM が画像を分析した")
     print(f"      テキスト形式のメモリが生成される。")
 else:
@@ -156,18 +137,11 @@ session_async = client.agent_engines.sessions.create(
 )
 session_async_name: str = session_async.response.name
 
-client.agent_engines.sessions.events.append(
-    name=session_async_name,
-    author="user",
-    invocation_id="1",
-    timestamp=datetime.datetime.now(tz=datetime.timezone.utc),
-    config={
-        "content": {
-            "role": "user",
-            "parts": [{"text": "経理部の田中さんから連絡があり、今後の消耗品の予算上限は月30万円になりました。"}],
-        }
-    },
-)
+append_events(
+    client,
+    session_async_name,
+    [{"role": "user", "text": "経理部の田中さんから連絡があり、今後の消耗品の予算上限は月30万円になりました。"}],
+).raise_for_failures()
 
 op_async = client.agent_engines.memories.generate(
     name=AGENT_ENGINE_NAME,
@@ -183,9 +157,13 @@ print(f"   done={op_async.done}")
 print(f"   → wait_for_completion=False なので即座に制御が返る")
 print(f"   → エージェントはメモリ生成の完了を待たずに次の処理へ進める")
 
-# 非同期処理が完了するまで少し待つ（デモ用）
-print(f"\n   ⏳ 非同期処理の完了を待機中（5秒）...")
-time.sleep(5)
+# 固定時間 sleep する代わりに、OperationTracker でオペレーションの完了をポーリングする。
+# 間隔は指数バックオフ + ジッターで伸ばし、完了した時点ですぐに次へ進む。
+print(f"\n   ⏳ 非同期処理の完了を待機中（指数バックオフでポーリング）...")
+with OperationTracker(client) as tracker:
+    tracker.track(op_async).result(timeout=120)
+    print(f"   ✅ 完了: {tracker.time_to_done['generate'].snapshot().summary()}")
+    print(f"      ポーリング回数: {tracker.polls}")
 
 # ============================================================
 # 最終確認 — 全メモリ一覧
@@ -194,19 +172,15 @@ print("\n" + "=" * 60)
 print("📥 最終確認 — 全メモリ一覧")
 print("=" * 60)
 
-all_results = client.agent_engines.memories.retrieve(
-    name=AGENT_ENGINE_NAME,
-    scope=SCOPE,
-)
-all_memories = list(all_results)
-
-print(f"   合計: {len(all_memories)} 件")
-for i, m in enumerate(all_memories, 1):
-    print(f"\n  [{i}] fact: {m.memory.fact}")
-    if m.memory.metadata:
-        print(f"      metadata: {m.memory.metadata}")
-    if hasattr(m.memory, "topics") and m.memory.topics:
-        print(f"      topics: {m.memory.topics}")
+# 全件をリストに溜めず、ページ単位でストリーミングしながら表示する
+total = 0
+for total, m in enumerate(compact(stream_retrieve(client, AGENT_ENGINE_NAME, SCOPE)), 1):
+    print(f"\n  [{total}] fact: {m.fact}")
+    if m.metadata:
+        print(f"      metadata: {m.metadata_dict()}")
+    if m.topics:
+        print(f"      topics: {m.topic_labels()}")
+print(f"\n   合計: {total} 件")
 
 print(f"""
 📊 記事 3-1 のまとめ:
@@ -14,19 +14,21 @@ Step 2: メモリの取得（記事 3-2 に対応）
 前提: Step 1 が実行済みで、user_123 にメモリが存在すること。
 """
 
-import os
+import asyncio
 from typing import Optional
 
-import vertexai
-from dotenv import load_dotenv
+from memorybank.aio import AsyncMemoryBank
+from memorybank.bulk import bulk_delete
+from memorybank.cache import CachedMemories
+from memorybank.connection import get_client, settings
+from memorybank.filters import ScopeSnapshot
+from memorybank.records import compact
+from memorybank.streaming import StreamStats, stream_list
 
-load_dotenv()
+AGENT_ENGINE_NAME = settings().require_agent_engine_name()
 
-PROJECT_ID = os.environ["GCP_PROJECT_ID"]
-LOCATION = os.environ["GCP_LOCATION"]
-AGENT_ENGINE_NAME = os.environ["AGENT_ENGINE_NAME"]
-
-client = vertexai.Client(project=PROJECT_ID, location=LOCATION)
+# vertexai の import と Client の生成はここで初めて行われる（プロセス内で共有）
+client = get_client()
 print(f"✅ Client 初期化完了")
 print(f"   Agent Engine: {AGENT_ENGINE_NAME}")
 
@@ -84,20 +86,21 @@ results = client.agent_engines.memories.retrieve(
     name=AGENT_ENGINE_NAME,
     scope=SCOPE,
 )
-all_memories = list(results)
+# 表示用にコンパクトな MemoryRecord に変換する（スコープの文字列は intern、日時は整数）
+all_memories = list(compact(results))
 
 print(f"   取得件数: {len(all_memories)}（scope={SCOPE} に一致するもののみ）")
 for i, m in enumerate(all_memories, 1):
-    print(f"\n  [{i}] fact: {m.memory.fact}")
-    print(f"      scope: {m.memory.scope}")
-    print(f"      update_time: {m.memory.update_time}")
-    if m.memory.metadata:
-        print(f"      metadata: {m.memory.metadata}")
+    print(f"\n  [{i}] fact: {m.fact}")
+    print(f"      scope: {m.scope_dict()}")
+    print(f"      update_time: {m.update_time}")
+    if m.metadata:
+        print(f"      metadata: {m.metadata_dict()}")
 
 # --- (1)-b: Get（リソース名で1件取得）---
 print("\n--- (1)-b: Get（リソース名で1件取得）---")
 if all_memories:
-    first_memory_name: str = all_memories[0].memory.name
+    first_memory_name: str = all_memories[0].name
     print(f"   取得対象: {first_memory_name}")
 
     memory = client.agent_engines.memories.get(name=first_memory_name)
@@ -114,20 +117,26 @@ else:
 
 # --- (1)-c: List（Agent Engine 内の全メモリを一覧取得）---
 print("\n--- (1)-c: List（Agent Engine 内の全メモリを一覧取得）---")
-pager = client.agent_engines.memories.list(name=AGENT_ENGINE_NAME)
-listed_memories = list(pager)
-print(f"   Agent Engine 内の全メモリ数: {len(listed_memories)}")
-for i, m in enumerate(listed_memories, 1):
-    print(f"\n  [{i}] fact: {m.fact}")
-    print(f"      scope: {m.scope}")
+# list() は全スコープのメモリを返すため、list(pager) で全ページを溜め込まず、
+# ページ単位でストリーミングする（次のページは表示中に先読み）。
+# 表示は先頭 LIST_PREVIEW 件だけにして、残りは件数を数えるだけにする。
+LIST_PREVIEW = 20
+list_stats = StreamStats()
+list_count = 0
+for list_count, m in enumerate(compact(stream_list(client, AGENT_ENGINE_NAME, stats=list_stats)), 1):
+    if list_count > LIST_PREVIEW:
+        continue
+    print(f"\n  [{list_count}] fact: {m.fact}")
+    print(f"      scope: {m.scope_dict()}")
     if m.metadata:
-        print(f"      metadata: {m.metadata}")
+        print(f"      metadata: {m.metadata_dict()}")
+if list_count > LIST_PREVIEW:
+    print(f"\n  ...（残り {list_count - LIST_PREVIEW} 件は省略）")
+print(f"   Agent Engine 内の全メモリ数: {list_count}（{list_stats.pages} ページ）")
 
 # --- (1)-d: List vs Retrieve の結果の違い ---
 print("\n--- (1)-d: List vs Retrieve の結果の違い ---")
 
-list_count: int = len(listed_memories)
-
 # Retrieve: user_123 のスコープ完全一致のみ
 retrieve_123_count: int = len(all_memories)
 
@@ -183,181 +192,160 @@ print(f"      → 横断検索したい属性はスコープではなくメタ
 # ============================================================
 # A. メタデータフィルタ（filter_groups）: DNF形式、完全一致のみ
 # B. システムフィールドフィルタ（filter）: EBNF構文、部分一致・日時範囲可
+#
+# A-1〜C はすべて同じ SCOPE への絞り込み。条件ごとに retrieve(config=...) すると
+# その回数だけサーバ往復が発生するため、スコープ全体を 1 回だけ取得し
+# （ScopeSnapshot）、同じ config をローカルで評価する（memorybank.filters）。
+# サーバ側で評価する場合は、各 config をそのまま retrieve() の config に渡せばよい。
 print("\n" + "=" * 60)
 print("(3) 2種類のフィルタリング（記事 3-2 (3)）")
 print("=" * 60)
 
+snapshot = ScopeSnapshot.fetch(client, AGENT_ENGINE_NAME, SCOPE)
+print(f"\n   スナップショット: {len(snapshot)} 件（retrieve() 1 回。以下の A-1〜C は RPC なし）")
+
 # --- (3)-A: メタデータフィルタ（filter_groups, DNF 形式）---
 print("\n--- (3)-A: メタデータフィルタ（filter_groups）---")
 
 # A-1: department=sales で絞り込み
 print("\n  [A-1] department=sales で絞り込み:")
-results_meta = client.agent_engines.memories.retrieve(
-    name=AGENT_ENGINE_NAME,
-    scope=SCOPE,
-    config={
-        "filter_groups": [
-            {
-                "filters": [
-                    {
-                        "key": "department",
-                        "value": {"string_value": "sales"},
-                    }
-                ]
-            }
-        ]
-    },
-)
-meta_memories = list(results_meta)
+config_meta: dict[str, object] = {
+    "filter_groups": [
+        {
+            "filters": [
+                {
+                    "key": "department",
+                    "value": {"string_value": "sales"},
+                }
+            ]
+        }
+    ]
+}
+meta_memories = snapshot.filter(config_meta)
 print(f"   ヒット件数: {len(meta_memories)}")
-for i, m in enumerate(meta_memories, 1):
-    print(f"    [{i}] fact: {m.memory.fact}")
-    if m.memory.metadata:
-        print(f"        metadata: {m.memory.metadata}")
+for i, m in enumerate(compact(meta_memories), 1):
+    print(f"    [{i}] fact: {m.fact}")
+    if m.metadata:
+        print(f"        metadata: {m.metadata_dict()}")
 
 # A-2: 存在しないメタデータでの絞り込み（0件になるはず）
 print("\n  [A-2] department=nonexistent で絞り込み（0件期待）:")
-results_none = client.agent_engines.memories.retrieve(
-    name=AGENT_ENGINE_NAME,
-    scope=SCOPE,
-    config={
-        "filter_groups": [
-            {
-                "filters": [
-                    {
-                        "key": "department",
-                        "value": {"string_value": "nonexistent"},
-                    }
-                ]
-            }
-        ]
-    },
-)
-none_memories = list(results_none)
+config_none: dict[str, object] = {
+    "filter_groups": [
+        {
+            "filters": [
+                {
+                    "key": "department",
+                    "value": {"string_value": "nonexistent"},
+                }
+            ]
+        }
+    ]
+}
+none_memories = snapshot.filter(config_none)
 print(f"   ヒット件数: {len(none_memories)} （期待: 0）")
 
 # A-3: 複数条件（department=sales AND item_category=stationery）
 # 記事の「プロジェクトA」かつ「優先度：高」に相当する複合条件
 print("\n  [A-3] department=sales AND item_category=stationery:")
-results_multi = client.agent_engines.memories.retrieve(
-    name=AGENT_ENGINE_NAME,
-    scope=SCOPE,
-    config={
-        "filter_groups": [
-            {
-                "filters": [
-                    {
-                        "key": "department",
-                        "value": {"string_value": "sales"},
-                    },
-                    {
-                        "key": "item_category",
-                        "value": {"string_value": "stationery"},
-                    },
-                ]
-            }
-        ]
-    },
-)
-multi_memories = list(results_multi)
+config_multi: dict[str, object] = {
+    "filter_groups": [
+        {
+            "filters": [
+                {
+                    "key": "department",
+                    "value": {"string_value": "sales"},
+                },
+                {
+                    "key": "item_category",
+                    "value": {"string_value": "stationery"},
+                },
+            ]
+        }
+    ]
+}
+multi_memories = snapshot.filter(config_multi)
 print(f"   ヒット件数: {len(multi_memories)}")
-for i, m in enumerate(multi_memories, 1):
-    print(f"    [{i}] fact: {m.memory.fact}")
-    if m.memory.metadata:
-        print(f"        metadata: {m.memory.metadata}")
+for i, m in enumerate(compact(multi_memories), 1):
+    print(f"    [{i}] fact: {m.fact}")
+    if m.metadata:
+        print(f"        metadata: {m.metadata_dict()}")
 
 # --- (3)-B: システムフィールドフィルタ（filter, EBNF 構文）---
 print("\n--- (3)-B: システムフィールドフィルタ（filter）---")
 
 # B-1: fact の部分一致（正規表現）— 記事の例: fact=~".*PC.*"
 print('\n  [B-1] fact に「PC」を含むメモリ:')
-results_fact = client.agent_engines.memories.retrieve(
-    name=AGENT_ENGINE_NAME,
-    scope=SCOPE,
-    config={
-        "filter": 'fact=~".*PC.*"',
-    },
-)
-fact_memories = list(results_fact)
+fact_memories = snapshot.filter({"filter": 'fact=~".*PC.*"'})
 print(f"   ヒット件数: {len(fact_memories)}")
-for i, m in enumerate(fact_memories, 1):
-    print(f"    [{i}] fact: {m.memory.fact}")
+for i, m in enumerate(compact(fact_memories), 1):
+    print(f"    [{i}] fact: {m.fact}")
 
 # B-2: create_time でフィルタ（日時の範囲指定）— 記事の例に準拠
 print('\n  [B-2] 2026年以降に作成されたメモリ:')
-results_time = client.agent_engines.memories.retrieve(
-    name=AGENT_ENGINE_NAME,
-    scope=SCOPE,
-    config={
-        "filter": 'create_time>="2026-01-01T00:00:00Z"',
-    },
-)
-time_memories = list(results_time)
+time_memories = snapshot.filter({"filter": 'create_time>="2026-01-01T00:00:00Z"'})
 print(f"   ヒット件数: {len(time_memories)}")
-for i, m in enumerate(time_memories, 1):
-    print(f"    [{i}] fact: {m.memory.fact}")
-    print(f"        create_time: {m.memory.create_time}")
+for i, m in enumerate(compact(time_memories), 1):
+    print(f"    [{i}] fact: {m.fact}")
+    print(f"        create_time: {m.create_time}")
 
 # B-3: トピックでフィルタ（マネージドトピック）
 print("\n  [B-3] マネージドトピック USER_PREFERENCES でフィルタ:")
-results_topic = client.agent_engines.memories.retrieve(
-    name=AGENT_ENGINE_NAME,
-    scope=SCOPE,
-    config={
-        "filter": "topics.managed_memory_topic: USER_PREFERENCES",
-    },
-)
-topic_memories = list(results_topic)
+topic_memories = snapshot.filter({"filter": "topics.managed_memory_topic: USER_PREFERENCES"})
 print(f"   ヒット件数: {len(topic_memories)}")
-for i, m in enumerate(topic_memories, 1):
-    print(f"    [{i}] fact: {m.memory.fact}")
-    if hasattr(m.memory, "topics") and m.memory.topics:
-        print(f"        topics: {m.memory.topics}")
+for i, m in enumerate(compact(topic_memories), 1):
+    print(f"    [{i}] fact: {m.fact}")
+    if m.topics:
+        print(f"        topics: {m.topic_labels()}")
 
 # B-4: カスタムトピックでフィルタ（Step 0 で設定したカスタムトピック）
 print("\n  [B-4] カスタムトピック ordering_rules でフィルタ:")
-results_custom_topic = client.agent_engines.memories.retrieve(
-    name=AGENT_ENGINE_NAME,
-    scope=SCOPE,
-    config={
-        "filter": "topics.custom_memory_topic_label: ordering_rules",
-    },
-)
-custom_topic_memories = list(results_custom_topic)
+custom_topic_memories = snapshot.filter({"filter": "topics.custom_memory_topic_label: ordering_rules"})
 print(f"   ヒット件数: {len(custom_topic_memories)}")
-for i, m in enumerate(custom_topic_memories, 1):
-    print(f"    [{i}] fact: {m.memory.fact}")
+for i, m in enumerate(compact(custom_topic_memories), 1):
+    print(f"    [{i}] fact: {m.fact}")
 
 # --- (3)-C: 複合フィルタ（filter + filter_groups の同時利用）---
 print("\n--- (3)-C: 複合フィルタ（filter + filter_groups の同時利用）---")
 
 # 記事の例に準拠: 「PC」を含む記憶のうち、2026年以降に作成されたもの
 print('\n  department=sales AND fact に「用紙」を含む:')
+config_combined: dict[str, object] = {
+    # メタデータフィルタ
+    "filter_groups": [
+        {
+            "filters": [
+                {
+                    "key": "department",
+                    "value": {"string_value": "sales"},
+                }
+            ]
+        }
+    ],
+    # システムフィールドフィルタ
+    "filter": 'fact=~".*用紙.*"',
+}
+combined_memories = snapshot.filter(config_combined)
+print(f"   ヒット件数: {len(combined_memories)}")
+for i, m in enumerate(compact(combined_memories), 1):
+    print(f"    [{i}] fact: {m.fact}")
+    if m.metadata:
+        print(f"        metadata: {m.metadata_dict()}")
+
+# --- (3)-D: サーバ側の評価（retrieve(config=...)）との照合 ---
+# 複合条件 C だけをサーバでも評価し、ローカル評価と同じメモリが返ることを確認する
+print("\n--- (3)-D: サーバ側の評価との照合（C のみ）---")
 results_combined = client.agent_engines.memories.retrieve(
     name=AGENT_ENGINE_NAME,
     scope=SCOPE,
-    config={
-        # メタデータフィルタ
-        "filter_groups": [
-            {
-                "filters": [
-                    {
-                        "key": "department",
-                        "value": {"string_value": "sales"},
-                    }
-                ]
-            }
-        ],
-        # システムフィールドフィルタ
-        "filter": 'fact=~".*用紙.*"',
-    },
+    config=config_combined,
 )
-combined_memories = list(results_combined)
-print(f"   ヒット件数: {len(combined_memories)}")
-for i, m in enumerate(combined_memories, 1):
-    print(f"    [{i}] fact: {m.memory.fact}")
-    if m.memory.metadata:
-        print(f"        metadata: {m.memory.metadata}")
+server_names = sorted(m.memory.name for m in results_combined)
+local_names = sorted(m.memory.name for m in combined_memories)
+print(f"   サーバ: {len(server_names)} 件 / ローカル: {len(local_names)} 件 "
+      f"{'✅ 一致' if server_names == local_names else '⚠️ 一致しない'}")
+print(f"\n   💡 サーバ往復: A-1〜C の 8 回 → スナップショット 1 回（+ 照合 1 回）")
+print(f"      ⚠️ セマンティック検索（similarity_search_params）はローカルでは評価できない")
 
 # ============================================================
 # (4) セマンティック検索（類似性検索）（記事 3-2 (4) 参照）
@@ -370,56 +358,31 @@ print("\n" + "=" * 60)
 print("(4) セマンティック検索（類似性検索）（記事 3-2 (4)）")
 print("=" * 60)
 
-# --- クエリ A: いつもの業者を知りたい ---
-print('\n--- クエリ A: 「いつもの発注業者は？」 ---')
-results_a = client.agent_engines.memories.retrieve(
-    name=AGENT_ENGINE_NAME,
-    scope=SCOPE,
-    similarity_search_params={
-        "search_query": "いつもの発注業者は？",
-        "top_k": 3,
-    },
-)
-for i, m in enumerate(list(results_a), 1):
-    distance_str: Optional[str] = None
-    if hasattr(m, "distance") and m.distance is not None:
-        distance_str = f"{m.distance:.4f}"
-    print(f"  [{i}] fact: {m.memory.fact}")
-    print(f"      distance: {distance_str or '(なし)'}")
-
-# --- クエリ B: 納品先についての質問 ---
-print('\n--- クエリ B: 「納品先はどこですか？」 ---')
-results_b = client.agent_engines.memories.retrieve(
-    name=AGENT_ENGINE_NAME,
-    scope=SCOPE,
-    similarity_search_params={
-        "search_query": "納品先はどこですか？",
-        "top_k": 3,
-    },
-)
-for i, m in enumerate(list(results_b), 1):
-    distance_str = None
-    if hasattr(m, "distance") and m.distance is not None:
-        distance_str = f"{m.distance:.4f}"
-    print(f"  [{i}] fact: {m.memory.fact}")
-    print(f"      distance: {distance_str or '(なし)'}")
-
-# --- クエリ C: 予算に関する質問 ---
-print('\n--- クエリ C: 「予算の上限は？」 ---')
-results_c = client.agent_engines.memories.retrieve(
-    name=AGENT_ENGINE_NAME,
-    scope=SCOPE,
-    similarity_search_params={
-        "search_query": "予算の上限は？",
-        "top_k": 3,
-    },
-)
-for i, m in enumerate(list(results_c), 1):
-    distance_str = None
-    if hasattr(m, "distance") and m.distance is not None:
-        distance_str = f"{m.distance:.4f}"
-    print(f"  [{i}] fact: {m.memory.fact}")
-    print(f"      distance: {distance_str or '(なし)'}")
+# クエリ A/B/C は互いに独立しているため、AsyncMemoryBank で並行に投げる。
+# 待ち時間は「3回分の合計」ではなく「最も遅い1回分」になる。
+semantic_queries: list[tuple[str, str]] = [
+    ("A", "いつもの発注業者は？"),  # いつもの業者を知りたい
+    ("B", "納品先はどこですか？"),  # 納品先についての質問
+    ("C", "予算の上限は？"),  # 予算に関する質問
+]
+
+
+async def run_semantic_queries() -> list[list[object]]:
+    bank = AsyncMemoryBank(client, AGENT_ENGINE_NAME)
+    return await asyncio.gather(*(
+        bank.retrieve(SCOPE, similarity_search_params={"search_query": query, "top_k": 3})
+        for _, query in semantic_queries
+    ))
+
+
+for (label, query), semantic_results in zip(semantic_queries, asyncio.run(run_semantic_queries())):
+    print(f'\n--- クエリ {label}: 「{query}」 ---')
+    for i, m in enumerate(compact(semantic_results), 1):  # type: ignore[arg-type]
+        distance_str: Optional[str] = None
+        if m.distance is not None:
+            distance_str = f"{m.distance:.4f}"
+        print(f"  [{i}] fact: {m.fact}")
+        print(f"      distance: {distance_str or '(なし)'}")
 
 print(f"""
 💡 セマンティック検索のポイント:
@@ -428,16 +391,65 @@ print(f"""
    - top_k で返す件数を制御できる
 """)
 
+# ------------------------------------------------------------
+# (4)-B 同じ質問の繰り返し（SemanticQueryCache）
+# ------------------------------------------------------------
+# エージェントは毎ターンほぼ同じ質問を投げることが多い。CachedMemories は
+# クエリの表記ゆれ（全角/半角・空白・末尾の「？」）を正規化してキャッシュし、
+# top_k を広げて取得しておくことで、小さい top_k の問い合わせにもそのまま答える。
+print("--- (4)-B 同じ質問の繰り返し（キャッシュ） ---")
+cached_memories = CachedMemories(client.agent_engines.memories)
+repeated_turns: list[tuple[str, int]] = [
+    ("いつもの発注業者は？", 3),
+    ("いつもの発注業者は?", 3),  # 半角の「?」
+    (" いつもの　発注業者は？", 1),  # 空白の違い + 小さい top_k
+    ("いつもの発注業者は？", 5),
+]
+for turn, (query, top_k) in enumerate(repeated_turns, 1):
+    hits_before = cached_memories.semantic_cache.stats.hits
+    turn_results = cached_memories.retrieve(
+        name=AGENT_ENGINE_NAME,
+        scope=SCOPE,
+        similarity_search_params={"search_query": query, "top_k": top_k},
+    )
+    source = "キャッシュ" if cached_memories.semantic_cache.stats.hits > hits_before else "サーバ"
+    print(f"  ターン{turn}: 「{query}」 top_k={top_k} → {len(turn_results)}件（{source}）")
+semantic_stats = cached_memories.semantic_cache.stats
+print(f"  ヒット率: {semantic_stats.hit_rate:.0%}（うち top_k の切り出し {semantic_stats.partial_hits} 回）")
+print(f"  省けた待ち時間: {semantic_stats.saved_seconds:.2f} 秒\n")
+
+# ------------------------------------------------------------
+# (4)-C ローカルミラー（任意: NumPy が必要）
+# ------------------------------------------------------------
+# よく使うスコープは fact の埋め込みを手元に持っておけば、検索自体はローカルで終わる。
+# Agent Engine と同じ埋め込みモデル（Step 0 で設定）を使うため、distance の意味も同じ。
+print("--- (4)-C ローカルミラー（LocalVectorMirror） ---")
+try:
+    from memorybank.vector_index import LocalVectorMirror, genai_embedder
+
+    mirror = LocalVectorMirror(genai_embedder())
+    mirror_index = mirror.load(client, AGENT_ENGINE_NAME, SCOPE)
+except ImportError as e:
+    print(f"  ⏭️ スキップ: {e}\n")
+else:
+    print(f"  ミラー: {len(mirror_index)} 件（{mirror_index.nbytes / 1024:.1f} KB）")
+    for label, query in semantic_queries:
+        local_hits = mirror.search(AGENT_ENGINE_NAME, SCOPE, query, top_k=3)
+        print(f'  クエリ {label}: 「{query}」')
+        for i, hit in enumerate(local_hits, 1):
+            print(f"    [{i}] {hit.memory.fact}（distance: {hit.distance:.4f}）")
+    print()
+
 # ============================================================
 # クリーンアップ: user_999 のメモリを削除
 # ============================================================
 print("=" * 60)
 print("🧹 クリーンアップ: user_999 のメモリを削除")
 print("=" * 60)
-for mem_name in user_999_memory_names:
-    client.agent_engines.memories.delete(name=mem_name)
-    print(f"   🗑️ 削除: {mem_name}")
-print(f"   ✅ user_999 のメモリを {len(user_999_memory_names)} 件削除完了")
+# 1 件ずつ直列に delete() せず、bulk_delete() で並列に削除する（一時的なエラーは再試行）
+cleanup = bulk_delete(client, AGENT_ENGINE_NAME, names=user_999_memory_names)
+cleanup.raise_for_failures()
+print(f"   ✅ user_999 のメモリを {cleanup.summary()}")
 
 # ============================================================
 # まとめ